@@ -0,0 +1,71 @@
+"""
+Benchmark of the request dispatch.
+
+Compares the time to find the handler of a request with the GenericRequestMapper of the ASK SDK, which asks every
+registered handler with can_handle until one of them can handle the request, and with the IndexedRequestMapper, which
+only asks the handlers registered for the request type or intent name of the request.
+
+    python -m benchmarks.dispatch --repeat 10000
+"""
+
+import argparse
+import statistics
+import time
+from typing import List
+
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_model import Context, Device, Intent, IntentRequest, LaunchRequest, RequestEnvelope, SupportedInterfaces
+from ask_sdk_model.interfaces.audioplayer import AudioPlayerInterface, PlaybackNearlyFinishedRequest, \
+    PlaybackStartedRequest
+from ask_sdk_model.interfaces.system import SystemState
+from ask_sdk_runtime.dispatch_components import GenericRequestMapper
+
+from jellyfin_alexa_skill.alexa.dispatch import IndexedRequestMapper, get_dispatch_key
+from jellyfin_alexa_skill.alexa.handler import get_skill_builder
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
+
+REQUESTS = [LaunchRequest(),
+            IntentRequest(intent=Intent(name="PlaySongIntent")),
+            IntentRequest(intent=Intent(name="AMAZON.YesIntent")),
+            PlaybackStartedRequest(),
+            PlaybackNearlyFinishedRequest()]
+
+
+def build_handler_input(request) -> HandlerInput:
+    device = Device(supported_interfaces=SupportedInterfaces(audio_player=AudioPlayerInterface()))
+
+    return HandlerInput(request_envelope=RequestEnvelope(context=Context(system=SystemState(device=device)),
+                                                         request=request))
+
+
+def measure(mapper: GenericRequestMapper, handler_input: HandlerInput, repeat: int) -> List[float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        mapper.get_request_handler_chain(handler_input)
+        durations.append(time.perf_counter() - start)
+
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the request dispatch")
+    parser.add_argument("--repeat", type=int, default=10_000, help="number of dispatches of each request")
+    args = parser.parse_args()
+
+    skill_builder = get_skill_builder(JellyfinClient(server_endpoint="http://localhost:8096"))
+    chains = skill_builder.runtime_configuration_builder.request_handler_chains
+
+    mappers = (("generic", GenericRequestMapper(request_handler_chains=chains)),
+               ("indexed", IndexedRequestMapper(request_handler_chains=chains)))
+
+    print(f"{'request':<36} {'mapper':<10} {'median (µs)':>12}")
+    for request in REQUESTS:
+        handler_input = build_handler_input(request)
+        for name, mapper in mappers:
+            durations = measure(mapper, handler_input, args.repeat)
+            print(f"{get_dispatch_key(handler_input):<36} {name:<10} {statistics.median(durations) * 10 ** 6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark of the AudioPlayer event router.
+
+Compares the CPU time per AudioPlayer event which is dispatched by the skill, i.e. deserialized into the request
+envelope model, dispatched to the handler and serialized, and which is handled from the raw request by the
+AudioPlayerEventRouter. The playback and the user are stored in an in-memory SQLite database, the users are cached and
+the playback state changes are written behind like with the default configuration. The request verification is
+disabled, because it is the same for both.
+
+    python -m benchmarks.events --repeat 2000
+"""
+
+import argparse
+import json
+import time
+from typing import Callable
+
+from ask_sdk_core.serialize import DefaultSerializer
+from ask_sdk_model import RequestEnvelope
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.alexa.handler import get_skill_builder
+from jellyfin_alexa_skill.alexa.handler.base import BaseHandler
+from jellyfin_alexa_skill.alexa.router import AudioPlayerEventRouter
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.database.state import PlaybackStateCache
+from jellyfin_alexa_skill.database.user_cache import UserCache
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
+
+USER_ID = "amzn1.ask.account.42424242"
+ACCESS_TOKEN = "nicetoken4242"
+
+EVENT_TYPES = ("AudioPlayer.PlaybackStarted", "AudioPlayer.PlaybackStopped", "AudioPlayer.PlaybackFinished")
+
+
+def build_event(request_type: str) -> bytes:
+    return json.dumps({
+        "version": "1.0",
+        "context": {
+            "AudioPlayer": {"token": "abc0", "offsetInMilliseconds": 4200, "playerActivity": "PLAYING"},
+            "System": {
+                "application": {"applicationId": "amzn1.ask.skill.11111111-2222-3333-4444-555555555555"},
+                "user": {"userId": USER_ID, "accessToken": ACCESS_TOKEN},
+                "device": {"deviceId": "amzn1.ask.device.1234567890", "supportedInterfaces": {"AudioPlayer": {}}},
+                "apiEndpoint": "https://api.eu.amazonalexa.com",
+                "apiAccessToken": "apitoken.4242"
+            }
+        },
+        "request": {
+            "type": request_type,
+            "requestId": "amzn1.echo-api.request.99999999-8888-7777-6666-555555555555",
+            "locale": "en-US",
+            "timestamp": "2022-01-01T12:42:42Z",
+            "token": "abc0",
+            "offsetInMilliseconds": 4200
+        }
+    }).encode("utf-8")
+
+
+def measure(func: Callable, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        func()
+
+    return (time.process_time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AudioPlayer event router")
+    parser.add_argument("--repeat", type=int, default=2000, help="number of the dispatches of each event")
+    args = parser.parse_args()
+
+    db.initialize(SqliteDatabase(":memory:"))
+    db.connect()
+    db.create_tables([User, Playback, QueueItem])
+    User.create(alexa_auth_token=ACCESS_TOKEN, jellyfin_user_id="a8e5cac72a3a4ad8a3069f95b4a811ee",
+                jellyfin_token="token")
+    Playback.create(user_id=USER_ID)
+
+    BaseHandler.user_cache = UserCache()
+    # the pending state changes are not flushed during the benchmark, the changes of the single playback are coalesced
+    skill_builder = get_skill_builder(JellyfinClient(server_endpoint="http://localhost:8096"),
+                                      PlaybackStateCache(flush_interval=3600))
+    skill = skill_builder.create()
+    router = AudioPlayerEventRouter(skill_builder.runtime_configuration_builder.request_handler_chains)
+    serializer = DefaultSerializer()
+
+    def dispatch_skill(body: bytes) -> str:
+        # the steps of the webservice handler of the ASK SDK without the verifiers
+        request_envelope = serializer.deserialize(payload=body.decode("utf-8"), obj_type=RequestEnvelope)
+        response_envelope = skill.invoke(request_envelope=request_envelope, context=None)
+        return json.dumps(serializer.serialize(response_envelope))
+
+    def dispatch_router(body: bytes) -> str:
+        return json.dumps(router.dispatch({}, body))
+
+    print(f"{'event':<32} {'skill (µs)':>12} {'router (µs)':>12} {'saved (µs)':>12}")
+    for event_type in EVENT_TYPES:
+        body = build_event(event_type)
+        skill_time = measure(lambda: dispatch_skill(body), args.repeat)
+        router_time = measure(lambda: dispatch_router(body), args.repeat)
+        print(f"{event_type:<32} {skill_time * 10 ** 6:>12.1f} {router_time * 10 ** 6:>12.1f} "
+              f"{(skill_time - router_time) * 10 ** 6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
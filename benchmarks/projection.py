@@ -0,0 +1,132 @@
+"""
+Benchmark of the field projection of the search and listing responses.
+
+Compares the size and the JSON decode time of a listing response with the full items of the server and with the items
+restricted to the base fields by build_projection. By default the responses are generated with the fields of a typical
+Jellyfin server, the responses of a real server are used with the --server, --user-id and --token arguments.
+
+    python -m benchmarks.projection --items 10000
+    python -m benchmarks.projection --server http://localhost:8096 --user-id <user id> --token <token>
+"""
+
+import argparse
+import json
+import random
+import statistics
+import string
+import time
+from typing import Callable, List, Tuple
+
+import requests
+
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, build_projection
+
+
+def random_id(rng: random.Random) -> str:
+    return "".join(rng.choice(string.hexdigits[:16]) for _ in range(32))
+
+
+def build_item(rng: random.Random, projected: bool) -> dict:
+    artist = {"Name": " ".join(rng.choice(("Kevin", "MacLeod", "Daft", "Punk", "Orchestra")) for _ in range(2)),
+              "Id": random_id(rng)}
+    item = {"Name": " ".join(rng.choice(("Monkeys", "Spinning", "Sneaky", "Snitch", "Café")) for _ in range(3)),
+            "ServerId": random_id(rng),
+            "Id": random_id(rng),
+            "RunTimeTicks": rng.randint(10 ** 9, 10 ** 10),
+            "ProductionYear": rng.randint(1950, 2022),
+            "IndexNumber": rng.randint(1, 20),
+            "IsFolder": False,
+            "Type": "Audio",
+            "Artists": [artist["Name"]],
+            "ArtistItems": [artist],
+            "Album": "Album",
+            "AlbumId": random_id(rng),
+            "AlbumArtist": artist["Name"],
+            "AlbumArtists": [artist],
+            "LocationType": "FileSystem",
+            "MediaType": "Audio"}
+    if projected:
+        return item
+
+    item.update({
+        "UserData": {"PlaybackPositionTicks": 0, "PlayCount": rng.randint(0, 50), "IsFavorite": rng.random() < 0.1,
+                     "Played": rng.random() < 0.5, "Key": random_id(rng)},
+        "ImageTags": {"Primary": random_id(rng)},
+        "BackdropImageTags": [],
+        "ImageBlurHashes": {"Primary": {random_id(rng): "".join(rng.choice(string.ascii_letters) for _ in range(28))}},
+        "AlbumPrimaryImageTag": random_id(rng),
+        "ChannelId": None,
+        "ParentId": random_id(rng),
+        "Genres": ["Soundtrack"],
+        "GenreItems": [{"Name": "Soundtrack", "Id": random_id(rng)}],
+        "People": [],
+        "Studios": [],
+        "Tags": [],
+        "ProviderIds": {"MusicBrainzTrack": random_id(rng), "MusicBrainzAlbum": random_id(rng)},
+        "DateCreated": "2022-01-01T00:00:00.0000000Z",
+        "SortName": "0001 - monkeys spinning monkeys",
+        "PrimaryImageAspectRatio": 1,
+        "MediaSources": [{"Protocol": "File", "Id": random_id(rng), "Path": "/media/music/album/song.mp3",
+                          "Container": "mp3", "Size": rng.randint(10 ** 6, 10 ** 7), "Bitrate": 320000,
+                          "MediaStreams": [{"Codec": "mp3", "Type": "Audio", "Channels": 2, "SampleRate": 44100}]}]
+    })
+
+    return item
+
+
+def generated_responses(count: int, seed: int) -> Tuple[bytes, bytes]:
+    full = json.dumps({"Items": [build_item(random.Random(seed + i), False) for i in range(count)],
+                       "TotalRecordCount": count}).encode()
+    projected = json.dumps({"Items": [build_item(random.Random(seed + i), True) for i in range(count)]}).encode()
+
+    return full, projected
+
+
+def server_responses(server: str, user_id: str, token: str, count: int) -> Tuple[bytes, bytes]:
+    url = server + f"/Users/{user_id}/Items"
+    headers = {"X-Emby-Authorization": JellyfinClient._build_emby_auth_header(token=token)}
+    params = {"IncludeItemTypes": "Audio", "Recursive": True, "Limit": count}
+
+    responses = []
+    for projection in ({}, build_projection()):
+        res = requests.get(url, headers=headers, params=dict(params, **projection))
+        res.raise_for_status()
+        responses.append(res.content)
+
+    return responses[0], responses[1]
+
+
+def measure(func: Callable, repeat: int) -> List[float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the field projection of the listing responses")
+    parser.add_argument("--items", type=int, default=10_000, help="number of items in the responses")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the generated items")
+    parser.add_argument("--repeat", type=int, default=10, help="number of the decodes of each response")
+    parser.add_argument("--server", help="url of a Jellyfin server, instead of the generated responses")
+    parser.add_argument("--user-id", help="Jellyfin user id of the user whose items are listed")
+    parser.add_argument("--token", help="authentication token of the user")
+    args = parser.parse_args()
+
+    if args.server:
+        full, projected = server_responses(args.server, args.user_id, args.token, args.items)
+    else:
+        full, projected = generated_responses(args.items, args.seed)
+
+    print(f"{'response':<12} {'items':>8} {'size (KiB)':>12} {'decode median (ms)':>20}")
+    for name, content in (("full", full), ("projected", projected)):
+        durations = measure(lambda: json.loads(content), args.repeat)
+        print(f"{name:<12} {len(json.loads(content)['Items']):>8} {len(content) / 1024:>12.1f} "
+              f"{statistics.median(durations) * 1000:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
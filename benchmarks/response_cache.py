@@ -0,0 +1,86 @@
+"""
+Benchmark of the response cache of the JellyfinClient.
+
+Compares the time of a cached album listing on a cache miss, which requests and decodes the response, and on a cache
+hit, which returns a shallow copy of the cached items. The time of a deep copy of the items is shown for comparison,
+because it grows with the number and the size of the items like the decoding on a miss.
+
+    python -m benchmarks.response_cache --items 1000
+"""
+
+import argparse
+import copy
+import json
+import statistics
+import time
+from typing import Callable, List
+from unittest import mock
+
+from jellyfin_alexa_skill.jellyfin.api.cache import ResponseCache
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
+
+USER_ID = "a8e5cac72a3a4ad8a3069f95b4a811ee"
+
+
+class FakeResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def __bool__(self):
+        return True
+
+
+def build_items(count: int) -> List[dict]:
+    return [{"Name": f"Song {i}",
+             "Id": f"{i:032x}",
+             "Type": "Audio",
+             "MediaType": "Audio",
+             "IsFolder": False,
+             "RunTimeTicks": 2_000_000_000,
+             "Artists": ["Kevin MacLeod"],
+             "ArtistItems": [{"Name": "Kevin MacLeod", "Id": f"{i + 1:032x}"}],
+             "AlbumArtists": [{"Name": "Kevin MacLeod", "Id": f"{i + 1:032x}"}],
+             "Album": "Album",
+             "AlbumId": f"{i + 2:032x}",
+             "UserData": {"PlayCount": 3, "IsFavorite": False}}
+            for i in range(count)]
+
+
+def measure(func: Callable, repeat: int) -> List[float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the response cache of the Jellyfin client")
+    parser.add_argument("--items", type=int, default=1000, help="number of items of the cached listing")
+    parser.add_argument("--repeat", type=int, default=100, help="number of the measured calls")
+    args = parser.parse_args()
+
+    items = build_items(args.items)
+    content = json.dumps({"Items": items}).encode()
+
+    client = JellyfinClient(server_endpoint="http://localhost:8096",
+                            response_cache=ResponseCache(max_result_size=args.items))
+
+    def get_album_items(album_id: str) -> List[dict]:
+        return client.get_album_items(user_id=USER_ID, token="token", album_id=album_id)
+
+    with mock.patch.object(client.session, "get", return_value=FakeResponse(content)):
+        album_ids = iter(range(args.repeat))
+        miss = measure(lambda: get_album_items(str(next(album_ids))), args.repeat)
+        hit = measure(lambda: get_album_items("0"), args.repeat)
+    deep_copy = measure(lambda: copy.deepcopy(items), args.repeat)
+
+    print(f"{'call':<24} {'items':>8} {'median (ms)':>12}")
+    for name, durations in (("miss", miss), ("hit (shallow copy)", hit), ("deep copy of the items", deep_copy)):
+        print(f"{name:<24} {args.items:>8} {statistics.median(durations) * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark of the ranking of search results.
+
+Compares the scoring of every candidate with get_similarity and the selection of the best candidates by sorting with the
+batch trigram scoring of the library index, whose trigrams are precomputed, and the reuse of one matcher for all
+candidates by get_similarities.
+
+    python -m benchmarks.scoring
+"""
+
+import argparse
+import random
+import statistics
+import string
+import time
+from typing import Callable, List
+
+from jellyfin_alexa_skill.alexa.util import get_similarity, get_similarities
+from jellyfin_alexa_skill.library.scoring import trigrams, top_k
+
+CANDIDATE_COUNTS = [20, 100, 1_000, 10_000]
+TOP_K = 3
+
+
+def build_names(count: int, rng: random.Random) -> List[str]:
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9))) for _ in range(2000)]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(1, 5))).title() for _ in range(count)]
+
+
+def rank_sequence_matcher(term: str, names: List[str]) -> List[int]:
+    # the previous ranking of the handlers
+    scores = [get_similarity(name, term) for name in names]
+    return [i for i, _ in sorted(enumerate(scores), key=lambda item: item[1], reverse=True)[:TOP_K]]
+
+
+def rank_sequence_matcher_batch(term: str, names: List[str]) -> List[int]:
+    scores = get_similarities(names, term)
+    return [i for i, _ in sorted(enumerate(scores), key=lambda item: item[1], reverse=True)[:TOP_K]]
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ranking of search results")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs per candidate count")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the generated names")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    print(f"{'candidates':>10} {'SequenceMatcher':>18} {'one matcher':>18} {'trigrams top-k':>18}")
+    for count in CANDIDATE_COUNTS:
+        names = build_names(count, rng)
+        term = rng.choice(names).lower()
+        name_trigrams = [trigrams(name) for name in names]
+
+        single = measure(lambda: rank_sequence_matcher(term, names), args.repeat)
+        batch = measure(lambda: rank_sequence_matcher_batch(term, names), args.repeat)
+        # unlimited time budget to measure the scoring of all candidates
+        trigram = measure(lambda: top_k(trigrams(term), name_trigrams, TOP_K, time_budget=60), args.repeat)
+
+        print(f"{count:>10} {single * 1000:>15.3f} ms {batch * 1000:>15.3f} ms {trigram * 1000:>15.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
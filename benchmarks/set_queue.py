@@ -0,0 +1,105 @@
+"""
+Benchmark of the replacement of a playback queue.
+
+Compares the bulk insert of Playback.set_queue and the packed queue storage with inserting every queue item by its own
+INSERT statement. By default
+an in-memory SQLite database is used, a PostgreSQL database can be used with the --postgres-* arguments.
+
+    python -m benchmarks.set_queue
+    python -m benchmarks.set_queue --postgres-host localhost --postgres-user skill --postgres-password pw
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+from peewee import SqliteDatabase, PostgresqlDatabase
+
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem, QueueStorage
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.jellyfin.api.client import MediaType
+
+QUEUE_SIZES = [10, 1_000, 10_000]
+
+
+def build_items(size: int) -> List[QueueItem]:
+    return [QueueItem(idx=i, media_type=MediaType.AUDIO, item_id=f"{i:032x}") for i in range(size)]
+
+
+def set_queue_single_inserts(playback: Playback, items: List[QueueItem]) -> None:
+    # the previous implementation of Playback.set_queue
+    QueueItem.delete().where(QueueItem.playback == playback).execute()
+    playback.packed_queue = None
+
+    for item in items:
+        item.playback = playback
+        item.save()
+
+    playback.current_item = items[0]
+    playback.playing = False
+    playback.offset = 0
+    playback.save()
+
+
+def set_queue_bulk(playback: Playback, items: List[QueueItem]) -> None:
+    Playback.queue_storage = QueueStorage.ROWS
+    playback.set_queue(items)
+
+
+def set_queue_packed(playback: Playback, items: List[QueueItem]) -> None:
+    Playback.queue_storage = QueueStorage.PACKED
+    playback.set_queue(items)
+
+
+def measure(func: Callable[[Playback, List[QueueItem]], None], playback: Playback, size: int, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        items = build_items(size)
+
+        start = time.perf_counter()
+        func(playback, items)
+        durations.append(time.perf_counter() - start)
+
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the replacement of a playback queue")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs per queue size")
+    parser.add_argument("--postgres-host", help="host of a PostgreSQL database, SQLite in-memory if not set")
+    parser.add_argument("--postgres-port", type=int, default=5432)
+    parser.add_argument("--postgres-user", default="skill")
+    parser.add_argument("--postgres-password", default="")
+    parser.add_argument("--postgres-database", default="jellyfin_alexa_skill_benchmark")
+    args = parser.parse_args()
+
+    if args.postgres_host:
+        db.initialize(PostgresqlDatabase(database=args.postgres_database,
+                                         user=args.postgres_user,
+                                         password=args.postgres_password,
+                                         host=args.postgres_host,
+                                         port=args.postgres_port))
+    else:
+        db.initialize(SqliteDatabase(":memory:"))
+
+    db.connect()
+    db.drop_tables([User, Playback, QueueItem], safe=True)
+    db.create_tables([User, Playback, QueueItem])
+
+    playback = Playback.create(user_id="benchmark")
+
+    print(f"{'queue size':>10} {'single inserts':>16} {'bulk insert':>16} {'packed':>16}")
+    for size in QUEUE_SIZES:
+        single = measure(set_queue_single_inserts, playback, size, args.repeat)
+        bulk = measure(set_queue_bulk, playback, size, args.repeat)
+        packed = measure(set_queue_packed, playback, size, args.repeat)
+        print(f"{size:>10} {single * 1000:>13.2f} ms {bulk * 1000:>13.2f} ms {packed * 1000:>13.2f} ms")
+
+    db.drop_tables([User, Playback, QueueItem])
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
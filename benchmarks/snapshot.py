@@ -0,0 +1,72 @@
+"""
+Benchmark of the cold start of the library index from a snapshot.
+
+Measures the time to write the snapshot of an index with generated items, the time until a new process can answer the
+first search from the mapped snapshot and the time to restore the index of the library sync from the snapshot, which
+runs in the background.
+
+    python -m benchmarks.snapshot --items 100000
+"""
+
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+from jellyfin_alexa_skill.library.index import LibraryIndex
+from jellyfin_alexa_skill.library.snapshot import Snapshot, SnapshotIndex, write_snapshot
+
+USER_ID = "a8e5cac72a3a4ad8a3069f95b4a811ee"
+
+
+def build_index(count: int, rng: random.Random) -> LibraryIndex:
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9))) for _ in range(5000)]
+    items = [{"Id": f"{i:032x}",
+              "Name": " ".join(rng.choice(words) for _ in range(rng.randint(1, 5))).title(),
+              "Type": rng.choice(("Audio", "MusicAlbum", "Video")),
+              "IsFolder": False,
+              "Album": rng.choice(words).title()} for i in range(count)]
+
+    library_index = LibraryIndex()
+    library_index.update_user(USER_ID, items)
+
+    return library_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of the library index from a snapshot")
+    parser.add_argument("--items", type=int, default=100_000, help="number of items in the index")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the generated items")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    library_index = build_index(args.items, rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "library_index.snapshot")
+
+        start = time.perf_counter()
+        write_snapshot(library_index, path)
+        write_duration = time.perf_counter() - start
+
+        term = rng.choice(library_index.contents().items)[0]["Name"]
+
+        start = time.perf_counter()
+        results = SnapshotIndex(path).search(USER_ID, term, ["Audio", "MusicAlbum", "Video"], limit=3)
+        first_search_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        LibraryIndex().restore(Snapshot(path).contents())
+        restore_duration = time.perf_counter() - start
+
+        print(f"items:                      {args.items}")
+        print(f"snapshot size:              {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        print(f"write:                      {write_duration * 1000:.1f} ms")
+        print(f"map and first search:       {first_search_duration * 1000:.1f} ms ({len(results)} results)")
+        print(f"restore of the sync index:  {restore_duration * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_core.skill_builder import SkillBuilder
+from ask_sdk_model import IntentRequest
+from ask_sdk_runtime.dispatch_components import GenericRequestHandlerChain, GenericRequestMapper
+
+
+def get_dispatch_key(handler_input: HandlerInput) -> str:
+    """
+    Get the key under which the handlers of a request are registered.
+
+    :param handler_input: the handler input of the request
+    :return: the intent name of intent requests, otherwise the request type
+    """
+
+    request = handler_input.request_envelope.request
+    if isinstance(request, IntentRequest):
+        return request.intent.name
+
+    return request.object_type
+
+
+class IndexedRequestMapper(GenericRequestMapper):
+    """
+    Request mapper which looks up the handler of a request by its request type or intent name instead of asking every
+    registered handler, see BaseHandler.dispatch_keys.
+
+    The candidates of each key are the handlers registered with the key and the handlers without dispatch keys, in the
+    order of their registration. The candidates are still asked with can_handle, so the chosen handler is the same as
+    with the GenericRequestMapper.
+    """
+
+    def __init__(self, request_handler_chains: List[GenericRequestHandlerChain]):
+        """
+        :param request_handler_chains: the request handler chains in the order of their registration
+        """
+
+        self._chains_by_key: Dict[str, List[GenericRequestHandlerChain]] = {}
+        self._unkeyed_chains: List[GenericRequestHandlerChain] = []
+
+        super().__init__(request_handler_chains=request_handler_chains)
+
+    def add_request_handler_chain(self, request_handler_chain: GenericRequestHandlerChain) -> None:
+        super().add_request_handler_chain(request_handler_chain)
+
+        self._index()
+
+    def _index(self) -> None:
+        keys = set()
+        for chain in self.request_handler_chains:
+            keys.update(getattr(chain.request_handler, "dispatch_keys", None) or ())
+
+        chains_by_key = defaultdict(list)
+        unkeyed_chains = []
+        for chain in self.request_handler_chains:
+            dispatch_keys = getattr(chain.request_handler, "dispatch_keys", None)
+            if dispatch_keys is None:
+                unkeyed_chains.append(chain)
+                for key in keys:
+                    chains_by_key[key].append(chain)
+            else:
+                for key in dispatch_keys:
+                    chains_by_key[key].append(chain)
+
+        self._chains_by_key = dict(chains_by_key)
+        self._unkeyed_chains = unkeyed_chains
+
+    def get_request_handler_chain(self, handler_input: HandlerInput) -> Optional[GenericRequestHandlerChain]:
+        chains = self._chains_by_key.get(get_dispatch_key(handler_input), self._unkeyed_chains)
+        for chain in chains:
+            if chain.request_handler.can_handle(handler_input=handler_input):
+                return chain
+
+        return None
+
+
+class IndexedSkillBuilder(SkillBuilder):
+    """
+    Skill builder which dispatches the requests with the IndexedRequestMapper.
+    """
+
+    @property
+    def skill_configuration(self):
+        skill_configuration = super().skill_configuration
+        skill_configuration.request_mappers = [IndexedRequestMapper(self.runtime_configuration_builder
+                                                                    .request_handler_chains)]
+
+        return skill_configuration
@@ -1,4 +1,4 @@
-from ask_sdk_core.skill_builder import SkillBuilder
+from typing import Optional
 
 from jellyfin_alexa_skill.alexa.handler.channel import *
 from jellyfin_alexa_skill.alexa.handler.control import *
@@ -12,10 +12,27 @@ from jellyfin_alexa_skill.alexa.handler.interface import *
 from jellyfin_alexa_skill.alexa.handler.launch import *
 from jellyfin_alexa_skill.alexa.handler.playlist import *
 from jellyfin_alexa_skill.alexa.handler.yesno import *
+from jellyfin_alexa_skill.alexa.dispatch import IndexedSkillBuilder
+from jellyfin_alexa_skill.alexa.loader import QueueLoader
+from jellyfin_alexa_skill.alexa.planner import QueryPlanner
+from jellyfin_alexa_skill.alexa.prefetch import StreamPrefetcher
+from jellyfin_alexa_skill.alexa.speculation import MatchSpeculator
+from jellyfin_alexa_skill.database.state import PlaybackStateCache
+from jellyfin_alexa_skill.jellyfin.api.async_client import AsyncJellyfinClient
 
 
-def get_skill_builder(jellyfin_client: JellyfinClient):
-    skill_builder = SkillBuilder()
+def get_skill_builder(jellyfin_client: JellyfinClient, playback_state_cache: Optional[PlaybackStateCache] = None):
+    skill_builder = IndexedSkillBuilder()
+
+    if playback_state_cache is None:
+        # write all playback state changes immediately
+        playback_state_cache = PlaybackStateCache(flush_interval=0)
+
+    async_jellyfin_client = AsyncJellyfinClient(jellyfin_client)
+    query_planner = QueryPlanner(jellyfin_client, async_jellyfin_client)
+    queue_loader = QueueLoader()
+    stream_prefetcher = StreamPrefetcher(jellyfin_client)
+    match_speculator = MatchSpeculator(jellyfin_client)
 
     skill_builder.add_request_handler(CheckAudioInterfaceHandler())
 
@@ -25,11 +42,11 @@ def get_skill_builder(jellyfin_client: JellyfinClient):
     skill_builder.add_request_handler(LaunchRequestHandler(jellyfin_client))
     skill_builder.add_request_handler(SessionEndedRequestHandler())
 
-    skill_builder.add_request_handler(PlaySongIntentHandler(jellyfin_client))
-    skill_builder.add_request_handler(PlayAlbumIntentHandler(jellyfin_client))
-    skill_builder.add_request_handler(PlayChannelIntentHandler(jellyfin_client))
-    skill_builder.add_request_handler(PlayVideoIntentHandler(jellyfin_client))
-    skill_builder.add_request_handler(PlayArtistSongsIntentHandler(jellyfin_client))
+    skill_builder.add_request_handler(PlaySongIntentHandler(jellyfin_client, query_planner, match_speculator))
+    skill_builder.add_request_handler(PlayAlbumIntentHandler(jellyfin_client, query_planner, match_speculator))
+    skill_builder.add_request_handler(PlayChannelIntentHandler(jellyfin_client, match_speculator))
+    skill_builder.add_request_handler(PlayVideoIntentHandler(jellyfin_client, match_speculator))
+    skill_builder.add_request_handler(PlayArtistSongsIntentHandler(jellyfin_client, queue_loader))
 
     skill_builder.add_request_handler(PlayLastAddedIntentHandler(jellyfin_client))
 
@@ -38,28 +55,28 @@ def get_skill_builder(jellyfin_client: JellyfinClient):
 
     skill_builder.add_request_handler(LoopAllOffIntent())
     skill_builder.add_request_handler(LoopAllOnIntent())
-    skill_builder.add_request_handler(NextIntentHandler(jellyfin_client))
+    skill_builder.add_request_handler(NextIntentHandler(jellyfin_client, stream_prefetcher))
     skill_builder.add_request_handler(PreviousIntentHandler(jellyfin_client))
     skill_builder.add_request_handler(RepeatSingleOnIntent())
     skill_builder.add_request_handler(ShuffleOffIntentHandler())
     skill_builder.add_request_handler(ShuffleOnIntentHandler())
     skill_builder.add_request_handler(StartOverIntentHandler(jellyfin_client))
 
-    skill_builder.add_request_handler(PlayFavoritesIntentHandler(jellyfin_client))
+    skill_builder.add_request_handler(PlayFavoritesIntentHandler(jellyfin_client, queue_loader))
     skill_builder.add_request_handler(MarkFavoriteIntentHandler(jellyfin_client))
     skill_builder.add_request_handler(UnmarkFavoriteIntentHandler(jellyfin_client))
 
-    skill_builder.add_request_handler(PlayPlaylistIntentHandler(jellyfin_client))
+    skill_builder.add_request_handler(PlayPlaylistIntentHandler(jellyfin_client, queue_loader))
 
-    skill_builder.add_request_handler(PlaybackStartedEventHandler())
-    skill_builder.add_request_handler(PlaybackStoppedEventHandler())
-    skill_builder.add_request_handler(PlaybackFinishedEventHandler())
-    skill_builder.add_request_handler(PlaybackNearlyFinishedEventHandler(jellyfin_client))
-    skill_builder.add_request_handler(PlaybackFailedEventHandler())
+    skill_builder.add_request_handler(PlaybackStartedEventHandler(stream_prefetcher, playback_state_cache))
+    skill_builder.add_request_handler(PlaybackStoppedEventHandler(playback_state_cache))
+    skill_builder.add_request_handler(PlaybackFinishedEventHandler(playback_state_cache))
+    skill_builder.add_request_handler(PlaybackNearlyFinishedEventHandler(jellyfin_client, stream_prefetcher))
+    skill_builder.add_request_handler(PlaybackFailedEventHandler(playback_state_cache))
 
     skill_builder.add_request_handler(MediaInfoIntentHandler(jellyfin_client))
     skill_builder.add_request_handler(HelpIntentHandler())
 
-    skill_builder.add_request_handler(YesNoIntentHandler(jellyfin_client))
+    skill_builder.add_request_handler(YesNoIntentHandler(jellyfin_client, match_speculator))
 
     return skill_builder
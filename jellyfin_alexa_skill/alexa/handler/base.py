@@ -1,16 +1,97 @@
 from abc import abstractmethod, ABC
 from functools import wraps
+from typing import Optional, Tuple
 
 from ask_sdk_core.dispatch_components import AbstractRequestHandler
 from ask_sdk_core.handler_input import HandlerInput
 from ask_sdk_model.ui.link_account_card import LinkAccountCard
 from peewee import DoesNotExist
 
+from jellyfin_alexa_skill.alexa.dispatch import get_dispatch_key
+from jellyfin_alexa_skill.alexa.stream_token import StreamTokenSigner
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
 from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.database.user_cache import UserCache
 from jellyfin_alexa_skill.l10n import get_translation
 
 
 class BaseHandler(AbstractRequestHandler, ABC):
+    # cache of the linked users shared by all handlers, None looks up the user in the database for every request
+    user_cache: Optional[UserCache] = None
+    # request types and intent names of the requests which can be handled, such that the requests are dispatched with a
+    # lookup instead of asking every handler, None if the handler is asked for every request and overrides can_handle
+    dispatch_keys: Optional[Tuple[str, ...]] = None
+    # signer of the stream tokens shared by all handlers, None uses the bare item ids as stream tokens
+    stream_token_signer: Optional[StreamTokenSigner] = None
+
+    def get_user(self, alexa_auth_token: str) -> User:
+        """
+        Get the user linked with an Alexa access token.
+
+        :param alexa_auth_token: the Alexa access token
+        :return: the user
+        :raises: DoesNotExist if no user is linked with the access token
+        """
+
+        if self.user_cache is None:
+            return User.get(alexa_auth_token=alexa_auth_token)
+
+        user = self.user_cache.get_user(alexa_auth_token)
+        if user is None:
+            raise DoesNotExist("No user is linked with the access token")
+
+        return user
+
+    def get_stream_token(self, user_id: str, playback: Playback, queue_item: QueueItem) -> str:
+        """
+        Get the token of the stream of a queue item.
+
+        :param user_id: Alexa user id of the playback
+        :param playback: the playback
+        :param queue_item: the queue item
+        :return: the signed token with the position of the item in the queue or the bare item id if no signer is set
+        """
+
+        if self.stream_token_signer is None:
+            return queue_item.item_id
+
+        return self.stream_token_signer.encode(user_id, queue_item.item_id, queue_item.idx, playback.queue_generation)
+
+    def is_stale_event(self, user_id: str, playback: Playback, token: Optional[str]) -> bool:
+        """
+        Check if an AudioPlayer event belongs to a stream which is not the current item of the playback anymore, e.g. a
+        late event of a stream of a replaced queue.
+
+        :param user_id: Alexa user id of the playback
+        :param playback: the playback
+        :param token: the token of the stream of the event
+        :return: True if the token is a signed token of another queue or item, False otherwise, also if the token is
+                 not signed
+        """
+
+        if self.stream_token_signer is None:
+            return False
+
+        stream_token = self.stream_token_signer.decode(user_id, token)
+        if stream_token is None:
+            return False
+
+        current_item = playback.current_item
+
+        return (stream_token.queue_generation != playback.queue_generation
+                or current_item is None
+                or stream_token.queue_idx != current_item.idx)
+
+    def can_handle(self, handler_input: HandlerInput) -> bool:
+        """
+        Check if the request type or intent name of a request is one of the dispatch keys of the handler.
+
+        :param handler_input: the handler input of the request
+        :return: True if the request can be handled, False otherwise
+        """
+
+        return self.dispatch_keys is not None and get_dispatch_key(handler_input) in self.dispatch_keys
+
     def handle(self, handler_input: HandlerInput, *args, **kwargs):
         alexa_auth_token = handler_input.request_envelope.context.system.user.access_token
 
@@ -19,7 +100,7 @@ class BaseHandler(AbstractRequestHandler, ABC):
             return handler_input.response_builder.response
 
         try:
-            user = User.get(alexa_auth_token=alexa_auth_token)
+            user = self.get_user(alexa_auth_token)
         except DoesNotExist:
             handler_input.response_builder.set_card(LinkAccountCard())
             return handler_input.response_builder.response
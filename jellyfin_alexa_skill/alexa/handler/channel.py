@@ -1,11 +1,11 @@
 from gettext import GNUTranslations
 
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_core.utils import is_intent_name
 from ask_sdk_model import Response
 
 from jellyfin_alexa_skill.alexa.handler.base import BaseHandler
-from jellyfin_alexa_skill.alexa.util import build_stream_response, get_similarity, \
+from jellyfin_alexa_skill.alexa.speculation import MatchSpeculator
+from jellyfin_alexa_skill.alexa.util import build_stream_response, get_similarities, \
     best_matches_by_idx
 from jellyfin_alexa_skill.database.db import get_playback
 from jellyfin_alexa_skill.database.model.playback import QueueItem
@@ -14,11 +14,11 @@ from jellyfin_alexa_skill.jellyfin.api.client import MediaType, JellyfinClient
 
 
 class PlayChannelIntentHandler(BaseHandler):
-    def __init__(self, jellyfin_client: JellyfinClient):
-        self.jellyfin_client = jellyfin_client
+    dispatch_keys = ("PlayChannelIntent",)
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("PlayChannelIntent")(handler_input)
+    def __init__(self, jellyfin_client: JellyfinClient, match_speculator: MatchSpeculator):
+        self.jellyfin_client = jellyfin_client
+        self.match_speculator = match_speculator
 
     @BaseHandler.translate
     def handle_func(self,
@@ -55,15 +55,16 @@ class PlayChannelIntentHandler(BaseHandler):
             user_id = handler_input.request_envelope.context.system.user.user_id
             item = QueueItem(idx=0,
                              media_type=MediaType.CHANNEL,
-                             media_item_id=item["Id"])
+                             item_id=item["Id"])
             playback = get_playback(user_id)
-            playback.set_playback_queue(user_id, [item])
+            playback.set_queue([item])
 
             build_stream_response(jellyfin_client=self.jellyfin_client,
                                   jellyfin_user_id=user.jellyfin_user_id,
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
-                                  queue_item=playback.current_item)
+                                  queue_item=playback.current_item,
+                                  stream_token=self.get_stream_token(user_id, playback, playback.current_item))
 
             return handler_input.response_builder.response
 
@@ -73,7 +74,7 @@ class PlayChannelIntentHandler(BaseHandler):
              (b) find top 3 matches and store them in session variable list
              (c) ask user to confirm their choice (see YesNoIntentHandler)
         """
-        channel_match_scores = [get_similarity(item["Name"], channel) for item in channel_search_results]
+        channel_match_scores = get_similarities([item["Name"] for item in channel_search_results], channel)
         top_matches_idx = best_matches_by_idx(match_scores=channel_match_scores)
         top_matches = []
         for idx in top_matches_idx:
@@ -84,6 +85,13 @@ class PlayChannelIntentHandler(BaseHandler):
         handler_input.attributes_manager.session_attributes["TopMatches"] = top_matches
         handler_input.attributes_manager.session_attributes["TopMatchesType"] = MediaType.CHANNEL
 
+        # resolve the top match while the question is spoken
+        self.match_speculator.speculate(user_id=handler_input.request_envelope.context.system.user.user_id,
+                                        media_type=MediaType.CHANNEL,
+                                        item_id=top_matches[0]["Id"],
+                                        jellyfin_user_id=user.jellyfin_user_id,
+                                        jellyfin_token=user.jellyfin_token)
+
         # ask user if they want the first one...  (response is handled by YesNoIntentHandler)
         request_text = translation.gettext("Would you like to listen to {name}?".format(
             name=top_matches[0]['Name']))
@@ -1,13 +1,16 @@
 from gettext import GNUTranslations
 
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_core.utils import is_intent_name
 from ask_sdk_model import Response
 from ask_sdk_model.interfaces.audioplayer import StopDirective
 
 from jellyfin_alexa_skill.database.db import get_playback
 from jellyfin_alexa_skill.alexa.handler.base import BaseHandler
-from jellyfin_alexa_skill.alexa.util import build_stream_response, get_similarity, best_matches_by_idx, \
+from jellyfin_alexa_skill.alexa.loader import QueueLoader
+from jellyfin_alexa_skill.alexa.planner import QueryPlanner
+from jellyfin_alexa_skill.alexa.prefetch import StreamPrefetcher
+from jellyfin_alexa_skill.alexa.speculation import MatchSpeculator
+from jellyfin_alexa_skill.alexa.util import build_stream_response, get_similarities, best_matches_by_idx, \
     get_media_type_enum
 from jellyfin_alexa_skill.config import ARTISTS_PARTIAL_RATIO_THRESHOLD
 from jellyfin_alexa_skill.database.model.playback import QueueItem
@@ -16,11 +19,12 @@ from jellyfin_alexa_skill.jellyfin.api.client import MediaType, JellyfinClient
 
 
 class PlaySongIntentHandler(BaseHandler):
-    def __init__(self, jellyfin_client: JellyfinClient):
-        self.jellyfin_client = jellyfin_client
+    dispatch_keys = ("PlaySongIntent",)
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("PlaySongIntent")(handler_input)
+    def __init__(self, jellyfin_client: JellyfinClient, query_planner: QueryPlanner, match_speculator: MatchSpeculator):
+        self.jellyfin_client = jellyfin_client
+        self.query_planner = query_planner
+        self.match_speculator = match_speculator
 
     @BaseHandler.translate
     def handle_func(self,
@@ -41,22 +45,15 @@ class PlaySongIntentHandler(BaseHandler):
 
         song = song.lower()
 
-        song_search_results = self.jellyfin_client.search_media_items(user_id=user.jellyfin_user_id,
-                                                                      token=user.jellyfin_token,
-                                                                      term=song,
-                                                                      media=MediaType.AUDIO,
-                                                                      Filters="IsNotFolder")
-
         if musician:
             musician = musician.lower()
-            # filter song search results with the searched musician
-            artists_search_results = self.jellyfin_client.search_artist(user_id=user.jellyfin_user_id,
-                                                                        token=user.jellyfin_token,
-                                                                        term=musician)
-            artists_ids = set([artists["Id"] for artists in artists_search_results])
 
-            song_search_results = [song for song in song_search_results if
-                                   set(artist["Id"] for artist in song["ArtistItems"]).intersection(artists_ids)]
+        song_search_results = self.query_planner.search(jellyfin_user_id=user.jellyfin_user_id,
+                                                        token=user.jellyfin_token,
+                                                        term=song,
+                                                        media=MediaType.AUDIO,
+                                                        musician=musician,
+                                                        Filters="IsNotFolder")
 
         if len(song_search_results) == 0:
             # no search results
@@ -70,20 +67,21 @@ class PlaySongIntentHandler(BaseHandler):
 
             item = QueueItem(idx=0,
                              media_type=get_media_type_enum(item),
-                             media_item_id=item["Id"])
+                             item_id=item["Id"])
             playback = get_playback(user_id)
-            playback.set_playback_queue(user_id, [item])
+            playback.set_queue([item])
 
             build_stream_response(jellyfin_client=self.jellyfin_client,
                                   jellyfin_user_id=user.jellyfin_user_id,
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
-                                  queue_item=playback.current_item)
+                                  queue_item=playback.current_item,
+                                  stream_token=self.get_stream_token(user_id, playback, playback.current_item))
 
             return handler_input.response_builder.response
 
         # more than one search result, so find the best matches and ask user what they want to hear
-        song_match_scores = [get_similarity(item["Name"], song) for item in song_search_results]
+        song_match_scores = get_similarities([item["Name"] for item in song_search_results], song)
         top_matches_idx = best_matches_by_idx(match_scores=song_match_scores)
         top_matches = []
         for idx in top_matches_idx:
@@ -94,6 +92,13 @@ class PlaySongIntentHandler(BaseHandler):
         handler_input.attributes_manager.session_attributes["TopMatches"] = top_matches
         handler_input.attributes_manager.session_attributes["TopMatchesType"] = MediaType.AUDIO
 
+        # resolve the top match while the question is spoken
+        self.match_speculator.speculate(user_id=handler_input.request_envelope.context.system.user.user_id,
+                                        media_type=MediaType.AUDIO,
+                                        item_id=top_matches[0]["Id"],
+                                        jellyfin_user_id=user.jellyfin_user_id,
+                                        jellyfin_token=user.jellyfin_token)
+
         # ask user if they want the first one...  (response is handled by YesNoIntentHandler)
         by_artist = ""
         artists = top_matches[0]["Artist"]
@@ -108,11 +113,12 @@ class PlaySongIntentHandler(BaseHandler):
 
 
 class PlayAlbumIntentHandler(BaseHandler):
-    def __init__(self, jellyfin_client: JellyfinClient):
-        self.jellyfin_client = jellyfin_client
+    dispatch_keys = ("PlayAlbumIntent",)
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("PlayAlbumIntent")(handler_input)
+    def __init__(self, jellyfin_client: JellyfinClient, query_planner: QueryPlanner, match_speculator: MatchSpeculator):
+        self.jellyfin_client = jellyfin_client
+        self.query_planner = query_planner
+        self.match_speculator = match_speculator
 
     @BaseHandler.translate
     def handle_func(self,
@@ -133,21 +139,15 @@ class PlayAlbumIntentHandler(BaseHandler):
 
         album_name = album_name.lower()
 
-        album_search_results = self.jellyfin_client.search_media_items(user_id=user.jellyfin_user_id,
-                                                                       token=user.jellyfin_token,
-                                                                       term=album_name,
-                                                                       media=MediaType.ALBUM,
-                                                                       Filters="IsFolder")
         if musician:
             musician = musician.lower()
-            # filter album search results with the searched musician
-            artists_search_results = self.jellyfin_client.search_artist(user_id=user.jellyfin_user_id,
-                                                                        token=user.jellyfin_token,
-                                                                        term=musician)
-            artists_ids = set([artists["Id"] for artists in artists_search_results])
 
-            album_search_results = [album for album in album_search_results if
-                                    set(artist["Id"] for artist in album["AlbumArtists"]).intersection(artists_ids)]
+        album_search_results = self.query_planner.search(jellyfin_user_id=user.jellyfin_user_id,
+                                                         token=user.jellyfin_token,
+                                                         term=album_name,
+                                                         media=MediaType.ALBUM,
+                                                         musician=musician,
+                                                         Filters="IsFolder")
 
         if len(album_search_results) == 0:
             # no search results
@@ -170,21 +170,22 @@ class PlayAlbumIntentHandler(BaseHandler):
 
             queue_items = [QueueItem(idx=i,
                                      media_type=get_media_type_enum(item_info),
-                                     media_item_id=item_info["Id"]) for i, item_info in enumerate(items)]
+                                     item_id=item_info["Id"]) for i, item_info in enumerate(items)]
 
             playback = get_playback(user_id)
-            playback.set_playback_queue(user_id, queue_items)
+            playback.set_queue(queue_items)
 
             build_stream_response(jellyfin_client=self.jellyfin_client,
                                   jellyfin_user_id=user.jellyfin_user_id,
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
-                                  queue_item=playback.current_item)
+                                  queue_item=playback.current_item,
+                                  stream_token=self.get_stream_token(user_id, playback, playback.current_item))
 
             return handler_input.response_builder.response
 
         # more than one search result, so find the best matches and ask user what they want to hear
-        album_match_scores = [get_similarity(album["Name"], album_name) for album in album_search_results]
+        album_match_scores = get_similarities([album["Name"] for album in album_search_results], album_name)
         top_matches_idx = best_matches_by_idx(match_scores=album_match_scores)
         top_matches = []
         for idx in top_matches_idx:
@@ -200,6 +201,13 @@ class PlayAlbumIntentHandler(BaseHandler):
         handler_input.attributes_manager.session_attributes["TopMatches"] = top_matches
         handler_input.attributes_manager.session_attributes["TopMatchesType"] = MediaType.ALBUM
 
+        # resolve the top match while the question is spoken
+        self.match_speculator.speculate(user_id=handler_input.request_envelope.context.system.user.user_id,
+                                        media_type=MediaType.ALBUM,
+                                        item_id=top_matches[0]["Id"],
+                                        jellyfin_user_id=user.jellyfin_user_id,
+                                        jellyfin_token=user.jellyfin_token)
+
         # ask user if they want the first one...  (response is handled by YesNoIntentHandler)
         by_artist = ""
         artists = top_matches[0]["Artist"]
@@ -214,11 +222,11 @@ class PlayAlbumIntentHandler(BaseHandler):
 
 
 class PlayVideoIntentHandler(BaseHandler):
-    def __init__(self, jellyfin_client: JellyfinClient):
-        self.jellyfin_client = jellyfin_client
+    dispatch_keys = ("PlayVideoIntent",)
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("PlayVideoIntent")(handler_input)
+    def __init__(self, jellyfin_client: JellyfinClient, match_speculator: MatchSpeculator):
+        self.jellyfin_client = jellyfin_client
+        self.match_speculator = match_speculator
 
     @BaseHandler.translate
     def handle_func(self,
@@ -262,20 +270,21 @@ class PlayVideoIntentHandler(BaseHandler):
 
             item = QueueItem(idx=0,
                              media_type=get_media_type_enum(item),
-                             media_item_id=item["Id"])
+                             item_id=item["Id"])
             playback = get_playback(user_id)
-            playback.set_playback_queue(user_id, [item])
+            playback.set_queue([item])
 
             build_stream_response(jellyfin_client=self.jellyfin_client,
                                   jellyfin_user_id=user.jellyfin_user_id,
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
-                                  queue_item=playback.current_item)
+                                  queue_item=playback.current_item,
+                                  stream_token=self.get_stream_token(user_id, playback, playback.current_item))
 
             return handler_input.response_builder.response
 
         # more than one search result, so find the best matches and ask user what they want to watch
-        video_match_scores = [get_similarity(item["Name"], title) for item in video_search_results]
+        video_match_scores = get_similarities([item["Name"] for item in video_search_results], title)
         top_matches_idx = best_matches_by_idx(match_scores=video_match_scores)
         top_matches = []
         for idx in top_matches_idx:
@@ -286,6 +295,13 @@ class PlayVideoIntentHandler(BaseHandler):
         handler_input.attributes_manager.session_attributes["TopMatches"] = top_matches
         handler_input.attributes_manager.session_attributes["TopMatchesType"] = MediaType.VIDEO
 
+        # resolve the top match while the question is spoken
+        self.match_speculator.speculate(user_id=handler_input.request_envelope.context.system.user.user_id,
+                                        media_type=MediaType.VIDEO,
+                                        item_id=top_matches[0]["Id"],
+                                        jellyfin_user_id=user.jellyfin_user_id,
+                                        jellyfin_token=user.jellyfin_token)
+
         # ask user if they want the first one...  (response is handled by YesNoIntentHandler)
         by_artist = ""
         artists = top_matches[0]["Artist"]
@@ -300,11 +316,11 @@ class PlayVideoIntentHandler(BaseHandler):
 
 
 class PlayArtistSongsIntentHandler(BaseHandler):
-    def __init__(self, jellyfin_client: JellyfinClient):
-        self.jellyfin_client = jellyfin_client
+    dispatch_keys = ("PlayArtistSongsIntent",)
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("PlayArtistSongsIntent")(handler_input)
+    def __init__(self, jellyfin_client: JellyfinClient, queue_loader: QueueLoader):
+        self.jellyfin_client = jellyfin_client
+        self.queue_loader = queue_loader
 
     @BaseHandler.translate
     def handle_func(self,
@@ -328,7 +344,7 @@ class PlayArtistSongsIntentHandler(BaseHandler):
                                                             token=user.jellyfin_token,
                                                             term=musician)
 
-        song_match_scores = [get_similarity(item["Name"], musician) for item in search_results]
+        song_match_scores = get_similarities([item["Name"] for item in search_results], musician)
 
         if not song_match_scores:
             handler_input.response_builder.speak(no_result_response_text)
@@ -342,40 +358,36 @@ class PlayArtistSongsIntentHandler(BaseHandler):
         artist_item = search_results[song_match_scores.index(best_score)]
         artist_id = artist_item["Id"]
 
-        items = self.jellyfin_client.get_artist_items(user_id=user.jellyfin_user_id,
-                                                      token=user.jellyfin_token,
-                                                      artist_id=artist_id,
-                                                      media=MediaType.AUDIO)
-
-        if not items:
-            handler_input.response_builder.speak(no_result_response_text)
-            return handler_input.response_builder.response
+        items = self.jellyfin_client.iter_artist_items(user_id=user.jellyfin_user_id,
+                                                       token=user.jellyfin_token,
+                                                       artist_id=artist_id,
+                                                       media=MediaType.AUDIO,
+                                                       page_size=self.queue_loader.page_size)
 
         user_id = handler_input.request_envelope.context.system.user.user_id
-
-        queue_items = [QueueItem(idx=i,
-                                 media_type=get_media_type_enum(item_info),
-                                 media_item_id=item_info["Id"]) for i, item_info in enumerate(items)]
-
         playback = get_playback(user_id)
-        playback.set_playback_queue(user_id, queue_items)
+
+        # the playback starts with the first page of the songs, the other songs are queued in the background
+        if not self.queue_loader.set_queue(playback, items):
+            handler_input.response_builder.speak(no_result_response_text)
+            return handler_input.response_builder.response
 
         build_stream_response(jellyfin_client=self.jellyfin_client,
                               jellyfin_user_id=user.jellyfin_user_id,
                               jellyfin_token=user.jellyfin_token,
                               handler_input=handler_input,
-                              queue_item=playback.current_item)
+                              queue_item=playback.current_item,
+                              stream_token=self.get_stream_token(user_id, playback, playback.current_item))
 
         return handler_input.response_builder.response
 
 
 class PlayLastAddedIntentHandler(BaseHandler):
+    dispatch_keys = ("PlayLastAddedIntent",)
+
     def __init__(self, jellyfin_client: JellyfinClient):
         self.jellyfin_client = jellyfin_client
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("PlayLastAddedIntent")(handler_input)
-
     @BaseHandler.translate
     def handle_func(self,
                     user: User,
@@ -406,25 +418,23 @@ class PlayLastAddedIntentHandler(BaseHandler):
 
             queue_items = [QueueItem(idx=i,
                                      media_type=get_media_type_enum(item_info),
-                                     media_item_id=item_info["Id"]) for i, item_info in enumerate(recently_added_items)]
+                                     item_id=item_info["Id"]) for i, item_info in enumerate(recently_added_items)]
 
             playback = get_playback(user_id)
-            playback.set_playback_queue(user_id, queue_items)
+            playback.set_queue(queue_items)
 
             build_stream_response(jellyfin_client=self.jellyfin_client,
                                   jellyfin_user_id=user.jellyfin_user_id,
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
-                                  queue_item=playback.current_item)
+                                  queue_item=playback.current_item,
+                                  stream_token=self.get_stream_token(user_id, playback, playback.current_item))
 
         return handler_input.response_builder.response
 
 
 class PauseIntentHandler(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.PauseIntent")(handler_input) \
-               or is_intent_name("AMAZON.StopIntent")(handler_input) \
-               or is_intent_name("AMAZON.CancelIntent")(handler_input)
+    dispatch_keys = ("AMAZON.PauseIntent", "AMAZON.StopIntent", "AMAZON.CancelIntent")
 
     def handle_func(self, user: User, handler_input: HandlerInput, *args, **kwargs) -> Response:
 
@@ -446,12 +456,11 @@ class PauseIntentHandler(BaseHandler):
 
 
 class ResumeIntentHandler(BaseHandler):
+    dispatch_keys = ("AMAZON.ResumeIntent",)
+
     def __init__(self, jellyfin_client: JellyfinClient):
         self.jellyfin_client = jellyfin_client
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.ResumeIntent")(handler_input)
-
     @BaseHandler.translate
     def handle_func(self,
                     user: User,
@@ -468,6 +477,7 @@ class ResumeIntentHandler(BaseHandler):
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
                                   queue_item=playback.current_item,
+                                  stream_token=self.get_stream_token(user_id, playback, playback.current_item),
                                   offset=playback.offset)
         else:
             text = translation.gettext("What can I play?")
@@ -477,8 +487,7 @@ class ResumeIntentHandler(BaseHandler):
 
 
 class LoopAllOffIntent(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("LoopAllOffIntent")(handler_input)
+    dispatch_keys = ("LoopAllOffIntent",)
 
     def handle_func(self, user: User, handler_input: HandlerInput, *args, **kwargs) -> Response:
         user_id = handler_input.request_envelope.context.system.user.user_id
@@ -492,8 +501,7 @@ class LoopAllOffIntent(BaseHandler):
 
 
 class LoopAllOnIntent(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("LoopAllOnIntent")(handler_input)
+    dispatch_keys = ("LoopAllOnIntent",)
 
     def handle_func(self, user: User, handler_input: HandlerInput, *args, **kwargs) -> Response:
         user_id = handler_input.request_envelope.context.system.user.user_id
@@ -507,11 +515,11 @@ class LoopAllOnIntent(BaseHandler):
 
 
 class NextIntentHandler(BaseHandler):
-    def __init__(self, jellyfin_client: JellyfinClient):
-        self.jellyfin_client = jellyfin_client
+    dispatch_keys = ("AMAZON.NextIntent",)
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.NextIntent")(handler_input)
+    def __init__(self, jellyfin_client: JellyfinClient, stream_prefetcher: StreamPrefetcher):
+        self.jellyfin_client = jellyfin_client
+        self.stream_prefetcher = stream_prefetcher
 
     @BaseHandler.translate
     def handle_func(self,
@@ -524,6 +532,8 @@ class NextIntentHandler(BaseHandler):
 
         playback = get_playback(user_id)
         next_item = playback.next()
+        prefetched_stream = self.stream_prefetcher.get(user_id=user_id, playback=playback, next_item=next_item) \
+            if next_item else None
         playback.current_item = next_item
         playback.save()
 
@@ -533,7 +543,9 @@ class NextIntentHandler(BaseHandler):
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
                                   queue_item=next_item,
-                                  offset=0)
+                                  stream_token=self.get_stream_token(user_id, playback, next_item),
+                                  offset=0,
+                                  prefetched_stream=prefetched_stream)
         else:
             handler_input.response_builder.add_directive(StopDirective())
 
@@ -541,12 +553,11 @@ class NextIntentHandler(BaseHandler):
 
 
 class PreviousIntentHandler(BaseHandler):
+    dispatch_keys = ("AMAZON.PreviousIntent",)
+
     def __init__(self, jellyfin_client: JellyfinClient):
         self.jellyfin_client = jellyfin_client
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.PreviousIntent")(handler_input)
-
     @BaseHandler.translate
     def handle_func(self,
                     user: User,
@@ -567,6 +578,7 @@ class PreviousIntentHandler(BaseHandler):
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
                                   queue_item=prev_item,
+                                  stream_token=self.get_stream_token(user_id, playback, prev_item),
                                   offset=0)
         else:
             handler_input.response_builder.add_directive(StopDirective())
@@ -575,8 +587,7 @@ class PreviousIntentHandler(BaseHandler):
 
 
 class RepeatSingleOnIntent(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("RepeatSingleOnIntent")(handler_input)
+    dispatch_keys = ("RepeatSingleOnIntent",)
 
     def handle_func(self, user: User, handler_input: HandlerInput, *args, **kwargs) -> Response:
         user_id = handler_input.request_envelope.context.system.user.user_id
@@ -590,40 +601,37 @@ class RepeatSingleOnIntent(BaseHandler):
 
 
 class ShuffleOffIntentHandler(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.ShuffleOffIntent")(handler_input)
+    dispatch_keys = ("AMAZON.ShuffleOffIntent",)
 
     def handle_func(self, user: User, handler_input: HandlerInput, *args, **kwargs) -> Response:
         user_id = handler_input.request_envelope.context.system.user.user_id
 
         playback = get_playback(user_id)
-        playback.shuffle = False
+        playback.set_shuffle(False)
         playback.save()
 
         return handler_input.response_builder.response
 
 
 class ShuffleOnIntentHandler(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.ShuffleOnIntent")(handler_input)
+    dispatch_keys = ("AMAZON.ShuffleOnIntent",)
 
     def handle_func(self, user: User, handler_input: HandlerInput, *args, **kwargs) -> Response:
         user_id = handler_input.request_envelope.context.system.user.user_id
 
         playback = get_playback(user_id)
-        playback.shuffle = True
+        playback.set_shuffle(True)
         playback.save()
 
         return handler_input.response_builder.response
 
 
 class StartOverIntentHandler(BaseHandler):
+    dispatch_keys = ("AMAZON.StartOverIntent",)
+
     def __init__(self, jellyfin_client: JellyfinClient):
         self.jellyfin_client = jellyfin_client
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.StartOverIntent")(handler_input)
-
     @BaseHandler.translate
     def handle_func(self,
                     user: User,
@@ -640,7 +648,8 @@ class StartOverIntentHandler(BaseHandler):
                                   jellyfin_user_id=user.jellyfin_user_id,
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
-                                  queue_item=playback.current_item)
+                                  queue_item=playback.current_item,
+                                  stream_token=self.get_stream_token(user_id, playback, playback.current_item))
         else:
             text = translation.gettext("The playback queue is empty. Please try to add some media and try again.")
             handler_input.response_builder.add_directive(StopDirective()).speak(text)
@@ -1,87 +1,136 @@
+from abc import abstractmethod
 from gettext import GNUTranslations
+from typing import Optional
 
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_core.utils import is_request_type
 from ask_sdk_model import Response
 
 from jellyfin_alexa_skill.alexa.handler import BaseHandler
+from jellyfin_alexa_skill.alexa.prefetch import StreamPrefetcher
 from jellyfin_alexa_skill.alexa.util import build_stream_response
 from jellyfin_alexa_skill.database.db import get_playback
 from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.database.state import PlaybackStateCache
 from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
+from jellyfin_alexa_skill.metrics import REGISTRY
 
+STALE_EVENTS = REGISTRY.counter("audio_player_stale_events_total",
+                                "Number of ignored AudioPlayer events of streams which are not the current item")
 
-class PlaybackStartedEventHandler(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_request_type("AudioPlayer.PlaybackStarted")(handler_input)
 
-    def handle_func(self, user: User, handler_input: HandlerInput, *arg, **kwargs) -> Response:
-        user_id = handler_input.request_envelope.context.system.user.user_id
+class AudioPlayerEventHandler(BaseHandler):
+    """
+    Handler of an AudioPlayer event which only changes the playback of the user and responds without any content, such
+    that the event can also be handled from the raw request by the AudioPlayerEventRouter.
+    """
 
-        playback = get_playback(user_id)
-        playback.playing = True
-        playback.offset = 0
-        playback.save()
+    @abstractmethod
+    def handle_event(self, user_id: str, user: User, token: Optional[str]) -> None:
+        """
+        Handle the event.
+
+        :param user_id: Alexa user id of the playback
+        :param user: the linked user
+        :param token: the token of the stream of the event
+        """
+
+        pass
+
+    def handle_func(self, user: User, handler_input: HandlerInput, *args, **kwargs) -> Response:
+        self.handle_event(user_id=handler_input.request_envelope.context.system.user.user_id,
+                          user=user,
+                          token=handler_input.request_envelope.request.token)
 
         return handler_input.response_builder.response
 
 
-class PlaybackFinishedEventHandler(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_request_type("AudioPlayer.PlaybackFinished")(handler_input)
+class PlaybackStartedEventHandler(AudioPlayerEventHandler):
+    dispatch_keys = ("AudioPlayer.PlaybackStarted",)
 
-    def handle_func(self, user: User, handler_input: HandlerInput, *args, **kwargs) -> Response:
-        user_id = handler_input.request_envelope.context.system.user.user_id
+    def __init__(self, stream_prefetcher: StreamPrefetcher, playback_state_cache: PlaybackStateCache):
+        self.stream_prefetcher = stream_prefetcher
+        self.playback_state_cache = playback_state_cache
 
+    def handle_event(self, user_id: str, user: User, token: Optional[str]) -> None:
         playback = get_playback(user_id)
-        playback.playing = False
-        playback.offset = 0
-        playback.save()
+        if self.is_stale_event(user_id, playback, token):
+            STALE_EVENTS.inc()
+            return
 
-        return handler_input.response_builder.response
+        self.playback_state_cache.update(user_id, playing=True, offset=0)
 
+        # resolve the stream of the next item while the current item is playing
+        self.stream_prefetcher.prefetch(user_id=user_id,
+                                        playback=playback,
+                                        jellyfin_user_id=user.jellyfin_user_id,
+                                        jellyfin_token=user.jellyfin_token)
 
-class PlaybackStoppedEventHandler(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_request_type("AudioPlayer.PlaybackStopped")(handler_input)
 
-    def handle_func(self, user: User, handler_input: HandlerInput, *args, **kwargs) -> Response:
-        user_id = handler_input.request_envelope.context.system.user.user_id
+class PlaybackFinishedEventHandler(AudioPlayerEventHandler):
+    dispatch_keys = ("AudioPlayer.PlaybackFinished",)
 
-        playback = get_playback(user_id)
-        playback.playing = False
-        playback.save()
+    def __init__(self, playback_state_cache: PlaybackStateCache):
+        self.playback_state_cache = playback_state_cache
 
-        return handler_input.response_builder.response
+    def handle_event(self, user_id: str, user: User, token: Optional[str]) -> None:
+        self.playback_state_cache.update(user_id, playing=False, offset=0)
+
+
+class PlaybackStoppedEventHandler(AudioPlayerEventHandler):
+    dispatch_keys = ("AudioPlayer.PlaybackStopped",)
+
+    def __init__(self, playback_state_cache: PlaybackStateCache):
+        self.playback_state_cache = playback_state_cache
+
+    def handle_event(self, user_id: str, user: User, token: Optional[str]) -> None:
+        self.playback_state_cache.update(user_id, playing=False)
 
 
 class PlaybackNearlyFinishedEventHandler(BaseHandler):
-    def __init__(self, jellyfin_client: JellyfinClient):
-        self.jellyfin_client = jellyfin_client
+    dispatch_keys = ("AudioPlayer.PlaybackNearlyFinished",)
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_request_type("AudioPlayer.PlaybackNearlyFinished")(handler_input)
+    def __init__(self, jellyfin_client: JellyfinClient, stream_prefetcher: StreamPrefetcher):
+        self.jellyfin_client = jellyfin_client
+        self.stream_prefetcher = stream_prefetcher
 
     def handle_func(self, user: User, handler_input: HandlerInput, *args, **kwargs) -> Response:
         user_id = handler_input.request_envelope.context.system.user.user_id
 
         playback = get_playback(user_id)
+        if self.is_stale_event(user_id, playback, handler_input.request_envelope.request.token):
+            # the queue was already moved on, e.g. by a next intent
+            STALE_EVENTS.inc()
+            return handler_input.response_builder.response
+
         next_item = playback.next()
+        if not next_item:
+            # the end of the queue is reached, let the current stream finish
+            playback.current_item = None
+            playback.save()
+            return handler_input.response_builder.response
+
+        prefetched_stream = self.stream_prefetcher.get(user_id=user_id, playback=playback, next_item=next_item)
         playback.current_item = next_item
         playback.save()
 
+        # enqueue the next stream after the current one for a gapless transition
         build_stream_response(jellyfin_client=self.jellyfin_client,
                               jellyfin_user_id=user.jellyfin_user_id,
                               jellyfin_token=user.jellyfin_token,
                               handler_input=handler_input,
-                              queue_item=next_item)
+                              queue_item=next_item,
+                              stream_token=self.get_stream_token(user_id, playback, next_item),
+                              prefetched_stream=prefetched_stream,
+                              expected_previous_token=handler_input.request_envelope.request.token)
 
         return handler_input.response_builder.response
 
 
 class PlaybackFailedEventHandler(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_request_type("AudioPlayer.PlaybackFailed")(handler_input)
+    dispatch_keys = ("AudioPlayer.PlaybackFailed",)
+
+    def __init__(self, playback_state_cache: PlaybackStateCache):
+        self.playback_state_cache = playback_state_cache
 
     @BaseHandler.translate
     def handle_func(self,
@@ -92,9 +141,7 @@ class PlaybackFailedEventHandler(BaseHandler):
                     **kwargs) -> Response:
         user_id = handler_input.request_envelope.context.system.user.user_id
 
-        playback = get_playback(user_id)
-        playback.playing = False
-        playback.save()
+        self.playback_state_cache.update(user_id, playing=False)
 
         handler_input.response_builder.speak(
             translation.gettext("Something went wrong during media playback. Please try again."))
@@ -103,8 +150,7 @@ class PlaybackFailedEventHandler(BaseHandler):
 
 
 class SessionEndedRequestHandler(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_request_type("SessionEndedRequest")(handler_input)
+    dispatch_keys = ("SessionEndedRequest",)
 
     def handle_func(self,
                     user: User,
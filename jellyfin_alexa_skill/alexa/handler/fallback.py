@@ -2,15 +2,17 @@ from gettext import GNUTranslations
 
 from ask_sdk_core.dispatch_components import AbstractRequestHandler
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_core.utils import is_intent_name
 from ask_sdk_model import Response
 
+from jellyfin_alexa_skill.alexa.dispatch import get_dispatch_key
 from jellyfin_alexa_skill.alexa.handler import BaseHandler
 
 
 class FallbackIntentHandler(AbstractRequestHandler):
+    dispatch_keys = ("AMAZON.FallbackIntent",)
+
     def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.FallbackIntent")(handler_input)
+        return get_dispatch_key(handler_input) in self.dispatch_keys
 
     @BaseHandler.translate
     def handle(self,
@@ -1,23 +1,22 @@
 from gettext import GNUTranslations
 
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_core.utils import is_intent_name
 from ask_sdk_model import Response
 
 from jellyfin_alexa_skill.alexa.handler import BaseHandler
-from jellyfin_alexa_skill.alexa.util import build_stream_response, get_media_type_enum
+from jellyfin_alexa_skill.alexa.loader import QueueLoader
+from jellyfin_alexa_skill.alexa.util import build_stream_response
 from jellyfin_alexa_skill.database.db import get_playback
-from jellyfin_alexa_skill.database.model.playback import QueueItem
 from jellyfin_alexa_skill.database.model.user import User
 from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
 
 
 class PlayFavoritesIntentHandler(BaseHandler):
-    def __init__(self, jellyfin_client: JellyfinClient):
-        self.jellyfin_client = jellyfin_client
+    dispatch_keys = ("PlayFavoritesIntent",)
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("PlayFavoritesIntent")(handler_input)
+    def __init__(self, jellyfin_client: JellyfinClient, queue_loader: QueueLoader):
+        self.jellyfin_client = jellyfin_client
+        self.queue_loader = queue_loader
 
     @BaseHandler.translate
     def handle_func(self,
@@ -36,24 +35,22 @@ class PlayFavoritesIntentHandler(BaseHandler):
         else:
             filter_media_type = None
 
-        favorites = self.jellyfin_client.get_favorites(user_id=user.jellyfin_user_id,
-                                                       token=user.jellyfin_token,
-                                                       media_type=filter_media_type)
+        favorites = self.jellyfin_client.iter_favorites(user_id=user.jellyfin_user_id,
+                                                        token=user.jellyfin_token,
+                                                        media_type=filter_media_type,
+                                                        page_size=self.queue_loader.page_size)
 
-        if favorites:
-            user_id = handler_input.request_envelope.session.user.user_id
-            queue_items = [QueueItem(idx=i,
-                                     media_type=get_media_type_enum(item_info),
-                                     media_item_id=item_info["Id"]) for i, item_info in enumerate(favorites)]
-
-            playback = get_playback(user_id)
-            playback.set_playback_queue(user_id, queue_items)
+        user_id = handler_input.request_envelope.session.user.user_id
+        playback = get_playback(user_id)
 
+        # the playback starts with the first page of the favorites, the other favorites are queued in the background
+        if self.queue_loader.set_queue(playback, favorites):
             build_stream_response(jellyfin_client=self.jellyfin_client,
                                   jellyfin_user_id=user.jellyfin_user_id,
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
-                                  queue_item=playback.current_item)
+                                  queue_item=playback.current_item,
+                                  stream_token=self.get_stream_token(user_id, playback, playback.current_item))
         else:
             text = translation.gettext("Sorry, you don't have any favorite media.")
             handler_input.response_builder.speak(text)
@@ -62,12 +59,11 @@ class PlayFavoritesIntentHandler(BaseHandler):
 
 
 class MarkFavoriteIntentHandler(BaseHandler):
+    dispatch_keys = ("MarkFavoriteIntent",)
+
     def __init__(self, jellyfin_client: JellyfinClient):
         self.jellyfin_client = jellyfin_client
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("MarkFavoriteIntent")(handler_input)
-
     @BaseHandler.translate
     def handle_func(self,
                     user: User,
@@ -78,8 +74,8 @@ class MarkFavoriteIntentHandler(BaseHandler):
         user_id = handler_input.request_envelope.session.user.user_id
         playback = get_playback(user_id)
 
-        if playback.playing and playback.current_idx is not None:
-            current_media_id = playback.queue[playback.current_idx]
+        if playback.playing and playback.current_item:
+            current_media_id = playback.current_item.item_id
             self.jellyfin_client.favorite(user_id=user.jellyfin_user_id,
                                           token=user.jellyfin_token,
                                           media_id=current_media_id)
@@ -92,12 +88,11 @@ class MarkFavoriteIntentHandler(BaseHandler):
 
 
 class UnmarkFavoriteIntentHandler(BaseHandler):
+    dispatch_keys = ("UnmarkFavoriteIntent",)
+
     def __init__(self, jellyfin_client: JellyfinClient):
         self.jellyfin_client = jellyfin_client
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("UnmarkFavoriteIntent")(handler_input)
-
     @BaseHandler.translate
     def handle_func(self,
                     user: User,
@@ -108,8 +103,8 @@ class UnmarkFavoriteIntentHandler(BaseHandler):
         user_id = handler_input.request_envelope.session.user.user_id
         playback = get_playback(user_id)
 
-        if playback.playing and playback.current_idx is not None:
-            current_media_id = playback.queue[playback.current_idx]
+        if playback.playing and playback.current_item:
+            current_media_id = playback.current_item.item_id
             self.jellyfin_client.unfavorite(user_id=user.jellyfin_user_id,
                                             token=user.jellyfin_token,
                                             media_id=current_media_id)
@@ -1,7 +1,6 @@
 from gettext import GNUTranslations
 
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_core.utils import is_intent_name
 from ask_sdk_model import Response
 
 from jellyfin_alexa_skill.alexa.handler.base import BaseHandler
@@ -9,8 +8,7 @@ from jellyfin_alexa_skill.database.model.user import User
 
 
 class HelpIntentHandler(BaseHandler):
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.HelpIntent")(handler_input)
+    dispatch_keys = ("AMAZON.HelpIntent",)
 
     @BaseHandler.translate
     def handle_func(self,
@@ -1,7 +1,6 @@
 from gettext import GNUTranslations
 
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_core.utils import is_intent_name
 from ask_sdk_model import Response
 
 from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
@@ -11,12 +10,11 @@ from jellyfin_alexa_skill.database.model.user import User
 
 
 class MediaInfoIntentHandler(BaseHandler):
+    dispatch_keys = ("MediaInfoIntent",)
+
     def __init__(self, jellyfin_client: JellyfinClient):
         self.jellyfin_client = jellyfin_client
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("MediaInfoIntent")(handler_input)
-
     @BaseHandler.translate
     def handle_func(self,
                     user: User,
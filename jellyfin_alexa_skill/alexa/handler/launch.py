@@ -1,7 +1,6 @@
 import gettext
 
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_core.utils import is_request_type
 from ask_sdk_model import Response
 
 from jellyfin_alexa_skill.alexa.handler import BaseHandler
@@ -12,12 +11,11 @@ from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
 
 
 class LaunchRequestHandler(BaseHandler):
+    dispatch_keys = ("LaunchRequest",)
+
     def __init__(self, jellyfin_client: JellyfinClient):
         self.jellyfin_client = jellyfin_client
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_request_type("LaunchRequest")(handler_input)
-
     @BaseHandler.translate
     def handle_func(self,
                     user: User,
@@ -34,6 +32,7 @@ class LaunchRequestHandler(BaseHandler):
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
                                   queue_item=playback.current_item,
+                                  stream_token=self.get_stream_token(user_id, playback, playback.current_item),
                                   offset=playback.offset)
         else:
             speech_text = translation.gettext("Welcome to Jellyfin Player skill, what can I play?")
@@ -1,10 +1,10 @@
 from gettext import GNUTranslations
 
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_core.utils import is_intent_name
 from ask_sdk_model import Response
 
 from jellyfin_alexa_skill.alexa.handler.base import BaseHandler
+from jellyfin_alexa_skill.alexa.speculation import MatchSpeculator
 from jellyfin_alexa_skill.alexa.util import build_stream_response, get_media_type_enum
 from jellyfin_alexa_skill.database.db import get_playback
 from jellyfin_alexa_skill.database.model.playback import QueueItem
@@ -13,16 +13,16 @@ from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
 
 
 class YesNoIntentHandler(BaseHandler):
-    def __init__(self, jellyfin_client: JellyfinClient):
+    dispatch_keys = ("AMAZON.YesIntent", "AMAZON.NoIntent")
+
+    def __init__(self, jellyfin_client: JellyfinClient, match_speculator: MatchSpeculator):
         self.jellyfin_client = jellyfin_client
+        self.match_speculator = match_speculator
 
     """
        Handler for Yes/No dialog with user
     """
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.YesIntent")(handler_input) or is_intent_name("AMAZON.NoIntent")(handler_input)
-
     @BaseHandler.translate
     def handle_func(self,
                     user: User,
@@ -38,6 +38,8 @@ class YesNoIntentHandler(BaseHandler):
         if len(handler_input.attributes_manager.session_attributes["TopMatches"]) == 0:
             return handler_input.response_builder.response
 
+        user_id = handler_input.request_envelope.context.system.user.user_id
+
         # handle the yes/no response
         if handler_input.request_envelope.request.intent.name == "AMAZON.YesIntent":
             # user wants to play the top match
@@ -48,15 +50,23 @@ class YesNoIntentHandler(BaseHandler):
             handler_input.attributes_manager.session_attributes["TopMatches"].clear()
             handler_input.attributes_manager.session_attributes["TopMatchesType"] = ""
 
+            # the top match was resolved while the question was spoken
+            speculated_match = self.match_speculator.get(user_id=user_id,
+                                                         media_type=MediaType(media_type),
+                                                         item_id=item["Id"])
+
             if media_type == MediaType.ALBUM.value:
                 album = item
                 no_result_response_text = translation.gettext(
                     "Sorry, I can't find any songs with that name. Please try again.")
 
                 # get all tracks on the album
-                items = self.jellyfin_client.get_album_items(user_id=user.jellyfin_user_id,
-                                                             token=user.jellyfin_token,
-                                                             album_id=album["Id"])
+                if speculated_match:
+                    items = speculated_match.items
+                else:
+                    items = self.jellyfin_client.get_album_items(user_id=user.jellyfin_user_id,
+                                                                 token=user.jellyfin_token,
+                                                                 album_id=album["Id"])
 
                 if not items:
                     handler_input.response_builder.speak(no_result_response_text)
@@ -64,22 +74,24 @@ class YesNoIntentHandler(BaseHandler):
 
                 queue_items = [QueueItem(idx=i,
                                          media_type=get_media_type_enum(item_info),
-                                         media_item_id=item_info["Id"]) for i, item_info in
+                                         item_id=item_info["Id"]) for i, item_info in
                                enumerate(items)]
             else:
+                # the top matches contain only the name, id and artists, the media type is the type of the search
                 queue_items = [QueueItem(idx=0,
-                                         media_type=get_media_type_enum(item),
-                                         media_item_id=item["Id"])]
+                                         media_type=MediaType(media_type),
+                                         item_id=item["Id"])]
 
-            user_id = handler_input.request_envelope.context.system.user.user_id
             playback = get_playback(user_id)
-            playback.set_playback_queue(user_id, queue_items)
+            playback.set_queue(queue_items)
 
             build_stream_response(jellyfin_client=self.jellyfin_client,
                                   jellyfin_user_id=user.jellyfin_user_id,
                                   jellyfin_token=user.jellyfin_token,
                                   handler_input=handler_input,
-                                  queue_item=playback.current_item)
+                                  queue_item=playback.current_item,
+                                  prefetched_stream=speculated_match.stream if speculated_match else None,
+                                  stream_token=self.get_stream_token(user_id, playback, playback.current_item))
 
             return handler_input.response_builder.response
 
@@ -90,6 +102,14 @@ class YesNoIntentHandler(BaseHandler):
         if handler_input.attributes_manager.session_attributes["TopMatches"]:
             item = handler_input.attributes_manager.session_attributes["TopMatches"][0]
 
+            # resolve the next match while the question is spoken
+            media_type = handler_input.attributes_manager.session_attributes["TopMatchesType"]
+            self.match_speculator.speculate(user_id=user_id,
+                                            media_type=MediaType(media_type),
+                                            item_id=item["Id"],
+                                            jellyfin_user_id=user.jellyfin_user_id,
+                                            jellyfin_token=user.jellyfin_token)
+
             artists = item["Artist"]
             by_artist = ""
             if len(artists) > 0:
@@ -102,6 +122,7 @@ class YesNoIntentHandler(BaseHandler):
             return handler_input.response_builder.speak(request_text).ask(request_text).response
         else:
             handler_input.attributes_manager.session_attributes["TopMatchesType"] = ""
+            self.match_speculator.invalidate(user_id)
 
             speak_output = translation.gettext("I'm all out of guesses.  Please try asking a different way.")
             handler_input.response_builder.speak(speak_output)
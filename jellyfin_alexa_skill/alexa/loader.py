@@ -0,0 +1,98 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List
+
+from jellyfin_alexa_skill.alexa.util import get_media_type_enum
+from jellyfin_alexa_skill.config import DEFAULT_QUEUE_PAGE_SIZE
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.metrics import REGISTRY
+
+APPENDED_PAGES = REGISTRY.counter("queue_loader_appended_pages_total",
+                                  "Number of listing pages appended to a queue in the background")
+DISCARDED_PAGES = REGISTRY.counter("queue_loader_discarded_pages_total",
+                                   "Number of listing pages discarded because the queue was replaced in the meantime")
+LOADER_ERRORS = REGISTRY.counter("queue_loader_errors_total",
+                                 "Number of failed background loads of a queue")
+
+
+def build_queue_items(items: Iterable[dict]) -> List[QueueItem]:
+    """
+    Build the unsaved queue items of listed Jellyfin items.
+
+    :param items: the Jellyfin items
+    :return: the queue items with consecutive indices starting at 0
+    """
+
+    return [QueueItem(idx=i, media_type=get_media_type_enum(item_info), item_id=item_info["Id"])
+            for i, item_info in enumerate(items)]
+
+
+class QueueLoader:
+    """
+    Fills the queue of a playback from a paged listing, e.g. JellyfinClient.iter_favorites. The first page is queued
+    immediately, such that the playback can start while the remaining pages are fetched and appended to the queue in
+    the background.
+    """
+
+    def __init__(self, page_size: int = DEFAULT_QUEUE_PAGE_SIZE, max_workers: int = 2):
+        """
+        :param page_size: number of items which are queued at once (default: 100)
+        :param max_workers: maximum number of queues which are loaded at the same time (default: 2)
+        """
+
+        self.page_size = page_size
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="queue-loader")
+
+    def _append_pages(self, playback: Playback, queue_generation: int, items: Iterator[dict]) -> int:
+        was_closed = db.is_closed()
+        if was_closed:
+            db.connect()
+
+        appended_pages = 0
+        try:
+            while True:
+                page = list(islice(items, self.page_size))
+                if not page:
+                    break
+
+                if not playback.append_queue(build_queue_items(page), queue_generation):
+                    DISCARDED_PAGES.inc()
+                    break
+
+                APPENDED_PAGES.inc()
+                appended_pages += 1
+        except Exception as e:
+            LOADER_ERRORS.inc()
+            logging.warning(f"Loading of the queue failed: {e}")
+        finally:
+            if was_closed:
+                db.close()
+
+        return appended_pages
+
+    def set_queue(self, playback: Playback, items: Iterable[dict]) -> bool:
+        """
+        Set the queue of the playback to the listed items. Only the first page is fetched before the queue is set, the
+        remaining pages are appended in the background unless the queue is replaced or cleared in the meantime.
+
+        :param playback: the playback
+        :param items: iterable of the listed Jellyfin items, which fetches the items lazily
+
+        :return: True if the queue is set, False if there are no items, then the queue is not changed
+        :raises: the errors of the items iterable while the first page is fetched
+        """
+
+        items = iter(items)
+
+        first_page = list(islice(items, self.page_size))
+        if not first_page:
+            return False
+
+        playback.set_queue(build_queue_items(first_page))
+        if len(first_page) == self.page_size:
+            self._executor.submit(self._append_pages, playback, playback.queue_generation, items)
+
+        return True
@@ -0,0 +1,188 @@
+import logging
+import time
+from enum import Enum
+from typing import Iterable, List, Optional, Set, Tuple
+
+from jellyfin_alexa_skill.config import DEFAULT_QUERY_PLANNER_TITLE_CANDIDATES, DEFAULT_QUERY_PLANNER_ARTIST_CANDIDATES
+from jellyfin_alexa_skill.jellyfin.api.async_client import AsyncJellyfinClient, run_concurrently
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+from jellyfin_alexa_skill.metrics import REGISTRY
+
+
+class QueryPlan(Enum):
+    # only the title is searched
+    TITLE = "title"
+    # the title and the artist are searched in the library index and the results are intersected
+    INDEXED = "indexed"
+    # the artist is searched first and the server searches only the titles of the found artists
+    ARTIST_FILTERED = "artist_filtered"
+    # the title and the artist are searched on the server at the same time and the results are intersected
+    PARALLEL = "parallel"
+
+
+# field with the artists of the found items and parameter to filter the items by the artists on the server
+ARTIST_FIELDS = {
+    MediaType.AUDIO: ("ArtistItems", "ArtistIds"),
+    MediaType.ALBUM: ("AlbumArtists", "AlbumArtistIds")
+}
+
+PLAN_LATENCY = REGISTRY.histogram("query_plan_seconds",
+                                  "Time to search the titles of a song or album intent")
+PLAN_SEARCHES = {plan: REGISTRY.counter(f"query_plan_{plan.value}_total",
+                                        f"Number of song and album searches with the {plan.value} query plan")
+                 for plan in QueryPlan}
+
+
+class QueryPlanner:
+    """
+    Searches the titles of the song and album intents, optionally restricted to the items of a musician, with the
+    cheapest plan for the given slots.
+
+    Without a musician only the title is searched. With a musician both lookups are answered by the library index if
+    the index of the user is fresh. If the searched title is not among the candidates of the index, the artists found
+    in the index are used to let the server search only the titles of these artists. Without a fresh index, the title
+    and the artist are searched on the server at the same time.
+    """
+
+    def __init__(self,
+                 jellyfin_client: JellyfinClient,
+                 async_jellyfin_client: AsyncJellyfinClient,
+                 max_title_candidates: int = DEFAULT_QUERY_PLANNER_TITLE_CANDIDATES,
+                 max_artist_candidates: int = DEFAULT_QUERY_PLANNER_ARTIST_CANDIDATES):
+        """
+        :param jellyfin_client: client which is used for the searches in the library index
+        :param async_jellyfin_client: client which is used for the concurrent searches on the server
+        :param max_title_candidates: maximum number of found titles (default: 20)
+        :param max_artist_candidates: maximum number of found artists whose titles are searched (default: 10)
+        """
+
+        self.jellyfin_client = jellyfin_client
+        self.async_jellyfin_client = async_jellyfin_client
+        self.max_title_candidates = max_title_candidates
+        self.max_artist_candidates = max_artist_candidates
+
+    def plan(self, jellyfin_user_id: str, musician: Optional[str]) -> QueryPlan:
+        """
+        Choose the plan for a search.
+
+        :param jellyfin_user_id: Jellyfin user id of the user whose items should be searched
+        :param musician: searched musician or None if the items of all musicians are searched
+
+        :return: the chosen plan, the artist filtered plan is only used if the indexed plan finds no items
+        """
+
+        if not musician:
+            return QueryPlan.TITLE
+
+        library_index = self.jellyfin_client.library_index
+        if library_index is not None and library_index.is_fresh(jellyfin_user_id):
+            return QueryPlan.INDEXED
+
+        return QueryPlan.PARALLEL
+
+    def search(self,
+               jellyfin_user_id: str,
+               token: str,
+               term: str,
+               media: MediaType,
+               musician: Optional[str] = None,
+               **kwargs) -> List[dict]:
+        """
+        Search the items with the given title.
+
+        :param jellyfin_user_id: Jellyfin user id of the user whose items should be searched
+        :param token: authentication token
+        :param term: searched title
+        :param media: media type to search for, either audio or album
+        :param musician: searched musician or None if the items of all musicians are searched
+        :param kwargs: additional parameters of the title search
+
+        :return: list of the found items
+        :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
+        """
+
+        start = time.perf_counter()
+
+        plan = self.plan(jellyfin_user_id, musician)
+        if plan is QueryPlan.TITLE:
+            items = self.jellyfin_client.search_media_items(user_id=jellyfin_user_id,
+                                                            token=token,
+                                                            term=term,
+                                                            media=media,
+                                                            limit=self.max_title_candidates,
+                                                            **kwargs)
+        elif plan is QueryPlan.INDEXED:
+            plan, items = self._search_indexed(jellyfin_user_id, token, term, media, musician, **kwargs)
+        else:
+            items = self._search_parallel(jellyfin_user_id, token, term, media, musician, **kwargs)
+
+        duration = time.perf_counter() - start
+        PLAN_LATENCY.observe(duration)
+        PLAN_SEARCHES[plan].inc()
+        logging.info(f"Searched {media.name.lower()} titles with the {plan.value} query plan: "
+                     f"{len(items)} items in {duration * 1000:.1f} ms")
+
+        return items
+
+    def _search_indexed(self,
+                        jellyfin_user_id: str,
+                        token: str,
+                        term: str,
+                        media: MediaType,
+                        musician: str,
+                        **kwargs) -> Tuple[QueryPlan, List[dict]]:
+        artists = self.jellyfin_client.search_artist(user_id=jellyfin_user_id, token=token, term=musician)
+        artist_ids = [artist["Id"] for artist in artists[:self.max_artist_candidates]]
+        if not artist_ids:
+            return QueryPlan.INDEXED, []
+
+        items = self.jellyfin_client.search_media_items(user_id=jellyfin_user_id,
+                                                        token=token,
+                                                        term=term,
+                                                        media=media,
+                                                        limit=self.max_title_candidates,
+                                                        **kwargs)
+        items = self._filter_artists(items, media, set(artist_ids))
+        if items:
+            return QueryPlan.INDEXED, items
+
+        # the title can be missing in the capped candidates of the index, so the server searches the titles of the
+        # found artists only
+        _, artists_param = ARTIST_FIELDS[media]
+        kwargs[artists_param] = ",".join(artist_ids)
+        items = self.jellyfin_client.search_media_items(user_id=jellyfin_user_id,
+                                                        token=token,
+                                                        term=term,
+                                                        media=media,
+                                                        limit=self.max_title_candidates,
+                                                        **kwargs)
+
+        return QueryPlan.ARTIST_FILTERED, items
+
+    def _search_parallel(self,
+                         jellyfin_user_id: str,
+                         token: str,
+                         term: str,
+                         media: MediaType,
+                         musician: str,
+                         **kwargs) -> List[dict]:
+        title_search = self.async_jellyfin_client.search_media_items(user_id=jellyfin_user_id,
+                                                                     token=token,
+                                                                     term=term,
+                                                                     media=media,
+                                                                     limit=self.max_title_candidates,
+                                                                     **kwargs)
+        artists_search = self.async_jellyfin_client.search_artist(user_id=jellyfin_user_id,
+                                                                  token=token,
+                                                                  term=musician,
+                                                                  Limit=self.max_artist_candidates)
+        items, artists = run_concurrently(title_search, artists_search)
+
+        return self._filter_artists(items, media, set(artist["Id"] for artist in artists))
+
+    @staticmethod
+    def _filter_artists(items: Iterable[dict], media: MediaType, artist_ids: Set[str]) -> List[dict]:
+        artists_field, _ = ARTIST_FIELDS[media]
+
+        return [item for item in items
+                if any(artist["Id"] in artist_ids for artist in item.get(artists_field) or ())]
@@ -0,0 +1,147 @@
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from jellyfin_alexa_skill.cache import TTLCache
+from jellyfin_alexa_skill.config import DEFAULT_PREFETCH_TTL, DEFAULT_PREFETCH_WAIT
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
+
+PrefetchedStream = namedtuple("PrefetchedStream", ["url", "play_info", "item_info"])
+
+
+def get_playback_fingerprint(playback: Playback, next_item: QueueItem) -> tuple:
+    """
+    Build a fingerprint of the playback state which determines the next item. A prefetched stream is only valid as
+    long as the fingerprint does not change.
+
+    :param playback: the playback
+    :param next_item: the next item of the playback
+
+    :return: the fingerprint
+    """
+
+    return (playback.current_item.idx,
+            next_item.idx,
+            next_item.item_id,
+            playback.shuffle,
+            playback.shuffle_random,
+            playback.shuffle_idx,
+            playback.shuffle_length,
+            playback.shuffle_segments,
+            playback.loop_single,
+            playback.loop_all)
+
+
+def resolve_stream(jellyfin_client: JellyfinClient,
+                   jellyfin_user_id: str,
+                   jellyfin_token: str,
+                   item_id: str) -> PrefetchedStream:
+    """
+    Resolve the stream url and the metadata of an item.
+
+    :param jellyfin_client: the Jellyfin client
+    :param jellyfin_user_id: Jellyfin user id
+    :param jellyfin_token: Jellyfin authentication token
+    :param item_id: Jellyfin item id
+
+    :return: the resolved stream
+    :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
+    """
+
+    url, play_info = jellyfin_client.get_stream_url(item_id=item_id, user_id=jellyfin_user_id, token=jellyfin_token)
+    item_info = jellyfin_client.get_item_info(user_id=jellyfin_user_id, token=jellyfin_token, media_id=item_id)
+
+    return PrefetchedStream(url, play_info, item_info)
+
+
+class StreamPrefetcher:
+    """
+    Resolves the stream url and the metadata of the next item of a playback in the background, such that the
+    transition to the next item does not have to wait for the Jellyfin server.
+
+    The prefetched streams are kept in the worker process which handled the PlaybackStarted event. An event of the
+    playback which is handled by another worker does not find the prefetched stream and resolves the stream itself.
+    """
+
+    def __init__(self,
+                 jellyfin_client: JellyfinClient,
+                 max_workers: int = 2,
+                 ttl: float = DEFAULT_PREFETCH_TTL,
+                 wait: float = DEFAULT_PREFETCH_WAIT):
+        """
+        :param jellyfin_client: client which is used to resolve the streams
+        :param max_workers: maximum number of concurrently resolved streams (default: 2)
+        :param ttl: time in seconds after which a prefetched stream is discarded (default: 3600)
+        :param wait: maximum time in seconds to wait for an unfinished prefetched stream (default: 1)
+        """
+
+        self.jellyfin_client = jellyfin_client
+        self.wait = wait
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stream-prefetch")
+        self._streams = TTLCache(max_size=1024, ttl=ttl)
+
+    def prefetch(self, user_id: str, playback: Playback, jellyfin_user_id: str, jellyfin_token: str) -> None:
+        """
+        Start to resolve the stream of the next item of the playback in the background.
+
+        :param user_id: Alexa user id of the playback
+        :param playback: the playback
+        :param jellyfin_user_id: Jellyfin user id
+        :param jellyfin_token: Jellyfin authentication token
+        """
+
+        next_item = playback.next()
+        if not next_item:
+            self._streams.pop(user_id)
+            return
+
+        future = self._executor.submit(resolve_stream, self.jellyfin_client, jellyfin_user_id, jellyfin_token,
+                                       next_item.item_id)
+        self._streams.set(user_id, (get_playback_fingerprint(playback, next_item), future))
+
+    def get(self, user_id: str, playback: Playback, next_item: QueueItem) -> Optional[PrefetchedStream]:
+        """
+        Get the prefetched stream of the next item. The prefetched stream is removed, such that it is used only once.
+
+        :param user_id: Alexa user id of the playback
+        :param playback: the playback with the state before moving to the next item
+        :param next_item: the next item of the playback
+
+        :return: the prefetched stream or None if there is no valid prefetched stream for the item or it is not resolved
+                 in time, then the stream has to be resolved by the caller
+        """
+
+        entry = self._streams.pop(user_id)
+        if entry is None:
+            return None
+
+        fingerprint, future = entry
+        if fingerprint != get_playback_fingerprint(playback, next_item):
+            # the queue, shuffle or loop state has changed since the stream was prefetched
+            future.cancel()
+            return None
+
+        try:
+            # an unfinished request is still faster than a new one, unless the server hangs
+            return future.result(timeout=self.wait)
+        except FutureTimeoutError:
+            future.cancel()
+            logging.warning(f"Prefetching of the stream did not finish within {self.wait} seconds")
+            return None
+        except Exception as e:
+            logging.warning(f"Prefetching of the stream failed: {e}")
+            return None
+
+    def invalidate(self, user_id: str) -> None:
+        """
+        Discard the prefetched stream of a playback.
+
+        :param user_id: Alexa user id of the playback
+        """
+
+        entry = self._streams.pop(user_id)
+        if entry is not None:
+            entry[1].cancel()
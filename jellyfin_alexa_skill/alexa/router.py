@@ -0,0 +1,133 @@
+import json
+import logging
+from types import SimpleNamespace
+from typing import Any, Dict, List, Mapping, Optional
+
+from ask_sdk_core.utils import RESPONSE_FORMAT_VERSION
+from ask_sdk_runtime.dispatch_components import GenericRequestHandlerChain
+from ask_sdk_runtime.utils import UserAgentManager
+from dateutil.parser import parse
+from peewee import DoesNotExist
+
+from jellyfin_alexa_skill.alexa.handler.event import AudioPlayerEventHandler
+from jellyfin_alexa_skill.metrics import REGISTRY
+
+ROUTED_EVENTS = REGISTRY.counter("audio_player_routed_events_total",
+                                 "Number of AudioPlayer events handled without the deserialization of the request")
+ROUTER_ERRORS = REGISTRY.counter("audio_player_router_errors_total",
+                                 "Number of failed AudioPlayer events handled by the event router")
+
+# common prefix of the request types of the routed events, checked in the raw body before it is parsed
+EVENT_TYPE_PREFIX = b"AudioPlayer.Playback"
+
+
+def verify_request(verifiers: List, headers: Mapping[str, Any], body: str, request: dict) -> None:
+    """
+    Apply the verifiers of the ASK SDK webservice support on a raw request without its deserialization.
+
+    :param verifiers: the verifiers, e.g. the signature and timestamp verifiers
+    :param headers: the headers of the request
+    :param body: the raw body of the request
+    :param request: the request object of the parsed body
+
+    :raises: the VerificationException of the verifiers if the verification fails
+    """
+
+    # the verifiers only use the type and the timestamp of the deserialized request, the timestamp is parsed like by the
+    # serializer of the ASK SDK
+    timestamp = request.get("timestamp")
+    request_envelope = SimpleNamespace(request=SimpleNamespace(object_type=request.get("type"),
+                                                               timestamp=parse(timestamp) if timestamp else None))
+
+    for verifier in verifiers:
+        verifier.verify(headers=headers, serialized_request_env=body, deserialized_request_env=request_envelope)
+
+
+class AudioPlayerEventRouter:
+    """
+    Handles the AudioPlayer events of the AudioPlayerEventHandlers directly from the raw request, without the
+    deserialization of the request into the request envelope model of the ASK SDK and the dispatch of the skill.
+    AudioPlayer events are sent for every played item and are the most frequent requests of the skill.
+
+    All other requests, and events which would not be handled by the event handler itself, e.g. of a user who is not
+    linked, are not routed and have to be dispatched by the skill.
+    """
+
+    def __init__(self,
+                 request_handler_chains: List[GenericRequestHandlerChain],
+                 verifiers: Optional[List] = None,
+                 skill_id: Optional[str] = None):
+        """
+        :param request_handler_chains: the request handler chains of the skill, the chains of the
+                                       AudioPlayerEventHandlers are routed
+        :param verifiers: the verifiers of the ASK SDK webservice support which are applied on the routed events, e.g.
+                          the signature and timestamp verifiers, the same as used by the skill adapter (default: none)
+        :param skill_id: the skill id, events of other skills are not routed and rejected by the skill like all other
+                         requests, if None the application id is not checked (default: None)
+        """
+
+        self.verifiers = verifiers if verifiers is not None else []
+        self.skill_id = skill_id
+
+        self._handlers: Dict[str, AudioPlayerEventHandler] = {}
+        # the first handler of an event type is used, like by the dispatch of the skill
+        for chain in reversed(request_handler_chains):
+            if isinstance(chain.request_handler, AudioPlayerEventHandler):
+                for key in chain.request_handler.dispatch_keys:
+                    self._handlers[key] = chain.request_handler
+
+    def dispatch(self, headers: Mapping[str, Any], body: bytes) -> Optional[dict]:
+        """
+        Handle the request if it is a routed AudioPlayer event.
+
+        :param headers: the headers of the request
+        :param body: the raw body of the request
+
+        :return: the serialized response envelope or None if the request is not routed
+        :raises: the VerificationException of the verifiers if the verification of a routed event fails
+        """
+
+        if EVENT_TYPE_PREFIX not in body:
+            return None
+
+        request_envelope = json.loads(body)
+        request = request_envelope.get("request") or {}
+
+        handler = self._handlers.get(request.get("type"))
+        if handler is None:
+            return None
+
+        verify_request(self.verifiers, headers, body.decode("utf-8"), request)
+
+        system = request_envelope["context"]["System"]
+        if self.skill_id is not None and (system.get("application") or {}).get("applicationId") != self.skill_id:
+            # the skill rejects requests of other skills
+            return None
+
+        device = system.get("device")
+        if device and "AudioPlayer" not in (device.get("supportedInterfaces") or {}):
+            # the skill responds that the device does not support media playback
+            return None
+
+        access_token = system["user"].get("accessToken")
+        if not access_token:
+            return None
+        try:
+            user = handler.get_user(access_token)
+        except DoesNotExist:
+            # the skill responds with the account linking card
+            return None
+
+        try:
+            handler.handle_event(user_id=system["user"]["userId"], user=user, token=request.get("token"))
+            ROUTED_EVENTS.inc()
+        except Exception as e:
+            # responses to AudioPlayer events can not contain speech, so the error is only logged
+            ROUTER_ERRORS.inc()
+            logging.error(e, exc_info=True)
+
+        return {
+            "version": RESPONSE_FORMAT_VERSION,
+            "userAgent": UserAgentManager.get_user_agent(),
+            "response": {}
+        }
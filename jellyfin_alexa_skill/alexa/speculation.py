@@ -0,0 +1,122 @@
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from jellyfin_alexa_skill.alexa.prefetch import resolve_stream
+from jellyfin_alexa_skill.cache import TTLCache
+from jellyfin_alexa_skill.config import DEFAULT_MATCH_SPECULATION_TTL, DEFAULT_MATCH_SPECULATION_WAIT
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+
+# the items of an album or None for a single item and the resolved stream of the first item or None if there is none
+SpeculatedMatch = namedtuple("SpeculatedMatch", ["items", "stream"])
+
+
+class MatchSpeculator:
+    """
+    Resolves the top match of a search in the background while the user is asked whether it should be played, such
+    that the confirmation does not have to wait for the Jellyfin server. For an album, the album items are loaded and
+    the stream of the first item is resolved, for all other media types the stream of the item itself.
+
+    The speculated matches are kept in the worker process which handled the search. A confirmation which is handled by
+    another worker does not find the speculated match and resolves the match itself.
+    """
+
+    def __init__(self,
+                 jellyfin_client: JellyfinClient,
+                 max_workers: int = 2,
+                 ttl: float = DEFAULT_MATCH_SPECULATION_TTL,
+                 wait: float = DEFAULT_MATCH_SPECULATION_WAIT):
+        """
+        :param jellyfin_client: client which is used to resolve the matches
+        :param max_workers: maximum number of concurrently resolved matches (default: 2)
+        :param ttl: time in seconds after which a resolved match is discarded (default: 300)
+        :param wait: maximum time in seconds to wait for an unfinished speculated match (default: 1)
+        """
+
+        self.jellyfin_client = jellyfin_client
+        self.wait = wait
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="match-speculation")
+        self._matches = TTLCache(max_size=1024, ttl=ttl)
+
+    def _resolve(self,
+                 jellyfin_user_id: str,
+                 jellyfin_token: str,
+                 media_type: MediaType,
+                 item_id: str) -> SpeculatedMatch:
+        if media_type != MediaType.ALBUM:
+            stream = resolve_stream(self.jellyfin_client, jellyfin_user_id, jellyfin_token, item_id)
+            return SpeculatedMatch(None, stream)
+
+        items = self.jellyfin_client.get_album_items(user_id=jellyfin_user_id, token=jellyfin_token, album_id=item_id)
+        if not items:
+            return SpeculatedMatch(items, None)
+
+        stream = resolve_stream(self.jellyfin_client, jellyfin_user_id, jellyfin_token, items[0]["Id"])
+        return SpeculatedMatch(items, stream)
+
+    def speculate(self,
+                  user_id: str,
+                  media_type: MediaType,
+                  item_id: str,
+                  jellyfin_user_id: str,
+                  jellyfin_token: str) -> None:
+        """
+        Start to resolve a match in the background. A previously speculated match of the user is replaced.
+
+        :param user_id: Alexa user id
+        :param media_type: media type of the match
+        :param item_id: Jellyfin item id of the match
+        :param jellyfin_user_id: Jellyfin user id
+        :param jellyfin_token: Jellyfin authentication token
+        """
+
+        self.invalidate(user_id)
+
+        future = self._executor.submit(self._resolve, jellyfin_user_id, jellyfin_token, media_type, item_id)
+        self._matches.set(user_id, ((media_type, item_id), future))
+
+    def get(self, user_id: str, media_type: MediaType, item_id: str) -> Optional[SpeculatedMatch]:
+        """
+        Get the speculated match. The speculated match is removed, such that it is used only once.
+
+        :param user_id: Alexa user id
+        :param media_type: media type of the confirmed match
+        :param item_id: Jellyfin item id of the confirmed match
+
+        :return: the speculated match or None if there is no valid speculated match for the item or it did not finish
+                 in time, then the caller has to resolve the match itself
+        """
+
+        entry = self._matches.pop(user_id)
+        if entry is None:
+            return None
+
+        key, future = entry
+        if key != (media_type, item_id):
+            # another search was started since the match was speculated
+            future.cancel()
+            return None
+
+        try:
+            # an unfinished request is still faster than a new one, unless the server hangs
+            return future.result(timeout=self.wait)
+        except FutureTimeoutError:
+            future.cancel()
+            logging.warning(f"Speculative resolution of the match did not finish within {self.wait} seconds")
+            return None
+        except Exception as e:
+            logging.warning(f"Speculative resolution of the match failed: {e}")
+            return None
+
+    def invalidate(self, user_id: str) -> None:
+        """
+        Discard the speculated match of a user.
+
+        :param user_id: Alexa user id
+        """
+
+        entry = self._matches.pop(user_id)
+        if entry is not None:
+            entry[1].cancel()
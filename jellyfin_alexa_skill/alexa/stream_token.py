@@ -0,0 +1,74 @@
+import base64
+import hashlib
+import hmac
+from collections import namedtuple
+from typing import Optional
+
+StreamToken = namedtuple("StreamToken", ["item_id", "queue_idx", "queue_generation"])
+
+# number of bytes of the HMAC-SHA256 digest in a token, 96 bits are 16 base64 characters
+SIGNATURE_SIZE = 12
+
+
+class StreamTokenSigner:
+    """
+    Encodes the position of a played item in the queue of a playback into the token of its stream, which the device
+    sends back with every AudioPlayer event of the stream. The token is signed with the secret of the skill and bound to
+    the Alexa user id of the playback, such that the position in a token can be trusted.
+
+    A token consists of the Jellyfin item id, the index of the item in the queue, the queue generation and the
+    signature, e.g. "ccf19d58cf1a38fa18ea0e2dd0da0e5b:2a:3:<signature>".
+    """
+
+    def __init__(self, secret: str):
+        """
+        :param secret: the secret key of the signatures
+        """
+
+        self._key = secret.encode("utf-8")
+
+    def _sign(self, user_id: str, payload: str) -> str:
+        digest = hmac.new(self._key, f"{user_id}:{payload}".encode("utf-8"), hashlib.sha256).digest()
+
+        return base64.urlsafe_b64encode(digest[:SIGNATURE_SIZE]).decode("ascii")
+
+    def encode(self, user_id: str, item_id: str, queue_idx: int, queue_generation: int) -> str:
+        """
+        Build the signed token of the stream of a queue item.
+
+        :param user_id: Alexa user id of the playback
+        :param item_id: Jellyfin item id of the queue item
+        :param queue_idx: index of the item in the queue
+        :param queue_generation: generation of the queue
+        :return: the token
+        """
+
+        payload = f"{item_id}:{queue_idx:x}:{queue_generation:x}"
+
+        return f"{payload}:{self._sign(user_id, payload)}"
+
+    def decode(self, user_id: str, token: Optional[str]) -> Optional[StreamToken]:
+        """
+        Decode the token of a stream.
+
+        :param user_id: Alexa user id of the playback
+        :param token: the token of the stream
+        :return: the decoded token or None if it is not a signed token of the playback, e.g. a bare item id or a token
+                 signed with another secret
+        """
+
+        if not token:
+            return None
+
+        parts = token.rsplit(":", 3)
+        if len(parts) != 4:
+            return None
+
+        payload, signature = token[:-len(parts[3]) - 1], parts[3]
+        if not hmac.compare_digest(signature, self._sign(user_id, payload)):
+            return None
+
+        try:
+            return StreamToken(parts[0], int(parts[1], 16), int(parts[2], 16))
+        except ValueError:
+            return None
@@ -1,11 +1,17 @@
+import heapq
 from difflib import SequenceMatcher
+from typing import List, Optional, Sequence
 
 from ask_sdk_model.interfaces.audioplayer import PlayDirective, PlayBehavior, AudioItem, Stream, AudioItemMetadata
 from ask_sdk_model.interfaces.display import Image, ImageInstance
 from ask_sdk_model.interfaces.videoapp import LaunchDirective, VideoItem, Metadata
 
+from jellyfin_alexa_skill.alexa.prefetch import PrefetchedStream
+from jellyfin_alexa_skill.config import PHONETIC_MATCH_SIMILARITY
 from jellyfin_alexa_skill.database.model.playback import QueueItem
 from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+from jellyfin_alexa_skill.library.normalize import normalize
+from jellyfin_alexa_skill.library.phonetic import normalized_key, phonetic_key
 
 
 def build_stream_response(jellyfin_client: JellyfinClient,
@@ -13,26 +19,59 @@ def build_stream_response(jellyfin_client: JellyfinClient,
                           jellyfin_token: str,
                           handler_input,
                           queue_item: QueueItem,
-                          offset: int = 0) -> None:
-    url, play_info = jellyfin_client.get_stream_url(item_id=queue_item.item_id,
-                                                    user_id=jellyfin_user_id,
-                                                    token=jellyfin_token)
+                          offset: int = 0,
+                          prefetched_stream: Optional[PrefetchedStream] = None,
+                          expected_previous_token: Optional[str] = None,
+                          stream_token: Optional[str] = None) -> None:
+    """
+    Add the directive to play a queue item to the response.
+
+    Audio items replace the currently playing stream and the queue of the device, unless an expected previous token is
+    given. Then the audio item is enqueued after the stream with this token, such that the device can buffer the next
+    stream and play it without a gap. This should be used for transitions which are triggered by AudioPlayer events,
+    but not for transitions requested by the user.
+
+    :param jellyfin_client: the Jellyfin client
+    :param jellyfin_user_id: Jellyfin user id
+    :param jellyfin_token: Jellyfin authentication token
+    :param handler_input: the handler input of the request
+    :param queue_item: the queue item to play
+    :param offset: playback start offset in milliseconds (default: 0)
+    :param prefetched_stream: already resolved stream of the queue item (default: None = resolve the stream now)
+    :param expected_previous_token: token of the currently playing stream to enqueue the item after (default: None)
+    :param stream_token: token of the stream, see BaseHandler.get_stream_token (default: None = the item id)
+    """
+
+    if prefetched_stream:
+        url, play_info = prefetched_stream.url, prefetched_stream.play_info
+        metadata = prefetched_stream.item_info
+    else:
+        url, play_info = jellyfin_client.get_stream_url(item_id=queue_item.item_id,
+                                                        user_id=jellyfin_user_id,
+                                                        token=jellyfin_token)
+        metadata = play_info
 
     if queue_item.media_type == MediaType.AUDIO:
         primary_image_url = jellyfin_client.server_endpoint + f"/Items/{queue_item.item_id}/Images/Primary"
         art_image = Image(sources=[ImageInstance(url=primary_image_url)])
 
+        if expected_previous_token:
+            play_behavior = PlayBehavior.ENQUEUE
+        else:
+            play_behavior = PlayBehavior.REPLACE_ALL
+
         handler_input.response_builder.add_directive(
             PlayDirective(
-                play_behavior=PlayBehavior.REPLACE_ALL,
+                play_behavior=play_behavior,
                 audio_item=AudioItem(
                     stream=Stream(
-                        token=queue_item.item_id,
+                        token=stream_token or queue_item.item_id,
                         url=url,
-                        offset_in_milliseconds=offset),
+                        offset_in_milliseconds=offset,
+                        expected_previous_token=expected_previous_token),
                     metadata=AudioItemMetadata(
-                        title=play_info.get("name", "Unknown Title"),
-                        subtitle=" ,".join(play_info.get("artists", [])),
+                        title=metadata.get("Name", "Unknown Title"),
+                        subtitle=", ".join(metadata.get("Artists", [])),
                         art=art_image
                     )
                 )
@@ -49,15 +88,51 @@ def build_stream_response(jellyfin_client: JellyfinClient,
                 video_item=VideoItem(
                     source=url,
                     metadata=Metadata(
-                        title=play_info.get("name", "Unknown Title")
+                        title=metadata.get("Name", "Unknown Title")
                     )
                 )
             )
         )
 
 
+def _is_junk(x: str) -> bool:
+    return x in " \t,.:-;/&_"
+
+
 def get_similarity(s1: str, s2: str) -> float:
-    return SequenceMatcher(lambda x: x in " \t,.:-;/&_", s1.lower(), s2.lower()).ratio()
+    return SequenceMatcher(_is_junk, s1.lower(), s2.lower()).ratio()
+
+
+def get_similarities(names: Sequence[str], term: str) -> List[float]:
+    """
+    Compute the similarity of each name to the search term. Names with the same normalized key as the search term,
+    e.g. "AC/DC" for "AC DC", have the similarity 1 and names with the same phonetic key, e.g. "Beyoncé" for "Beyonsay",
+    have at least the similarity PHONETIC_MATCH_SIMILARITY. The similarity of all other names is the get_similarity of
+    the normalized name and search term, such that width, kana and diacritic variants of the languages of all locales
+    are equal. The matcher and lookup table of the search term are only built once for all names.
+
+    :param names: the names
+    :param term: the search term
+    :return: the similarities in the order of the names
+    """
+
+    term_normalized_key = normalized_key(term)
+    term_phonetic_key = phonetic_key(term)
+    matcher = SequenceMatcher(_is_junk, b=normalize(term))
+
+    similarities = []
+    for name in names:
+        if term_normalized_key and normalized_key(name) == term_normalized_key:
+            similarities.append(1.0)
+            continue
+
+        matcher.set_seq1(normalize(name))
+        similarity = matcher.ratio()
+        if term_phonetic_key and phonetic_key(name) == term_phonetic_key:
+            similarity = max(similarity, PHONETIC_MATCH_SIMILARITY)
+        similarities.append(similarity)
+
+    return similarities
 
 
 def best_matches_by_idx(match_scores, max_matches=3):
@@ -73,33 +148,8 @@ def best_matches_by_idx(match_scores, max_matches=3):
                     ==> [ 3, 1, 0 ]  corresponding to match_scores[3], match_scores[1] and match_scores[0]
     """
 
-    # the simple cases first
-    if len(match_scores) == 0:
-        return []
-    if len(match_scores) == 1:
-        return [0]
-
-    # more complex cases: match_scores consists of 2 or more scores
-    # step 1 - build a dictionary to remember the original index of each score in "match_scores"
-    idx = 0
-    indexed_scores = {}
-    for score in match_scores:
-        indexed_scores[idx] = score
-        idx += 1
-
-    # step 2 - sort the scores (by value) in descending order
-    sorted_scores = {key: val for key, val in sorted(indexed_scores.items(), key=lambda item: item[1], reverse=True)}
-
-    # step 3 - put the top "max_matches" indexes (by key) in a list
-    idx = 0
-    indexed_list = []
-    for key in sorted_scores.keys():
-        indexed_list.append(key)
-        idx += 1
-        if idx >= max_matches:
-            break
-
-    return indexed_list
+    # partial selection of the top scores, equal scores keep their order
+    return heapq.nlargest(max_matches, range(len(match_scores)), key=match_scores.__getitem__)
 
 
 def get_media_type_enum(item_info: dict) -> MediaType:
@@ -1,13 +1,77 @@
-from flask import Blueprint
+import hmac
+from typing import List, Optional
+
+from ask_sdk_webservice_support.verifier import VerificationException
+from flask import Blueprint, Response, current_app, jsonify, request
 from flask_ask_sdk.skill_adapter import SkillAdapter
+from werkzeug import exceptions
+
+from jellyfin_alexa_skill.alexa.router import AudioPlayerEventRouter, verify_request
+from jellyfin_alexa_skill.database.idempotency import IdempotencyCache, get_body_hash, get_request
+from jellyfin_alexa_skill.metrics import REGISTRY
 
 
-def get_skill_blueprint(skill_adapter: SkillAdapter):
+def get_skill_blueprint(skill_adapter: SkillAdapter,
+                        event_router: Optional[AudioPlayerEventRouter] = None,
+                        request_cache: Optional[IdempotencyCache] = None,
+                        metrics_token: Optional[str] = None,
+                        verifiers: Optional[List] = None):
     skill_blueprint = Blueprint("skill", __name__)
 
     @skill_blueprint.route("/", methods=["POST"])
     def invoke_skill():
-        return skill_adapter.dispatch_request()
+        if event_router is not None:
+            try:
+                response = event_router.dispatch(request.headers, request.get_data())
+            except VerificationException:
+                current_app.logger.error("Request verification failed", exc_info=True)
+                raise exceptions.BadRequest(description="Incoming request failed verification")
+
+            if response is not None:
+                return jsonify(response)
+
+        if request_cache is None:
+            return skill_adapter.dispatch_request()
+
+        # the routed AudioPlayer events only change the playback state and are not cached
+        body = request.get_data()
+        alexa_request = get_request(body)
+        request_id = alexa_request.get("requestId") if alexa_request is not None else None
+        if request_id is None:
+            return skill_adapter.dispatch_request()
+
+        # a replayed request must not get the cached response, so the request is verified before the cache is used
+        try:
+            verify_request(verifiers or [], request.headers, body.decode("utf-8"), alexa_request)
+        except VerificationException:
+            current_app.logger.error("Request verification failed", exc_info=True)
+            raise exceptions.BadRequest(description="Incoming request failed verification")
+
+        body_hash = get_body_hash(body)
+        if not request_cache.claim(request_id, body_hash):
+            # a retried request gets the response of the first request, if it is the same request
+            try:
+                response = request_cache.wait(request_id, body_hash)
+            except TimeoutError:
+                # the request is not handled a second time while the first request is still handled, Alexa can retry it
+                raise exceptions.Conflict(description="Request is still handled")
+            if response is not None:
+                return current_app.response_class(response, mimetype="application/json")
+
+            return skill_adapter.dispatch_request()
+
+        try:
+            response = skill_adapter.dispatch_request()
+        except Exception:
+            request_cache.release(request_id)
+            raise
+
+        if response.status_code == 200:
+            request_cache.complete(request_id, response.get_data(as_text=True))
+        else:
+            request_cache.release(request_id)
+
+        return response
 
     @skill_blueprint.route("/healthy", methods=["GET"])
     def health_check():
@@ -22,4 +86,23 @@ def get_skill_blueprint(skill_adapter: SkillAdapter):
         """
         return "OK"
 
+    @skill_blueprint.route("/metrics", methods=["GET"])
+    def metrics():
+        """
+        Metrics of the skill in the Prometheus text format.
+
+        The metrics are only published if a token is configured, which has to be sent as bearer token in the
+        Authorization header.
+
+        note: each gunicorn worker has its own metrics, a scrape returns the metrics of the worker which handles it
+        """
+        if not metrics_token:
+            raise exceptions.NotFound()
+
+        authorization = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(authorization.encode(), f"Bearer {metrics_token}".encode()):
+            raise exceptions.Unauthorized()
+
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
     return skill_blueprint
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe cache with a maximum number of entries, which expire after a time to live. When the cache is full, the
+    least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        """
+        :param max_size: maximum number of entries in the cache
+        :param ttl: default time to live of an entry in seconds
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get the value of a key and mark the entry as recently used.
+
+        :param key: key of the entry
+        :param default: value which is returned when there is no valid entry for the key (default: None)
+
+        :return: the cached value or the default value
+        """
+
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Insert or replace the value of a key.
+
+        :param key: key of the entry
+        :param value: value to cache
+        :param ttl: time to live of this entry in seconds (default: None = default time to live of the cache)
+        """
+
+        if ttl is None:
+            ttl = self.ttl
+
+        if ttl <= 0 or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Remove the entry of a key.
+
+        :param key: key of the entry
+        :param default: value which is returned when there is no entry for the key (default: None)
+
+        :return: the removed value or the default value
+        """
+
+        with self._lock:
+            entry = self._entries.pop(key, _MISSING)
+
+        if entry is _MISSING or entry[0] <= time.monotonic():
+            return default
+
+        return entry[1]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Remove all entries whose key matches the predicate.
+
+        :param predicate: function which returns True for all keys which should be removed
+
+        :return: number of removed entries
+        """
+
+        return self.invalidate_items(lambda key, value: predicate(key))
+
+    def invalidate_items(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """
+        Remove all entries whose key and value match the predicate.
+
+        :param predicate: function which returns True for all keys and values which should be removed
+
+        :return: number of removed entries
+        """
+
+        with self._lock:
+            keys = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+            for key in keys:
+                del self._entries[key]
+
+        return len(keys)
+
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -31,6 +31,84 @@ CAPABILITIES_VIDEO = {
     "SupportsSync": True
 }
 
+DEFAULT_JELLYFIN_POOL_SIZE = 10
+DEFAULT_JELLYFIN_POOL_IDLE_TIMEOUT = 60
+# time in seconds to connect to the Jellyfin server and to wait for its response, requests which take longer fail
+DEFAULT_JELLYFIN_TIMEOUT = 30
+
+DEFAULT_JELLYFIN_CACHE_SIZE = 1024
+DEFAULT_JELLYFIN_CACHE_TTL = 300
+DEFAULT_JELLYFIN_CACHE_NEGATIVE_TTL = 30
+DEFAULT_JELLYFIN_CACHE_MAX_RESULT_SIZE = 1000
+# time to live in seconds of the cached responses by client method
+DEFAULT_JELLYFIN_CACHE_TTLS = {
+    "search_media_items": 300,
+    "search_artist": 600,
+    "get_album_items": 600,
+    "get_artist_items": 300,
+    "get_playlist": 300,
+    "get_playlist_items": 120,
+    "get_favorites": 60,
+    "get_recently_added": 60,
+    "get_item_info": 60
+}
+
+# time in seconds after which a prefetched stream of the next queue item is discarded
+DEFAULT_PREFETCH_TTL = 3600
+# maximum time in seconds a request waits for an unfinished prefetched stream before it resolves the stream itself
+DEFAULT_PREFETCH_WAIT = 1
+# time in seconds after which a speculatively resolved top match of a search, which is not confirmed, is discarded
+DEFAULT_MATCH_SPECULATION_TTL = 300
+# maximum time in seconds a confirmation waits for an unfinished speculated match before it resolves the match itself
+DEFAULT_MATCH_SPECULATION_WAIT = 1
+
+# maximum number of title and artist candidates which are searched for the song and album intents with a musician
+DEFAULT_QUERY_PLANNER_TITLE_CANDIDATES = 20
+DEFAULT_QUERY_PLANNER_ARTIST_CANDIDATES = 10
+
+# number of items of the favorites, artist and playlist listings which are fetched and queued at once, the first page is
+# queued immediately and the remaining pages are appended to the queue in the background
+DEFAULT_QUEUE_PAGE_SIZE = 100
+
+# maximum number of cached linked users and the time in seconds for which they are cached
+DEFAULT_USER_CACHE_SIZE = 1024
+DEFAULT_USER_CACHE_TTL = 300
+
+# storage of the playback queues, either one row per queue item or the whole queue packed into the playback
+QUEUE_STORAGE_OPTIONS = ("rows", "packed")
+DEFAULT_QUEUE_STORAGE = "rows"
+
+# time in seconds after which the playback state changes of AudioPlayer events are written to the database
+DEFAULT_PLAYBACK_STATE_FLUSH_INTERVAL = 1
+# number of pending playback state changes which trigger an immediate write to the database
+DEFAULT_PLAYBACK_STATE_FLUSH_BATCH_SIZE = 100
+
+# time in seconds for which the responses are kept to answer retried requests with the same request id, 0 disables the
+# cache, and the maximum time in seconds a retried request waits for the response of the still handled first request,
+# the worker is blocked while it waits
+DEFAULT_REQUEST_CACHE_TTL = 60
+DEFAULT_REQUEST_CACHE_WAIT = 1
+
+# search the titles in a local index of the Jellyfin libraries instead of sending each search to the server
+DEFAULT_LIBRARY_INDEX = True
+# time in seconds after which the library index of a user is stale and synced again
+DEFAULT_LIBRARY_INDEX_MAX_AGE = 3600
+# time in seconds between the syncs of the library index and number of items fetched with each request of a sync
+DEFAULT_LIBRARY_SYNC_INTERVAL = 300
+DEFAULT_LIBRARY_SYNC_PAGE_SIZE = 500
+# time in seconds after which the sync of a user walks all items again instead of only the changed items, such that
+# deleted items are removed even if the number of items did not change
+DEFAULT_LIBRARY_FULL_SYNC_INTERVAL = 86400
+# snapshot of the library index, which is shared by the gunicorn workers, relative paths are relative to the directory
+# of the config file
+DEFAULT_LIBRARY_SNAPSHOT_PATH = "library_index.snapshot"
+
+# maximum time in seconds for ranking the found items of a library index search
+DEFAULT_SCORING_TIME_BUDGET = 0.01
+
+# similarity of names which sound like the searched name, above all thresholds, but below an equal name
+PHONETIC_MATCH_SIMILARITY = 0.9
+
 ARTISTS_PARTIAL_RATIO_THRESHOLD = 0.7
 SONG_PARTIAL_RATIO_THRESHOLD = 0.5
 TITLE_PARTIAL_RATIO_THRESHOLD = 0.5
@@ -114,6 +192,30 @@ def validate_config(config: configparser.ConfigParser) -> None:
     if web_app_port < 1 or web_app_port > 65535:
         raise ValueError(f"Invalid web app port \"{web_app_port}\"")
 
+    jellyfin_pool_size = config.getint("jellyfin", "pool_size", fallback=DEFAULT_JELLYFIN_POOL_SIZE)
+    if jellyfin_pool_size < 1:
+        raise ValueError(f"Invalid jellyfin connection pool size \"{jellyfin_pool_size}\"")
+
+    jellyfin_pool_idle_timeout = config.getfloat("jellyfin",
+                                                 "pool_idle_timeout",
+                                                 fallback=DEFAULT_JELLYFIN_POOL_IDLE_TIMEOUT)
+    if jellyfin_pool_idle_timeout < 0:
+        raise ValueError(f"Invalid jellyfin connection pool idle timeout \"{jellyfin_pool_idle_timeout}\"")
+
+    jellyfin_timeout = config.getfloat("jellyfin", "timeout", fallback=DEFAULT_JELLYFIN_TIMEOUT)
+    if jellyfin_timeout <= 0:
+        raise ValueError(f"Invalid jellyfin request timeout \"{jellyfin_timeout}\"")
+
+    jellyfin_cache_size = config.getint("jellyfin", "cache_size", fallback=DEFAULT_JELLYFIN_CACHE_SIZE)
+    if jellyfin_cache_size < 0:
+        raise ValueError(f"Invalid jellyfin cache size \"{jellyfin_cache_size}\"")
+
+    if config.has_section("jellyfin"):
+        for key in config.options("jellyfin"):
+            if key == "cache_ttl" or key == "cache_negative_ttl" or key.startswith("cache_ttl_"):
+                if config.getfloat("jellyfin", key) < 0:
+                    raise ValueError(f"Invalid jellyfin cache time to live \"{key}\"")
+
     if len(config.get("smapi", "client_id", fallback="").strip()) == 0:
         raise ValueError("SMAPI client ID is not set")
     if len(config.get("smapi", "client_secret", fallback="").strip()) == 0:
@@ -126,3 +228,56 @@ def validate_config(config: configparser.ConfigParser) -> None:
 
     if len(config.get("database", "password", fallback="").strip()) == 0:
         raise ValueError("Database password is not set")
+
+    user_cache_size = config.getint("database", "user_cache_size", fallback=DEFAULT_USER_CACHE_SIZE)
+    if user_cache_size < 0:
+        raise ValueError(f"Invalid user cache size \"{user_cache_size}\"")
+
+    user_cache_ttl = config.getfloat("database", "user_cache_ttl", fallback=DEFAULT_USER_CACHE_TTL)
+    if user_cache_ttl < 0:
+        raise ValueError(f"Invalid user cache time to live \"{user_cache_ttl}\"")
+
+    queue_storage = config.get("database", "queue_storage", fallback=DEFAULT_QUEUE_STORAGE)
+    if queue_storage not in QUEUE_STORAGE_OPTIONS:
+        raise ValueError(f"Invalid queue storage \"{queue_storage}\"")
+
+    state_flush_interval = config.getfloat("database",
+                                           "state_flush_interval",
+                                           fallback=DEFAULT_PLAYBACK_STATE_FLUSH_INTERVAL)
+    if state_flush_interval < 0:
+        raise ValueError(f"Invalid playback state flush interval \"{state_flush_interval}\"")
+
+    state_flush_batch_size = config.getint("database",
+                                           "state_flush_batch_size",
+                                           fallback=DEFAULT_PLAYBACK_STATE_FLUSH_BATCH_SIZE)
+    if state_flush_batch_size < 1:
+        raise ValueError(f"Invalid playback state flush batch size \"{state_flush_batch_size}\"")
+
+    request_cache_ttl = config.getfloat("database", "request_cache_ttl", fallback=DEFAULT_REQUEST_CACHE_TTL)
+    if request_cache_ttl < 0:
+        raise ValueError(f"Invalid request cache time to live \"{request_cache_ttl}\"")
+
+    request_cache_wait = config.getfloat("database", "request_cache_wait", fallback=DEFAULT_REQUEST_CACHE_WAIT)
+    if request_cache_wait < 0:
+        raise ValueError(f"Invalid request cache wait time \"{request_cache_wait}\"")
+
+    # raises a ValueError if the value is not a boolean
+    config.getboolean("library", "index", fallback=DEFAULT_LIBRARY_INDEX)
+
+    library_index_max_age = config.getfloat("library", "index_max_age", fallback=DEFAULT_LIBRARY_INDEX_MAX_AGE)
+    if library_index_max_age <= 0:
+        raise ValueError(f"Invalid library index max age \"{library_index_max_age}\"")
+
+    library_sync_interval = config.getfloat("library", "sync_interval", fallback=DEFAULT_LIBRARY_SYNC_INTERVAL)
+    if library_sync_interval <= 0:
+        raise ValueError(f"Invalid library sync interval \"{library_sync_interval}\"")
+
+    library_sync_page_size = config.getint("library", "sync_page_size", fallback=DEFAULT_LIBRARY_SYNC_PAGE_SIZE)
+    if library_sync_page_size < 1:
+        raise ValueError(f"Invalid library sync page size \"{library_sync_page_size}\"")
+
+    library_full_sync_interval = config.getfloat("library",
+                                                 "full_sync_interval",
+                                                 fallback=DEFAULT_LIBRARY_FULL_SYNC_INTERVAL)
+    if library_full_sync_interval <= 0:
+        raise ValueError(f"Invalid library full sync interval \"{library_full_sync_interval}\"")
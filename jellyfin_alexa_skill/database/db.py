@@ -1,16 +1,23 @@
-from peewee import Database
+from typing import Optional
+
+from peewee import Database, PostgresqlDatabase
+from playhouse.migrate import SchemaMigrator, migrate
 from playhouse.pool import PooledPostgresqlDatabase
 
 from jellyfin_alexa_skill.database.model.base import db
-from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem, QueueStorage
+from jellyfin_alexa_skill.database.model.request import RequestResponse
 from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.database.state import PlaybackStateCache
 
 
 def connect_db(user: str,
                password: str,
                host: str,
                port: int = 5432,
-               database: str = "jellyfin_alexa_skill") -> Database:
+               database: str = "jellyfin_alexa_skill",
+               queue_storage: QueueStorage = QueueStorage.ROWS,
+               playback_state_cache: Optional[PlaybackStateCache] = None) -> Database:
     db.initialize(PooledPostgresqlDatabase(database=database,
                                            user=user,
                                            password=password,
@@ -21,19 +28,85 @@ def connect_db(user: str,
 
     db.connect(reuse_if_open=True)
 
-    db.create_tables([User, Playback, QueueItem], safe=True)
+    db.create_tables([User, Playback, QueueItem, RequestResponse], safe=True)
+
+    migrate_queue_item_id()
+    migrate_playback_columns()
+    migrate_queue_storage(queue_storage)
+
+    Playback.state_cache = playback_state_cache
 
     return db
 
 
+def migrate_playback_columns() -> None:
+    """
+    Add the columns of the playback table, which were added after the table was created.
+    """
+
+    columns = {column.name for column in db.get_columns("Playback")}
+    fields = [Playback.packed_queue, Playback.queue_position, Playback.queue_generation, Playback.state_version,
+              Playback.shuffle_length, Playback.shuffle_segments]
+    missing_fields = [field for field in fields if field.column_name not in columns]
+    if not missing_fields:
+        return
+
+    migrator = SchemaMigrator.from_database(db.obj)
+    with db.atomic():
+        migrate(*[migrator.add_column("Playback", field.column_name, field) for field in missing_fields])
+
+
+def migrate_queue_storage(queue_storage: QueueStorage) -> None:
+    """
+    Set the storage of new queues and convert all existing queues to this storage.
+
+    :param queue_storage: the storage of the queues
+    """
+
+    Playback.queue_storage = queue_storage
+
+    if queue_storage == QueueStorage.PACKED:
+        playbacks = Playback.select().where(Playback.user_id.in_(QueueItem.select(QueueItem.playback)))
+    else:
+        playbacks = Playback.select().where(Playback.packed_queue.is_null(False))
+
+    for playback in list(playbacks):
+        playback.migrate_queue(queue_storage)
+
+
+def migrate_queue_item_id() -> None:
+    """
+    Older versions created the id column of the queue items without a sequence, such that queue items could only be
+    inserted with an explicit id. Add the missing sequence, which is required for the bulk inserts of the queue.
+    """
+
+    if not isinstance(db.obj, PostgresqlDatabase):
+        return
+
+    column_default = db.execute_sql("SELECT column_default FROM information_schema.columns "
+                                    "WHERE table_name = 'QueueItem' AND column_name = 'id'").fetchone()
+    if column_default is None or column_default[0] is not None:
+        return
+
+    with db.atomic():
+        db.execute_sql('CREATE SEQUENCE IF NOT EXISTS "QueueItem_id_seq" OWNED BY "QueueItem"."id"')
+        db.execute_sql('ALTER TABLE "QueueItem" ALTER COLUMN "id" SET DEFAULT nextval(\'"QueueItem_id_seq"\')')
+        db.execute_sql('SELECT setval(\'"QueueItem_id_seq"\', COALESCE(MAX("id"), 0) + 1, false) FROM "QueueItem"')
+
+
 def close_db() -> None:
     db.close()
 
 
 def clear_db() -> None:
-    db.drop_tables([User, Playback, QueueItem], safe=True)
-    db.create_tables([User, Playback, QueueItem], safe=True)
+    db.drop_tables([User, Playback, QueueItem, RequestResponse], safe=True)
+    db.create_tables([User, Playback, QueueItem, RequestResponse], safe=True)
 
 
 def get_playback(user_id: str) -> Playback:
-    return Playback.get_or_create(user_id=user_id)[0]
+    playback = Playback.get_or_create(user_id=user_id)[0]
+
+    if Playback.state_cache is not None:
+        Playback.state_cache.apply(playback)
+
+    return playback
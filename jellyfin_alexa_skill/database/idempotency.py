@@ -0,0 +1,171 @@
+import hashlib
+import json
+import time
+from typing import Optional
+
+from peewee import IntegrityError
+
+from jellyfin_alexa_skill.config import DEFAULT_REQUEST_CACHE_TTL, DEFAULT_REQUEST_CACHE_WAIT
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.request import RequestResponse
+from jellyfin_alexa_skill.metrics import REGISTRY
+
+CACHED_RESPONSES = REGISTRY.counter("request_cache_hits_total",
+                                    "Number of retried requests answered with the response of the first request")
+WAIT_TIMEOUTS = REGISTRY.counter("request_cache_wait_timeouts_total",
+                                 "Number of retried requests without the response of the first request in time")
+
+
+def get_request(body: bytes) -> Optional[dict]:
+    """
+    Get the request object of a request envelope.
+
+    :param body: the raw body of the request
+    :return: the request object or None if the body is not a request envelope with a request object
+    """
+
+    try:
+        request_envelope = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(request_envelope, dict) or not isinstance(request_envelope.get("request"), dict):
+        return None
+
+    return request_envelope["request"]
+
+
+def get_request_id(body: bytes) -> Optional[str]:
+    """
+    Get the request id of a request.
+
+    :param body: the raw body of the request
+    :return: the request id or None if the body is not a request envelope with a request id
+    """
+
+    return (get_request(body) or {}).get("requestId")
+
+
+def get_body_hash(body: bytes) -> str:
+    """
+    :param body: the raw body of the request
+    :return: the hash of the body, which is the same for a retried request
+    """
+
+    return hashlib.sha256(body).hexdigest()
+
+
+class IdempotencyCache:
+    """
+    Cache of the responses by the request id of the requests, such that a request which is retried by Alexa, because the
+    first request did not respond in time, is not handled twice. The cache is stored in the database and shared by all
+    workers.
+
+    The first request claims its request id and stores its response when it is handled. A retried request waits for the
+    response of the first request and gets it only if the retried request has the same body. The requests have to be
+    verified before they claim or wait, otherwise a replayed request would get the response of the first request,
+    which contains the signed stream URLs of the user.
+    """
+
+    def __init__(self,
+                 ttl: float = DEFAULT_REQUEST_CACHE_TTL,
+                 wait: float = DEFAULT_REQUEST_CACHE_WAIT,
+                 poll_interval: float = 0.05):
+        """
+        :param ttl: time in seconds for which the responses are kept (default: 60)
+        :param wait: maximum time in seconds a retried request waits for the response of the first request (default: 1)
+        :param poll_interval: time in seconds between the lookups of the response of the first request (default: 0.05)
+        """
+
+        self.ttl = ttl
+        self.wait_time = wait
+        self.poll_interval = poll_interval
+
+        self._last_expiry = 0
+
+    def _expire(self, now: float) -> None:
+        # the expired responses are deleted at most once per time to live by each worker
+        if now - self._last_expiry < self.ttl:
+            return
+        self._last_expiry = now
+
+        RequestResponse.delete().where(RequestResponse.created < now - self.ttl).execute()
+
+    @staticmethod
+    def _insert(request_id: str, body_hash: str, now: float) -> bool:
+        try:
+            # the savepoint keeps an outer transaction usable after a failed insert
+            with db.atomic():
+                RequestResponse.create(request_id=request_id, body_hash=body_hash, created=now)
+        except IntegrityError:
+            return False
+
+        return True
+
+    def claim(self, request_id: str, body_hash: str) -> bool:
+        """
+        Claim the handling of a request.
+
+        :param request_id: the request id
+        :param body_hash: the hash of the body of the request, see get_body_hash
+        :return: True if the request is claimed and has to be handled, then the response must be stored with complete
+                 or the claim removed with release, False if the request id is already claimed
+        """
+
+        now = time.time()
+        self._expire(now)
+
+        if self._insert(request_id, body_hash, now):
+            return True
+
+        # the request id can be claimed again, if the claim expired since the last expiry
+        expired = RequestResponse.delete().where((RequestResponse.request_id == request_id)
+                                                 & (RequestResponse.created < now - self.ttl)).execute()
+
+        return bool(expired) and self._insert(request_id, body_hash, now)
+
+    def wait(self, request_id: str, body_hash: str) -> Optional[str]:
+        """
+        Wait for the response of a claimed request.
+
+        :param request_id: the request id
+        :param body_hash: the hash of the body of the retried request, see get_body_hash
+        :return: the response of the first request or None if the first request failed or has another body, then the
+                 retried request has to be handled without the cache
+        :raises TimeoutError: if the first request is still handled after the wait time, the retried request must not be
+                              handled a second time
+        """
+
+        deadline = time.monotonic() + self.wait_time
+        while True:
+            request_response = RequestResponse.get_or_none(RequestResponse.request_id == request_id)
+            if request_response is None or request_response.body_hash != body_hash:
+                return None
+
+            if request_response.response is not None:
+                CACHED_RESPONSES.inc()
+                return request_response.response
+
+            if time.monotonic() >= deadline:
+                WAIT_TIMEOUTS.inc()
+                raise TimeoutError(f"Request {request_id} is still handled")
+
+            time.sleep(self.poll_interval)
+
+    def complete(self, request_id: str, response: str) -> None:
+        """
+        Store the response of a claimed request.
+
+        :param request_id: the request id
+        :param response: the serialized response
+        """
+
+        RequestResponse.update(response=response).where(RequestResponse.request_id == request_id).execute()
+
+    def release(self, request_id: str) -> None:
+        """
+        Remove the claim of a request which failed, such that a retried request is handled again.
+
+        :param request_id: the request id
+        """
+
+        RequestResponse.delete().where(RequestResponse.request_id == request_id).execute()
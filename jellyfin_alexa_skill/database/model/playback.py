@@ -1,17 +1,39 @@
+import bisect
 import random
-from typing import Optional, List
+import time
+from enum import Enum
+from typing import Optional, List, Tuple
 
-import peewee
-from peewee import CharField, IntegerField, BooleanField, DeferredForeignKey, ForeignKeyField, TextField
+from peewee import AutoField, BlobField, CharField, IntegerField, BooleanField, DeferredForeignKey, DoubleField, \
+    ForeignKeyField, TextField, fn
 
-from jellyfin_alexa_skill.database.model.base import BaseModel, CharEnumField
+from jellyfin_alexa_skill.database.model.base import BaseModel, CharEnumField, db
 from jellyfin_alexa_skill.jellyfin.api.client import MediaType
+from jellyfin_alexa_skill.shuffle import Permutation
 
 SHUFFLE_RANDOM_RANGE = (-424242, 424242)
 
+# number of queue items per INSERT statement, 4 parameters per row stay below the parameter limit of SQLite
+QUEUE_INSERT_BATCH_SIZE = 200
+
+# the index of a media type is its code in a packed queue, so new media types must only be appended
+PACKED_MEDIA_TYPES = (MediaType.AUDIO, MediaType.VIDEO, MediaType.CHANNEL, MediaType.ALBUM)
+# 1 byte media type code followed by the 16 bytes of the Jellyfin item id
+PACKED_ITEM_SIZE = 17
+
+# fields of the playback which change with every AudioPlayer event and are written behind by the PlaybackStateCache
+STATE_FIELDS = ("playing", "offset")
+
+
+class QueueStorage(Enum):
+    # one QueueItem row per queued item
+    ROWS = "rows"
+    # the whole queue is packed into a single column of the playback
+    PACKED = "packed"
+
 
 class QueueItem(BaseModel):
-    id = IntegerField(primary_key=True)
+    id = AutoField()
     playback = DeferredForeignKey("Playback", backref="items", on_delete="CASCADE", null=True)
     idx = IntegerField(null=False)
     media_type = CharEnumField(MediaType, null=False)
@@ -19,21 +41,256 @@ class QueueItem(BaseModel):
 
     class Meta:
         table_name = "QueueItem"
+        indexes = (
+            (("playback", "idx"), False),
+        )
+
+
+def pack_queue(items: List[QueueItem]) -> Optional[bytes]:
+    """
+    Pack queue items into the compact binary format of a packed queue.
+
+    :param items: the queue items ordered by their index
+    :return: the packed queue or None if an item id is not a Jellyfin item id, which can not be packed
+    """
+
+    packed = bytearray()
+    for item in items:
+        item_id = item.item_id
+        if len(item_id) != 32 or item_id != item_id.lower():
+            return None
+
+        try:
+            packed.append(PACKED_MEDIA_TYPES.index(item.media_type))
+            packed += bytes.fromhex(item_id)
+        except ValueError:
+            return None
+
+    return bytes(packed)
+
+
+def unpack_queue_item(packed_queue: bytes, position: int) -> QueueItem:
+    """
+    Unpack a single item of a packed queue without unpacking the other items.
+
+    :param packed_queue: the packed queue
+    :param position: the position of the item in the queue
+    :return: the unsaved queue item
+    """
+
+    start = position * PACKED_ITEM_SIZE
+
+    return QueueItem(idx=position,
+                     media_type=PACKED_MEDIA_TYPES[packed_queue[start]],
+                     item_id=bytes(packed_queue[start + 1:start + PACKED_ITEM_SIZE]).hex())
 
 
 class Playback(BaseModel):
     user_id = CharField(primary_key=True)
     playing = BooleanField(default=False)
-    current_item = ForeignKeyField(QueueItem, null=True)
+    current_queue_item = ForeignKeyField(QueueItem, null=True, column_name="current_item_id")
     loop_single = BooleanField(default=False, null=False)
     loop_all = BooleanField(default=False, null=False)
     offset = IntegerField(default=0, null=False)
     shuffle = BooleanField(default=False, null=False)
+    # seed of the shuffled order
     shuffle_random = IntegerField(null=True)
+    # index of the queue item which starts the shuffled order
     shuffle_idx = IntegerField(null=True)
+    # number of queue items in the shuffled order, the order only depends on the seed and this length and not on the
+    # current length of the queue
+    shuffle_length = IntegerField(null=True)
+    # comma-separated start indices of the shuffled segments of the items appended after the queue was shuffled
+    shuffle_segments = TextField(null=True)
+    packed_queue = BlobField(null=True)
+    queue_position = IntegerField(null=True)
+    # changed whenever the queue is replaced or cleared, such that pages which are appended in the background are not
+    # appended to another queue
+    queue_generation = IntegerField(default=0, null=False)
+    # time of the last change of the state fields, a write-behind flush of a worker only writes the state fields if its
+    # change is newer, such that it never overwrites a newer change of another worker
+    state_version = DoubleField(default=0, null=False)
+
+    # storage of new queues, existing queues are read in the storage they were written with
+    queue_storage = QueueStorage.ROWS
+    # write-behind cache of the state changes of AudioPlayer events (PlaybackStateCache)
+    state_cache = None
 
     class Meta:
         table_name = "Playback"
+        # do not rewrite the packed queue when only the position changes
+        only_save_dirty = True
+
+    def save(self, *args, **kwargs):
+        if any(field.name in STATE_FIELDS for field in self.dirty_fields):
+            self.state_version = time.time()
+
+        if self.state_cache is None:
+            return super().save(*args, **kwargs)
+
+        # the saved fields are written through, pending changes of them are outdated
+        with self.state_cache.write_through(self.user_id, [field.name for field in self.dirty_fields]):
+            return super().save(*args, **kwargs)
+
+    @property
+    def is_packed(self) -> bool:
+        """
+        :return: True if the queue of this playback is stored packed, otherwise False
+        """
+
+        return self.packed_queue is not None
+
+    @property
+    def current_item(self) -> Optional[QueueItem]:
+        """
+        :return: the current item of the queue or None if there is no current item
+        """
+
+        if self.is_packed:
+            if self.queue_position is None:
+                return None
+            return unpack_queue_item(self.packed_queue, self.queue_position)
+
+        return self.current_queue_item
+
+    @current_item.setter
+    def current_item(self, item: Optional[QueueItem]) -> None:
+        if self.is_packed:
+            self.queue_position = item.idx if item else None
+        else:
+            self.current_queue_item = item
+
+    def get_queue_length(self) -> int:
+        """
+        :return: the number of items in the queue
+        """
+
+        if self.is_packed:
+            return len(self.packed_queue) // PACKED_ITEM_SIZE
+
+        last_idx = QueueItem.select(fn.MAX(QueueItem.idx)).where(QueueItem.playback == self).scalar()
+
+        return 0 if last_idx is None else last_idx + 1
+
+    def get_item(self, position: int) -> Optional[QueueItem]:
+        """
+        Get the item at a position of the queue.
+
+        :param position: the position of the item
+        :return: the item or None if there is no item at the position
+        """
+
+        if self.is_packed:
+            if 0 <= position < self.get_queue_length():
+                return unpack_queue_item(self.packed_queue, position)
+            return None
+
+        return QueueItem.get_or_none(QueueItem.playback == self, QueueItem.idx == position)
+
+    def get_queue(self) -> List[QueueItem]:
+        """
+        :return: all items of the queue ordered by their position
+        """
+
+        if self.is_packed:
+            return [unpack_queue_item(self.packed_queue, i) for i in range(self.get_queue_length())]
+
+        return list(QueueItem.select().where(QueueItem.playback == self).order_by(QueueItem.idx))
+
+    def _get_shuffle_segments(self, length: int) -> List[int]:
+        """
+        :param length: number of queue items in the shuffled order
+        :return: the start indices of the shuffled segments, the first segment starts at 0
+        """
+
+        starts = [0]
+        if self.shuffle_segments:
+            starts += [int(start) for start in self.shuffle_segments.split(",") if int(start) < length]
+        return starts
+
+    def _get_segment_permutation(self, starts: List[int], length: int, segment: int) -> Tuple[int, int, Permutation]:
+        """
+        :param starts: the start indices of the shuffled segments
+        :param length: number of queue items in the shuffled order
+        :param segment: the number of the segment
+        :return: the start index of the segment, the rotation of its permutation and its permutation
+        """
+
+        start = starts[segment]
+        end = starts[segment + 1] if segment + 1 < len(starts) else length
+        permutation = Permutation(end - start, (self.shuffle_random or 0) + start)
+
+        rotation = 0
+        if segment == 0 and self.shuffle_idx is not None and self.shuffle_idx < end:
+            # the first segment starts with the item at the index shuffle_idx
+            rotation = permutation.index(self.shuffle_idx)
+
+        return start, rotation, permutation
+
+    def _get_shuffled_item(self, current_item: QueueItem, step: int) -> Optional[QueueItem]:
+        """
+        Get an item relative to the current item in the shuffled order. The shuffled order consists of segments of
+        consecutive queue items, each is a seeded permutation of its items and the first starts with the item at the
+        index shuffle_idx. The segments are played one after the other. The item is computed in constant time and the
+        queue is not changed.
+
+        The first segment covers the queue when the shuffle is enabled or the queue is set, the items which are appended
+        later are shuffled in further segments, see append_queue. Hence, the order of the already shuffled items stays
+        the same when the queue grows.
+
+        :param current_item: the current item
+        :param step: the offset of the item from the current item in the shuffled order
+        :return: the item or None if the item is outside the shuffled order and loop all is disabled
+        """
+
+        # playbacks which were shuffled before the length was stored use the current length
+        length = self.shuffle_length if self.shuffle_length is not None else self.get_queue_length()
+        if length == 0 or current_item.idx >= length:
+            return None
+
+        # the segments cover the same ranges of positions in the shuffled order as of indices in the queue
+        starts = self._get_shuffle_segments(length)
+        start, rotation, permutation = self._get_segment_permutation(starts,
+                                                                     length,
+                                                                     bisect.bisect_right(starts, current_item.idx) - 1)
+        position = start + (permutation.index(current_item.idx - start) - rotation) % len(permutation) + step
+        if not 0 <= position < length:
+            if not self.loop_all:
+                return None
+            position %= length
+
+        start, rotation, permutation = self._get_segment_permutation(starts,
+                                                                     length,
+                                                                     bisect.bisect_right(starts, position) - 1)
+
+        return self.get_item(start + permutation[(position - start + rotation) % len(permutation)])
+
+    def _reshuffle(self, start_idx: int, length: int) -> None:
+        """
+        Choose a new shuffled order.
+
+        :param start_idx: index of the queue item which starts the shuffled order
+        :param length: number of queue items in the shuffled order
+        """
+
+        self.shuffle_random = random.randint(*SHUFFLE_RANDOM_RANGE)
+        self.shuffle_idx = start_idx
+        self.shuffle_length = length
+        self.shuffle_segments = None
+
+    def set_shuffle(self, shuffle: bool) -> None:
+        """
+        Enable or disable the shuffle. When the shuffle is enabled, a new shuffled order is chosen, which starts with
+        the current item. The queue items are not changed.
+
+        :param shuffle: True to enable the shuffle, False to disable it
+        """
+
+        if shuffle and not self.shuffle:
+            current_item = self.current_item
+            self._reshuffle(current_item.idx if current_item else 0, self.get_queue_length())
+
+        self.shuffle = shuffle
 
     def next(self) -> Optional[QueueItem]:
         """
@@ -42,43 +299,20 @@ class Playback(BaseModel):
         :return: The next item in the queue or None if there is no next item.
         """
 
-        if not self.current_item:
+        current_item = self.current_item
+        if not current_item:
             return None
 
         if self.loop_single:
-            return self.current_item
+            return current_item
 
         if self.shuffle:
-            if not self.shuffle_random:
-                self.shuffle_random = random.randint(*SHUFFLE_RANDOM_RANGE)
-            if not self.shuffle_idx:
-                self.shuffle_idx = 0
-
-            try:
-                next_item = QueueItem.get(QueueItem.playback == self) \
-                    .oder_by(self.shuffle_random) \
-                    .skip(self.shuffle_idx) \
-                    .first()
-
-                if not next_item:
-                    self.shuffle_idx = None
-                else:
-                    self.shuffle_idx += 1
-            except peewee.DoesNotExist:
-                self.shuffle_idx = None
-                next_item = None
+            next_item = self._get_shuffled_item(current_item, 1)
         else:
-            try:
-                next_item = QueueItem.get(QueueItem.playback == self, QueueItem.idx == self.current_item.idx + 1)
-            except peewee.DoesNotExist:
-                if self.loop_all:
-                    try:
-                        # try to go to the first item
-                        next_item = QueueItem.get(QueueItem.playback == self, QueueItem.idx == 0)
-                    except peewee.DoesNotExist:
-                        next_item = None
-                else:
-                    next_item = None
+            next_item = self.get_item(current_item.idx + 1)
+            if next_item is None and self.loop_all:
+                # try to go to the first item
+                next_item = self.get_item(0)
 
         return next_item
 
@@ -89,68 +323,169 @@ class Playback(BaseModel):
         :return: The previous item in the queue or None if there is no previous item.
         """
 
-        if not self.current_item:
+        current_item = self.current_item
+        if not current_item:
             return None
 
         if self.loop_single:
-            return self.current_item
+            return current_item
 
         if self.shuffle:
-            if not self.shuffle_random:
-                self.shuffle_random = random.randint(*SHUFFLE_RANDOM_RANGE)
-            if not self.shuffle_idx:
-                self.shuffle_idx = 0
-
-            try:
-                prev_item = QueueItem.get(QueueItem.playback == self) \
-                    .oder_by(self.shuffle_random) \
-                    .skip(self.shuffle_idx - 1) \
-                    .first()
-                self.shuffle_idx -= 1
-
-                if not prev_item:
-                    self.shuffle_idx = None
-                else:
-                    self.shuffle_idx += 1
-            except peewee.DoesNotExist:
-                self.shuffle_idx = None
-                prev_item = None
+            prev_item = self._get_shuffled_item(current_item, -1)
         else:
-            try:
-                prev_item = QueueItem.get(QueueItem.playback == self, QueueItem.idx == self.current_item.idx - 1)
-            except peewee.DoesNotExist:
-                if self.loop_all:
-                    try:
-                        # try to get the last item in the queue
-                        prev_item = QueueItem.select(QueueItem.playback == self).order_by(QueueItem.idx.desc()).first()
-                    except peewee.DoesNotExist:
-                        prev_item = None
-                else:
-                    prev_item = None
+            prev_item = self.get_item(current_item.idx - 1)
+            if prev_item is None and self.loop_all:
+                # try to get the last item in the queue
+                prev_item = self.get_item(self.get_queue_length() - 1)
 
         return prev_item
 
+    def _store_queue(self, items: List[QueueItem], queue_storage: QueueStorage) -> None:
+        """
+        Replace the stored queue items without changing the current item. Queues with item ids which can not be packed
+        are always stored as rows.
+
+        :param items: the new queue items ordered by their index
+        :param queue_storage: the storage of the new queue
+        """
+
+        QueueItem.delete().where(QueueItem.playback == self).execute()
+        self.current_queue_item = None
+        self.packed_queue = None
+        self.queue_position = None
+
+        if queue_storage == QueueStorage.PACKED:
+            self.packed_queue = pack_queue(items)
+            if self.packed_queue is not None:
+                return
+
+        for item in items:
+            item.id = None
+            item.playback = self
+        QueueItem.bulk_create(items, batch_size=QUEUE_INSERT_BATCH_SIZE)
+
+        if len(items) > 0 and items[0].id is None:
+            items[0].id = QueueItem.select(QueueItem.id) \
+                .where(QueueItem.playback == self, QueueItem.idx == items[0].idx) \
+                .scalar()
+
     def set_queue(self, items: List[QueueItem]) -> None:
         """
         Sets the queue to the given list of queue items and delete all old queue items in the database.
         Moreover, the offset is set to 0 and when the item list is not empty the current item is set to the first item
         of the list. Otherwise, the current item is set to None.
+
+        The queue is replaced in a single transaction and stored as configured by queue_storage. Rows are inserted with
+        multi-row inserts of QUEUE_INSERT_BATCH_SIZE items. The ids of the inserted items are only set when the
+        database supports RETURNING, the id of the first item is always set.
+
+        :param items: the new queue items, which are not saved yet
         """
 
-        # first clear the old queue items
-        QueueItem.delete().where(QueueItem.playback == self).execute()
+        with db.atomic():
+            self._store_queue(items, self.queue_storage)
+
+            if len(items) > 0:
+                self.current_item = items[0]
+            else:
+                self.current_item = None
+            if self.shuffle:
+                # shuffle the new queue starting with the first item
+                self._reshuffle(0, len(items))
+            self.playing = False
+            self.offset = 0
+            self.queue_generation += 1
+            self.save()
+
+    def append_queue(self, items: List[QueueItem], queue_generation: int) -> bool:
+        """
+        Append items to the end of the queue, unless the queue was replaced or cleared since it had the given
+        generation. The current item and the playback state are not changed.
 
-        for item in items:
-            item.playback = self
-            item.save()
+        If the queue is shuffled, the items are shuffled after the already shuffled items, such that the played items
+        are not played again and no item is skipped. The items extend the last appended segment of the shuffled order if
+        it is not reached yet, otherwise they start a new segment.
 
-        if len(items) > 0:
-            self.current_item = items[0]
-        else:
-            self.current_item = None
-        self.playing = False
-        self.offset = 0
-        self.save()
+        The stored queue is read again after the playback row is locked, because the queue can be changed by other
+        requests at the same time. The queue of this instance is not updated.
+
+        :param items: the new queue items, which are not saved yet, their indices are set by the append
+        :param queue_generation: generation of the queue to which the items belong
+        :return: True if the items are appended, False if the queue was replaced or cleared
+        """
+
+        with db.atomic():
+            # the update locks the playback row until the end of the transaction
+            locked = Playback.update(queue_generation=Playback.queue_generation) \
+                .where(Playback.user_id == self.user_id, Playback.queue_generation == queue_generation) \
+                .execute()
+            if not locked:
+                return False
+
+            playback = Playback.get_by_id(self.user_id)
+            length = playback.get_queue_length()
+            if playback.shuffle:
+                playback._extend_shuffle(length, len(items))
+
+            if playback.is_packed:
+                packed_items = pack_queue(items)
+                if packed_items is not None:
+                    Playback.update(packed_queue=playback.packed_queue + packed_items) \
+                        .where(Playback.user_id == self.user_id) \
+                        .execute()
+                    return True
+
+                # the items can not be packed, so the whole queue is stored as rows
+                playback.migrate_queue(QueueStorage.ROWS)
+
+            for i, item in enumerate(items):
+                item.id = None
+                item.idx = length + i
+                item.playback = playback
+            QueueItem.bulk_create(items, batch_size=QUEUE_INSERT_BATCH_SIZE)
+
+        return True
+
+    def _extend_shuffle(self, length: int, appended: int) -> None:
+        """
+        Add appended items to the shuffled order and store it.
+
+        :param length: the length of the queue before the append
+        :param appended: the number of appended items
+        """
+
+        starts = self._get_shuffle_segments(length)
+        current_item = self.current_item
+        if len(starts) == 1 or (current_item is not None and current_item.idx >= starts[-1]):
+            # the last segment is already played, its order must not change
+            starts.append(length)
+
+        Playback.update(shuffle_length=length + appended,
+                        shuffle_segments=",".join(str(start) for start in starts[1:])) \
+            .where(Playback.user_id == self.user_id) \
+            .execute()
+
+    def migrate_queue(self, queue_storage: QueueStorage) -> None:
+        """
+        Convert the stored queue to another storage. The current item and the playback state are kept. Queues which
+        can not be packed are kept as rows.
+
+        :param queue_storage: the new storage of the queue
+        """
+
+        current_item = self.current_item
+        position = current_item.idx if current_item else None
+
+        with db.atomic():
+            items = self.get_queue()
+            if queue_storage == QueueStorage.PACKED and pack_queue(items) is None:
+                return
+
+            self._store_queue(items, queue_storage)
+
+            if position is not None:
+                self.current_item = self.get_item(position)
+            self.save()
 
     def clear_queue(self) -> None:
         """
@@ -161,6 +496,9 @@ class Playback(BaseModel):
         QueueItem.delete().where(QueueItem.playback == self).execute()
 
         self.playing = False
-        self.current_item = None
+        self.current_queue_item = None
+        self.packed_queue = None
+        self.queue_position = None
         self.offset = 0
+        self.queue_generation += 1
         self.save()
@@ -0,0 +1,16 @@
+from peewee import CharField, DoubleField, TextField
+
+from jellyfin_alexa_skill.database.model.base import BaseModel
+
+
+class RequestResponse(BaseModel):
+    request_id = CharField(primary_key=True)
+    # SHA-256 hash of the raw request body, a retried request has the same body
+    body_hash = CharField(null=False)
+    # serialized response envelope, None while the request is handled
+    response = TextField(null=True)
+    # time of the first request in seconds since the epoch
+    created = DoubleField(null=False)
+
+    class Meta:
+        table_name = "RequestResponse"
@@ -0,0 +1,205 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator
+
+from peewee import Case
+
+from jellyfin_alexa_skill.config import DEFAULT_PLAYBACK_STATE_FLUSH_INTERVAL, DEFAULT_PLAYBACK_STATE_FLUSH_BATCH_SIZE
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, STATE_FIELDS
+from jellyfin_alexa_skill.metrics import REGISTRY
+
+FLUSH_LATENCY = REGISTRY.histogram("playback_state_flush_seconds",
+                                   "Time to write a batch of playback state changes to the database")
+FLUSH_BATCH_SIZE = REGISTRY.histogram("playback_state_flush_batch_size",
+                                      "Number of playbacks written by a playback state flush",
+                                      buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+FLUSH_ERRORS = REGISTRY.counter("playback_state_flush_errors_total",
+                                "Number of failed playback state flushes")
+COALESCED_UPDATES = REGISTRY.counter("playback_state_coalesced_updates_total",
+                                     "Number of playback state changes which replaced a pending change")
+PENDING_PLAYBACKS = REGISTRY.gauge("playback_state_pending",
+                                   "Number of playbacks with pending state changes")
+
+
+class PlaybackStateCache:
+    """
+    Write-behind cache for the playback state fields, which change with every AudioPlayer event.
+
+    Changes of the same playback are coalesced and written to the database by a background thread in batches, either
+    after the flush interval or when the batch size is reached. Playbacks loaded with get_playback contain the pending
+    changes of this process. A save of a playback writes the changed fields through and discards their pending changes.
+
+    Each gunicorn worker has its own cache. Every change is versioned with the time it was made and a flush only writes
+    a playback whose state_version is older than the change, such that a later flush never overwrites a newer change of
+    this or another worker, e.g. a pending PlaybackStopped of one worker does not overwrite a newer PlaybackStarted
+    which was handled by another worker. The workers of a skill have to run on hosts with synchronized clocks.
+    """
+
+    FIELDS = STATE_FIELDS
+
+    def __init__(self,
+                 flush_interval: float = DEFAULT_PLAYBACK_STATE_FLUSH_INTERVAL,
+                 max_batch_size: int = DEFAULT_PLAYBACK_STATE_FLUSH_BATCH_SIZE):
+        """
+        :param flush_interval: maximum time in seconds a change is pending, 0 writes all changes immediately
+                               (default: 1)
+        :param max_batch_size: number of pending playbacks which trigger an immediate flush (default: 100)
+        """
+
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # time of the latest pending change by user id
+        self._versions: Dict[str, float] = {}
+        # protects the pending changes
+        self._lock = threading.Lock()
+        # serializes the flushes and the write through saves
+        self._write_lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._flusher_pid = None
+
+    def _start_flusher(self) -> None:
+        # threads do not survive the fork of the gunicorn workers, so the flusher is started in the using process
+        if self._flusher_pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        threading.Thread(target=self._run_flusher, name="playback-state-flush", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run_flusher(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Flushing of the playback states failed: {e}")
+
+    def update(self, user_id: str, **state) -> None:
+        """
+        Change the state of a playback. The change is written to the database later.
+
+        :param user_id: Alexa user id of the playback
+        :param state: the changed fields, only the fields in FIELDS are allowed
+        """
+
+        for field in state:
+            if field not in self.FIELDS:
+                raise ValueError(f"Field \"{field}\" of the playback can not be cached")
+
+        with self._lock:
+            pending_state = self._pending.setdefault(user_id, {})
+            if pending_state:
+                COALESCED_UPDATES.inc()
+            pending_state.update(state)
+            self._versions[user_id] = time.time()
+            pending_count = len(self._pending)
+
+        PENDING_PLAYBACKS.set(pending_count)
+
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+
+        self._start_flusher()
+        if pending_count >= self.max_batch_size:
+            self._wakeup.set()
+
+    def apply(self, playback: Playback) -> None:
+        """
+        Apply the pending changes to a playback loaded from the database.
+
+        :param playback: the playback
+        """
+
+        with self._lock:
+            pending_state = dict(self._pending.get(playback.user_id, {}))
+
+        for field, value in pending_state.items():
+            setattr(playback, field, value)
+
+    @contextmanager
+    def write_through(self, user_id: str, fields: Iterable[str]) -> Iterator[None]:
+        """
+        Context for writing fields of a playback directly to the database. The pending changes of these fields are
+        discarded and no flush runs while the context is active.
+
+        :param user_id: Alexa user id of the playback
+        :param fields: names of the written fields
+        """
+
+        with self._write_lock:
+            with self._lock:
+                pending_state = self._pending.get(user_id)
+                if pending_state is not None:
+                    for field in fields:
+                        pending_state.pop(field, None)
+                    if not pending_state:
+                        del self._pending[user_id]
+                        del self._versions[user_id]
+
+            yield
+
+    def flush(self) -> int:
+        """
+        Write all pending changes to the database. Playbacks with equal changes are updated by a single statement.
+
+        :return: the number of written playbacks
+        """
+
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                versions, self._versions = self._versions, {}
+
+            if not pending:
+                return 0
+
+            start = time.perf_counter()
+
+            user_ids_by_state = defaultdict(list)
+            for user_id, state in pending.items():
+                user_ids_by_state[tuple(sorted(state.items()))].append(user_id)
+
+            was_closed = db.is_closed()
+            if was_closed:
+                db.connect()
+            try:
+                with db.atomic():
+                    for state, user_ids in user_ids_by_state.items():
+                        version = Case(Playback.user_id, [(user_id, versions[user_id]) for user_id in user_ids]) \
+                            .cast("DOUBLE PRECISION")
+                        Playback.update(state_version=version, **dict(state)) \
+                            .where(Playback.user_id.in_(user_ids) & (Playback.state_version < version)) \
+                            .execute()
+            except Exception:
+                FLUSH_ERRORS.inc()
+                # keep the changes for the next flush, newer changes take precedence
+                with self._lock:
+                    for user_id, state in pending.items():
+                        state.update(self._pending.get(user_id, {}))
+                        self._pending[user_id] = state
+                        self._versions[user_id] = max(versions[user_id], self._versions.get(user_id, 0))
+                raise
+            finally:
+                if was_closed:
+                    db.close()
+
+        FLUSH_LATENCY.observe(time.perf_counter() - start)
+        FLUSH_BATCH_SIZE.observe(len(pending))
+        PENDING_PLAYBACKS.set(len(self._pending))
+
+        return len(pending)
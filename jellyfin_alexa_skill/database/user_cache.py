@@ -0,0 +1,75 @@
+import hashlib
+from typing import Optional
+
+from jellyfin_alexa_skill.cache import TTLCache
+from jellyfin_alexa_skill.config import DEFAULT_USER_CACHE_SIZE, DEFAULT_USER_CACHE_TTL
+from jellyfin_alexa_skill.database.model.user import User
+
+
+class UserCache:
+    """
+    Cache of the linked users by their Alexa access token, such that requests do not need to query the database for the
+    user.
+
+    The entries are keyed by the SHA-256 hash of the access token and contain only the Jellyfin user id and token.
+
+    Each skill worker has its own cache and invalidations are not shared between the workers. A change of a linked user
+    is therefore only guaranteed to be seen by all workers after the time to live of the entries, the configured time to
+    live is the upper bound for the use of outdated credentials.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_USER_CACHE_SIZE, ttl: float = DEFAULT_USER_CACHE_TTL):
+        """
+        :param max_size: maximum number of cached users, 0 disables the cache (default: 1024)
+        :param ttl: time in seconds for which a user is cached (default: 300)
+        """
+
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    @staticmethod
+    def _build_key(alexa_auth_token: str) -> str:
+        return hashlib.sha256(alexa_auth_token.encode("utf-8")).hexdigest()
+
+    def get_user(self, alexa_auth_token: str) -> Optional[User]:
+        """
+        Get the user linked with an Alexa access token.
+
+        :param alexa_auth_token: the Alexa access token
+        :return: the user or None if no user is linked with the access token
+        """
+
+        key = self._build_key(alexa_auth_token)
+
+        cached_user = self._cache.get(key)
+        if cached_user is not None:
+            jellyfin_user_id, jellyfin_token = cached_user
+            return User(alexa_auth_token=alexa_auth_token,
+                        jellyfin_user_id=jellyfin_user_id,
+                        jellyfin_token=jellyfin_token)
+
+        user = User.get_or_none(User.alexa_auth_token == alexa_auth_token)
+        if user is not None:
+            self._cache.set(key, (user.jellyfin_user_id, user.jellyfin_token))
+
+        return user
+
+    def invalidate_jellyfin_user(self, jellyfin_user_id: str) -> int:
+        """
+        Remove all cached access tokens of a Jellyfin user, e.g. when the account is linked again. Only the cache of
+        this worker is changed, the other workers keep their entries until the time to live expires.
+
+        :param jellyfin_user_id: id of the Jellyfin user
+        :return: number of removed access tokens
+        """
+
+        return self._cache.invalidate_items(lambda key, value: value[0] == jellyfin_user_id)
+
+    def clear(self) -> None:
+        """
+        Remove all cached users.
+        """
+
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
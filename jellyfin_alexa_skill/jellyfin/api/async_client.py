@@ -0,0 +1,208 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, Any, Awaitable, List
+
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+
+
+def run_concurrently(*awaitables: Awaitable) -> List[Any]:
+    """
+    Run the given awaitables concurrently from synchronous code and wait until all of them are finished.
+
+    :param awaitables: the awaitables to run, e.g. coroutines of the AsyncJellyfinClient
+
+    :return: list with the results in the same order as the awaitables
+    :raises: the first exception raised by any of the awaitables
+    """
+
+    async def gather():
+        return await asyncio.gather(*awaitables)
+
+    return asyncio.run(gather())
+
+
+class AsyncJellyfinClient:
+    """
+    Asyncio client for the Jellyfin API with the same methods as the JellyfinClient.
+
+    The requests are sent with the pooled session of the wrapped JellyfinClient in a thread pool, such that independent
+    requests can be awaited concurrently, e.g. with asyncio.gather.
+    """
+
+    def __init__(self, client: JellyfinClient, max_workers: Optional[int] = None):
+        """
+        :param client: the client which is used to send the requests
+        :param max_workers: maximum number of concurrent requests (default: None = connection pool size of the client)
+        """
+
+        self.client = client
+        self.server_endpoint = client.server_endpoint
+
+        if max_workers is None:
+            max_workers = client.pool_size
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jellyfin-client")
+
+    async def _run(self, func, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def public_info(self) -> Optional[dict]:
+        """
+        See JellyfinClient.public_info
+        """
+
+        return await self._run(self.client.public_info)
+
+    async def get_auth_token(self, username: str, password: str) -> Tuple[str, str]:
+        """
+        See JellyfinClient.get_auth_token
+        """
+
+        return await self._run(self.client.get_auth_token, username=username, password=password)
+
+    async def get_stream_url(self, user_id: str, token: str, item_id: str, **kwargs) -> Tuple[str, dict]:
+        """
+        See JellyfinClient.get_stream_url
+        """
+
+        return await self._run(self.client.get_stream_url, user_id=user_id, token=token, item_id=item_id, **kwargs)
+
+    async def get_ancestor_with_image(self, item_id: str, token: str) -> Optional[str]:
+        """
+        See JellyfinClient.get_ancestor_with_image
+        """
+
+        return await self._run(self.client.get_ancestor_with_image, item_id=item_id, token=token)
+
+    async def get_art_url(self, item_id: str, token: str) -> Optional[str]:
+        """
+        See JellyfinClient.get_art_url
+        """
+
+        return await self._run(self.client.get_art_url, item_id=item_id, token=token)
+
+    async def get_favorites(self,
+                            user_id: str,
+                            token: str,
+                            media_type: Optional[MediaType] = None,
+                            **kwargs) -> dict:
+        """
+        See JellyfinClient.get_favorites
+        """
+
+        return await self._run(self.client.get_favorites,
+                               user_id=user_id,
+                               token=token,
+                               media_type=media_type,
+                               **kwargs)
+
+    async def get_playlist(self,
+                           user_id: str,
+                           token: str,
+                           playlist_name: Optional[str] = None,
+                           **kwargs) -> dict:
+        """
+        See JellyfinClient.get_playlist
+        """
+
+        return await self._run(self.client.get_playlist,
+                               user_id=user_id,
+                               token=token,
+                               playlist_name=playlist_name,
+                               **kwargs)
+
+    async def get_playlist_items(self, user_id: str, token: str, playlist_id: str, **kwargs) -> dict:
+        """
+        See JellyfinClient.get_playlist_items
+        """
+
+        return await self._run(self.client.get_playlist_items,
+                               user_id=user_id,
+                               token=token,
+                               playlist_id=playlist_id,
+                               **kwargs)
+
+    async def search_media_items(self,
+                                 user_id: str,
+                                 token: str,
+                                 term: str,
+                                 media: MediaType,
+                                 limit: int = 20,
+                                 **kwargs) -> dict:
+        """
+        See JellyfinClient.search_media_items
+        """
+
+        return await self._run(self.client.search_media_items,
+                               user_id=user_id,
+                               token=token,
+                               term=term,
+                               media=media,
+                               limit=limit,
+                               **kwargs)
+
+    async def get_artist_items(self, user_id: str, token: str, artist_id: str, media: MediaType, **kwargs):
+        """
+        See JellyfinClient.get_artist_items
+        """
+
+        return await self._run(self.client.get_artist_items,
+                               user_id=user_id,
+                               token=token,
+                               artist_id=artist_id,
+                               media=media,
+                               **kwargs)
+
+    async def search_artist(self, user_id: str, token: str, term: str, **kwargs):
+        """
+        See JellyfinClient.search_artist
+        """
+
+        return await self._run(self.client.search_artist, user_id=user_id, token=token, term=term, **kwargs)
+
+    async def get_album_items(self, user_id: str, token: str, album_id: str) -> dict:
+        """
+        See JellyfinClient.get_album_items
+        """
+
+        return await self._run(self.client.get_album_items, user_id=user_id, token=token, album_id=album_id)
+
+    async def get_recently_added(self,
+                                 user_id: str,
+                                 token: str,
+                                 media: MediaType = None,
+                                 limit: int = 50,
+                                 **kwargs) -> dict:
+        """
+        See JellyfinClient.get_recently_added
+        """
+
+        return await self._run(self.client.get_recently_added,
+                               user_id=user_id,
+                               token=token,
+                               media=media,
+                               limit=limit,
+                               **kwargs)
+
+    async def favorite(self, user_id: str, token: str, media_id: str) -> dict:
+        """
+        See JellyfinClient.favorite
+        """
+
+        return await self._run(self.client.favorite, user_id=user_id, token=token, media_id=media_id)
+
+    async def unfavorite(self, user_id: str, token: str, media_id: str):
+        """
+        See JellyfinClient.unfavorite
+        """
+
+        return await self._run(self.client.unfavorite, user_id=user_id, token=token, media_id=media_id)
+
+    async def get_item_info(self, user_id: str, token: str, media_id: str, **kwargs) -> dict:
+        """
+        See JellyfinClient.get_item_info
+        """
+
+        return await self._run(self.client.get_item_info, user_id=user_id, token=token, media_id=media_id, **kwargs)
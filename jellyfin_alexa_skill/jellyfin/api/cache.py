@@ -0,0 +1,154 @@
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+from jellyfin_alexa_skill.cache import TTLCache
+from jellyfin_alexa_skill.config import DEFAULT_JELLYFIN_CACHE_SIZE, DEFAULT_JELLYFIN_CACHE_TTL, \
+    DEFAULT_JELLYFIN_CACHE_NEGATIVE_TTL, DEFAULT_JELLYFIN_CACHE_TTLS, DEFAULT_JELLYFIN_CACHE_MAX_RESULT_SIZE
+
+
+# name of the free-text search term parameter of the search methods
+SEARCH_TERM_PARAM = "term"
+
+
+def _normalize(value: Any) -> Any:
+    """
+    Convert a request parameter into a hashable value. The values are not changed, because parameters like item ids,
+    playlist names or the sort order are case-sensitive.
+
+    :param value: the request parameter
+
+    :return: hashable value
+    """
+
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, set):
+        return tuple(sorted(_normalize(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+
+
+def _normalize_term(term: str) -> str:
+    """
+    Normalize a free-text search term, such that equivalent searches result in the same cache key.
+
+    :param term: the search term
+
+    :return: the normalized search term
+    """
+
+    # the search terms are case-insensitive on the server side
+    return " ".join(term.lower().split())
+
+
+class ResponseCache:
+    """
+    Cache for the responses of the read methods of the JellyfinClient.
+
+    The entries are keyed by the method, the Jellyfin user and the normalized request parameters. Each method can have
+    its own time to live and empty results are cached with a shorter time to live. Results with too many items are not
+    cached to keep the memory footprint bounded.
+    """
+
+    def __init__(self,
+                 max_size: int = DEFAULT_JELLYFIN_CACHE_SIZE,
+                 default_ttl: float = DEFAULT_JELLYFIN_CACHE_TTL,
+                 negative_ttl: float = DEFAULT_JELLYFIN_CACHE_NEGATIVE_TTL,
+                 ttls: Optional[Dict[str, float]] = None,
+                 max_result_size: int = DEFAULT_JELLYFIN_CACHE_MAX_RESULT_SIZE):
+        """
+        :param max_size: maximum number of cached responses (default: 1024)
+        :param default_ttl: time to live in seconds of methods without a specific time to live (default: 300)
+        :param negative_ttl: time to live in seconds of empty results (default: 30)
+        :param ttls: time to live in seconds by method name (default: None = DEFAULT_JELLYFIN_CACHE_TTLS)
+        :param max_result_size: maximum number of items of a cached result (default: 1000)
+        """
+
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.ttls = dict(DEFAULT_JELLYFIN_CACHE_TTLS if ttls is None else ttls)
+        self.max_result_size = max_result_size
+
+        self._cache = TTLCache(max_size=max_size, ttl=default_ttl)
+
+    @staticmethod
+    def build_key(method: str, params: Dict[str, Any]) -> Tuple[str, Optional[str], tuple]:
+        """
+        Build the cache key of a request.
+
+        :param method: name of the client method
+        :param params: parameters of the request without the authentication token
+
+        :return: the cache key
+        """
+
+        params = dict(params)
+        user_id = params.pop("user_id", None)
+        if isinstance(params.get(SEARCH_TERM_PARAM), str):
+            params[SEARCH_TERM_PARAM] = _normalize_term(params[SEARCH_TERM_PARAM])
+
+        return method, user_id, _normalize(params)
+
+    def get(self, method: str, params: Dict[str, Any], default: Any = None) -> Any:
+        """
+        Get a cached response.
+
+        :param method: name of the client method
+        :param params: parameters of the request without the authentication token
+        :param default: value which is returned when no response is cached (default: None)
+
+        :return: the cached response or the default value
+        """
+
+        return self._cache.get(self.build_key(method, params), default)
+
+    def set(self, method: str, params: Dict[str, Any], result: Any) -> None:
+        """
+        Cache a response.
+
+        :param method: name of the client method
+        :param params: parameters of the request without the authentication token
+        :param result: the response
+        """
+
+        if not result:
+            ttl = self.negative_ttl
+        else:
+            if isinstance(result, list) and len(result) > self.max_result_size:
+                return
+            ttl = self.ttls.get(method, self.default_ttl)
+
+        self._cache.set(self.build_key(method, params), result, ttl=ttl)
+
+    def invalidate(self, method: str, user_id: Optional[str] = None, **params) -> int:
+        """
+        Remove all cached responses of a method for a user, which were requested with the given parameters.
+
+        :param method: name of the client method
+        :param user_id: id of the Jellyfin user (default: None = all users)
+        :param params: parameters which must match (default: all parameters match)
+
+        :return: number of removed responses
+        """
+
+        required = set(_normalize(params))
+
+        def predicate(key: Tuple[str, Optional[str], tuple]) -> bool:
+            return key[0] == method \
+                   and (user_id is None or key[1] == user_id) \
+                   and required.issubset(key[2])
+
+        return self._cache.invalidate(predicate)
+
+    def clear(self) -> None:
+        """
+        Remove all cached responses.
+        """
+
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -1,13 +1,25 @@
+import copy
+import inspect
 import json
-import urllib.parse
+import logging
+import threading
+import time
 import urllib.parse
 from enum import Enum
-from typing import Optional, Tuple
+from http.cookiejar import DefaultCookiePolicy
+from functools import wraps
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from jellyfin_alexa_skill import __version__
-from jellyfin_alexa_skill.config import APP_NAME
+from jellyfin_alexa_skill.config import APP_NAME, DEFAULT_JELLYFIN_POOL_SIZE, DEFAULT_JELLYFIN_POOL_IDLE_TIMEOUT, \
+    DEFAULT_JELLYFIN_TIMEOUT, DEFAULT_QUEUE_PAGE_SIZE
+from jellyfin_alexa_skill.jellyfin.api.cache import ResponseCache
+from jellyfin_alexa_skill.library.index import BaseLibraryIndex, INDEXED_ITEM_TYPES, ARTIST_ITEM_TYPE
+
+_NOT_CACHED = object()
 
 
 class MediaType(Enum):
@@ -17,19 +29,168 @@ class MediaType(Enum):
     ALBUM = "MusicAlbum"
 
 
+def build_projection(*fields: str, total_record_count: bool = False) -> dict:
+    """
+    Build the parameters which restrict the items of a search or listing response to the base fields of the items,
+    e.g. Id, Name, Type, MediaType, Artists, ArtistItems and AlbumArtists, and the given optional fields. Without them,
+    the server adds the user data, the image tags and further optional fields like the people to every item.
+
+    :param fields: optional fields of the items which are read by the caller
+    :param total_record_count: whether the total number of items is needed (default: False)
+
+    :return: dict of the request parameters
+    """
+
+    params = {
+        "Fields": ",".join(fields),
+        "EnableImages": False,
+        "EnableUserData": False
+    }
+    if not total_record_count:
+        params["EnableTotalRecordCount"] = False
+
+    return params
+
+
+class PooledSession(requests.Session):
+    """
+    Session with a bounded pool of keep-alive connections to a single server.
+
+    The underlying urllib3 connection pool is thread-safe, so one session can be shared by all threads of a worker.
+    Connections which were not used for longer than the idle timeout are dropped before the next request, because the
+    server or a proxy in between has most likely closed them already.
+
+    The pool does not block when all its connections are in use, e.g. by the background threads of the prefetch, the
+    queue loader or the library sync, then an additional connection is opened and closed after the request. Requests
+    without an explicit timeout use the default timeout, such that a slow server can not block the threads forever.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_JELLYFIN_POOL_SIZE,
+                 idle_timeout: float = DEFAULT_JELLYFIN_POOL_IDLE_TIMEOUT,
+                 timeout: float = DEFAULT_JELLYFIN_TIMEOUT):
+        """
+        :param pool_size: maximum number of connections kept open to the server
+        :param idle_timeout: time in seconds after which idle connections are discarded
+        :param timeout: default time in seconds to connect to the server and to wait for a response
+        """
+
+        super().__init__()
+
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        # the server does not use cookies, disable them so that no shared state is modified by concurrent requests
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        # open additional connections when all connections of the pool are in use, only pool_size are kept open
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+        self._last_used = time.monotonic()
+        self._lock = threading.Lock()
+
+    def request(self, method, url, *args, **kwargs) -> requests.Response:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_used > self.idle_timeout:
+                self.reset()
+            self._last_used = now
+
+        kwargs.setdefault("timeout", self.timeout)
+
+        return super().request(method, url, *args, **kwargs)
+
+    def reset(self) -> None:
+        """
+        Close all pooled connections. New connections are opened on demand by the next requests.
+        """
+
+        for adapter in self.adapters.values():
+            adapter.close()
+
+
+def cached(func):
+    """
+    Decorator for read methods of the JellyfinClient, which returns the response from the response cache of the client
+    if there is one. The authentication token is not part of the cache key.
+
+    The callers get a shallow copy of the cached result, the returned list or dict can be changed, but the items in it
+    are shared with the cache and must only be read.
+    """
+
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self.response_cache is None:
+            return func(self, *args, **kwargs)
+
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+
+        params = {}
+        for name, value in arguments.arguments.items():
+            if signature.parameters[name].kind == inspect.Parameter.VAR_KEYWORD:
+                params.update(value)
+            elif name not in ("self", "token"):
+                params[name] = value
+
+        result = self.response_cache.get(func.__name__, params, default=_NOT_CACHED)
+        if result is _NOT_CACHED:
+            result = func(self, *args, **kwargs)
+            self.response_cache.set(func.__name__, params, result)
+
+        # a deep copy of large results would cost more than the request saves, the items are shared read-only
+        return copy.copy(result)
+
+    return wrapper
+
+
 class JellyfinClient:
     """
     Client for the Jellyfin API.
     """
 
-    def __init__(self, server_endpoint: str, client_name: str = APP_NAME):
+    def __init__(self,
+                 server_endpoint: str,
+                 client_name: str = APP_NAME,
+                 pool_size: int = DEFAULT_JELLYFIN_POOL_SIZE,
+                 pool_idle_timeout: float = DEFAULT_JELLYFIN_POOL_IDLE_TIMEOUT,
+                 response_cache: Optional[ResponseCache] = None,
+                 library_index: Optional[BaseLibraryIndex] = None,
+                 timeout: float = DEFAULT_JELLYFIN_TIMEOUT):
         """
         :param server_endpoint: url of the server
         :param client_name: name of the client (default: "jellyfin_alexa_skill")
+        :param pool_size: maximum number of keep-alive connections to the server (default: 10)
+        :param pool_idle_timeout: time in seconds after which idle connections are discarded (default: 60)
+        :param response_cache: cache for the responses of the read methods (default: None = no caching)
+        :param library_index: local index for the searches of the users (default: None = search on the server)
+        :param timeout: time in seconds to connect to the server and to wait for a response (default: 30)
         """
 
         self.server_endpoint = server_endpoint
         self.client_name = client_name
+        self.pool_size = pool_size
+        self.response_cache = response_cache
+        self.library_index = library_index
+
+        self.session = PooledSession(pool_size=pool_size, idle_timeout=pool_idle_timeout, timeout=timeout)
+
+    def preconnect(self) -> None:
+        """
+        Drop all existing connections and open a new connection to the server, such that the first request does not
+        have to wait for the TCP and TLS handshake. This should be called once in each worker process after the fork,
+        because connections can not be shared between processes.
+        """
+
+        self.session.reset()
+
+        try:
+            self.public_info()
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Could not connect to the Jellyfin server: {e}")
 
     @staticmethod
     def _build_emby_auth_header(client_name: str = APP_NAME,
@@ -70,7 +231,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header()
         }
 
-        res = requests.get(url, headers=headers)
+        res = self.session.get(url, headers=headers)
 
         if res:
             return json.loads(res.content)
@@ -102,7 +263,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header()
         }
 
-        res = requests.post(url, headers=headers, data=json.dumps(data))
+        res = self.session.post(url, headers=headers, data=json.dumps(data))
 
         if res:
             json_res = json.loads(res.content)
@@ -149,7 +310,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.post(url, headers=headers, data=json.dumps(data))
+        res = self.session.post(url, headers=headers, data=json.dumps(data))
         if res:
             play_info = json.loads(res.content)
         else:
@@ -222,7 +383,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers)
+        res = self.session.get(url, headers=headers)
         if res:
             ancestor_info = json.loads(res.content)
             if not ancestor_info:
@@ -259,7 +420,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers)
+        res = self.session.get(url, headers=headers)
         if res:
             image_info = json.loads(res.content)
             if not image_info:
@@ -291,6 +452,138 @@ class JellyfinClient:
 
         return url
 
+    def get_library_items(self,
+                          user_id: str,
+                          token: str,
+                          item_types: Iterable[str] = INDEXED_ITEM_TYPES,
+                          start_index: int = 0,
+                          limit: Optional[int] = None,
+                          **kwargs) -> Tuple[List[dict], int]:
+        """
+        Get a page of the items of the specified types in the libraries of a user.
+
+        :param user_id: user id of the user whose items should be retrieved
+        :param token: authentication token
+        :param item_types: Jellyfin types of the items to retrieve (default: INDEXED_ITEM_TYPES)
+        :param start_index: index of the first item of the page (default: 0)
+        :param limit: maximum number of items of the page (default: None = all items)
+        :param kwargs: additional parameters to pass to the server for the request, e.g. MinDateLastSaved
+
+        :return: tuple of type (items of the page, total number of items)
+        :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
+        """
+
+        params = {
+            "IncludeItemTypes": ",".join(item_types),
+            "Recursive": True,
+            "SortBy": "DateCreated,SortName",
+            "StartIndex": start_index,
+            **build_projection(total_record_count=True)
+        }
+        if limit is not None:
+            params["Limit"] = limit
+        params.update(kwargs)
+
+        url = self.server_endpoint + f"/Users/{user_id}/Items"
+
+        headers = {
+            "Content-Type": "application/json",
+            "X-Emby-Authorization": self._build_emby_auth_header(token=token)
+        }
+
+        res = self.session.get(url, headers=headers, params=params)
+
+        if res:
+            json_res = json.loads(res.content)
+            return json_res["Items"], json_res["TotalRecordCount"]
+        else:
+            res.raise_for_status()
+
+    def get_artists(self,
+                    user_id: str,
+                    token: str,
+                    start_index: int = 0,
+                    limit: Optional[int] = None,
+                    **kwargs) -> Tuple[List[dict], int]:
+        """
+        Get a page of the artists in the libraries of a user.
+
+        :param user_id: user id of the user whose artists should be retrieved
+        :param token: authentication token
+        :param start_index: index of the first artist of the page (default: 0)
+        :param limit: maximum number of artists of the page (default: None = all artists)
+        :param kwargs: additional parameters to pass to the server for the request, e.g. MinDateLastSaved
+
+        :return: tuple of type (artists of the page, total number of artists)
+        :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
+        """
+
+        params = {
+            "UserId": user_id,
+            "Recursive": True,
+            "SortBy": "DateCreated,SortName",
+            "StartIndex": start_index,
+            **build_projection(total_record_count=True)
+        }
+        if limit is not None:
+            params["Limit"] = limit
+        params.update(kwargs)
+
+        url = self.server_endpoint + "/Artists"
+
+        headers = {
+            "Content-Type": "application/json",
+            "X-Emby-Authorization": self._build_emby_auth_header(token=token)
+        }
+
+        res = self.session.get(url, headers=headers, params=params)
+
+        if res:
+            json_res = json.loads(res.content)
+            return json_res["Items"], json_res["TotalRecordCount"]
+        else:
+            res.raise_for_status()
+
+    def _search_library(self,
+                        user_id: str,
+                        token: str,
+                        term: str,
+                        item_types: Iterable[str],
+                        limit: Optional[int],
+                        **kwargs) -> Optional[List[dict]]:
+        """
+        Search items in the library index, which is kept up to date by the library sync.
+
+        :param user_id: user id of the user whose items should be searched
+        :param token: authentication token
+        :param term: search term
+        :param item_types: Jellyfin types of the items to search for
+        :param limit: maximum number of results to return, None for all results
+        :param kwargs: additional parameters of the search request
+
+        :return: list of the found items or None if the search has to be sent to the server
+        """
+
+        if self.library_index is None:
+            return None
+
+        # the index can only apply the folder filters, other parameters have to be handled by the server
+        filters = kwargs.pop("Filters", None)
+        if kwargs or filters not in (None, "IsFolder", "IsNotFolder"):
+            return None
+
+        items = self.library_index.search(user_id=user_id,
+                                          term=term,
+                                          item_types=item_types,
+                                          limit=limit,
+                                          is_folder=None if filters is None else filters == "IsFolder")
+        if not items:
+            # the index of the user is stale or misses items which were added after the last sync
+            return None
+
+        return items
+
+    @cached
     def get_favorites(self,
                       user_id: str,
                       token: str,
@@ -311,6 +604,7 @@ class JellyfinClient:
         params = {
             "Filters": "IsFavorite",
             "Recursive": True,
+            **build_projection()
         }
         params.update(kwargs)
 
@@ -324,7 +618,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers, params=params)
+        res = self.session.get(url, headers=headers, params=params)
 
         if res:
             json_res = json.loads(res.content)
@@ -332,6 +626,7 @@ class JellyfinClient:
         else:
             res.raise_for_status()
 
+    @cached
     def get_playlist(self,
                      user_id: str,
                      token: str,
@@ -349,9 +644,15 @@ class JellyfinClient:
         :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
         """
 
+        if playlist_name:
+            items = self._search_library(user_id, token, playlist_name, ("Playlist",), None, **kwargs)
+            if items is not None:
+                return items
+
         params = {
             "IncludeItemTypes": "Playlist",
-            "Recursive": True
+            "Recursive": True,
+            **build_projection()
         }
         params.update(kwargs)
 
@@ -365,7 +666,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers, params=params)
+        res = self.session.get(url, headers=headers, params=params)
 
         if res:
             json_res = json.loads(res.content)
@@ -373,6 +674,7 @@ class JellyfinClient:
         else:
             res.raise_for_status()
 
+    @cached
     def get_playlist_items(self,
                            user_id: str,
                            token: str,
@@ -391,7 +693,8 @@ class JellyfinClient:
         """
 
         params = {
-            "UserId": user_id
+            "UserId": user_id,
+            **build_projection()
         }
         params.update(kwargs)
 
@@ -402,7 +705,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers, params=params)
+        res = self.session.get(url, headers=headers, params=params)
 
         if res:
             json_res = json.loads(res.content)
@@ -410,6 +713,7 @@ class JellyfinClient:
         else:
             res.raise_for_status()
 
+    @cached
     def search_media_items(self,
                            user_id: str,
                            token: str,
@@ -431,11 +735,16 @@ class JellyfinClient:
         :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
         """
 
+        items = self._search_library(user_id, token, term, media.value.split(","), limit, **kwargs)
+        if items is not None:
+            return items
+
         params = {
             "searchTerm": term,
             "Recursive": True,
             "IncludeItemTypes": media.value,
-            "Limit": limit
+            "Limit": limit,
+            **build_projection()
         }
         params.update(kwargs)
 
@@ -446,7 +755,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers, params=params)
+        res = self.session.get(url, headers=headers, params=params)
 
         if res:
             json_res = json.loads(res.content)
@@ -454,6 +763,7 @@ class JellyfinClient:
         else:
             res.raise_for_status()
 
+    @cached
     def get_artist_items(self,
                          user_id: str,
                          token: str,
@@ -477,6 +787,7 @@ class JellyfinClient:
             "ArtistIds": artist_id,
             "Recursive": True,
             "MediaTypes": media.value,
+            **build_projection()
         }
         params.update(kwargs)
 
@@ -487,7 +798,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers, params=params)
+        res = self.session.get(url, headers=headers, params=params)
 
         if res:
             json_res = json.loads(res.content)
@@ -495,6 +806,128 @@ class JellyfinClient:
         else:
             res.raise_for_status()
 
+    def _iter_items(self, url: str, token: str, params: dict, page_size: int) -> Iterator[dict]:
+        """
+        Page through the items of a listing with StartIndex and Limit. The next page is only requested when all items
+        of the previous page are consumed.
+
+        :param url: url of the listing
+        :param token: authentication token
+        :param params: parameters of the listing
+        :param page_size: number of items per request
+
+        :return: iterator over the items of the listing
+        :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
+        """
+
+        headers = {
+            "Content-Type": "application/json",
+            "X-Emby-Authorization": self._build_emby_auth_header(token=token)
+        }
+
+        start_index = 0
+        while True:
+            res = self.session.get(url, headers=headers, params=dict(params, StartIndex=start_index, Limit=page_size))
+            if not res:
+                res.raise_for_status()
+
+            items = json.loads(res.content)["Items"]
+            yield from items
+
+            if len(items) < page_size:
+                return
+            start_index += len(items)
+
+    def iter_favorites(self,
+                       user_id: str,
+                       token: str,
+                       media_type: Optional[MediaType] = None,
+                       page_size: int = DEFAULT_QUEUE_PAGE_SIZE,
+                       **kwargs) -> Iterator[dict]:
+        """
+        Get all favorite items for a specified user page by page. The responses are not cached.
+
+        :param user_id: user id of the user whose favorite items should be retrieved
+        :param token: authentication token
+        :param media_type: media type of the favorite items to retrieve
+        :param page_size: number of items per request (default: 100)
+        :param kwargs: additional parameters to pass to the server for the requests
+
+        :return: iterator over the favorite items
+        :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
+        """
+
+        params = {
+            "Filters": "IsFavorite",
+            "Recursive": True,
+            **build_projection()
+        }
+        params.update(kwargs)
+
+        if media_type:
+            params["IncludeItemTypes"] = media_type.value
+
+        return self._iter_items(self.server_endpoint + f"/Users/{user_id}/Items", token, params, page_size)
+
+    def iter_playlist_items(self,
+                            user_id: str,
+                            token: str,
+                            playlist_id: str,
+                            page_size: int = DEFAULT_QUEUE_PAGE_SIZE,
+                            **kwargs) -> Iterator[dict]:
+        """
+        Get all items in a specified playlist page by page. The responses are not cached.
+
+        :param user_id: user id of the user whose playlist items should be retrieved
+        :param token: authentication token
+        :param playlist_id: id of the playlist whose items should be retrieved
+        :param page_size: number of items per request (default: 100)
+        :param kwargs: additional parameters to pass to the server for the requests
+
+        :return: iterator over the playlist items
+        :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
+        """
+
+        params = {
+            "UserId": user_id,
+            **build_projection()
+        }
+        params.update(kwargs)
+
+        return self._iter_items(self.server_endpoint + f"/Playlists/{playlist_id}/Items", token, params, page_size)
+
+    def iter_artist_items(self,
+                          user_id: str,
+                          token: str,
+                          artist_id: str,
+                          media: MediaType,
+                          page_size: int = DEFAULT_QUEUE_PAGE_SIZE,
+                          **kwargs) -> Iterator[dict]:
+        """
+        Get all items of a specified artist page by page. The responses are not cached.
+
+        :param user_id: user id of the user whose artist items should be retrieved
+        :param token: authentication token
+        :param artist_id: id of the artist whose items should be retrieved
+        :param media: media type to search for
+        :param page_size: number of items per request (default: 100)
+        :param kwargs: additional parameters to pass to the server for the requests
+
+        :return: iterator over the artist items
+        :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
+        """
+
+        params = {
+            "ArtistIds": artist_id,
+            "Recursive": True,
+            "MediaTypes": media.value,
+            **build_projection()
+        }
+        params.update(kwargs)
+
+        return self._iter_items(self.server_endpoint + f"/Users/{user_id}/Items", token, params, page_size)
+
+    @cached
     def search_artist(self,
                       user_id: str,
                       token: str,
@@ -512,11 +945,16 @@ class JellyfinClient:
         :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
         """
 
+        items = self._search_library(user_id, token, term, (ARTIST_ITEM_TYPE,), None, **kwargs)
+        if items is not None:
+            return items
+
         params = {
             "UserId": user_id,
             "searchTerm": term,
             "IncludeArtists": True,
-            "Recursive": True
+            "Recursive": True,
+            **build_projection()
         }
         params.update(kwargs)
 
@@ -527,7 +965,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers, params=params)
+        res = self.session.get(url, headers=headers, params=params)
 
         if res:
             json_res = json.loads(res.content)
@@ -535,6 +973,7 @@ class JellyfinClient:
         else:
             res.raise_for_status()
 
+    @cached
     def get_album_items(self,
                         user_id: str,
                         token: str,
@@ -554,7 +993,8 @@ class JellyfinClient:
             "IncludeItemTypes": "Audio",
             "Recursive": True,
             "sortBy": "SortName",
-            "ParentId": album_id
+            "ParentId": album_id,
+            **build_projection()
         }
         url = self.server_endpoint + f"/Users/{user_id}/Items"
         headers = {
@@ -562,13 +1002,14 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers, params=params)
+        res = self.session.get(url, headers=headers, params=params)
         if res:
             json_res = json.loads(res.content)
             return json_res["Items"]
         else:
             res.raise_for_status()
 
+    @cached
     def get_recently_added(self,
                            user_id: str,
                            token: str,
@@ -589,7 +1030,8 @@ class JellyfinClient:
         """
 
         params = {
-            "Limit": limit
+            "Limit": limit,
+            **build_projection()
         }
         params.update(kwargs)
 
@@ -603,13 +1045,28 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers, params=params)
+        res = self.session.get(url, headers=headers, params=params)
 
         if res:
             return json.loads(res.content)
         else:
             res.raise_for_status()
 
+    def _invalidate_favorite(self, user_id: str, media_id: str) -> None:
+        """
+        Remove all cached responses which depend on the favorite state of an item. Only the response cache of this
+        worker is changed, the other workers keep their responses until the time to live of the request type expires.
+
+        :param user_id: user id of the user whose favorites changed
+        :param media_id: id of the item which was favorited or unfavorited
+        """
+
+        if self.response_cache is None:
+            return
+
+        self.response_cache.invalidate("get_favorites", user_id=user_id)
+        self.response_cache.invalidate("get_item_info", user_id=user_id, media_id=media_id)
+
     def favorite(self, user_id: str, token: str, media_id: str) -> dict:
         """
         Favorite an item.
@@ -629,7 +1086,8 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.post(url, headers=headers)
+        res = self.session.post(url, headers=headers)
+        self._invalidate_favorite(user_id=user_id, media_id=media_id)
 
         if res:
             return json.loads(res.content)
@@ -655,13 +1113,15 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.delete(url, headers=headers)
+        res = self.session.delete(url, headers=headers)
+        self._invalidate_favorite(user_id=user_id, media_id=media_id)
 
         if res:
             return json.loads(res.content)
         else:
             res.raise_for_status()
 
+    @cached
     def get_item_info(self, user_id: str, token: str, media_id: str, **kwargs) -> dict:
         """
         Get information about an item.
@@ -681,7 +1141,7 @@ class JellyfinClient:
             "X-Emby-Authorization": self._build_emby_auth_header(token=token)
         }
 
-        res = requests.get(url, headers=headers, params=kwargs)
+        res = self.session.get(url, headers=headers, params=kwargs)
 
         if res:
             return json.loads(res.content)
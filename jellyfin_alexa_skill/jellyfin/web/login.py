@@ -2,18 +2,24 @@ import binascii
 import os
 import urllib.parse
 from pathlib import Path
+from typing import Optional
 
 from flask import Blueprint, request, render_template, redirect, abort
 from requests import HTTPError
 
 from jellyfin_alexa_skill.config import VALID_ALEXA_REDIRECT_URLS_REGEX
 from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.database.user_cache import UserCache
 from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
+from jellyfin_alexa_skill.library.sync import LibrarySync
 
 templates_path = Path(__file__).parent.resolve() / "templates"
 
 
-def get_jellyfin_login_blueprint(jellyfin_server_endpoint: str, client_id: str):
+def get_jellyfin_login_blueprint(jellyfin_client: JellyfinClient,
+                                 client_id: str,
+                                 user_cache: Optional[UserCache] = None,
+                                 library_sync: Optional[LibrarySync] = None):
     login_blueprint = Blueprint("login", __name__, template_folder=str(templates_path))
 
     @login_blueprint.route("/login", methods=["GET", "POST"])
@@ -33,11 +39,9 @@ def get_jellyfin_login_blueprint(jellyfin_server_endpoint: str, client_id: str):
             return abort(400)
 
         if request.method == "POST":
-            client = JellyfinClient(jellyfin_server_endpoint)
-
             try:
-                user_id, token = client.get_auth_token(username=request.form["username"],
-                                                       password=request.form["password"])
+                user_id, token = jellyfin_client.get_auth_token(username=request.form["username"],
+                                                                password=request.form["password"])
             except HTTPError as e:
                 if e.response.status_code == 401:
                     return render_template("login.html",
@@ -59,6 +63,17 @@ def get_jellyfin_login_blueprint(jellyfin_server_endpoint: str, client_id: str):
                                jellyfin_token=token)
             user.save()
 
+            if user_cache is not None:
+                # the account was linked again, the cached credentials of the Jellyfin user are outdated, the other
+                # workers drop them after the time to live of the user cache
+                user_cache.invalidate_jellyfin_user(user_id)
+
+            if library_sync is not None:
+                # index the libraries of the new user without waiting for the next scheduled sync, the process which
+                # syncs the snapshot is triggered as well, without a snapshot the other processes search on the server
+                # until their next sync
+                library_sync.trigger()
+
             params = {
                 "access_token": alexa_auth_token,
                 "state": state,
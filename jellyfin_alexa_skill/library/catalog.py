@@ -0,0 +1,84 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# fields of the Jellyfin items which are kept in the catalog, all other fields are dropped to save memory
+CATALOG_FIELDS = ("Id", "Name", "Type", "MediaType", "IsFolder", "Artists", "ArtistItems", "AlbumArtist",
+                  "AlbumArtists", "Album", "AlbumId")
+
+
+class Catalog:
+    """
+    Items of the Jellyfin libraries, each item is stored once regardless of the number of users who can see it.
+
+    The items are addressed by slot numbers, such that sets of items, e.g. the visible items of a user, are compact sets
+    of integers. Slots of removed items are reused.
+    """
+
+    def __init__(self):
+        self._items: List[Optional[dict]] = []
+        self._slots: Dict[str, int] = {}
+        self._free_slots: List[int] = []
+
+    def add(self, item: dict) -> Tuple[int, Optional[dict]]:
+        """
+        Add an item or replace the item with the same id.
+
+        :param item: the item as returned by the Jellyfin API
+        :return: tuple of type (slot, replaced item or None)
+        """
+
+        entry = {field: item[field] for field in CATALOG_FIELDS if field in item}
+
+        slot = self._slots.get(entry["Id"])
+        if slot is not None:
+            previous_entry = self._items[slot]
+            self._items[slot] = entry
+            return slot, previous_entry
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._items[slot] = entry
+        else:
+            slot = len(self._items)
+            self._items.append(entry)
+        self._slots[entry["Id"]] = slot
+
+        return slot, None
+
+    def remove(self, slot: int) -> dict:
+        """
+        :param slot: slot of the item
+        :return: the removed item
+        """
+
+        entry = self._items[slot]
+        self._items[slot] = None
+        del self._slots[entry["Id"]]
+        self._free_slots.append(slot)
+
+        return entry
+
+    def get(self, slot: int) -> dict:
+        """
+        :param slot: slot of the item
+        :return: the item, which must not be modified
+        """
+
+        return self._items[slot]
+
+    def slot(self, item_id: str) -> Optional[int]:
+        """
+        :param item_id: id of the item
+        :return: the slot of the item or None if the item is not in the catalog
+        """
+
+        return self._slots.get(item_id)
+
+    def items(self) -> Iterator[Tuple[int, dict]]:
+        """
+        :return: iterator of tuples of type (slot, item) of all items
+        """
+
+        return ((slot, self._items[slot]) for slot in self._slots.values())
+
+    def __len__(self) -> int:
+        return len(self._slots)
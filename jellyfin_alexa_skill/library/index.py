@@ -0,0 +1,511 @@
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Container, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from jellyfin_alexa_skill.config import DEFAULT_LIBRARY_INDEX_MAX_AGE, DEFAULT_SCORING_TIME_BUDGET
+from jellyfin_alexa_skill.library.catalog import Catalog
+from jellyfin_alexa_skill.library.normalize import tokenize
+from jellyfin_alexa_skill.library.phonetic import normalized_key, phonetic_key
+from jellyfin_alexa_skill.library.scoring import Trigrams, top_k, trigrams
+from jellyfin_alexa_skill.metrics import REGISTRY
+
+# item types of the Jellyfin libraries which can be searched in the index
+INDEXED_ITEM_TYPES = ("Audio", "MusicAlbum", "Video", "MusicVideo", "TvChannel", "Playlist")
+ARTIST_ITEM_TYPE = "MusicArtist"
+
+# kinds of the keys of the item names
+NORMALIZED_KEY = "normalized"
+PHONETIC_KEY = "phonetic"
+
+SEARCH_HITS = REGISTRY.counter("library_index_hits_total",
+                               "Number of searches answered by the library index")
+SEARCH_MISSES = REGISTRY.counter("library_index_misses_total",
+                                 "Number of searches without results in the library index")
+SEARCH_KEY_HITS = REGISTRY.counter("library_index_key_hits_total",
+                                   "Number of searches answered by the normalized or phonetic keys of the item names")
+SEARCH_STALE = REGISTRY.counter("library_index_stale_total",
+                                "Number of searches of users without a current library index")
+INDEXED_ITEMS = REGISTRY.gauge("library_index_items",
+                               "Number of items in the library index")
+
+
+class NameForms(NamedTuple):
+    """
+    Normalized forms of an item name, which are computed once when the item is added to the index.
+    """
+
+    words: FrozenSet[str]
+    normalized_key: str
+    phonetic_key: str
+    # None if the trigrams were not computed yet
+    trigrams: Optional[Trigrams]
+
+    @classmethod
+    def of(cls, name: str) -> "NameForms":
+        return cls(frozenset(tokenize(name)), normalized_key(name), phonetic_key(name), trigrams(name))
+
+
+class IndexContents(NamedTuple):
+    """
+    Copy of the contents of a library index, the items are numbered consecutively.
+    """
+
+    # items and the normalized forms of their names
+    items: List[Tuple[dict, NameForms]]
+    # sorted numbers of the visible items by user
+    user_items: Dict[str, List[int]]
+    # wall clock time of the last completed sync by user
+    synced_at: Dict[str, float]
+
+
+class IndexView(ABC):
+    """
+    Read access to the items of an index for the search, the items are addressed by slot numbers.
+    """
+
+    @abstractmethod
+    def _visible_slots_of(self, user_id: str) -> Optional[Container[int]]:
+        pass
+
+    @abstractmethod
+    def _key_slots(self, kind: str, key: str) -> Set[int]:
+        pass
+
+    @abstractmethod
+    def _prefix_slots(self, prefix: str) -> Set[int]:
+        pass
+
+    @abstractmethod
+    def _item_type(self, slot: int) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def _is_folder(self, slot: int) -> bool:
+        pass
+
+    @abstractmethod
+    def _name_trigrams(self, slot: int) -> Trigrams:
+        pass
+
+    @abstractmethod
+    def _entry(self, slot: int) -> dict:
+        """
+        :param slot: slot of the item
+        :return: copy of the item, which the caller can modify
+        """
+
+        pass
+
+
+class BaseLibraryIndex(ABC):
+    """
+    Search of the items in the Jellyfin libraries of the linked users, the subclasses store the items.
+    """
+
+    def __init__(self,
+                 max_age: float = DEFAULT_LIBRARY_INDEX_MAX_AGE,
+                 scoring_time_budget: float = DEFAULT_SCORING_TIME_BUDGET):
+        """
+        :param max_age: time in seconds after which the index of a user is stale and has to be synced again
+                        (default: 3600)
+        :param scoring_time_budget: maximum time in seconds for ranking the found items of a search (default: 0.01)
+        """
+
+        self.max_age = max_age
+        self.scoring_time_budget = scoring_time_budget
+
+    @abstractmethod
+    def _view(self):
+        """
+        :return: context manager of the view on the items, which stays consistent until the context is left
+        """
+
+        pass
+
+    @abstractmethod
+    def item_count(self, user_id: str) -> int:
+        """
+        :param user_id: Jellyfin user id
+        :return: the number of items of the user
+        """
+
+        pass
+
+    @abstractmethod
+    def synced_at(self, user_id: str) -> Optional[float]:
+        """
+        :param user_id: Jellyfin user id
+        :return: wall clock time of the last completed sync of the user or None if the user was never synced
+        """
+
+        pass
+
+    def is_fresh(self, user_id: str) -> bool:
+        """
+        :param user_id: Jellyfin user id
+        :return: True if the user was synced within the maximum age, otherwise False
+        """
+
+        synced_at = self.synced_at(user_id)
+        return synced_at is not None and time.time() - synced_at <= self.max_age
+
+    @staticmethod
+    def _word_slots(view: IndexView, words: Sequence[str]) -> Set[int]:
+        slots = None
+        # start with the longest word, which usually matches the fewest items
+        for word in sorted(words, key=len, reverse=True):
+            word_slots = view._prefix_slots(word)
+            slots = word_slots if slots is None else slots & word_slots
+            if not slots:
+                break
+
+        return slots or set()
+
+    @staticmethod
+    def _filter_slots(view: IndexView,
+                      slots: Iterable[int],
+                      visible_slots: Container[int],
+                      item_types: Set[str],
+                      is_folder: Optional[bool]) -> List[int]:
+        return [slot for slot in slots
+                if slot in visible_slots
+                and view._item_type(slot) in item_types
+                and (is_folder is None or view._is_folder(slot) == is_folder)]
+
+    def search(self,
+               user_id: str,
+               term: str,
+               item_types: Iterable[str],
+               limit: Optional[int] = None,
+               is_folder: Optional[bool] = None) -> Optional[List[dict]]:
+        """
+        Search the items of a user. Items whose names have the same normalized key as the search term, e.g. "AC/DC" for
+        "AC DC", are returned without other items. Otherwise, the items whose names contain words starting with each
+        word of the search term are returned, or if there are none, the items whose names sound like the search term.
+
+        :param user_id: Jellyfin user id
+        :param term: search term
+        :param item_types: Jellyfin types of the searched items
+        :param limit: maximum number of results (default: None = all results)
+        :param is_folder: only search folders if True or only other items if False (default: None = all items)
+        :return: the found items sorted by the trigram similarity of their names to the search term, or None if the
+                 index of the user is stale
+        """
+
+        if not self.is_fresh(user_id):
+            SEARCH_STALE.inc()
+            return None
+
+        words = tokenize(term)
+        item_types = set(item_types)
+
+        with self._view() as view:
+            visible_slots = view._visible_slots_of(user_id)
+            if visible_slots is None or not words:
+                SEARCH_MISSES.inc()
+                return []
+
+            # a name with the same spelling independent key is the searched item, only if there is none all items
+            # whose names contain the words are searched and at last the items whose names sound like the term
+            slots = self._filter_slots(view,
+                                       view._key_slots(NORMALIZED_KEY, normalized_key(term)),
+                                       visible_slots,
+                                       item_types,
+                                       is_folder)
+            if slots:
+                SEARCH_KEY_HITS.inc()
+            else:
+                slots = self._filter_slots(view, self._word_slots(view, words), visible_slots, item_types, is_folder)
+            if not slots:
+                slots = self._filter_slots(view,
+                                           view._key_slots(PHONETIC_KEY, phonetic_key(term)),
+                                           visible_slots,
+                                           item_types,
+                                           is_folder)
+                if slots:
+                    SEARCH_KEY_HITS.inc()
+
+            if not slots:
+                SEARCH_MISSES.inc()
+                return []
+            SEARCH_HITS.inc()
+
+            scores = top_k(trigrams(term),
+                           [view._name_trigrams(slot) for slot in slots],
+                           limit,
+                           self.scoring_time_budget)
+
+            return [view._entry(slots[i]) for i, _ in scores]
+
+
+class LibraryIndex(BaseLibraryIndex, IndexView):
+    """
+    Search index of the items in the Jellyfin libraries of the linked users.
+
+    The items are stored once in a catalog and the words of their names are indexed. Each user has the set of items,
+    which the user can see in Jellyfin, such that a search only returns items of the user's libraries. The items of a
+    user are updated by the library sync, the index of a user is stale when the last completed sync is older than the
+    maximum age.
+    """
+
+    def __init__(self,
+                 max_age: float = DEFAULT_LIBRARY_INDEX_MAX_AGE,
+                 scoring_time_budget: float = DEFAULT_SCORING_TIME_BUDGET):
+        """
+        :param max_age: time in seconds after which the index of a user is stale and has to be synced again
+                        (default: 3600)
+        :param scoring_time_budget: maximum time in seconds for ranking the found items of a search (default: 0.01)
+        """
+
+        super().__init__(max_age, scoring_time_budget)
+
+        self._catalog = Catalog()
+        # slots of the items by the words in their names
+        self._postings: Dict[str, Set[int]] = {}
+        # sorted words of the postings for the prefix search, None when the words changed
+        self._words: Optional[List[str]] = None
+        # normalized forms of the item names by slot, the trigrams are used for the ranking of the found items
+        self._name_forms: Dict[int, NameForms] = {}
+        # slots of the items by the kind and the value of the keys of their names, which match spoken names regardless
+        # of the spelling
+        self._keys: Dict[str, Dict[str, Set[int]]] = {NORMALIZED_KEY: {}, PHONETIC_KEY: {}}
+        self._visible_slots: Dict[str, Set[int]] = {}
+        self._synced_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _add_key(keys: Dict[str, Set[int]], key: str, slot: int) -> None:
+        if key:
+            keys.setdefault(key, set()).add(slot)
+
+    @staticmethod
+    def _remove_key(keys: Dict[str, Set[int]], key: str, slot: int) -> None:
+        slots = keys.get(key)
+        if slots is not None:
+            slots.discard(slot)
+            if not slots:
+                del keys[key]
+
+    def _index_name(self, slot: int, forms: NameForms) -> None:
+        self._name_forms[slot] = forms
+
+        for word in forms.words:
+            slots = self._postings.get(word)
+            if slots is None:
+                self._postings[word] = {slot}
+                self._words = None
+            else:
+                slots.add(slot)
+
+        self._add_key(self._keys[NORMALIZED_KEY], forms.normalized_key, slot)
+        self._add_key(self._keys[PHONETIC_KEY], forms.phonetic_key, slot)
+
+    def _unindex_name(self, slot: int) -> None:
+        forms = self._name_forms.pop(slot)
+
+        for word in forms.words:
+            slots = self._postings.get(word)
+            if slots is None:
+                continue
+            slots.discard(slot)
+            if not slots:
+                del self._postings[word]
+                self._words = None
+
+        self._remove_key(self._keys[NORMALIZED_KEY], forms.normalized_key, slot)
+        self._remove_key(self._keys[PHONETIC_KEY], forms.phonetic_key, slot)
+
+    def _add_item(self, item: dict) -> int:
+        slot, previous_entry = self._catalog.add(item)
+
+        name = item.get("Name") or ""
+        if previous_entry is None:
+            self._index_name(slot, NameForms.of(name))
+        elif (previous_entry.get("Name") or "") != name:
+            self._unindex_name(slot)
+            self._index_name(slot, NameForms.of(name))
+
+        return slot
+
+    def _remove_item(self, slot: int) -> None:
+        self._catalog.remove(slot)
+        self._unindex_name(slot)
+
+    @contextmanager
+    def _view(self) -> Iterator[IndexView]:
+        with self._lock:
+            yield self
+
+    def _visible_slots_of(self, user_id: str) -> Optional[Container[int]]:
+        return self._visible_slots.get(user_id)
+
+    def _key_slots(self, kind: str, key: str) -> Set[int]:
+        return self._keys[kind].get(key, set())
+
+    def _prefix_slots(self, prefix: str) -> Set[int]:
+        if self._words is None:
+            self._words = sorted(self._postings)
+
+        slots = set()
+        i = bisect.bisect_left(self._words, prefix)
+        while i < len(self._words) and self._words[i].startswith(prefix):
+            slots |= self._postings[self._words[i]]
+            i += 1
+
+        return slots
+
+    def _item_type(self, slot: int) -> Optional[str]:
+        return self._catalog.get(slot).get("Type")
+
+    def _is_folder(self, slot: int) -> bool:
+        return self._catalog.get(slot).get("IsFolder", False)
+
+    def _name_trigrams(self, slot: int) -> Trigrams:
+        forms = self._name_forms[slot]
+        if forms.trigrams is None:
+            forms = forms._replace(trigrams=trigrams(self._catalog.get(slot).get("Name") or ""))
+            self._name_forms[slot] = forms
+
+        return forms.trigrams
+
+    def _entry(self, slot: int) -> dict:
+        # the entries are shared, hand out copies which the caller can modify
+        return dict(self._catalog.get(slot))
+
+    def add_items(self, user_id: str, items: Iterable[dict]) -> int:
+        """
+        Add items to the items of a user or replace the items with the same ids.
+
+        :param user_id: Jellyfin user id
+        :param items: items of the user's libraries as returned by the Jellyfin API
+        :return: the number of added or replaced items
+        """
+
+        with self._lock:
+            slots = set(self._add_item(item) for item in items)
+            self._visible_slots.setdefault(user_id, set()).update(slots)
+
+            INDEXED_ITEMS.set(len(self._catalog))
+
+        return len(slots)
+
+    def retain_items(self, user_id: str, item_ids: Set[str]) -> int:
+        """
+        Remove all items of a user except the specified items. Items which are no longer visible to any user are removed
+        from the catalog.
+
+        :param user_id: Jellyfin user id
+        :param item_ids: ids of the items which the user can still see
+        :return: the number of removed items
+        """
+
+        with self._lock:
+            visible_slots = self._visible_slots.get(user_id, set())
+            removed_slots = set(slot for slot in visible_slots if self._catalog.get(slot)["Id"] not in item_ids)
+            visible_slots -= removed_slots
+
+            for slot in removed_slots:
+                if not any(slot in slots for slots in self._visible_slots.values()):
+                    self._remove_item(slot)
+
+            INDEXED_ITEMS.set(len(self._catalog))
+
+        return len(removed_slots)
+
+    def mark_synced(self, user_id: str) -> None:
+        """
+        Mark the items of a user as complete and current, such that searches of the user use the index.
+
+        :param user_id: Jellyfin user id
+        """
+
+        with self._lock:
+            self._visible_slots.setdefault(user_id, set())
+            self._synced_at[user_id] = time.time()
+
+    def update_user(self, user_id: str, items: Iterable[dict]) -> int:
+        """
+        Replace the items of a user with all items of the user's libraries.
+
+        :param user_id: Jellyfin user id
+        :param items: all items of the user's libraries as returned by the Jellyfin API
+        :return: the number of items of the user
+        """
+
+        items = list(items)
+
+        with self._lock:
+            self.add_items(user_id, items)
+            self.retain_items(user_id, set(item["Id"] for item in items))
+            self.mark_synced(user_id)
+
+            return self.item_count(user_id)
+
+    def remove_user(self, user_id: str) -> None:
+        """
+        Remove all items of a user from the index.
+
+        :param user_id: Jellyfin user id
+        """
+
+        with self._lock:
+            self.retain_items(user_id, set())
+            self._visible_slots.pop(user_id, None)
+            self._synced_at.pop(user_id, None)
+
+    def restore(self, contents: IndexContents) -> None:
+        """
+        Replace all items and users of the index, e.g. with the contents of a snapshot. The normalized forms of the
+        names are taken from the contents instead of computing them again.
+
+        :param contents: the contents of an index
+        """
+
+        with self._lock:
+            self._catalog = Catalog()
+            self._postings = {}
+            self._words = None
+            self._name_forms = {}
+            self._keys = {NORMALIZED_KEY: {}, PHONETIC_KEY: {}}
+
+            slots = []
+            for entry, forms in contents.items:
+                slot, _ = self._catalog.add(entry)
+                self._index_name(slot, forms)
+                slots.append(slot)
+
+            self._visible_slots = {user_id: set(slots[number] for number in numbers)
+                                   for user_id, numbers in contents.user_items.items()}
+            self._synced_at = dict(contents.synced_at)
+
+            INDEXED_ITEMS.set(len(self._catalog))
+
+    def item_count(self, user_id: str) -> int:
+        with self._lock:
+            return len(self._visible_slots.get(user_id, ()))
+
+    def synced_at(self, user_id: str) -> Optional[float]:
+        return self._synced_at.get(user_id)
+
+    def contents(self) -> IndexContents:
+        """
+        :return: a copy of the contents of the index, e.g. to write it to a snapshot
+        """
+
+        with self._lock:
+            numbers = {}
+            items = []
+            for slot, entry in self._catalog.items():
+                numbers[slot] = len(items)
+                items.append((entry, self._name_forms[slot]))
+
+            user_items = {user_id: sorted(numbers[slot] for slot in slots)
+                          for user_id, slots in self._visible_slots.items()}
+
+            return IndexContents(items, user_items, dict(self._synced_at))
+
+    def __len__(self) -> int:
+        return len(self._catalog)
@@ -0,0 +1,87 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Tuple
+
+# number of cached normalized texts, the names of the search results repeat often
+NORMALIZE_CACHE_SIZE = 8192
+
+# separators of ascii texts, which have no combining marks
+_ASCII_SEPARATOR_REGEX = re.compile(r"[\W_]+", re.ASCII)
+# accents of the latin, greek and cyrillic letters, other scripts use combining marks for vowels
+_LATIN_DIACRITICS_REGEX = re.compile("[\u0300-\u036f]")
+# harakat, quranic marks, superscript alef and tatweel
+_ARABIC_DIACRITICS_REGEX = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+# letter variants, which are written inconsistently
+_ARABIC_LETTER_VARIANTS = str.maketrans({"\u0623": "\u0627", "\u0625": "\u0627", "\u0622": "\u0627",
+                                         "\u0671": "\u0627", "\u0649": "\u064a", "\u0629": "\u0647",
+                                         "\u0624": "\u0648", "\u0626": "\u064a"})
+_DEVANAGARI_NUKTA = "\u093c"
+_KATAKANA_TO_HIRAGANA = {c: c - 0x60 for c in range(0x30a1, 0x30f7)}
+# runs of kana and han characters, which are written without spaces between the words
+_UNSEGMENTED_REGEX = re.compile("([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)")
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize(text: str) -> str:
+    """
+    Normalize a text for the comparison with other texts. The steps only change the characters of their script, so the
+    normalized text is the same for all locales:
+
+    - NFKC, which folds full-width and half-width variants, e.g. full-width latin letters and half-width katakana
+    - case folding
+    - removal of the accents of latin, greek and cyrillic letters
+    - katakana to hiragana
+    - removal of the arabic diacritics and tatweel, unification of the alef, yeh, teh marbuta and hamza variants
+    - removal of the devanagari nukta
+    - a single space instead of punctuation, symbols and whitespace
+
+    :param text: the text
+    :return: the normalized text
+    """
+
+    if text.isascii():
+        # the other steps do not change ascii texts
+        return _ASCII_SEPARATOR_REGEX.sub(" ", text.lower()).strip()
+
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = unicodedata.normalize("NFC", _LATIN_DIACRITICS_REGEX.sub("", unicodedata.normalize("NFD", text)))
+    text = text.translate(_KATAKANA_TO_HIRAGANA)
+    text = _ARABIC_DIACRITICS_REGEX.sub("", text).translate(_ARABIC_LETTER_VARIANTS)
+    text = text.replace(_DEVANAGARI_NUKTA, "")
+
+    # combining marks are part of the words, e.g. the vowel signs of devanagari
+    text = "".join(" " if c == "_" or unicodedata.category(c)[0] in "PSZC" else c for c in text)
+
+    return " ".join(text.split())
+
+
+def _split_unsegmented(word: str) -> Tuple[str, ...]:
+    tokens = []
+    for i, part in enumerate(_UNSEGMENTED_REGEX.split(word)):
+        if not part:
+            continue
+        if i % 2 == 0 or len(part) == 1:
+            tokens.append(part)
+        else:
+            # bigrams of the characters, such that words in the run can be found without a dictionary
+            tokens.extend(part[j:j + 2] for j in range(len(part) - 1))
+
+    return tuple(tokens)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def tokenize(text: str) -> Tuple[str, ...]:
+    """
+    :param text: the text
+    :return: the normalized words of the text, runs of kana and han characters are split into bigrams
+    """
+
+    tokens = []
+    for word in normalize(text).split():
+        if _UNSEGMENTED_REGEX.search(word):
+            tokens.extend(_split_unsegmented(word))
+        else:
+            tokens.append(word)
+
+    return tuple(tokens)
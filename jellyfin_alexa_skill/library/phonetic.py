@@ -0,0 +1,168 @@
+from functools import lru_cache
+from typing import List
+
+from jellyfin_alexa_skill.library.normalize import NORMALIZE_CACHE_SIZE, tokenize
+
+VOWELS = frozenset("aeiou")
+FRONT_VOWELS = frozenset("eiy")
+
+_UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+    "seventeen": 17, "eighteen": 18, "nineteen": 19
+}
+_TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90
+}
+# words which are written differently by the speech recognition, e.g. "rock n roll"
+_WORD_REPLACEMENTS = {"n": "and"}
+
+
+def _replace_number_words(words: List[str]) -> List[str]:
+    """
+    Replace the number words with digits, e.g. ["twenty", "one", "pilots"] with ["21", "pilots"].
+
+    :param words: the normalized words
+    :return: the words with digits instead of number words
+    """
+
+    replaced_words = []
+    i = 0
+    while i < len(words):
+        word = words[i]
+        if word in _TENS:
+            number = _TENS[word]
+            if i + 1 < len(words) and 0 < _UNITS.get(words[i + 1], 0) < 10:
+                number += _UNITS[words[i + 1]]
+                i += 1
+            replaced_words.append(str(number))
+        elif word in _UNITS:
+            replaced_words.append(str(_UNITS[word]))
+        else:
+            replaced_words.append(word)
+        i += 1
+
+    return replaced_words
+
+
+def _key_words(text: str) -> List[str]:
+    # the speech recognition writes "&" as a word
+    words = tokenize(text.replace("&", " and "))
+    return _replace_number_words([_WORD_REPLACEMENTS.get(word, word) for word in words])
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalized_key(text: str) -> str:
+    """
+    Key of a text, which is equal for texts whose differences do not change the pronunciation, e.g. "AC/DC" and "AC DC",
+    "Sigur Rós" and "Sigur Ros" or "Maroon 5" and "Maroon five".
+
+    :param text: the text
+    :return: the key, an empty string if the text has no words
+    """
+
+    return "".join(_key_words(text))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _metaphone_word(word: str) -> str:
+    """
+    Simplified Metaphone code of a single word.
+
+    :param word: the normalized word
+    :return: the code of the word, digits are kept
+    """
+
+    if not word.isalpha():
+        return word
+
+    # initial letters which are not pronounced
+    if word[:2] in ("kn", "gn", "pn", "ae", "wr"):
+        word = word[1:]
+    elif word[0] == "x":
+        word = "s" + word[1:]
+    elif word[:2] == "wh":
+        word = "w" + word[2:]
+
+    code = []
+    length = len(word)
+    for i, c in enumerate(word):
+        previous_c = word[i - 1] if i > 0 else ""
+        next_c = word[i + 1] if i + 1 < length else ""
+        after_next_c = word[i + 2] if i + 2 < length else ""
+
+        if c == previous_c and c != "c":
+            continue
+
+        if c in VOWELS:
+            if i == 0:
+                code.append(c.upper())
+        elif c == "b":
+            if not (previous_c == "m" and i == length - 1):
+                code.append("B")
+        elif c == "c":
+            if next_c == "i" and after_next_c == "a" or next_c == "h":
+                code.append("X" if previous_c != "s" else "K")
+            elif next_c in FRONT_VOWELS:
+                if previous_c != "s":
+                    code.append("S")
+            else:
+                code.append("K")
+        elif c == "d":
+            code.append("J" if next_c == "g" and after_next_c in FRONT_VOWELS else "T")
+        elif c == "g":
+            if next_c == "h" and after_next_c not in VOWELS:
+                continue
+            if next_c == "n" and (i + 2 == length or word[i + 2:] == "ed"):
+                continue
+            if previous_c == "d" and next_c in FRONT_VOWELS:
+                continue
+            code.append("J" if next_c in FRONT_VOWELS else "K")
+        elif c == "h":
+            if next_c in VOWELS and previous_c not in "csptg":
+                code.append("H")
+        elif c == "k":
+            if previous_c != "c":
+                code.append("K")
+        elif c == "p":
+            code.append("F" if next_c == "h" else "P")
+        elif c == "q":
+            code.append("K")
+        elif c == "s":
+            if next_c == "h" or next_c == "i" and after_next_c in ("o", "a"):
+                code.append("X")
+            else:
+                code.append("S")
+        elif c == "t":
+            if next_c == "i" and after_next_c in ("o", "a"):
+                code.append("X")
+            elif next_c == "h":
+                code.append("0")
+            elif not (next_c == "c" and after_next_c == "h"):
+                code.append("T")
+        elif c == "v":
+            code.append("F")
+        elif c in "wy":
+            if next_c in VOWELS:
+                code.append(c.upper())
+        elif c == "x":
+            code.append("KS")
+        elif c == "z":
+            code.append("S")
+        else:
+            # f, j, l, m, n, r and letters of other scripts
+            code.append(c.upper())
+
+    return "".join(code)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def phonetic_key(text: str) -> str:
+    """
+    Metaphone-style key of a text, which is equal for texts which sound similar, e.g. "Beyonce" and "Beyonsay".
+
+    :param text: the text
+    :return: the key, an empty string if the text has no words
+    """
+
+    return "".join(_metaphone_word(word) for word in _key_words(text))
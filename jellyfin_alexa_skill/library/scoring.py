@@ -0,0 +1,80 @@
+import heapq
+import time
+from operator import itemgetter
+from typing import FrozenSet, List, Optional, Sequence, Tuple
+
+from jellyfin_alexa_skill.config import DEFAULT_SCORING_TIME_BUDGET
+from jellyfin_alexa_skill.library.normalize import normalize
+
+# number of candidates which are scored between two checks of the time budget
+BUDGET_CHECK_INTERVAL = 256
+
+Trigrams = FrozenSet[str]
+
+
+def trigrams(text: str) -> Trigrams:
+    """
+    :param text: the text
+    :return: the trigrams of the normalized text, the text is padded such that the beginning of the text and short
+             words have trigrams too
+    """
+
+    normalized_text = normalize(text)
+    if not normalized_text:
+        return frozenset()
+
+    padded_text = f"  {normalized_text} "
+    return frozenset(padded_text[i:i + 3] for i in range(len(padded_text) - 2))
+
+
+def top_k(query: Trigrams,
+          candidates: Sequence[Trigrams],
+          k: Optional[int] = None,
+          time_budget: float = DEFAULT_SCORING_TIME_BUDGET) -> List[Tuple[int, float]]:
+    """
+    Score the candidates by the Dice coefficient of their trigrams and the trigrams of the query and select the best
+    candidates. Candidates which could not be scored within the time budget are skipped.
+
+    :param query: trigrams of the query
+    :param candidates: trigrams of the candidates
+    :param k: maximum number of returned candidates (default: None = all scored candidates)
+    :param time_budget: maximum time in seconds for the scoring (default: 0.01)
+    :return: list of tuples of type (index of the candidate, score) sorted by descending score, candidates with equal
+             scores are kept in their order
+    """
+
+    if not query:
+        scores = [(index, 0.0) for index in range(len(candidates))]
+    else:
+        query_size = len(query)
+        deadline = time.perf_counter() + time_budget
+
+        scores = []
+        for start in range(0, len(candidates), BUDGET_CHECK_INTERVAL):
+            scores.extend((index, 2 * len(query & candidate) / (query_size + len(candidate)))
+                          for index, candidate in enumerate(candidates[start:start + BUDGET_CHECK_INTERVAL], start))
+            if time.perf_counter() > deadline:
+                break
+
+    if k is None:
+        return sorted(scores, key=itemgetter(1), reverse=True)
+
+    # partial selection instead of sorting all scores
+    return heapq.nlargest(k, scores, key=itemgetter(1))
+
+
+def score_names(query: str,
+                names: Sequence[str],
+                k: Optional[int] = None,
+                time_budget: float = DEFAULT_SCORING_TIME_BUDGET) -> List[Tuple[int, float]]:
+    """
+    Score names, whose trigrams are not precomputed, see top_k.
+
+    :param query: the query
+    :param names: the candidate names
+    :param k: maximum number of returned names (default: None = all scored names)
+    :param time_budget: maximum time in seconds for the scoring (default: 0.01)
+    :return: list of tuples of type (index of the name, score) sorted by descending score
+    """
+
+    return top_k(trigrams(query), [trigrams(name) for name in names], k, time_budget)
@@ -0,0 +1,494 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Container, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from jellyfin_alexa_skill.config import DEFAULT_LIBRARY_INDEX_MAX_AGE, DEFAULT_SCORING_TIME_BUDGET
+from jellyfin_alexa_skill.library.index import BaseLibraryIndex, IndexContents, IndexView, LibraryIndex, NameForms, \
+    NORMALIZED_KEY, PHONETIC_KEY
+from jellyfin_alexa_skill.library.scoring import Trigrams, trigrams
+from jellyfin_alexa_skill.metrics import REGISTRY
+
+MAGIC = b"JFASKIDX"
+# version of the layout of the sections, snapshots of other versions are ignored and the index is synced again
+FORMAT_VERSION = 1
+
+# magic, format version, byte order, generation, creation time and number of sections
+_HEADER = struct.Struct("<8sIIQdI4x")
+# offset and length of a section
+_SECTION = struct.Struct("<QQ")
+_ALIGNMENT = 8
+# the offset and slot arrays are written in the byte order of the machine
+_BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+
+SNAPSHOT_GENERATION = REGISTRY.gauge("library_snapshot_generation",
+                                     "Generation of the library index snapshot used by the searches of this process")
+SNAPSHOT_BYTES = REGISTRY.gauge("library_snapshot_bytes",
+                                "Size of the last written library index snapshot")
+SNAPSHOT_WRITE_LATENCY = REGISTRY.histogram("library_snapshot_write_seconds",
+                                            "Time to write a library index snapshot",
+                                            buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+SNAPSHOT_LOADS = REGISTRY.counter("library_snapshot_loads_total",
+                                  "Number of library index snapshots mapped by this process")
+SNAPSHOT_ERRORS = REGISTRY.counter("library_snapshot_errors_total",
+                                   "Number of library index snapshots which could not be mapped")
+
+
+def _string_table(strings: Iterable[bytes]) -> List[bytes]:
+    offsets = array("Q", [0])
+    data = bytearray()
+    for string in strings:
+        data += string
+        offsets.append(len(data))
+
+    return [offsets.tobytes(), bytes(data)]
+
+
+def _key_table(keys: Dict[str, Iterable[int]]) -> List[bytes]:
+    # the utf-8 encoded keys have the same order as the keys, the prefix search uses the byte order
+    encoded_keys = sorted((key.encode(), slots) for key, slots in keys.items())
+
+    posting_offsets = array("Q", [0])
+    postings = array("I")
+    for _, slots in encoded_keys:
+        postings.extend(sorted(slots))
+        posting_offsets.append(len(postings))
+
+    return _string_table(key for key, _ in encoded_keys) + [posting_offsets.tobytes(), postings.tobytes()]
+
+
+def encode_snapshot(library_index: LibraryIndex,
+                    generation: int,
+                    high_water_marks: Optional[Dict[str, str]] = None) -> bytes:
+    """
+    Encode the contents of a library index into a snapshot.
+
+    The snapshot consists of a header, a directory of the sections and the sections. The items are stored as json
+    and their names, types and folder flags are stored separately, such that a search only decodes the found items.
+    The words and keys of the names and the users are stored in sorted key tables, which are searched with binary
+    search, with the slot numbers of their items.
+
+    :param library_index: the library index
+    :param generation: generation of the snapshot
+    :param high_water_marks: MinDateLastSaved of the next delta sync by user (default: None = no delta syncs)
+    :return: the encoded snapshot
+    """
+
+    contents = library_index.contents()
+
+    words: Dict[str, List[int]] = {}
+    keys: Dict[str, Dict[str, List[int]]] = {NORMALIZED_KEY: {}, PHONETIC_KEY: {}}
+    item_types: Dict[Optional[str], int] = {}
+    item_info = array("H")
+    for slot, (entry, forms) in enumerate(contents.items):
+        for word in forms.words:
+            words.setdefault(word, []).append(slot)
+        if forms.normalized_key:
+            keys[NORMALIZED_KEY].setdefault(forms.normalized_key, []).append(slot)
+        if forms.phonetic_key:
+            keys[PHONETIC_KEY].setdefault(forms.phonetic_key, []).append(slot)
+
+        type_number = item_types.setdefault(entry.get("Type"), len(item_types))
+        item_info.append(type_number << 1 | bool(entry.get("IsFolder", False)))
+
+    meta = {
+        "item_types": list(item_types),
+        "synced_at": contents.synced_at,
+        "high_water_marks": high_water_marks or {}
+    }
+
+    sections = [json.dumps(meta).encode()]
+    sections += _string_table(json.dumps(entry, separators=(",", ":")).encode() for entry, _ in contents.items)
+    sections += _string_table((entry.get("Name") or "").encode() for entry, _ in contents.items)
+    sections.append(item_info.tobytes())
+    sections += _key_table(words)
+    sections += _key_table(keys[NORMALIZED_KEY])
+    sections += _key_table(keys[PHONETIC_KEY])
+    sections += _key_table(contents.user_items)
+
+    header_size = _HEADER.size + len(sections) * _SECTION.size
+    offset = header_size + -header_size % _ALIGNMENT
+
+    directory = []
+    for section in sections:
+        directory.append(_SECTION.pack(offset, len(section)))
+        offset += len(section) + -len(section) % _ALIGNMENT
+
+    data = bytearray(_HEADER.pack(MAGIC, FORMAT_VERSION, _BYTE_ORDER, generation, time.time(), len(sections)))
+    data += b"".join(directory)
+    for section in sections:
+        data += bytes(-len(data) % _ALIGNMENT)
+        data += section
+
+    return bytes(data)
+
+
+def read_generation(path: str) -> int:
+    """
+    :param path: path of the snapshot
+    :return: the generation of the snapshot or 0 if there is no valid snapshot
+    """
+
+    try:
+        with open(path, "rb") as file:
+            magic, version, _, generation, _, _ = _HEADER.unpack(file.read(_HEADER.size))
+    except (OSError, struct.error):
+        return 0
+
+    return generation if magic == MAGIC else 0
+
+
+def _fsync_directory(path: str) -> None:
+    # persist the rename of the snapshot, not supported on windows
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_snapshot(library_index: LibraryIndex, path: str, high_water_marks: Optional[Dict[str, str]] = None) -> int:
+    """
+    Write a snapshot of a library index. The snapshot is written to a temporary file, which replaces the previous
+    snapshot atomically, such that the readers either map the previous or the new snapshot.
+
+    :param library_index: the library index
+    :param path: path of the snapshot
+    :param high_water_marks: MinDateLastSaved of the next delta sync by user (default: None = no delta syncs)
+    :return: the generation of the written snapshot
+    """
+
+    start = time.perf_counter()
+
+    generation = read_generation(path) + 1
+    data = encode_snapshot(library_index, generation, high_water_marks)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+        _fsync_directory(path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    SNAPSHOT_BYTES.set(len(data))
+    SNAPSHOT_WRITE_LATENCY.observe(time.perf_counter() - start)
+
+    return generation
+
+
+class _StringTable:
+    """
+    Strings of a snapshot section, which are decoded on access.
+    """
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self._offsets = offsets.cast("Q")
+        self._data = data
+
+    def __getitem__(self, i: int) -> bytes:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return bytes(self._data[self._offsets[i]:self._offsets[i + 1]])
+
+    def __iter__(self) -> Iterator[bytes]:
+        # one copy of the section instead of a copy of each string
+        data = self._data.tobytes()
+        offsets = self._offsets.tolist()
+        return (data[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+
+class _SortedSlots:
+    """
+    Sorted slot numbers of a snapshot section, the membership is checked with binary search.
+    """
+
+    def __init__(self, slots: memoryview):
+        self._slots = slots
+
+    def __contains__(self, slot: int) -> bool:
+        i = bisect_left(self._slots, slot)
+        return i < len(self._slots) and self._slots[i] == slot
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._slots)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+class _KeyTable:
+    """
+    Sorted keys of a snapshot section with the slot numbers of their items.
+    """
+
+    def __init__(self, keys: _StringTable, posting_offsets: memoryview, postings: memoryview):
+        self._keys = keys
+        self._posting_offsets = posting_offsets.cast("Q")
+        self._postings = postings.cast("I")
+
+    def _postings_of(self, i: int) -> _SortedSlots:
+        return _SortedSlots(self._postings[self._posting_offsets[i]:self._posting_offsets[i + 1]])
+
+    def get(self, key: str) -> Optional[_SortedSlots]:
+        """
+        :param key: the key
+        :return: the slots of the key or None if the key is not in the table
+        """
+
+        encoded_key = key.encode()
+        i = bisect_left(self._keys, encoded_key)
+        if i < len(self._keys) and self._keys[i] == encoded_key:
+            return self._postings_of(i)
+        return None
+
+    def items(self) -> Iterator[Tuple[str, _SortedSlots]]:
+        """
+        :return: iterator of tuples of type (key, slots) of all keys
+        """
+
+        return ((key.decode(), self._postings_of(i)) for i, key in enumerate(self._keys))
+
+    def prefix_slots(self, prefix: str) -> Set[int]:
+        """
+        :param prefix: prefix of the keys
+        :return: the slots of all keys which start with the prefix
+        """
+
+        encoded_prefix = prefix.encode()
+        slots = set()
+        i = bisect_left(self._keys, encoded_prefix)
+        while i < len(self._keys) and self._keys[i].startswith(encoded_prefix):
+            slots.update(self._postings_of(i))
+            i += 1
+
+        return slots
+
+
+class Snapshot(IndexView):
+    """
+    Read-only memory-mapped snapshot of a library index. The sections are only decoded on access, so the pages of the
+    file are shared by all processes which map the snapshot.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path of the snapshot
+        :raises: ValueError if the file is not a valid snapshot, OSError if the file can not be read
+        """
+
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            if stat.st_size < _HEADER.size:
+                raise ValueError(f"Invalid library index snapshot {path}: file is too short")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # identifies the file, a new snapshot replaces the file with another one
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        buffer = memoryview(self._mmap)
+        magic, version, byte_order, self.generation, self.created_at, section_count = _HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"Invalid library index snapshot {path}: unknown file type")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Invalid library index snapshot {path}: unsupported version {version}")
+        if byte_order != _BYTE_ORDER:
+            raise ValueError(f"Invalid library index snapshot {path}: written with another byte order")
+
+        sections = []
+        for i in range(section_count):
+            offset, length = _SECTION.unpack_from(buffer, _HEADER.size + i * _SECTION.size)
+            if offset + length > len(buffer):
+                raise ValueError(f"Invalid library index snapshot {path}: truncated file")
+            sections.append(buffer[offset:offset + length])
+
+        meta = json.loads(bytes(sections[0]))
+        self._item_types: List[Optional[str]] = meta["item_types"]
+        self._synced_at: Dict[str, float] = meta["synced_at"]
+        self.high_water_marks: Dict[str, str] = meta["high_water_marks"]
+
+        self._entries = _StringTable(sections[1], sections[2])
+        self._names = _StringTable(sections[3], sections[4])
+        self._item_info = sections[5].cast("H")
+        self._words = _KeyTable(_StringTable(sections[6], sections[7]), sections[8], sections[9])
+        self._keys = {
+            NORMALIZED_KEY: _KeyTable(_StringTable(sections[10], sections[11]), sections[12], sections[13]),
+            PHONETIC_KEY: _KeyTable(_StringTable(sections[14], sections[15]), sections[16], sections[17])
+        }
+        self._users = _KeyTable(_StringTable(sections[18], sections[19]), sections[20], sections[21])
+
+    def synced_at(self, user_id: str) -> Optional[float]:
+        """
+        :param user_id: Jellyfin user id
+        :return: wall clock time of the last completed sync of the user or None if the user was never synced
+        """
+
+        return self._synced_at.get(user_id)
+
+    def item_count(self, user_id: str) -> int:
+        """
+        :param user_id: Jellyfin user id
+        :return: the number of items of the user
+        """
+
+        slots = self._users.get(user_id)
+        return 0 if slots is None else len(slots)
+
+    def contents(self) -> IndexContents:
+        """
+        Decode all items of the snapshot, e.g. to restore the library index of the sync. The words and keys of the names
+        are taken from the key tables, the trigrams are computed by the index when they are needed.
+
+        :return: the contents of the snapshot
+        """
+
+        words: List[List[str]] = [[] for _ in range(len(self))]
+        for word, slots in self._words.items():
+            for slot in slots:
+                words[slot].append(word)
+
+        keys = {}
+        for kind, key_table in self._keys.items():
+            keys[kind] = [""] * len(self)
+            for key, slots in key_table.items():
+                for slot in slots:
+                    keys[kind][slot] = key
+
+        items = []
+        for slot, entry in enumerate(self._entries):
+            forms = NameForms(frozenset(words[slot]), keys[NORMALIZED_KEY][slot], keys[PHONETIC_KEY][slot], None)
+            items.append((json.loads(entry), forms))
+
+        user_items = {user_id: list(slots) for user_id, slots in self._users.items()}
+
+        return IndexContents(items, user_items, dict(self._synced_at))
+
+    def _visible_slots_of(self, user_id: str) -> Optional[Container[int]]:
+        return self._users.get(user_id)
+
+    def _key_slots(self, kind: str, key: str) -> Set[int]:
+        slots = self._keys[kind].get(key)
+        return set() if slots is None else set(slots)
+
+    def _prefix_slots(self, prefix: str) -> Set[int]:
+        return self._words.prefix_slots(prefix)
+
+    def _item_type(self, slot: int) -> Optional[str]:
+        return self._item_types[self._item_info[slot] >> 1]
+
+    def _is_folder(self, slot: int) -> bool:
+        return bool(self._item_info[slot] & 1)
+
+    def _name_trigrams(self, slot: int) -> Trigrams:
+        return trigrams(self._names[slot].decode())
+
+    def _entry(self, slot: int) -> dict:
+        return json.loads(self._entries[slot])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SnapshotIndex(BaseLibraryIndex):
+    """
+    Library index which searches the latest snapshot written by the library sync.
+
+    All gunicorn workers map the same snapshot file instead of keeping a private copy of the index. Each access checks
+    whether the snapshot file was replaced and maps the new generation, the previous mapping is released when the
+    running searches are done.
+    """
+
+    def __init__(self,
+                 path: str,
+                 max_age: float = DEFAULT_LIBRARY_INDEX_MAX_AGE,
+                 scoring_time_budget: float = DEFAULT_SCORING_TIME_BUDGET):
+        """
+        :param path: path of the snapshot
+        :param max_age: time in seconds after which the index of a user is stale and has to be synced again
+                        (default: 3600)
+        :param scoring_time_budget: maximum time in seconds for ranking the found items of a search (default: 0.01)
+        """
+
+        super().__init__(max_age, scoring_time_budget)
+
+        self.path = path
+
+        self._snapshot: Optional[Snapshot] = None
+        # identity of the last file which could not be mapped, such that it is not mapped again on each access
+        self._invalid_identity: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+
+    def _current(self) -> Optional[Snapshot]:
+        snapshot = self._snapshot
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return snapshot
+
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if snapshot is not None and snapshot.identity == identity or identity == self._invalid_identity:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not snapshot:
+                # another thread mapped the new snapshot
+                return self._snapshot
+
+            try:
+                self._snapshot = Snapshot(self.path)
+            except (OSError, ValueError) as e:
+                self._invalid_identity = identity
+                SNAPSHOT_ERRORS.inc()
+                logging.warning(f"Could not map the library index snapshot: {e}")
+                return snapshot
+
+            SNAPSHOT_LOADS.inc()
+            SNAPSHOT_GENERATION.set(self._snapshot.generation)
+            logging.debug(f"Mapped the library index snapshot generation {self._snapshot.generation}")
+
+            return self._snapshot
+
+    @contextmanager
+    def _view(self) -> Iterator[IndexView]:
+        # the searches keep the snapshot which was current at their start
+        yield self._current()
+
+    @property
+    def generation(self) -> int:
+        """
+        :return: the generation of the mapped snapshot or 0 if no snapshot is mapped
+        """
+
+        snapshot = self._current()
+        return 0 if snapshot is None else snapshot.generation
+
+    def item_count(self, user_id: str) -> int:
+        snapshot = self._current()
+        return 0 if snapshot is None else snapshot.item_count(user_id)
+
+    def synced_at(self, user_id: str) -> Optional[float]:
+        snapshot = self._current()
+        return None if snapshot is None else snapshot.synced_at(user_id)
+
+    def __len__(self) -> int:
+        snapshot = self._current()
+        return 0 if snapshot is None else len(snapshot)
@@ -0,0 +1,409 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks on windows, each process syncs and writes the snapshot
+    fcntl = None
+
+from requests import HTTPError
+
+from jellyfin_alexa_skill.config import DEFAULT_LIBRARY_FULL_SYNC_INTERVAL, DEFAULT_LIBRARY_SYNC_INTERVAL, \
+    DEFAULT_LIBRARY_SYNC_PAGE_SIZE
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
+from jellyfin_alexa_skill.library.index import LibraryIndex
+from jellyfin_alexa_skill.library.snapshot import Snapshot, write_snapshot
+from jellyfin_alexa_skill.metrics import REGISTRY
+
+# the delta syncs overlap, such that items saved while the previous sync ran and differences between the clocks of the
+# skill and the server do not cause missed changes
+DELTA_SYNC_OVERLAP = timedelta(minutes=5)
+# time in seconds between the checks of the trigger file of the snapshot by the process which syncs the index
+TRIGGER_POLL_INTERVAL = 1
+
+SYNC_LATENCY = REGISTRY.histogram("library_sync_seconds",
+                                  "Time to sync the library index of a user",
+                                  buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+SYNCED_ITEMS = REGISTRY.counter("library_sync_items_total",
+                                "Number of items fetched by the library sync")
+FULL_SYNCS = REGISTRY.counter("library_sync_full_total",
+                              "Number of library syncs which fetched all items of a user")
+DELTA_SYNCS = REGISTRY.counter("library_sync_delta_total",
+                               "Number of library syncs which fetched only the changed items of a user")
+SYNC_ERRORS = REGISTRY.counter("library_sync_errors_total",
+                               "Number of failed library syncs")
+SYNC_PROGRESS_ITEMS = REGISTRY.gauge("library_sync_progress_items",
+                                     "Number of items fetched by the running full library sync")
+SYNC_PROGRESS_TOTAL = REGISTRY.gauge("library_sync_progress_total_items",
+                                     "Number of items to fetch by the running full library sync")
+SYNC_LAG = REGISTRY.gauge("library_sync_lag_seconds",
+                          "Time since the least recent completed library sync of a linked user")
+SYNCED_USERS = REGISTRY.gauge("library_sync_users",
+                              "Number of linked users with a completed library sync")
+
+PageFetcher = Callable[..., Tuple[List[dict], int]]
+
+
+def _format_date(date: datetime) -> str:
+    return date.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class LibrarySync:
+    """
+    Background sync of the library index with the Jellyfin libraries of the linked users.
+
+    The first sync of a user walks all items page by page. Later syncs only fetch the items which were saved since the
+    previous sync (MinDateLastSaved). Deleted items are detected by comparing the number of items of the user in the
+    index with the total number of items on the server, if they differ all items are walked again. Changes which are not
+    found this way, e.g. an item which is deleted while another unchanged item becomes accessible by a changed library
+    access, are found by walking all items again after the full sync interval.
+
+    With a snapshot path, only the process which holds the lock of the snapshot syncs and writes the snapshot after each
+    sync, the other processes search the snapshot. Another process takes over when the process holding the lock exits.
+    The snapshot persists the index and the MinDateLastSaved of the users, so after a restart the index is restored from
+    the snapshot and the syncs continue with delta syncs instead of walking all items again. A sync which is triggered
+    in another process is passed to the syncing process by the modification time of a trigger file next to the snapshot.
+    """
+
+    def __init__(self,
+                 jellyfin_client: JellyfinClient,
+                 library_index: LibraryIndex,
+                 interval: float = DEFAULT_LIBRARY_SYNC_INTERVAL,
+                 page_size: int = DEFAULT_LIBRARY_SYNC_PAGE_SIZE,
+                 snapshot_path: Optional[str] = None,
+                 full_sync_interval: float = DEFAULT_LIBRARY_FULL_SYNC_INTERVAL):
+        """
+        :param jellyfin_client: client for the Jellyfin server
+        :param library_index: the synced library index
+        :param interval: time in seconds between the syncs of all linked users (default: 300)
+        :param page_size: number of items fetched with a single request (default: 500)
+        :param snapshot_path: path of the snapshot of the library index, which is shared by all processes
+                              (default: None = each process syncs its own index)
+        :param full_sync_interval: time in seconds after which all items of a user are walked again (default: 86400)
+        """
+
+        self.jellyfin_client = jellyfin_client
+        self.library_index = library_index
+        self.interval = interval
+        self.page_size = page_size
+        self.snapshot_path = snapshot_path
+        self.full_sync_interval = full_sync_interval
+
+        # open lock file of the snapshot while this process is the writer
+        self._writer_lock_file = None
+        self._restored = False
+
+        # MinDateLastSaved of the next delta sync by user
+        self._high_water_marks: Dict[str, str] = {}
+        # time of the last full sync by user, users restored from the snapshot count from the first delta sync
+        self._full_synced_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._scheduler_pid = None
+        self._started_at = time.time()
+
+    def start(self) -> None:
+        """
+        Start the background scheduler in this process, if it is not running yet.
+        """
+
+        # threads do not survive the fork of the gunicorn workers, so the scheduler is started in each worker
+        with self._lock:
+            if self._scheduler_pid == os.getpid():
+                return
+            self._scheduler_pid = os.getpid()
+            self._started_at = time.time()
+
+        threading.Thread(target=self._run_scheduler, name="library-sync", daemon=True).start()
+
+    def trigger(self) -> None:
+        """
+        Run the next sync of all linked users immediately, e.g. after a user was linked. With a snapshot path, the sync
+        is also triggered if another process syncs the index.
+        """
+
+        self._wakeup.set()
+
+        if self.snapshot_path is not None:
+            trigger_path = f"{self.snapshot_path}.trigger"
+            try:
+                with open(trigger_path, "a"):
+                    pass
+                os.utime(trigger_path)
+            except OSError as e:
+                logging.warning(f"Could not trigger the library sync: {e}")
+
+    def _get_trigger_time(self) -> Optional[int]:
+        """
+        :return: modification time of the trigger file in nanoseconds or None if there is no trigger file
+        """
+
+        if self.snapshot_path is None:
+            return None
+
+        try:
+            return os.stat(f"{self.snapshot_path}.trigger").st_mtime_ns
+        except OSError:
+            return None
+
+    def _wait(self, trigger_time: Optional[int]) -> None:
+        """
+        Wait until the next sync is due or triggered.
+
+        :param trigger_time: modification time of the trigger file before the last sync
+        """
+
+        deadline = time.monotonic() + self.interval
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._wakeup.wait(min(remaining, TRIGGER_POLL_INTERVAL)):
+                break
+            if self._get_trigger_time() != trigger_time:
+                break
+
+        self._wakeup.clear()
+
+    def _acquire_writer_lock(self) -> bool:
+        """
+        :return: True if this process syncs the index, otherwise False
+        """
+
+        if self.snapshot_path is None or fcntl is None or self._writer_lock_file is not None:
+            return True
+
+        lock_file = open(f"{self.snapshot_path}.lock", "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        # the lock is released when this process exits
+        self._writer_lock_file = lock_file
+        logging.info(f"Process {os.getpid()} writes the library index snapshot")
+
+        return True
+
+    def _run_scheduler(self) -> None:
+        while True:
+            # triggers while the sync runs start another sync
+            trigger_time = self._get_trigger_time()
+            try:
+                if self._acquire_writer_lock():
+                    if self.snapshot_path is not None and not self._restored:
+                        self._restored = True
+                        self.restore_snapshot()
+                    self.sync_all()
+                    if self.snapshot_path is not None:
+                        self.publish_snapshot()
+            except Exception as e:
+                logging.error(f"Library sync failed: {e}")
+
+            self._wait(trigger_time)
+
+    def publish_snapshot(self) -> int:
+        """
+        Write the snapshot of the library index, which replaces the previous snapshot for all processes.
+
+        :return: the generation of the written snapshot
+        """
+
+        start = time.perf_counter()
+        generation = write_snapshot(self.library_index, self.snapshot_path, dict(self._high_water_marks))
+        logging.debug(f"Wrote the library index snapshot generation {generation} with {len(self.library_index)} "
+                      f"items in {time.perf_counter() - start:.2f}s")
+
+        return generation
+
+    def restore_snapshot(self) -> bool:
+        """
+        Restore the library index and the MinDateLastSaved of the users from the snapshot.
+
+        :return: True if the snapshot was restored, False if there is no valid snapshot
+        """
+
+        start = time.perf_counter()
+        try:
+            snapshot = Snapshot(self.snapshot_path)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not restore the library index snapshot, all items are synced again: {e}")
+            return False
+
+        self.library_index.restore(snapshot.contents())
+        self._high_water_marks = dict(snapshot.high_water_marks)
+
+        logging.info(f"Restored {len(self.library_index)} items of {len(self._high_water_marks)} users from the "
+                     f"library index snapshot generation {snapshot.generation} in {time.perf_counter() - start:.1f}s")
+
+        return True
+
+    @staticmethod
+    def _get_linked_users() -> Dict[str, List[str]]:
+        was_closed = db.is_closed()
+        if was_closed:
+            db.connect()
+        try:
+            tokens = {}
+            for user in User.select(User.jellyfin_user_id, User.jellyfin_token):
+                tokens.setdefault(user.jellyfin_user_id, []).append(user.jellyfin_token)
+            return tokens
+        finally:
+            if was_closed:
+                db.close()
+
+    def sync_all(self) -> int:
+        """
+        Sync the libraries of all linked users and remove the users which are no longer linked from the index.
+
+        :return: the number of successfully synced users
+        """
+
+        linked_users = self._get_linked_users()
+
+        synced_users = 0
+        for user_id, tokens in linked_users.items():
+            if self._sync_linked_user(user_id, tokens):
+                synced_users += 1
+
+        for user_id in list(self._high_water_marks):
+            if user_id not in linked_users:
+                self.library_index.remove_user(user_id)
+                del self._high_water_marks[user_id]
+                self._full_synced_at.pop(user_id, None)
+
+        self._update_lag(linked_users)
+
+        return synced_users
+
+    def _sync_linked_user(self, user_id: str, tokens: List[str]) -> bool:
+        # a user can be linked multiple times, use the first token which is still valid
+        for token in tokens:
+            try:
+                self.sync_user(user_id, token)
+                return True
+            except HTTPError as e:
+                if e.response is not None and e.response.status_code == 401:
+                    continue
+                SYNC_ERRORS.inc()
+                logging.error(f"Library sync of the user {user_id} failed: {e}")
+                return False
+            except Exception as e:
+                SYNC_ERRORS.inc()
+                logging.error(f"Library sync of the user {user_id} failed: {e}")
+                return False
+
+        SYNC_ERRORS.inc()
+        logging.warning(f"Library sync of the user {user_id} failed: no valid access token")
+        return False
+
+    def _update_lag(self, user_ids: Iterable[str]) -> None:
+        sync_times = [self.library_index.synced_at(user_id) for user_id in user_ids]
+        synced_times = [synced_at for synced_at in sync_times if synced_at is not None]
+        SYNCED_USERS.set(len(synced_times))
+
+        if len(synced_times) < len(sync_times):
+            # users which were never synced lag since the start of the scheduler
+            synced_times.append(self._started_at)
+
+        SYNC_LAG.set(time.time() - min(synced_times) if synced_times else 0)
+
+    def sync_user(self, user_id: str, token: str) -> int:
+        """
+        Sync the library index of a user with the user's libraries on the server.
+
+        :param user_id: Jellyfin user id
+        :param token: authentication token of the user
+        :return: the number of fetched items
+        :raises: requests.exceptions.HTTPError types if the server is not reachable or something went wrong
+        """
+
+        start = time.perf_counter()
+        # items saved while this sync runs are fetched again by the next sync
+        high_water_mark = _format_date(datetime.now(timezone.utc) - DELTA_SYNC_OVERLAP)
+
+        min_date_last_saved = self._high_water_marks.get(user_id)
+        full_synced_at = self._full_synced_at.setdefault(user_id, time.time())
+        if min_date_last_saved is None or self.library_index.synced_at(user_id) is None \
+                or time.time() - full_synced_at >= self.full_sync_interval:
+            fetched_items = self._full_sync(user_id, token)
+            FULL_SYNCS.inc()
+        else:
+            fetched_items = self._delta_sync(user_id, token, min_date_last_saved)
+            DELTA_SYNCS.inc()
+
+        self.library_index.mark_synced(user_id)
+        self._high_water_marks[user_id] = high_water_mark
+
+        SYNC_LATENCY.observe(time.perf_counter() - start)
+
+        return fetched_items
+
+    def _pages(self,
+               fetch_page: PageFetcher,
+               user_id: str,
+               token: str,
+               **kwargs) -> Iterator[Tuple[List[dict], int]]:
+        start_index = 0
+        while True:
+            items, total = fetch_page(user_id=user_id,
+                                      token=token,
+                                      start_index=start_index,
+                                      limit=self.page_size,
+                                      **kwargs)
+            SYNCED_ITEMS.inc(len(items))
+            yield items, total
+
+            start_index += len(items)
+            if not items or start_index >= total:
+                break
+
+    def _full_sync(self, user_id: str, token: str) -> int:
+        start = time.perf_counter()
+
+        item_ids = set()
+        fetched_totals = 0
+        for fetch_page in (self.jellyfin_client.get_library_items, self.jellyfin_client.get_artists):
+            total = 0
+            for items, total in self._pages(fetch_page, user_id, token):
+                self.library_index.add_items(user_id, items)
+                item_ids.update(item["Id"] for item in items)
+
+                SYNC_PROGRESS_ITEMS.set(len(item_ids))
+                SYNC_PROGRESS_TOTAL.set(fetched_totals + total)
+            fetched_totals += total
+
+        removed_items = self.library_index.retain_items(user_id, item_ids)
+        self._full_synced_at[user_id] = time.time()
+
+        logging.info(f"Full library sync of the user {user_id}: {len(item_ids)} items, {removed_items} removed, "
+                     f"{time.perf_counter() - start:.1f}s")
+
+        return len(item_ids)
+
+    def _delta_sync(self, user_id: str, token: str, min_date_last_saved: str) -> int:
+        fetched_items = 0
+        server_total = 0
+        for fetch_page in (self.jellyfin_client.get_library_items, self.jellyfin_client.get_artists):
+            for items, _ in self._pages(fetch_page, user_id, token, MinDateLastSaved=min_date_last_saved):
+                self.library_index.add_items(user_id, items)
+                fetched_items += len(items)
+
+            _, total = fetch_page(user_id=user_id, token=token, limit=0)
+            server_total += total
+
+        # the changed items are added, so the index contains more items than the server only when items were deleted
+        # or the user can no longer access them, in this rare case all items are walked to find them
+        if self.library_index.item_count(user_id) != server_total:
+            fetched_items += self._full_sync(user_id, token)
+            FULL_SYNCS.inc()
+
+        return fetched_items
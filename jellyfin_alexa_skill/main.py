@@ -8,9 +8,10 @@ import uuid
 from configparser import ConfigParser
 from copy import deepcopy
 from pathlib import Path
-from typing import Union
+from typing import Union, Optional
 
 import ask_sdk_model_runtime
+from ask_sdk_webservice_support.verifier import RequestVerifier, TimestampVerifier
 from ask_smapi_model.services.skill_management import SkillManagementServiceClient
 from ask_smapi_model.v1.skill import Status
 from ask_smapi_model.v1.skill.account_linking import AccountLinkingRequest, AccountLinkingRequestPayload, \
@@ -18,19 +19,37 @@ from ask_smapi_model.v1.skill.account_linking import AccountLinkingRequest, Acco
 from ask_smapi_model.v1.skill.manifest import SSLCertificateType, SkillManifestEndpoint, SkillManifestEnvelope
 from ask_smapi_sdk import StandardSmapiClientBuilder
 from flask import Flask
-from flask_ask_sdk.skill_adapter import SkillAdapter
+from flask_ask_sdk.skill_adapter import SkillAdapter, VERIFY_SIGNATURE_APP_CONFIG, VERIFY_TIMESTAMP_APP_CONFIG
 from flask_wtf import CSRFProtect
 from gunicorn.app.base import BaseApplication
 
 from jellyfin_alexa_skill import __version__
 from jellyfin_alexa_skill.alexa.handler import get_skill_builder
+from jellyfin_alexa_skill.alexa.handler.base import BaseHandler
+from jellyfin_alexa_skill.alexa.router import AudioPlayerEventRouter
 from jellyfin_alexa_skill.alexa.setup.interaction.model import INTERACTION_MODELS
 from jellyfin_alexa_skill.alexa.setup.manifest.manifest import get_skill_version, SKILL_MANIFEST
+from jellyfin_alexa_skill.alexa.stream_token import StreamTokenSigner
 from jellyfin_alexa_skill.alexa.web.skill import get_skill_blueprint
-from jellyfin_alexa_skill.config import get_config, APP_NAME, write_config
+from jellyfin_alexa_skill.config import get_config, APP_NAME, write_config, DEFAULT_JELLYFIN_POOL_SIZE, \
+    DEFAULT_JELLYFIN_POOL_IDLE_TIMEOUT, DEFAULT_JELLYFIN_TIMEOUT, DEFAULT_JELLYFIN_CACHE_SIZE, \
+    DEFAULT_JELLYFIN_CACHE_TTLS, DEFAULT_JELLYFIN_CACHE_TTL, DEFAULT_JELLYFIN_CACHE_NEGATIVE_TTL, \
+    DEFAULT_JELLYFIN_CACHE_MAX_RESULT_SIZE, \
+    DEFAULT_QUEUE_STORAGE, DEFAULT_PLAYBACK_STATE_FLUSH_INTERVAL, DEFAULT_PLAYBACK_STATE_FLUSH_BATCH_SIZE, \
+    DEFAULT_USER_CACHE_SIZE, DEFAULT_USER_CACHE_TTL, DEFAULT_LIBRARY_INDEX, DEFAULT_LIBRARY_INDEX_MAX_AGE, \
+    DEFAULT_LIBRARY_SYNC_INTERVAL, DEFAULT_LIBRARY_SYNC_PAGE_SIZE, DEFAULT_LIBRARY_SNAPSHOT_PATH, \
+    DEFAULT_REQUEST_CACHE_TTL, DEFAULT_REQUEST_CACHE_WAIT, DEFAULT_LIBRARY_FULL_SYNC_INTERVAL
 from jellyfin_alexa_skill.database.db import connect_db
+from jellyfin_alexa_skill.database.idempotency import IdempotencyCache
+from jellyfin_alexa_skill.database.model.playback import QueueStorage
+from jellyfin_alexa_skill.database.state import PlaybackStateCache
+from jellyfin_alexa_skill.database.user_cache import UserCache
+from jellyfin_alexa_skill.jellyfin.api.cache import ResponseCache
 from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
 from jellyfin_alexa_skill.jellyfin.web.login import get_jellyfin_login_blueprint
+from jellyfin_alexa_skill.library.index import LibraryIndex
+from jellyfin_alexa_skill.library.snapshot import SnapshotIndex
+from jellyfin_alexa_skill.library.sync import LibrarySync
 
 logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
 
@@ -258,6 +277,36 @@ def update_account_linking(config: ConfigParser,
     return account_linking_client_id
 
 
+def get_response_cache(config: ConfigParser) -> Optional[ResponseCache]:
+    """
+    Create the cache for the Jellyfin API responses from the skill configuration.
+
+    :param config: skill configuration
+
+    :return: the response cache or None if the cache is disabled
+    """
+
+    cache_size = config.getint("jellyfin", "cache_size", fallback=DEFAULT_JELLYFIN_CACHE_SIZE)
+    if cache_size == 0:
+        return None
+
+    ttls = dict(DEFAULT_JELLYFIN_CACHE_TTLS)
+    if config.has_section("jellyfin"):
+        for key in config.options("jellyfin"):
+            if key.startswith("cache_ttl_"):
+                ttls[key[len("cache_ttl_"):]] = config.getfloat("jellyfin", key)
+
+    return ResponseCache(max_size=cache_size,
+                         default_ttl=config.getfloat("jellyfin", "cache_ttl", fallback=DEFAULT_JELLYFIN_CACHE_TTL),
+                         negative_ttl=config.getfloat("jellyfin",
+                                                      "cache_negative_ttl",
+                                                      fallback=DEFAULT_JELLYFIN_CACHE_NEGATIVE_TTL),
+                         ttls=ttls,
+                         max_result_size=config.getint("jellyfin",
+                                                       "cache_max_result_size",
+                                                       fallback=DEFAULT_JELLYFIN_CACHE_MAX_RESULT_SIZE))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Selfhosted Alexa media player skill for Jellyfin",
@@ -338,20 +387,100 @@ def main():
                                                        skill_version,
                                                        smapi_client, stage)
 
-    jellyfin_endpoint = config.get("general", "jellyfin_endpoint")
-    jellyfin_client = JellyfinClient(server_endpoint=jellyfin_endpoint, client_name=APP_NAME)
+    library_index = None
+    searched_library_index = None
+    snapshot_path = None
+    if config.getboolean("library", "index", fallback=DEFAULT_LIBRARY_INDEX):
+        library_index_max_age = config.getfloat("library", "index_max_age", fallback=DEFAULT_LIBRARY_INDEX_MAX_AGE)
+        library_index = LibraryIndex(max_age=library_index_max_age)
+        searched_library_index = library_index
+
+        snapshot_path = config.get("library", "snapshot_path", fallback=DEFAULT_LIBRARY_SNAPSHOT_PATH).strip()
+        if snapshot_path:
+            snapshot_path = str(config_path.parent / snapshot_path)
+            # the workers search the shared snapshot, the index is only filled by the worker which writes the snapshot
+            searched_library_index = SnapshotIndex(snapshot_path, max_age=library_index_max_age)
+        else:
+            snapshot_path = None
 
-    skill_adapter = SkillAdapter(skill=get_skill_builder(jellyfin_client).create(),
+    jellyfin_endpoint = config.get("general", "jellyfin_endpoint")
+    jellyfin_client = JellyfinClient(server_endpoint=jellyfin_endpoint,
+                                     response_cache=get_response_cache(config),
+                                     library_index=searched_library_index,
+                                     client_name=APP_NAME,
+                                     pool_size=config.getint("jellyfin",
+                                                             "pool_size",
+                                                             fallback=DEFAULT_JELLYFIN_POOL_SIZE),
+                                     pool_idle_timeout=config.getfloat("jellyfin",
+                                                                       "pool_idle_timeout",
+                                                                       fallback=DEFAULT_JELLYFIN_POOL_IDLE_TIMEOUT),
+                                     timeout=config.getfloat("jellyfin", "timeout", fallback=DEFAULT_JELLYFIN_TIMEOUT))
+
+    library_sync = None
+    if library_index is not None:
+        library_sync = LibrarySync(jellyfin_client,
+                                   library_index,
+                                   interval=config.getfloat("library",
+                                                            "sync_interval",
+                                                            fallback=DEFAULT_LIBRARY_SYNC_INTERVAL),
+                                   page_size=config.getint("library",
+                                                           "sync_page_size",
+                                                           fallback=DEFAULT_LIBRARY_SYNC_PAGE_SIZE),
+                                   snapshot_path=snapshot_path,
+                                   full_sync_interval=config.getfloat("library",
+                                                                      "full_sync_interval",
+                                                                      fallback=DEFAULT_LIBRARY_FULL_SYNC_INTERVAL))
+
+    state_flush_interval = config.getfloat("database",
+                                           "state_flush_interval",
+                                           fallback=DEFAULT_PLAYBACK_STATE_FLUSH_INTERVAL)
+    state_flush_batch_size = config.getint("database",
+                                           "state_flush_batch_size",
+                                           fallback=DEFAULT_PLAYBACK_STATE_FLUSH_BATCH_SIZE)
+    playback_state_cache = PlaybackStateCache(flush_interval=state_flush_interval,
+                                              max_batch_size=state_flush_batch_size)
+
+    user_cache = UserCache(max_size=config.getint("database", "user_cache_size", fallback=DEFAULT_USER_CACHE_SIZE),
+                           ttl=config.getfloat("database", "user_cache_ttl", fallback=DEFAULT_USER_CACHE_TTL))
+    BaseHandler.user_cache = user_cache
+    # the position of the played item in the queue is signed into the stream tokens
+    BaseHandler.stream_token_signer = StreamTokenSigner(flask_secret)
+
+    skill_builder = get_skill_builder(jellyfin_client, playback_state_cache)
+    skill_adapter = SkillAdapter(skill=skill_builder.create(),
                                  skill_id=skill_id,
                                  app=app)
 
+    # the AudioPlayer events are handled without the skill, but verified like all other requests
+    verifiers = []
+    if app.config.get(VERIFY_SIGNATURE_APP_CONFIG, True):
+        verifiers.append(RequestVerifier())
+    if app.config.get(VERIFY_TIMESTAMP_APP_CONFIG, True):
+        verifiers.append(TimestampVerifier())
+    event_router = AudioPlayerEventRouter(skill_builder.runtime_configuration_builder.request_handler_chains,
+                                          verifiers=verifiers,
+                                          skill_id=skill_id)
+
+    # the responses of the requests are kept to answer requests which are retried by Alexa
+    request_cache_ttl = config.getfloat("database", "request_cache_ttl", fallback=DEFAULT_REQUEST_CACHE_TTL)
+    request_cache = None
+    if request_cache_ttl > 0:
+        request_cache = IdempotencyCache(ttl=request_cache_ttl,
+                                         wait=config.getfloat("database",
+                                                              "request_cache_wait",
+                                                              fallback=DEFAULT_REQUEST_CACHE_WAIT))
+
     # register skill routes
-    skill_blueprint = get_skill_blueprint(skill_adapter)
+    skill_blueprint = get_skill_blueprint(skill_adapter,
+                                          event_router,
+                                          request_cache,
+                                          metrics_token=config.get("general", "metrics_token", fallback="").strip(),
+                                          verifiers=verifiers)
     csrf.exempt(skill_blueprint)
     app.register_blueprint(skill_blueprint)
 
     # register login routes
-    login_blueprint = get_jellyfin_login_blueprint(jellyfin_endpoint, account_linking_client_id)
+    login_blueprint = get_jellyfin_login_blueprint(jellyfin_client, account_linking_client_id, user_cache, library_sync)
     app.register_blueprint(login_blueprint)
 
     # setup database
@@ -359,7 +488,11 @@ def main():
                           user=config.get("database", "user", fallback="skill"),
                           password=config.get("database", "password"),
                           host=config.get("database", "host", fallback="127.0.0.1"),
-                          port=config.getint("database", "port", fallback=5432))
+                          port=config.getint("database", "port", fallback=5432),
+                          queue_storage=QueueStorage(config.get("database",
+                                                                "queue_storage",
+                                                                fallback=DEFAULT_QUEUE_STORAGE)),
+                          playback_state_cache=playback_state_cache)
 
     @app.before_request
     def _db_connect():
@@ -373,9 +506,18 @@ def main():
     host = config.get("general", "bind_addr", fallback="0.0.0.0")
     web_app_port = config.getint("general", "web_app_port", fallback=1456)
 
+    def _post_fork(server, worker):
+        # connections of the master process can not be shared with the workers, open new ones in each worker
+        jellyfin_client.preconnect()
+
+        if library_sync is not None:
+            # the worker which gets the lock of the snapshot syncs, without a snapshot each worker syncs its own index
+            library_sync.start()
+
     options = {
         "bind": f"{host}:{web_app_port}",
         "workers": 2,
+        "post_fork": _post_fork,
     }
     GunicornApplication(app, options).run()
 
@@ -0,0 +1,222 @@
+import math
+import threading
+from typing import Dict, List, Sequence, Union
+
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """
+    Monotonically increasing value, e.g. the number of processed requests.
+    """
+
+    def __init__(self, name: str, documentation: str):
+        """
+        :param name: name of the metric
+        :param documentation: description of the metric
+        """
+
+        self.name = name
+        self.documentation = documentation
+
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        """
+        Increase the counter.
+
+        :param amount: the amount to add, must not be negative (default: 1)
+        """
+
+        if amount < 0:
+            raise ValueError("Counters can only be increased")
+
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} counter",
+                f"{self.name} {_format_value(self._value)}"]
+
+
+class Gauge:
+    """
+    Value which can go up and down, e.g. the number of pending items.
+    """
+
+    def __init__(self, name: str, documentation: str):
+        """
+        :param name: name of the metric
+        :param documentation: description of the metric
+        """
+
+        self.name = name
+        self.documentation = documentation
+
+        self._value = 0
+
+    def set(self, value: float) -> None:
+        """
+        :param value: the new value of the gauge
+        """
+
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(self._value)}"]
+
+
+class Histogram:
+    """
+    Distribution of observed values in cumulative buckets, e.g. the latency of an operation.
+    """
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        :param name: name of the metric
+        :param documentation: description of the metric
+        :param buckets: upper bounds of the buckets (default: DEFAULT_LATENCY_BUCKETS)
+        """
+
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Record an observed value.
+
+        :param value: the observed value
+        """
+
+        with self._lock:
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    self._counts[i] += 1
+                    break
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} histogram"]
+
+        with self._lock:
+            cumulative_count = 0
+            for upper_bound, count in zip(self.buckets, self._counts):
+                cumulative_count += count
+                lines.append(f"{self.name}_bucket{{le=\"{_format_value(upper_bound)}\"}} {cumulative_count}")
+            lines.append(f"{self.name}_sum {_format_value(self._sum)}")
+            lines.append(f"{self.name}_count {self._count}")
+
+        return lines
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class MetricsRegistry:
+    """
+    Collection of the metrics of a process, which can be rendered in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing_metric = self._metrics.get(metric.name)
+            if existing_metric is not None:
+                if type(existing_metric) is not type(metric):
+                    raise ValueError(f"Metric \"{metric.name}\" is already registered with another type")
+                return existing_metric
+
+            self._metrics[metric.name] = metric
+
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        """
+        Get or create a counter.
+
+        :param name: name of the metric
+        :param documentation: description of the metric
+        :return: the counter
+        """
+
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        """
+        Get or create a gauge.
+
+        :param name: name of the metric
+        :param documentation: description of the metric
+        :return: the gauge
+        """
+
+        return self._register(Gauge(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        """
+        Get or create a histogram.
+
+        :param name: name of the metric
+        :param documentation: description of the metric
+        :param buckets: upper bounds of the buckets (default: DEFAULT_LATENCY_BUCKETS)
+        :return: the histogram
+        """
+
+        return self._register(Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        """
+        :return: all metrics in the Prometheus text format
+        """
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+# metrics of this process, each worker process has its own metrics
+REGISTRY = MetricsRegistry()
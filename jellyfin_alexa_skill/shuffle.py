@@ -0,0 +1,96 @@
+from typing import List
+
+FEISTEL_ROUNDS = 4
+
+
+def _mix(value: int) -> int:
+    """
+    Scramble the bits of a 32-bit integer.
+
+    :param value: the integer
+    :return: the scrambled 32-bit integer
+    """
+
+    value &= 0xFFFFFFFF
+    value = ((value >> 16) ^ value) * 0x45D9F3B & 0xFFFFFFFF
+    value = ((value >> 16) ^ value) * 0x45D9F3B & 0xFFFFFFFF
+    return (value >> 16) ^ value
+
+
+class Permutation:
+    """
+    Seeded pseudo-random permutation of the indices 0 to size - 1.
+
+    The permutation is a balanced Feistel network over the smallest power of 4 which covers the size. Values outside the
+    range are mapped again until they are inside the range (cycle walking), which takes less than 4 rounds on average.
+    Hence, the position of an index and the index at a position are computed in constant time without materializing
+    the permutation.
+    """
+
+    def __init__(self, size: int, seed: int):
+        """
+        :param size: number of permuted indices
+        :param seed: the seed, equal seeds and sizes result in the same permutation
+        """
+
+        self.size = size
+
+        half_bits = 1
+        while 1 << (2 * half_bits) < size:
+            half_bits += 1
+        self._half_bits = half_bits
+        self._mask = (1 << half_bits) - 1
+
+        self._keys = [_mix(seed + i * 0x9E3779B9) for i in range(FEISTEL_ROUNDS)]
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self._half_bits, value & self._mask
+        for key in self._keys:
+            left, right = right, left ^ (_mix(right ^ key) & self._mask)
+        return (left << self._half_bits) | right
+
+    def _decrypt(self, value: int) -> int:
+        left, right = value >> self._half_bits, value & self._mask
+        for key in reversed(self._keys):
+            left, right = right ^ (_mix(left ^ key) & self._mask), left
+        return (left << self._half_bits) | right
+
+    def __getitem__(self, position: int) -> int:
+        """
+        :param position: the position in the permutation
+        :return: the index at the position
+        :raises: IndexError if the position is out of range
+        """
+
+        if not 0 <= position < self.size:
+            raise IndexError("permutation position out of range")
+
+        value = self._encrypt(position)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def index(self, value: int) -> int:
+        """
+        :param value: the permuted index
+        :return: the position of the index in the permutation
+        :raises: ValueError if the index is out of range
+        """
+
+        if not 0 <= value < self.size:
+            raise ValueError("index is not in the permutation")
+
+        position = self._decrypt(value)
+        while position >= self.size:
+            position = self._decrypt(position)
+        return position
+
+    def __len__(self) -> int:
+        return self.size
+
+    def to_list(self) -> List[int]:
+        """
+        :return: all indices in the order of the permutation
+        """
+
+        return [self[i] for i in range(self.size)]
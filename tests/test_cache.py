@@ -0,0 +1,154 @@
+import json
+import time
+import unittest
+from unittest import mock
+
+from jellyfin_alexa_skill.cache import TTLCache
+from jellyfin_alexa_skill.jellyfin.api.cache import ResponseCache
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+
+USER_ID = "a8e5cac72a3a4ad8a3069f95b4a811ee"
+TOKEN = "c98e5a373ff04faebc46daec14572eed"
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.content = json.dumps(data)
+
+    def __bool__(self):
+        return True
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = TTLCache(max_size=2, ttl=60)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("a", 42), 42)
+
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_expire(self):
+        cache = TTLCache(max_size=2, ttl=60)
+
+        cache.set("a", 1, ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+
+        # a time to live of 0 disables caching
+        cache.set("b", 1, ttl=0)
+        self.assertIsNone(cache.get("b"))
+
+    def test_lru_eviction(self):
+        cache = TTLCache(max_size=2, ttl=60)
+
+        cache.set("a", 1)
+        cache.set("b", 2)
+        # "a" is now the most recently used entry
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_invalidate(self):
+        cache = TTLCache(max_size=10, ttl=60)
+
+        for i in range(5):
+            cache.set(("x", i), i)
+        cache.set(("y", 0), 0)
+
+        self.assertEqual(cache.invalidate(lambda key: key[0] == "x"), 5)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.pop(("y", 0)), 0)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_items(self):
+        cache = TTLCache(max_size=10, ttl=60)
+
+        for i in range(5):
+            cache.set(i, i % 2)
+
+        self.assertEqual(cache.invalidate_items(lambda key, value: value == 1), 2)
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get(1))
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = JellyfinClient(server_endpoint="http://localhost:8096",
+                                     response_cache=ResponseCache(max_size=16, negative_ttl=0.01))
+        self.items = [{"Id": "ccf19d58cf1a38fa18ea0e2dd0da0e5b", "Name": "song title"}]
+
+    def test_cached_search(self):
+        with mock.patch.object(self.client.session, "get", return_value=FakeResponse({"Items": self.items})) as get:
+            for term in ["Song Title", "song title", "  song   TITLE "]:
+                result = self.client.search_media_items(user_id=USER_ID,
+                                                        token=TOKEN,
+                                                        term=term,
+                                                        media=MediaType.AUDIO,
+                                                        Filters="IsNotFolder")
+                self.assertEqual(result, self.items)
+
+            # all search terms are equal after the normalization
+            self.assertEqual(get.call_count, 1)
+
+            # another user has its own cache entries
+            self.client.search_media_items(user_id="other", token=TOKEN, term="song title", media=MediaType.AUDIO,
+                                           Filters="IsNotFolder")
+            self.assertEqual(get.call_count, 2)
+
+            # different parameters are not served from the cache
+            self.client.search_media_items(user_id=USER_ID, token=TOKEN, term="song title", media=MediaType.VIDEO,
+                                           Filters="IsNotFolder")
+            self.assertEqual(get.call_count, 3)
+
+            # only the search term is normalized, the other parameters are case-sensitive
+            self.client.search_media_items(user_id=USER_ID, token=TOKEN, term="song title", media=MediaType.AUDIO,
+                                           Filters="isnotfolder")
+            self.assertEqual(get.call_count, 4)
+
+    def test_case_sensitive_parameters(self):
+        with mock.patch.object(self.client.session, "get", return_value=FakeResponse({"Items": self.items})) as get:
+            self.client.get_album_items(user_id=USER_ID, token=TOKEN, album_id="AbC")
+            self.client.get_album_items(user_id=USER_ID, token=TOKEN, album_id="abc")
+
+            self.assertEqual(get.call_count, 2)
+
+    def test_cached_result_copy(self):
+        with mock.patch.object(self.client.session, "get", return_value=FakeResponse({"Items": self.items})):
+            result = self.client.get_album_items(user_id=USER_ID, token=TOKEN, album_id="abc")
+            result.clear()
+
+            self.assertEqual(self.client.get_album_items(user_id=USER_ID, token=TOKEN, album_id="abc"), self.items)
+
+    def test_negative_cache(self):
+        with mock.patch.object(self.client.session, "get", return_value=FakeResponse({"Items": []})) as get:
+            self.client.search_artist(user_id=USER_ID, token=TOKEN, term="unknown")
+            self.client.search_artist(user_id=USER_ID, token=TOKEN, term="unknown")
+            self.assertEqual(get.call_count, 1)
+
+            # empty results expire after the negative time to live
+            time.sleep(0.02)
+            self.client.search_artist(user_id=USER_ID, token=TOKEN, term="unknown")
+            self.assertEqual(get.call_count, 2)
+
+    def test_favorite_invalidation(self):
+        with mock.patch.object(self.client.session, "get", return_value=FakeResponse({"Items": self.items})) as get, \
+                mock.patch.object(self.client.session, "post", return_value=FakeResponse({"IsFavorite": True})):
+            self.client.get_favorites(user_id=USER_ID, token=TOKEN)
+            self.client.get_favorites(user_id=USER_ID, token=TOKEN)
+            self.assertEqual(get.call_count, 1)
+
+            self.client.favorite(user_id=USER_ID, token=TOKEN, media_id=self.items[0]["Id"])
+
+            self.client.get_favorites(user_id=USER_ID, token=TOKEN)
+            self.assertEqual(get.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,9 +3,9 @@ import unittest
 
 from peewee import SqliteDatabase
 
-from jellyfin_alexa_skill.database.db import close_db, get_playback
+from jellyfin_alexa_skill.database.db import close_db, get_playback, migrate_playback_columns, migrate_queue_storage
 from jellyfin_alexa_skill.database.model.base import db
-from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem, QUEUE_INSERT_BATCH_SIZE, QueueStorage
 from jellyfin_alexa_skill.database.model.user import User
 from jellyfin_alexa_skill.jellyfin.api.client import MediaType
 
@@ -131,6 +131,73 @@ class TestPlaybackModel(unittest.TestCase):
         prev_item = self.playback.previous()
         self.assertIsNone(prev_item)
 
+    def test_next_shuffle(self):
+        self.playback.current_item = self.items[3]
+        self.playback.set_shuffle(True)
+        self.playback.save()
+
+        shuffled = [self.playback.current_item]
+        while True:
+            next_item = self.playback.next()
+            if next_item is None:
+                break
+            shuffled.append(next_item)
+            self.playback.current_item = next_item
+
+        # every item is played once, starting with the item which was playing when the shuffle was enabled
+        self.assertEqual(shuffled[0], self.items[3])
+        self.assertCountEqual(shuffled, self.items)
+        self.assertNotEqual(shuffled, self.items[3:] + self.items[:3])
+
+        for item in reversed(shuffled[:-1]):
+            prev_item = self.playback.previous()
+            self.assertEqual(prev_item, item)
+            self.playback.current_item = prev_item
+        self.assertIsNone(self.playback.previous())
+
+        # with loop all the shuffled order is repeated
+        self.playback.loop_all = True
+        self.assertEqual(self.playback.previous(), shuffled[-1])
+        self.playback.current_item = shuffled[-1]
+        self.assertEqual(self.playback.next(), shuffled[0])
+
+    def test_next_shuffle_appended(self):
+        self.playback.current_item = self.items[0]
+        self.playback.set_shuffle(True)
+        self.playback.save()
+
+        def shuffled_order(playback):
+            playback.current_item = self.items[0]
+            order = []
+            next_item = playback.next()
+            while next_item is not None:
+                order.append(next_item.item_id)
+                playback.current_item = next_item
+                next_item = playback.next()
+            return order
+
+        shuffled = shuffled_order(self.playback)
+        self.playback.current_item = self.items[0]
+        self.playback.append_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id="def0")],
+                                   self.playback.queue_generation)
+
+        # the shuffled order does not change when the queue grows, the appended items are played afterwards
+        self.assertEqual(shuffled_order(get_playback(USER_ID)), shuffled + ["def0"])
+
+    def test_shuffle_toggle(self):
+        self.playback.current_item = self.items[0]
+        rows = list(QueueItem.select().order_by(QueueItem.id).tuples())
+
+        self.playback.set_shuffle(True)
+        self.playback.save()
+        self.assertIsNotNone(self.playback.next())
+        self.playback.set_shuffle(False)
+        self.playback.save()
+
+        # the queue items are not rewritten
+        self.assertEqual(list(QueueItem.select().order_by(QueueItem.id).tuples()), rows)
+        self.assertEqual(self.playback.next(), self.items[1])
+
 
 class TestDBMethods(unittest.TestCase):
     def setUp(self) -> None:
@@ -165,6 +232,21 @@ class TestDBMethods(unittest.TestCase):
         self.assertEqual(playback.offset, 0)
         self.assertEqual(playback.playing, False)
 
+    def test_set_playback_queue_replace(self):
+        playback = get_playback(USER_ID)
+        items = [QueueItem(idx=i, media_type=MediaType.AUDIO, item_id=f"def{i}")
+                 for i in range(QUEUE_INSERT_BATCH_SIZE * 2 + 1)]
+
+        playback.set_queue(items)
+
+        self.assertEqual(playback.current_item.item_id, "def0")
+        # the old queue items should be replaced by the new items in the same order
+        queue = QueueItem.select().where(QueueItem.playback == playback).order_by(QueueItem.idx)
+        self.assertEqual([item.item_id for item in queue], [item.item_id for item in items])
+
+        playback.current_item = queue[1]
+        self.assertEqual(playback.next().item_id, "def2")
+
     def test_set_playback_queue_empty(self):
         playback = get_playback(USER_ID)
         playback.set_queue([])
@@ -175,6 +257,204 @@ class TestDBMethods(unittest.TestCase):
         # there should be no items in the queue
         self.assertEqual(QueueItem.select().where(QueueItem.playback == playback).count(), 0)
 
+    def test_append_queue(self):
+        playback = get_playback(USER_ID)
+        playback.set_queue([QueueItem(idx=i, media_type=MediaType.AUDIO, item_id=f"abc{i}") for i in range(2)])
+        queue_generation = playback.queue_generation
+
+        self.assertTrue(playback.append_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id="def0")],
+                                              queue_generation))
+        self.assertEqual([item.item_id for item in playback.get_queue()], ["abc0", "abc1", "def0"])
+        self.assertEqual([item.idx for item in playback.get_queue()], [0, 1, 2])
+        self.assertEqual(get_playback(USER_ID).current_item.item_id, "abc0")
+
+        # items of a replaced queue are not appended
+        playback.set_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id="ghi0")])
+        self.assertFalse(playback.append_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id="def1")],
+                                               queue_generation))
+        self.assertEqual([item.item_id for item in playback.get_queue()], ["ghi0"])
+
+    def test_append_shuffled_queue(self):
+        playback = get_playback(USER_ID)
+        playback.shuffle = True
+        playback.set_queue([QueueItem(idx=i, media_type=MediaType.AUDIO, item_id=f"a{i}") for i in range(10)])
+
+        played = [playback.current_item.item_id]
+        for _ in range(2):
+            playback.current_item = playback.next()
+            playback.save()
+            played.append(playback.current_item.item_id)
+
+        self.assertTrue(playback.append_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id=f"b{i}")
+                                               for i in range(10)], playback.queue_generation))
+        # the appended items extend the appended segment while it is not played
+        self.assertTrue(playback.append_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id=f"b{i}")
+                                               for i in range(10, 12)], playback.queue_generation))
+
+        playback = get_playback(USER_ID)
+        self.assertEqual(playback.shuffle_segments, "10")
+        for _ in range(8):
+            playback.current_item = playback.next()
+            playback.save()
+            played.append(playback.current_item.item_id)
+
+        # items appended while the appended items are played are shuffled after them
+        self.assertTrue(playback.append_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id=f"c{i}")
+                                               for i in range(5)], playback.queue_generation))
+
+        playback = get_playback(USER_ID)
+        next_item = playback.next()
+        while next_item is not None:
+            played.append(next_item.item_id)
+            playback.current_item = next_item
+            next_item = playback.next()
+
+        # every item is played once, the items which were already shuffled are played first
+        self.assertEqual(playback.shuffle_segments, "10,22")
+        self.assertCountEqual(played, [f"a{i}" for i in range(10)] + [f"b{i}" for i in range(12)]
+                              + [f"c{i}" for i in range(5)])
+        self.assertCountEqual(played[:10], [f"a{i}" for i in range(10)])
+        self.assertCountEqual(played[10:22], [f"b{i}" for i in range(12)])
+
+        # the whole shuffled order is played backwards
+        for item_id in reversed(played[:-1]):
+            playback.current_item = playback.previous()
+            self.assertEqual(playback.current_item.item_id, item_id)
+        self.assertIsNone(playback.previous())
+
+
+class TestPackedQueue(unittest.TestCase):
+    def setUp(self) -> None:
+        connect_db()
+        migrate_queue_storage(QueueStorage.PACKED)
+
+        self.playback = get_playback(USER_ID)
+        self.items = [QueueItem(idx=i, media_type=MediaType.AUDIO, item_id=f"{i:032x}") for i in range(10)]
+        self.playback.set_queue(self.items)
+
+    def tearDown(self) -> None:
+        migrate_queue_storage(QueueStorage.ROWS)
+        db.close()
+
+    def test_set_queue(self):
+        self.assertTrue(self.playback.is_packed)
+        self.assertEqual(QueueItem.select().count(), 0)
+        self.assertEqual(self.playback.get_queue_length(), len(self.items))
+
+        playback = get_playback(USER_ID)
+        self.assertEqual(playback.current_item.item_id, self.items[0].item_id)
+        self.assertEqual(playback.current_item.media_type, MediaType.AUDIO)
+        self.assertEqual([item.item_id for item in playback.get_queue()], [item.item_id for item in self.items])
+
+    def test_set_queue_not_packable(self):
+        # item ids which are not Jellyfin item ids are stored as rows
+        self.playback.set_queue([QueueItem(idx=i, media_type=MediaType.AUDIO, item_id=f"abc{i}") for i in range(3)])
+
+        self.assertFalse(self.playback.is_packed)
+        self.assertEqual(self.playback.current_item.item_id, "abc0")
+        self.assertEqual(self.playback.next().item_id, "abc1")
+
+    def test_next_previous(self):
+        for item in self.items[1:]:
+            next_item = self.playback.next()
+            self.assertEqual(next_item.item_id, item.item_id)
+            self.playback.current_item = next_item
+            self.playback.save()
+
+        self.assertIsNone(self.playback.next())
+
+        for item in reversed(self.items[:-1]):
+            prev_item = self.playback.previous()
+            self.assertEqual(prev_item.item_id, item.item_id)
+            self.playback.current_item = prev_item
+
+        self.assertIsNone(self.playback.previous())
+
+        self.playback.loop_all = True
+        self.assertEqual(self.playback.previous().item_id, self.items[-1].item_id)
+
+    def test_next_shuffle(self):
+        self.playback.set_shuffle(True)
+
+        shuffled = [self.playback.current_item.item_id]
+        next_item = self.playback.next()
+        while next_item is not None:
+            shuffled.append(next_item.item_id)
+            self.playback.current_item = next_item
+            next_item = self.playback.next()
+
+        self.assertEqual(shuffled[0], self.items[0].item_id)
+        self.assertCountEqual(shuffled, [item.item_id for item in self.items])
+
+    def test_position_saved(self):
+        self.playback.current_item = self.playback.next()
+        self.playback.save()
+
+        self.assertEqual(get_playback(USER_ID).current_item.idx, 1)
+
+    def test_migrate(self):
+        self.playback.current_item = self.playback.get_item(3)
+        self.playback.save()
+
+        migrate_queue_storage(QueueStorage.ROWS)
+
+        playback = get_playback(USER_ID)
+        self.assertFalse(playback.is_packed)
+        self.assertEqual(QueueItem.select().where(QueueItem.playback == playback).count(), len(self.items))
+        self.assertEqual(playback.current_item.item_id, self.items[3].item_id)
+
+        migrate_queue_storage(QueueStorage.PACKED)
+
+        playback = get_playback(USER_ID)
+        self.assertTrue(playback.is_packed)
+        self.assertEqual(QueueItem.select().count(), 0)
+        self.assertEqual(playback.current_item.item_id, self.items[3].item_id)
+        self.assertEqual(playback.next().item_id, self.items[4].item_id)
+
+    def test_append_queue(self):
+        items = [QueueItem(idx=i, media_type=MediaType.AUDIO, item_id=f"{i:032x}") for i in range(10, 12)]
+        self.assertTrue(self.playback.append_queue(items, self.playback.queue_generation))
+
+        playback = get_playback(USER_ID)
+        self.assertTrue(playback.is_packed)
+        self.assertEqual(playback.get_queue_length(), 12)
+        self.assertEqual(playback.get_item(11).item_id, items[1].item_id)
+        self.assertEqual(playback.current_item.item_id, self.items[0].item_id)
+
+        # items which can not be packed convert the queue to rows
+        self.assertTrue(playback.append_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id="abc")],
+                                              playback.queue_generation))
+
+        playback = get_playback(USER_ID)
+        self.assertFalse(playback.is_packed)
+        self.assertEqual(playback.get_queue_length(), 13)
+        self.assertEqual(playback.get_item(12).item_id, "abc")
+        self.assertEqual(playback.current_item.item_id, self.items[0].item_id)
+
+    def test_append_cleared_queue(self):
+        queue_generation = self.playback.queue_generation
+        self.playback.clear_queue()
+
+        self.assertFalse(self.playback.append_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id=f"{0:032x}")],
+                                                    queue_generation))
+        self.assertEqual(get_playback(USER_ID).get_queue_length(), 0)
+
+    def test_migrate_columns(self):
+        db.execute_sql('ALTER TABLE "Playback" DROP COLUMN "queue_position"')
+        db.execute_sql('ALTER TABLE "Playback" DROP COLUMN "packed_queue"')
+        db.execute_sql('ALTER TABLE "Playback" DROP COLUMN "queue_generation"')
+        db.execute_sql('ALTER TABLE "Playback" DROP COLUMN "shuffle_length"')
+        db.execute_sql('ALTER TABLE "Playback" DROP COLUMN "shuffle_segments"')
+
+        migrate_playback_columns()
+
+        columns = [column.name for column in db.get_columns("Playback")]
+        self.assertIn("packed_queue", columns)
+        self.assertIn("queue_position", columns)
+        self.assertIn("queue_generation", columns)
+        self.assertIn("shuffle_length", columns)
+        self.assertIn("shuffle_segments", columns)
+
 
 if __name__ == "__main__":
     unittest.main()
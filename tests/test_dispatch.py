@@ -0,0 +1,90 @@
+import unittest
+
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_model import Context, Device, Intent, IntentRequest, LaunchRequest, RequestEnvelope, SessionEndedRequest, \
+    SupportedInterfaces
+from ask_sdk_model.interfaces.audioplayer import AudioPlayerInterface, PlaybackFailedRequest, \
+    PlaybackFinishedRequest, PlaybackNearlyFinishedRequest, PlaybackStartedRequest, PlaybackStoppedRequest
+from ask_sdk_model.interfaces.system import SystemState
+from ask_sdk_runtime.dispatch_components import GenericRequestMapper
+
+from jellyfin_alexa_skill.alexa.dispatch import IndexedRequestMapper, get_dispatch_key
+from jellyfin_alexa_skill.alexa.handler import CheckAudioInterfaceHandler, get_skill_builder
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
+
+REQUESTS = [LaunchRequest(), SessionEndedRequest(), PlaybackStartedRequest(), PlaybackStoppedRequest(),
+            PlaybackFinishedRequest(), PlaybackNearlyFinishedRequest(), PlaybackFailedRequest()]
+
+
+def build_handler_input(request, audio_player: bool = True) -> HandlerInput:
+    device = Device(supported_interfaces=SupportedInterfaces(
+        audio_player=AudioPlayerInterface() if audio_player else None))
+
+    return HandlerInput(request_envelope=RequestEnvelope(context=Context(system=SystemState(device=device)),
+                                                         request=request))
+
+
+class TestIndexedRequestMapper(unittest.TestCase):
+    def setUp(self) -> None:
+        skill_builder = get_skill_builder(JellyfinClient(server_endpoint="http://localhost:8096"))
+        chains = skill_builder.runtime_configuration_builder.request_handler_chains
+
+        self.generic_mapper = GenericRequestMapper(request_handler_chains=chains)
+        self.indexed_mapper = IndexedRequestMapper(request_handler_chains=chains)
+
+        self.intent_names = sorted({key for chain in chains
+                                    for key in getattr(chain.request_handler, "dispatch_keys", None) or ()
+                                    if key not in {request.object_type for request in REQUESTS}})
+
+    def test_skill_builder(self):
+        skill_configuration = get_skill_builder(JellyfinClient(server_endpoint="http://localhost:8096")) \
+            .skill_configuration
+        self.assertIsInstance(skill_configuration.request_mappers[0], IndexedRequestMapper)
+
+    def test_dispatch_key(self):
+        self.assertEqual(get_dispatch_key(build_handler_input(IntentRequest(intent=Intent(name="PlaySongIntent")))),
+                         "PlaySongIntent")
+        self.assertEqual(get_dispatch_key(build_handler_input(PlaybackStartedRequest())),
+                         "AudioPlayer.PlaybackStarted")
+
+    def test_same_handler(self):
+        handler_inputs = [build_handler_input(IntentRequest(intent=Intent(name=name))) for name in self.intent_names]
+        handler_inputs += [build_handler_input(request) for request in REQUESTS]
+        handler_inputs.append(build_handler_input(IntentRequest(intent=Intent(name="UnknownIntent"))))
+
+        for audio_player in (True, False):
+            for handler_input in handler_inputs:
+                handler_input.request_envelope.context.system.device.supported_interfaces.audio_player = \
+                    AudioPlayerInterface() if audio_player else None
+
+                with self.subTest(key=get_dispatch_key(handler_input), audio_player=audio_player):
+                    chain = self.indexed_mapper.get_request_handler_chain(handler_input)
+                    self.assertIs(chain, self.generic_mapper.get_request_handler_chain(handler_input))
+
+                    if not audio_player:
+                        self.assertIsInstance(chain.request_handler, CheckAudioInterfaceHandler)
+                    elif get_dispatch_key(handler_input) == "UnknownIntent":
+                        self.assertIsNone(chain)
+                    else:
+                        self.assertIn(get_dispatch_key(handler_input), chain.request_handler.dispatch_keys)
+
+    def test_dispatch_keys(self):
+        # the handlers can handle exactly the requests of their dispatch keys, otherwise a request which the handler
+        # can handle is never dispatched to it
+        handler_inputs = [build_handler_input(IntentRequest(intent=Intent(name=name))) for name in self.intent_names]
+        handler_inputs += [build_handler_input(request) for request in REQUESTS]
+        handler_inputs.append(build_handler_input(IntentRequest(intent=Intent(name="UnknownIntent"))))
+
+        for chain in self.indexed_mapper.request_handler_chains:
+            dispatch_keys = getattr(chain.request_handler, "dispatch_keys", None)
+            if dispatch_keys is None:
+                continue
+
+            for handler_input in handler_inputs:
+                key = get_dispatch_key(handler_input)
+                with self.subTest(handler=type(chain.request_handler).__name__, key=key):
+                    self.assertEqual(chain.request_handler.can_handle(handler_input), key in dispatch_keys)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.database.idempotency import CACHED_RESPONSES, IdempotencyCache, WAIT_TIMEOUTS, \
+    get_body_hash, get_request, get_request_id
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.request import RequestResponse
+from tests.test_router import build_event, encode
+
+REQUEST_ID = "amzn1.echo-api.request.99999999-8888-7777-6666-555555555555"
+RESPONSE = '{"version": "1.0", "response": {}}'
+
+
+class TestIdempotencyCache(unittest.TestCase):
+    def setUp(self) -> None:
+        # the requests are handled in other threads with their own connections
+        fd, self.db_path = tempfile.mkstemp(suffix=".sqlite")
+        os.close(fd)
+        db.initialize(SqliteDatabase(self.db_path))
+        db.connect(reuse_if_open=True)
+        db.create_tables([RequestResponse], safe=True)
+
+        self.cache = IdempotencyCache(ttl=60, wait=1, poll_interval=0.01)
+        self.body = encode(build_event("LaunchRequest"))
+        self.body_hash = get_body_hash(self.body)
+
+    def tearDown(self) -> None:
+        db.close()
+        os.remove(self.db_path)
+
+    def test_get_request_id(self):
+        self.assertEqual(get_request_id(self.body), REQUEST_ID)
+        self.assertIsNone(get_request_id(b"not a request"))
+        self.assertIsNone(get_request_id(b"[]"))
+        self.assertIsNone(get_request_id(b"{}"))
+
+    def test_get_request(self):
+        self.assertEqual(get_request(self.body)["type"], "LaunchRequest")
+        self.assertIsNone(get_request(b"{\"request\": []}"))
+
+    def test_retried_request(self):
+        hits = CACHED_RESPONSES.value
+
+        self.assertTrue(self.cache.claim(REQUEST_ID, self.body_hash))
+        self.cache.complete(REQUEST_ID, RESPONSE)
+
+        self.assertFalse(self.cache.claim(REQUEST_ID, self.body_hash))
+        self.assertEqual(self.cache.wait(REQUEST_ID, self.body_hash), RESPONSE)
+        self.assertEqual(CACHED_RESPONSES.value, hits + 1)
+
+    def test_other_body(self):
+        self.assertTrue(self.cache.claim(REQUEST_ID, self.body_hash))
+        self.cache.complete(REQUEST_ID, RESPONSE)
+
+        # a request with the same request id, but another body does not get the response
+        body_hash = get_body_hash(encode(build_event("SessionEndedRequest")))
+        self.assertFalse(self.cache.claim(REQUEST_ID, body_hash))
+        self.assertIsNone(self.cache.wait(REQUEST_ID, body_hash))
+
+    def test_released_request(self):
+        self.assertTrue(self.cache.claim(REQUEST_ID, self.body_hash))
+        self.cache.release(REQUEST_ID)
+
+        # the failed request is handled again
+        self.assertTrue(self.cache.claim(REQUEST_ID, self.body_hash))
+
+    def test_wait_for_handled_request(self):
+        self.assertTrue(self.cache.claim(REQUEST_ID, self.body_hash))
+
+        def handle_request():
+            db.connect(reuse_if_open=True)
+            try:
+                time.sleep(0.1)
+                self.cache.complete(REQUEST_ID, RESPONSE)
+            finally:
+                db.close()
+
+        thread = threading.Thread(target=handle_request)
+        thread.start()
+        try:
+            self.assertEqual(self.cache.wait(REQUEST_ID, self.body_hash), RESPONSE)
+        finally:
+            thread.join()
+
+    def test_wait_timeout(self):
+        timeouts = WAIT_TIMEOUTS.value
+        self.cache.wait_time = 0.05
+
+        self.assertTrue(self.cache.claim(REQUEST_ID, self.body_hash))
+        # the still handled request is not handled a second time
+        with self.assertRaises(TimeoutError):
+            self.cache.wait(REQUEST_ID, self.body_hash)
+        self.assertEqual(WAIT_TIMEOUTS.value, timeouts + 1)
+
+    def test_expired_response(self):
+        self.assertTrue(self.cache.claim(REQUEST_ID, self.body_hash))
+        self.cache.complete(REQUEST_ID, RESPONSE)
+        RequestResponse.update(created=time.time() - 61).execute()
+
+        self.assertTrue(self.cache.claim(REQUEST_ID, self.body_hash))
+
+
+if __name__ == "__main__":
+    unittest.main()
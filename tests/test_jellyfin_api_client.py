@@ -1,8 +1,10 @@
 import unittest
 from collections import OrderedDict
+from unittest import mock
 
 import requests
 
+from jellyfin_alexa_skill.jellyfin.api.async_client import AsyncJellyfinClient, run_concurrently
 from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
 
 AUDIO_MEDIA_IDS = [
@@ -140,6 +142,28 @@ class TestJellyfinApiClient(unittest.TestCase):
         except requests.exceptions.ConnectionError as e:
             self.assertTrue(True)
 
+    def test_preconnect(self):
+        """
+        Test if the pooled connections are reopened and usable after a preconnect.
+        """
+
+        client = JellyfinClient(server_endpoint="http://localhost:8096", pool_size=2, pool_idle_timeout=0)
+
+        client.preconnect()
+
+        # with an idle timeout of 0 the connections are discarded before each request, which must not fail
+        for _ in range(3):
+            self.assertIsNotNone(client.public_info())
+
+    def test_preconnect_server_not_reachable(self):
+        """
+        Test if a preconnect to an unreachable server does not raise an exception.
+        """
+
+        client = JellyfinClient(server_endpoint="http://localhost:1")
+
+        client.preconnect()
+
     def test_get_stream_url(self):
         # TODO: implement
         pass
@@ -385,5 +409,75 @@ class TestJellyfinApiClient(unittest.TestCase):
         self.assertFalse(result["IsFavorite"])
 
 
+class TestPooledSession(unittest.TestCase):
+    def test_default_timeout(self):
+        """
+        Test if requests without a timeout use the default timeout of the client and explicit timeouts are kept.
+        """
+
+        client = JellyfinClient(server_endpoint="http://localhost:8096", timeout=5)
+
+        with mock.patch.object(requests.Session, "request") as request:
+            client.session.get("http://localhost:8096/System/Info/Public")
+            self.assertEqual(request.call_args[1]["timeout"], 5)
+
+            client.session.get("http://localhost:8096/System/Info/Public", timeout=1)
+            self.assertEqual(request.call_args[1]["timeout"], 1)
+
+    def test_pool_not_blocking(self):
+        """
+        Test if the connection pool opens additional connections instead of blocking when all connections are in use.
+        """
+
+        client = JellyfinClient(server_endpoint="http://localhost:8096", pool_size=2)
+
+        self.assertFalse(client.session.get_adapter("http://localhost:8096")._pool_block)
+
+
+class TestAsyncJellyfinApiClient(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.client = JellyfinClient(server_endpoint="http://localhost:8096")
+        cls.async_client = AsyncJellyfinClient(cls.client)
+        cls.user_id, cls.token = cls.client.get_auth_token(USERNAME, PASSWORD)
+
+    def test_concurrent_requests(self):
+        """
+        Test if concurrent requests return the same results as the synchronous client.
+        """
+
+        songs, artists = run_concurrently(
+            self.async_client.search_media_items(user_id=self.user_id,
+                                                 token=self.token,
+                                                 term="song title",
+                                                 media=MediaType.AUDIO),
+            self.async_client.search_artist(user_id=self.user_id,
+                                            token=self.token,
+                                            term="artist")
+        )
+
+        sync_songs = self.client.search_media_items(user_id=self.user_id,
+                                                    token=self.token,
+                                                    term="song title",
+                                                    media=MediaType.AUDIO)
+        sync_artists = self.client.search_artist(user_id=self.user_id,
+                                                 token=self.token,
+                                                 term="artist")
+
+        self.assertEqual([item["Id"] for item in songs], [item["Id"] for item in sync_songs])
+        self.assertEqual([item["Id"] for item in artists], [item["Id"] for item in sync_artists])
+
+    def test_concurrent_requests_error(self):
+        """
+        Test if an error of a concurrent request is raised.
+        """
+
+        client = AsyncJellyfinClient(JellyfinClient(server_endpoint="http://localhost:1"))
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            run_concurrently(client.public_info(), client.public_info())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,348 @@
+import time
+import unittest
+
+import requests
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+from jellyfin_alexa_skill.library.catalog import Catalog
+from jellyfin_alexa_skill.library.index import BaseLibraryIndex, IndexView, LibraryIndex
+from jellyfin_alexa_skill.library.normalize import normalize, tokenize
+from jellyfin_alexa_skill.library.sync import LibrarySync
+
+USER_ID = "a8e5cac72a3a4ad8a3069f95b4a811ee"
+OTHER_USER_ID = "2c4d1f4e8e2b4c0c9d5f0a7c3b6e1d9f"
+
+ARTIST = {"Id": "artist1", "Name": "Kevin MacLeod", "Type": "MusicArtist"}
+ITEMS = [
+    {"Id": "song1", "Name": "Monkeys Spinning Monkeys", "Type": "Audio", "MediaType": "Audio", "IsFolder": False,
+     "ArtistItems": [{"Id": "artist1", "Name": "Kevin MacLeod"}], "UserData": {"PlayCount": 3}},
+    {"Id": "song2", "Name": "Sneaky Snitch", "Type": "Audio", "MediaType": "Audio", "IsFolder": False,
+     "ArtistItems": [{"Id": "artist1", "Name": "Kevin MacLeod"}]},
+    {"Id": "song3", "Name": "Café Snacks", "Type": "Audio", "MediaType": "Audio", "IsFolder": False},
+    {"Id": "album1", "Name": "Monkeys", "Type": "MusicAlbum", "IsFolder": True},
+    {"Id": "video1", "Name": "Monkeys at the Zoo", "Type": "Video", "MediaType": "Video", "IsFolder": False},
+    ARTIST
+]
+
+
+class FakeJellyfinClient(JellyfinClient):
+    def __init__(self, library_index: LibraryIndex):
+        super().__init__(server_endpoint="http://localhost:8096", library_index=library_index)
+        self.items = [dict(item, DateLastSaved="2020-01-01T00:00:00Z") for item in ITEMS]
+        self.requests = []
+
+    def _get_page(self, items, start_index=0, limit=None, MinDateLastSaved=None):
+        if MinDateLastSaved is not None:
+            items = [item for item in items if item["DateLastSaved"] >= MinDateLastSaved]
+        end_index = len(items) if limit is None else start_index + limit
+        return items[start_index:end_index], len(items)
+
+    def get_library_items(self, user_id: str, token: str, item_types=None, start_index=0, limit=None, **kwargs):
+        self.requests.append(("items", start_index, limit, kwargs))
+        return self._get_page([item for item in self.items if item["Type"] != "MusicArtist"],
+                              start_index, limit, **kwargs)
+
+    def get_artists(self, user_id: str, token: str, start_index=0, limit=None, **kwargs):
+        self.requests.append(("artists", start_index, limit, kwargs))
+        return self._get_page([item for item in self.items if item["Type"] == "MusicArtist"],
+                              start_index, limit, **kwargs)
+
+
+class TestNormalize(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize("  Café  del_Mar!"), "cafe del mar")
+        self.assertEqual(normalize("ÄÖÜ"), "aou")
+
+    def test_normalize_scripts(self):
+        # full-width and half-width variants
+        self.assertEqual(normalize("ＡＢＣ　１２３"), "abc 123")
+        self.assertEqual(normalize("ｶﾀｶﾅ"), normalize("カタカナ"))
+        # katakana and hiragana, the voiced kana are kept
+        self.assertEqual(normalize("カタカナ"), "かたかな")
+        self.assertEqual(normalize("ガッコウ"), "がっこう")
+        # arabic diacritics, tatweel and letter variants
+        self.assertEqual(normalize("مُحَمَّد"), "محمد")
+        self.assertEqual(normalize("عـربي"), "عربي")
+        self.assertEqual(normalize("أحمد"), normalize("احمد"))
+        # the vowel signs of devanagari are part of the words, the nukta is removed
+        self.assertEqual(normalize("हिन्दी गाना"), "हिन्दी गाना")
+        self.assertEqual(normalize("क़िस्मत"), normalize("किस्मत"))
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Monkeys-Spinning  Monkeys"), ("monkeys", "spinning", "monkeys"))
+        self.assertEqual(tokenize("!?"), ())
+
+    def test_tokenize_unsegmented(self):
+        # runs of kana and han characters are split into bigrams
+        self.assertEqual(tokenize("東京事変"), ("東京", "京事", "事変"))
+        self.assertEqual(tokenize("B'z 東京 live"), ("b", "z", "東京", "live"))
+        self.assertEqual(tokenize("雨"), ("雨",))
+
+
+class TestCatalog(unittest.TestCase):
+    def test_add_and_replace(self):
+        catalog = Catalog()
+
+        slot, previous_item = catalog.add(ITEMS[0])
+        self.assertIsNone(previous_item)
+        self.assertEqual(catalog.slot("song1"), slot)
+        # fields which are not needed for the search are dropped
+        self.assertNotIn("UserData", catalog.get(slot))
+
+        same_slot, previous_item = catalog.add({"Id": "song1", "Name": "Renamed"})
+        self.assertEqual(same_slot, slot)
+        self.assertEqual(previous_item["Name"], "Monkeys Spinning Monkeys")
+        self.assertEqual(len(catalog), 1)
+
+    def test_remove_reuses_slot(self):
+        catalog = Catalog()
+
+        slot, _ = catalog.add(ITEMS[0])
+        catalog.add(ITEMS[1])
+        catalog.remove(slot)
+        self.assertIsNone(catalog.slot("song1"))
+        self.assertEqual(len(catalog), 1)
+
+        new_slot, _ = catalog.add(ITEMS[2])
+        self.assertEqual(new_slot, slot)
+
+
+class TestLibraryIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.library_index = LibraryIndex(max_age=60)
+        self.library_index.update_user(USER_ID, ITEMS)
+
+    def test_search(self):
+        results = self.library_index.search(USER_ID, "monkeys", ["Audio"])
+        self.assertEqual([item["Id"] for item in results], ["song1"])
+
+        # every word of the term has to be a prefix of a word in the name
+        results = self.library_index.search(USER_ID, "spin monk", ["Audio"])
+        self.assertEqual([item["Id"] for item in results], ["song1"])
+        self.assertEqual(self.library_index.search(USER_ID, "spinning cats", ["Audio"]), [])
+
+        # case and diacritics are ignored
+        results = self.library_index.search(USER_ID, "CAFE", ["Audio"])
+        self.assertEqual([item["Id"] for item in results], ["song3"])
+
+    def test_search_item_types(self):
+        results = self.library_index.search(USER_ID, "monkey", ["Audio", "MusicAlbum", "Video"])
+        # the best match comes first
+        self.assertEqual(results[0]["Id"], "album1")
+        self.assertEqual(set(item["Id"] for item in results), {"song1", "album1", "video1"})
+
+        results = self.library_index.search(USER_ID, "monkey", ["Audio", "MusicAlbum"], is_folder=True)
+        self.assertEqual([item["Id"] for item in results], ["album1"])
+
+        results = self.library_index.search(USER_ID, "monkey", ["Audio", "MusicAlbum", "Video"], limit=2)
+        self.assertEqual(len(results), 2)
+
+    def test_search_keys(self):
+        self.library_index.add_items(USER_ID, [{"Id": "artist2", "Name": "AC/DC", "Type": "MusicArtist"},
+                                               {"Id": "artist3", "Name": "Beyoncé", "Type": "MusicArtist"},
+                                               {"Id": "artist4", "Name": "Maroon 5", "Type": "MusicArtist"}])
+
+        # an equal name is returned without the items which only contain the words
+        results = self.library_index.search(USER_ID, "Monkeys", ["Audio", "MusicAlbum", "Video"])
+        self.assertEqual([item["Id"] for item in results], ["album1"])
+
+        results = self.library_index.search(USER_ID, "ac dc", ["MusicArtist"])
+        self.assertEqual([item["Id"] for item in results], ["artist2"])
+        results = self.library_index.search(USER_ID, "maroon five", ["MusicArtist"])
+        self.assertEqual([item["Id"] for item in results], ["artist4"])
+
+        # names which sound like the term are only searched if no name contains the words
+        results = self.library_index.search(USER_ID, "beyonsay", ["MusicArtist"])
+        self.assertEqual([item["Id"] for item in results], ["artist3"])
+
+    def test_search_unsegmented(self):
+        self.library_index.add_items(USER_ID, [{"Id": "song4", "Name": "東京事変の歌", "Type": "Audio"},
+                                               {"Id": "song5", "Name": "ｶﾀｶﾅ ｿﾝｸﾞ", "Type": "Audio"}])
+
+        # words inside a run of han characters and katakana written in hiragana
+        results = self.library_index.search(USER_ID, "事変", ["Audio"])
+        self.assertEqual([item["Id"] for item in results], ["song4"])
+        results = self.library_index.search(USER_ID, "かたかな", ["Audio"])
+        self.assertEqual([item["Id"] for item in results], ["song5"])
+
+    def test_search_returns_copies(self):
+        results = self.library_index.search(USER_ID, "sneaky", ["Audio"])
+        results[0]["Name"] = "changed"
+
+        results = self.library_index.search(USER_ID, "sneaky", ["Audio"])
+        self.assertEqual(results[0]["Name"], "Sneaky Snitch")
+
+    def test_visibility(self):
+        self.library_index.update_user(OTHER_USER_ID, ITEMS[:1])
+
+        self.assertEqual(self.library_index.search(OTHER_USER_ID, "sneaky", ["Audio"]), [])
+        self.assertEqual(len(self.library_index.search(OTHER_USER_ID, "monkeys", ["Audio"])), 1)
+        # the catalog stores the shared items once
+        self.assertEqual(len(self.library_index), len(ITEMS))
+
+    def test_update_removes_invisible_items(self):
+        self.library_index.update_user(OTHER_USER_ID, ITEMS[:1])
+        self.library_index.update_user(USER_ID, ITEMS[2:])
+
+        # song1 is still visible to the other user, song2 is not visible to any user
+        self.assertEqual(len(self.library_index), len(ITEMS) - 1)
+        self.assertEqual(self.library_index.search(USER_ID, "monkeys", ["Audio"]), [])
+        self.assertEqual(self.library_index.search(USER_ID, "sneaky", ["Audio"]), [])
+
+        self.library_index.remove_user(OTHER_USER_ID)
+        self.assertEqual(len(self.library_index), len(ITEMS) - 2)
+        self.assertIsNone(self.library_index.search(OTHER_USER_ID, "monkeys", ["Audio"]))
+
+    def test_renamed_item(self):
+        self.library_index.update_user(USER_ID, [{"Id": "song2", "Name": "Loud Snitch", "Type": "Audio"}])
+
+        self.assertEqual(self.library_index.search(USER_ID, "sneaky", ["Audio"]), [])
+        self.assertEqual(len(self.library_index.search(USER_ID, "loud", ["Audio"])), 1)
+
+    def test_abstract_base_classes(self):
+        # the search needs the storage of a subclass
+        self.assertRaises(TypeError, BaseLibraryIndex)
+        self.assertRaises(TypeError, IndexView)
+
+    def test_stale(self):
+        self.assertIsNone(self.library_index.search(OTHER_USER_ID, "monkeys", ["Audio"]))
+
+        self.library_index.max_age = 0.01
+        time.sleep(0.02)
+        self.assertFalse(self.library_index.is_fresh(USER_ID))
+        self.assertIsNone(self.library_index.search(USER_ID, "monkeys", ["Audio"]))
+
+
+class TestClientLibraryIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.library_index = LibraryIndex(max_age=60)
+        self.client = FakeJellyfinClient(self.library_index)
+
+    def test_search_uses_index(self):
+        self.library_index.update_user(USER_ID, ITEMS)
+
+        results = self.client.search_media_items(user_id=USER_ID,
+                                                 token="token",
+                                                 term="sneaky",
+                                                 media=MediaType.AUDIO,
+                                                 Filters="IsNotFolder")
+        self.assertEqual([item["Id"] for item in results], ["song2"])
+
+        results = self.client.search_media_items(user_id=USER_ID,
+                                                 token="token",
+                                                 term="monkeys",
+                                                 media=MediaType.VIDEO)
+        self.assertEqual([item["Id"] for item in results], ["video1"])
+
+        results = self.client.search_artist(user_id=USER_ID, token="token", term="macleod")
+        self.assertEqual([item["Id"] for item in results], ["artist1"])
+
+    def test_stale_index(self):
+        self.assertIsNone(self.client._search_library(USER_ID, "token", "sneaky", ["Audio"], 20))
+
+        self.library_index.update_user(USER_ID, ITEMS)
+        self.assertEqual(len(self.client._search_library(USER_ID, "token", "sneaky", ["Audio"], 20)), 1)
+        # a miss of the index is searched on the server
+        self.assertIsNone(self.client._search_library(USER_ID, "token", "unknown", ["Audio"], 20))
+
+    def test_unsupported_parameters(self):
+        self.library_index.update_user(USER_ID, ITEMS)
+
+        self.assertIsNone(self.client._search_library(USER_ID, "token", "sneaky", ["Audio"], 20, SortBy="Random"))
+        self.assertIsNone(self.client._search_library(USER_ID, "token", "sneaky", ["Audio"], 20,
+                                                      Filters="IsFavorite"))
+
+
+class TestLibrarySync(unittest.TestCase):
+    def setUp(self) -> None:
+        db.initialize(SqliteDatabase(":memory:"))
+        db.connect(reuse_if_open=True)
+        db.create_tables([User], safe=True)
+
+        User.create(alexa_auth_token="alexa_token", jellyfin_user_id=USER_ID, jellyfin_token="token")
+
+        self.library_index = LibraryIndex(max_age=60)
+        self.client = FakeJellyfinClient(self.library_index)
+        self.library_sync = LibrarySync(self.client, self.library_index, page_size=2)
+
+    def tearDown(self) -> None:
+        db.close()
+
+    def test_full_sync(self):
+        self.assertEqual(self.library_sync.sync_all(), 1)
+
+        self.assertTrue(self.library_index.is_fresh(USER_ID))
+        self.assertEqual(self.library_index.item_count(USER_ID), len(ITEMS))
+        # the items are fetched page by page
+        self.assertEqual([request[:3] for request in self.client.requests],
+                         [("items", 0, 2), ("items", 2, 2), ("items", 4, 2), ("artists", 0, 2)])
+
+    def test_delta_sync(self):
+        self.library_sync.sync_all()
+        self.client.requests.clear()
+
+        self.client.items[0] = dict(self.client.items[0], Name="Renamed Song", DateLastSaved="2999-01-01T00:00:00Z")
+        self.client.items.append({"Id": "song4", "Name": "New Song", "Type": "Audio", "IsFolder": False,
+                                  "DateLastSaved": "2999-01-01T00:00:00Z"})
+        self.assertEqual(self.library_sync.sync_user(USER_ID, "token"), 2)
+
+        # only the changed items and the total numbers of items are fetched
+        self.assertTrue(all("MinDateLastSaved" in request[3] or request[2] == 0 for request in self.client.requests))
+        self.assertEqual(self.library_index.item_count(USER_ID), len(ITEMS) + 1)
+        self.assertEqual([item["Id"] for item in self.library_index.search(USER_ID, "song", ["Audio"])],
+                         ["song4", "song1"])
+
+    def test_delta_sync_detects_deletions(self):
+        self.library_sync.sync_all()
+
+        del self.client.items[1]
+        self.library_sync.sync_user(USER_ID, "token")
+
+        self.assertEqual(self.library_index.item_count(USER_ID), len(ITEMS) - 1)
+        self.assertEqual(self.library_index.search(USER_ID, "sneaky", ["Audio"]), [])
+
+    def test_full_sync_interval(self):
+        self.library_sync.sync_all()
+
+        # an item is deleted and an unchanged item becomes accessible, e.g. by a changed library access, the number of
+        # items does not change, so only the next full sync finds the changes
+        self.client.items[1] = {"Id": "song5", "Name": "Other Song", "Type": "Audio", "IsFolder": False,
+                                "DateLastSaved": "2020-01-01T00:00:00Z"}
+        self.library_sync.sync_user(USER_ID, "token")
+        self.assertEqual(len(self.library_index.search(USER_ID, "sneaky", ["Audio"])), 1)
+
+        self.library_sync.full_sync_interval = 0
+        self.library_sync.sync_user(USER_ID, "token")
+        self.assertEqual(self.library_index.search(USER_ID, "sneaky", ["Audio"]), [])
+        self.assertEqual([item["Id"] for item in self.library_index.search(USER_ID, "other", ["Audio"])], ["song5"])
+
+    def test_unlinked_user(self):
+        self.library_sync.sync_all()
+
+        User.delete().execute()
+        self.library_sync.sync_all()
+
+        self.assertEqual(len(self.library_index), 0)
+        self.assertIsNone(self.library_index.search(USER_ID, "monkeys", ["Audio"]))
+
+    def test_invalid_token(self):
+        User.create(alexa_auth_token="other_alexa_token", jellyfin_user_id=USER_ID, jellyfin_token="valid_token")
+
+        def get_library_items(user_id, token, **kwargs):
+            if token != "valid_token":
+                response = requests.Response()
+                response.status_code = 401
+                raise requests.HTTPError(response=response)
+            return FakeJellyfinClient.get_library_items(self.client, user_id, token, **kwargs)
+
+        self.client.get_library_items = get_library_items
+
+        self.assertEqual(self.library_sync.sync_all(), 1)
+        self.assertTrue(self.library_index.is_fresh(USER_ID))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.alexa.loader import QueueLoader
+from jellyfin_alexa_skill.database.db import get_playback
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+from tests.test_cache import FakeResponse, TOKEN
+
+USER_ID = "123456id"
+JELLYFIN_USER_ID = "a8e5cac72a3a4ad8a3069f95b4a811ee"
+
+ITEMS = [{"Id": f"{i:032x}", "Name": f"song {i}", "MediaType": "Audio"} for i in range(25)]
+
+
+def get_page(url, headers=None, params=None):
+    start_index = params["StartIndex"]
+    return FakeResponse({"Items": ITEMS[start_index:start_index + params["Limit"]]})
+
+
+class TestPagedListing(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = JellyfinClient(server_endpoint="http://localhost:8096")
+
+    def test_pages(self):
+        with mock.patch.object(self.client.session, "get", side_effect=get_page) as get:
+            items = self.client.iter_favorites(JELLYFIN_USER_ID, TOKEN, MediaType.AUDIO, page_size=10)
+            self.assertEqual(get.call_count, 0)
+
+            # the pages are requested when they are consumed
+            self.assertEqual(next(items), ITEMS[0])
+            self.assertEqual(get.call_count, 1)
+
+            self.assertEqual([items_info["Id"] for items_info in items], [item["Id"] for item in ITEMS[1:]])
+            self.assertEqual([call[1]["params"]["StartIndex"] for call in get.call_args_list], [0, 10, 20])
+            self.assertEqual(get.call_args[1]["params"]["IncludeItemTypes"], "Audio")
+
+    def test_listings(self):
+        with mock.patch.object(self.client.session, "get", side_effect=get_page) as get:
+            items = self.client.iter_artist_items(JELLYFIN_USER_ID, TOKEN, "artist1", MediaType.AUDIO, page_size=25)
+            self.assertEqual(len(list(items)), 25)
+            self.assertEqual(get.call_args[1]["params"]["ArtistIds"], "artist1")
+            # a full page is followed by a request of the next, empty page
+            self.assertEqual(get.call_count, 2)
+
+            self.assertEqual(len(list(self.client.iter_playlist_items(JELLYFIN_USER_ID, TOKEN, "playlist1"))), 25)
+            self.assertEqual(get.call_args[0][0], "http://localhost:8096/Playlists/playlist1/Items")
+
+
+class TestQueueLoader(unittest.TestCase):
+    def setUp(self) -> None:
+        # the queue is loaded in another thread, which needs its own connection to the same database
+        self.directory = tempfile.TemporaryDirectory()
+        db.initialize(SqliteDatabase(os.path.join(self.directory.name, "skill.db")))
+        db.connect(reuse_if_open=True)
+        db.create_tables([User, Playback, QueueItem], safe=True)
+
+        self.loader = QueueLoader(page_size=10)
+
+    def tearDown(self) -> None:
+        self.loader._executor.shutdown(wait=True)
+        db.close()
+        self.directory.cleanup()
+
+    def test_set_queue(self):
+        playback = get_playback(USER_ID)
+        fetched = []
+
+        def listing():
+            for item in ITEMS:
+                fetched.append(item["Id"])
+                yield item
+
+        self.assertTrue(self.loader.set_queue(playback, listing()))
+
+        # the playback starts with the first page
+        self.assertEqual(playback.current_item.item_id, ITEMS[0]["Id"])
+        self.assertGreaterEqual(len(fetched), 10)
+
+        self.loader._executor.shutdown(wait=True)
+
+        playback = get_playback(USER_ID)
+        self.assertEqual([item.item_id for item in playback.get_queue()], [item["Id"] for item in ITEMS])
+        self.assertEqual(playback.current_item.item_id, ITEMS[0]["Id"])
+
+    def test_empty_listing(self):
+        playback = get_playback(USER_ID)
+        playback.set_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id="abc0")])
+
+        # the queue is not changed without items
+        self.assertFalse(self.loader.set_queue(playback, iter([])))
+        self.assertEqual(get_playback(USER_ID).current_item.item_id, "abc0")
+
+    def test_replaced_queue(self):
+        playback = get_playback(USER_ID)
+
+        def listing():
+            yield from ITEMS[:10]
+            # the user starts another queue while the remaining pages are loaded
+            get_playback(USER_ID).set_queue([QueueItem(idx=0, media_type=MediaType.AUDIO, item_id="abc0")])
+            yield from ITEMS[10:]
+
+        self.assertTrue(self.loader.set_queue(playback, listing()))
+        self.loader._executor.shutdown(wait=True)
+
+        self.assertEqual([item.item_id for item in get_playback(USER_ID).get_queue()], ["abc0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from jellyfin_alexa_skill.metrics import MetricsRegistry
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render(self):
+        registry = MetricsRegistry()
+
+        counter = registry.counter("requests_total", "Number of requests")
+        counter.inc()
+        counter.inc(2)
+        registry.gauge("pending", "Number of pending items").set(7)
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        self.assertEqual(registry.render().splitlines(), [
+            "# HELP requests_total Number of requests",
+            "# TYPE requests_total counter",
+            "requests_total 3",
+            "# HELP pending Number of pending items",
+            "# TYPE pending gauge",
+            "pending 7",
+            "# HELP latency_seconds Latency",
+            "# TYPE latency_seconds histogram",
+            "latency_seconds_bucket{le=\"0.1\"} 1",
+            "latency_seconds_bucket{le=\"1\"} 2",
+            "latency_seconds_bucket{le=\"+Inf\"} 3",
+            "latency_seconds_sum 5.55",
+            "latency_seconds_count 3"
+        ])
+
+    def test_register(self):
+        registry = MetricsRegistry()
+
+        self.assertIs(registry.counter("requests_total", "Number of requests"),
+                      registry.counter("requests_total", "Number of requests"))
+        with self.assertRaises(ValueError):
+            registry.gauge("requests_total", "Number of requests")
+
+        with self.assertRaises(ValueError):
+            registry.counter("requests_total", "Number of requests").inc(-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from jellyfin_alexa_skill.library.phonetic import normalized_key, phonetic_key
+
+
+class TestNormalizedKey(unittest.TestCase):
+    def test_punctuation_and_diacritics(self):
+        self.assertEqual(normalized_key("AC/DC"), normalized_key("AC DC"))
+        self.assertEqual(normalized_key("Sigur Rós"), normalized_key("sigur ros"))
+        self.assertEqual(normalized_key("Simon & Garfunkel"), normalized_key("simon and garfunkel"))
+        self.assertEqual(normalized_key("Rock 'n' Roll"), normalized_key("rock and roll"))
+
+    def test_number_words(self):
+        self.assertEqual(normalized_key("Maroon 5"), normalized_key("maroon five"))
+        self.assertEqual(normalized_key("Twenty One Pilots"), normalized_key("21 pilots"))
+        self.assertEqual(normalized_key("Blink 182"), "blink182")
+        self.assertNotEqual(normalized_key("Twenty One Pilots"), normalized_key("20 pilots"))
+
+    def test_empty(self):
+        self.assertEqual(normalized_key(""), "")
+        self.assertEqual(normalized_key("?!"), "")
+
+
+class TestPhoneticKey(unittest.TestCase):
+    def test_similar_sounding_names(self):
+        for name, spoken_name in [("Beyoncé", "beyonsay"),
+                                  ("Philip Glass", "filip glas"),
+                                  ("Knight", "night"),
+                                  ("Tchaikovsky", "chaikovsky"),
+                                  ("AC/DC", "a c d c"),
+                                  ("Maroon 5", "marune five")]:
+            with self.subTest(name=name):
+                self.assertEqual(phonetic_key(name), phonetic_key(spoken_name))
+
+    def test_different_names(self):
+        self.assertNotEqual(phonetic_key("Madonna"), phonetic_key("Metallica"))
+        self.assertNotEqual(phonetic_key("Queen"), phonetic_key("Green"))
+
+    def test_empty(self):
+        self.assertEqual(phonetic_key(""), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+
+from jellyfin_alexa_skill.alexa.planner import QueryPlan, QueryPlanner
+from jellyfin_alexa_skill.jellyfin.api.async_client import AsyncJellyfinClient
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+from jellyfin_alexa_skill.library.index import LibraryIndex
+
+USER_ID = "a8e5cac72a3a4ad8a3069f95b4a811ee"
+
+KEVIN = {"Id": "artist1", "Name": "Kevin MacLeod", "Type": "MusicArtist"}
+OTHER_KEVIN = {"Id": "artist2", "Name": "Kevin Other", "Type": "MusicArtist"}
+ITEMS = [
+    {"Id": "song1", "Name": "Monkeys Spinning Monkeys", "Type": "Audio", "IsFolder": False,
+     "ArtistItems": [{"Id": "artist1", "Name": "Kevin MacLeod"}]},
+    {"Id": "song2", "Name": "Monkeys Spinning Monkeys Again", "Type": "Audio", "IsFolder": False,
+     "ArtistItems": [{"Id": "artist2", "Name": "Kevin Other"}]},
+    {"Id": "song3", "Name": "Monkeys", "Type": "Audio", "IsFolder": False},
+    {"Id": "album1", "Name": "Monkeys", "Type": "MusicAlbum", "IsFolder": True,
+     "AlbumArtists": [{"Id": "artist1", "Name": "Kevin MacLeod"}]},
+    KEVIN,
+    OTHER_KEVIN
+]
+
+
+class FakeJellyfinClient(JellyfinClient):
+    def __init__(self, library_index=None):
+        super().__init__(server_endpoint="http://localhost:8096", library_index=library_index)
+        self.requests = []
+
+    def search_media_items(self, user_id: str, token: str, term: str, media: MediaType, limit: int = 20, **kwargs):
+        items = self._search_library(user_id, token, term, media.value.split(","), limit, **kwargs)
+        if items is not None:
+            return items
+
+        self.requests.append(("items", term, limit, kwargs))
+        artist_ids = kwargs.get("ArtistIds", kwargs.get("AlbumArtistIds"))
+        items = [item for item in ITEMS if item["Type"] == media.value and term in item["Name"].lower()]
+        if artist_ids is not None:
+            items = [item for item in items
+                     if any(artist["Id"] in artist_ids.split(",")
+                            for artist in item.get("ArtistItems", item.get("AlbumArtists", [])))]
+        return items[:limit]
+
+    def search_artist(self, user_id: str, token: str, term: str, **kwargs):
+        items = self._search_library(user_id, token, term, ("MusicArtist",), None, **kwargs)
+        if items is not None:
+            return items
+
+        self.requests.append(("artists", term, kwargs))
+        return [item for item in ITEMS if item["Type"] == "MusicArtist" and term in item["Name"].lower()]
+
+
+class TestQueryPlanner(unittest.TestCase):
+    def setUp(self) -> None:
+        self.library_index = LibraryIndex(max_age=60)
+        self.library_index.update_user(USER_ID, ITEMS)
+
+    def get_planner(self, library_index=None, **kwargs):
+        client = FakeJellyfinClient(library_index)
+        return client, QueryPlanner(client, AsyncJellyfinClient(client), **kwargs)
+
+    def search(self, planner, term, musician, media=MediaType.AUDIO):
+        return [item["Id"] for item in planner.search(USER_ID, "token", term, media, musician)]
+
+    def test_plan(self):
+        _, planner = self.get_planner(self.library_index)
+        self.assertEqual(planner.plan(USER_ID, None), QueryPlan.TITLE)
+        self.assertEqual(planner.plan(USER_ID, "kevin"), QueryPlan.INDEXED)
+        self.assertEqual(planner.plan("unknown", "kevin"), QueryPlan.PARALLEL)
+
+        _, planner = self.get_planner()
+        self.assertEqual(planner.plan(USER_ID, "kevin"), QueryPlan.PARALLEL)
+
+    def test_title(self):
+        client, planner = self.get_planner(max_title_candidates=2)
+        self.assertEqual(self.search(planner, "monkeys", None), ["song1", "song2"])
+        self.assertEqual(client.requests, [("items", "monkeys", 2, {})])
+
+    def test_indexed(self):
+        client, planner = self.get_planner(self.library_index)
+
+        self.assertEqual(self.search(planner, "monkeys spinning", "kevin macleod"), ["song1"])
+        self.assertEqual(self.search(planner, "monkeys", "kevin macleod", MediaType.ALBUM), ["album1"])
+        # no request is sent to the server
+        self.assertEqual(client.requests, [])
+
+        # artists which are missing in the index are searched on the server, the titles are not searched without artists
+        self.assertEqual(self.search(planner, "monkeys", "unknown"), [])
+        self.assertEqual(client.requests, [("artists", "unknown", {})])
+
+    def test_artist_filtered(self):
+        # the song of the artist is not among the capped candidates of the index
+        client, planner = self.get_planner(self.library_index, max_title_candidates=1, max_artist_candidates=1)
+        with self.assertLogs(level="INFO") as logs:
+            self.assertEqual(self.search(planner, "monkeys spinning", "kevin other"), ["song2"])
+
+        self.assertEqual(client.requests, [("items", "monkeys spinning", 1, {"ArtistIds": "artist2"})])
+        self.assertIn("artist_filtered query plan", logs.output[0])
+
+    def test_parallel(self):
+        client, planner = self.get_planner(max_artist_candidates=1)
+
+        self.assertEqual(self.search(planner, "monkeys spinning", "kevin"), ["song1", "song2"])
+        self.assertCountEqual(client.requests, [("items", "monkeys spinning", 20, {}),
+                                                ("artists", "kevin", {"Limit": 1})])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.database.db import get_playback
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.database.state import PlaybackStateCache, FLUSH_BATCH_SIZE, COALESCED_UPDATES
+
+USER_IDS = ["123456id", "654321id", "abcdefid"]
+
+
+class TestPlaybackStateCache(unittest.TestCase):
+    def setUp(self) -> None:
+        db.initialize(SqliteDatabase(":memory:"))
+        db.connect(reuse_if_open=True)
+        db.create_tables([User, Playback, QueueItem], safe=True)
+
+        for user_id in USER_IDS:
+            Playback.create(user_id=user_id, offset=42)
+
+        # a long flush interval, such that only the tests flush
+        self.cache = PlaybackStateCache(flush_interval=3600)
+        Playback.state_cache = self.cache
+
+    def tearDown(self) -> None:
+        Playback.state_cache = None
+        db.close()
+
+    def test_write_behind(self):
+        coalesced_updates = COALESCED_UPDATES.value
+
+        self.cache.update(USER_IDS[0], playing=True, offset=0)
+        self.cache.update(USER_IDS[0], playing=False)
+        self.cache.update(USER_IDS[1], playing=False, offset=0)
+        self.cache.update(USER_IDS[2], playing=True)
+
+        self.assertEqual(COALESCED_UPDATES.value, coalesced_updates + 1)
+
+        # nothing is written yet
+        self.assertTrue(all(not playback.playing and playback.offset == 42 for playback in Playback.select()))
+
+        # the pending changes are visible
+        playback = get_playback(USER_IDS[0])
+        self.assertFalse(playback.playing)
+        self.assertEqual(playback.offset, 0)
+        self.assertTrue(get_playback(USER_IDS[2]).playing)
+
+        flushes = FLUSH_BATCH_SIZE.count
+        self.assertEqual(self.cache.flush(), 3)
+        self.assertEqual(FLUSH_BATCH_SIZE.count, flushes + 1)
+
+        states = {playback.user_id: (playback.playing, playback.offset) for playback in Playback.select()}
+        self.assertEqual(states, {USER_IDS[0]: (False, 0), USER_IDS[1]: (False, 0), USER_IDS[2]: (True, 42)})
+
+        # there is nothing left to flush
+        self.assertEqual(self.cache.flush(), 0)
+
+    def test_write_through(self):
+        self.cache.update(USER_IDS[0], playing=True, offset=0)
+
+        playback = get_playback(USER_IDS[0])
+        playback.playing = False
+        playback.offset = 1000
+        playback.save()
+
+        # the pending changes are older than the saved ones
+        self.assertEqual(self.cache.flush(), 0)
+
+        playback = Playback.get(Playback.user_id == USER_IDS[0])
+        self.assertFalse(playback.playing)
+        self.assertEqual(playback.offset, 1000)
+
+    def test_write_through_other_fields(self):
+        playback = get_playback(USER_IDS[0])
+        self.cache.update(USER_IDS[0], playing=True)
+
+        playback.loop_all = True
+        playback.save()
+
+        # the pending change is newer than the loaded playback and not overwritten by the save
+        self.assertEqual(self.cache.flush(), 1)
+
+        playback = Playback.get(Playback.user_id == USER_IDS[0])
+        self.assertTrue(playback.playing)
+        self.assertTrue(playback.loop_all)
+
+    def test_newer_change_of_other_worker(self):
+        self.cache.update(USER_IDS[0], playing=False, offset=0)
+
+        # another worker handles a newer event and flushes it first
+        other_cache = PlaybackStateCache(flush_interval=3600)
+        other_cache.update(USER_IDS[0], playing=True, offset=1000)
+        self.assertEqual(other_cache.flush(), 1)
+
+        # the older change does not overwrite the newer one
+        self.cache.flush()
+
+        playback = Playback.get(Playback.user_id == USER_IDS[0])
+        self.assertTrue(playback.playing)
+        self.assertEqual(playback.offset, 1000)
+
+    def test_newer_save_of_other_worker(self):
+        self.cache.update(USER_IDS[1], playing=True)
+
+        # another worker saves the playback without the pending change of this worker
+        Playback.state_cache = None
+        playback = Playback.get(Playback.user_id == USER_IDS[1])
+        playback.offset = 1000
+        playback.save()
+        Playback.state_cache = self.cache
+
+        self.cache.flush()
+
+        playback = Playback.get(Playback.user_id == USER_IDS[1])
+        self.assertFalse(playback.playing)
+        self.assertEqual(playback.offset, 1000)
+
+    def test_immediate_write(self):
+        cache = PlaybackStateCache(flush_interval=0)
+
+        cache.update(USER_IDS[0], playing=True)
+
+        self.assertTrue(Playback.get(Playback.user_id == USER_IDS[0]).playing)
+
+    def test_invalid_field(self):
+        with self.assertRaises(ValueError):
+            self.cache.update(USER_IDS[0], loop_all=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
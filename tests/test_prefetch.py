@@ -0,0 +1,97 @@
+import threading
+import unittest
+
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.alexa.prefetch import StreamPrefetcher
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+
+USER_ID = "123456id"
+
+
+class FakeJellyfinClient(JellyfinClient):
+    def __init__(self):
+        super().__init__(server_endpoint="http://localhost:8096")
+        self.resolved = []
+
+    def get_stream_url(self, user_id: str, token: str, item_id: str, **kwargs):
+        self.resolved.append(item_id)
+        return f"http://localhost:8096/Audio/{item_id}/universal", {"PlaySessionId": "42"}
+
+    def get_item_info(self, user_id: str, token: str, media_id: str, **kwargs) -> dict:
+        return {"Id": media_id, "Name": f"name {media_id}", "Artists": ["artist"]}
+
+
+class TestStreamPrefetcher(unittest.TestCase):
+    def setUp(self) -> None:
+        db.initialize(SqliteDatabase(":memory:"))
+        db.connect(reuse_if_open=True)
+        db.create_tables([User, Playback, QueueItem], safe=True)
+
+        self.playback = Playback.create(user_id=USER_ID)
+        self.items = [QueueItem.create(playback=self.playback, idx=i, media_type=MediaType.AUDIO, item_id=f"abc{i}")
+                      for i in range(3)]
+        self.playback.current_item = self.items[0]
+        self.playback.save()
+
+        self.client = FakeJellyfinClient()
+        self.prefetcher = StreamPrefetcher(self.client)
+
+    def tearDown(self) -> None:
+        db.close()
+
+    def test_prefetch(self):
+        self.prefetcher.prefetch(USER_ID, self.playback, "jellyfin_user", "token")
+
+        stream = self.prefetcher.get(USER_ID, self.playback, self.playback.next())
+        self.assertEqual(stream.url, "http://localhost:8096/Audio/abc1/universal")
+        self.assertEqual(stream.item_info["Name"], "name abc1")
+        self.assertEqual(self.client.resolved, ["abc1"])
+
+        # a prefetched stream is used only once
+        self.assertIsNone(self.prefetcher.get(USER_ID, self.playback, self.playback.next()))
+
+    def test_prefetch_state_changed(self):
+        with self.subTest("loop"):
+            self.prefetcher.prefetch(USER_ID, self.playback, "jellyfin_user", "token")
+            self.playback.loop_single = True
+
+            self.assertIsNone(self.prefetcher.get(USER_ID, self.playback, self.playback.next()))
+            self.playback.loop_single = False
+
+        with self.subTest("queue"):
+            self.prefetcher.prefetch(USER_ID, self.playback, "jellyfin_user", "token")
+            self.playback.set_queue([QueueItem(idx=i, media_type=MediaType.AUDIO, item_id=f"def{i}")
+                                     for i in range(3)])
+
+            self.assertIsNone(self.prefetcher.get(USER_ID, self.playback, self.playback.next()))
+
+    def test_prefetch_timeout(self):
+        resolved = threading.Event()
+        get_stream_url = self.client.get_stream_url
+
+        def hanging_get_stream_url(*args, **kwargs):
+            resolved.wait(1)
+            return get_stream_url(*args, **kwargs)
+
+        self.client.get_stream_url = hanging_get_stream_url
+        prefetcher = StreamPrefetcher(self.client, wait=0.01)
+        prefetcher.prefetch(USER_ID, self.playback, "jellyfin_user", "token")
+
+        # the caller resolves the stream itself instead of waiting for the hanging server
+        self.assertIsNone(prefetcher.get(USER_ID, self.playback, self.playback.next()))
+        resolved.set()
+
+    def test_prefetch_end_of_queue(self):
+        self.playback.current_item = self.items[-1]
+
+        self.prefetcher.prefetch(USER_ID, self.playback, "jellyfin_user", "token")
+
+        self.assertEqual(self.client.resolved, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType, build_projection
+from tests.test_cache import FakeResponse, TOKEN, USER_ID
+
+
+class TestProjection(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = JellyfinClient(server_endpoint="http://localhost:8096")
+
+    def test_build_projection(self):
+        self.assertEqual(build_projection(), {"Fields": "",
+                                              "EnableImages": False,
+                                              "EnableUserData": False,
+                                              "EnableTotalRecordCount": False})
+        self.assertEqual(build_projection("DateCreated", "SortName", total_record_count=True),
+                         {"Fields": "DateCreated,SortName", "EnableImages": False, "EnableUserData": False})
+
+    def test_listing_requests(self):
+        calls = [
+            lambda: self.client.get_favorites(USER_ID, TOKEN, MediaType.AUDIO),
+            lambda: self.client.get_playlist(USER_ID, TOKEN, "playlist"),
+            lambda: self.client.get_playlist_items(USER_ID, TOKEN, "playlist1"),
+            lambda: self.client.search_media_items(USER_ID, TOKEN, "song", MediaType.AUDIO),
+            lambda: self.client.get_artist_items(USER_ID, TOKEN, "artist1", MediaType.AUDIO),
+            lambda: self.client.search_artist(USER_ID, TOKEN, "artist"),
+            lambda: self.client.get_album_items(USER_ID, TOKEN, "album1")
+        ]
+
+        with mock.patch.object(self.client.session, "get", return_value=FakeResponse({"Items": []})) as get:
+            for call in calls:
+                call()
+                params = get.call_args[1]["params"]
+                self.assertEqual(params["Fields"], "")
+                self.assertFalse(params["EnableImages"])
+                self.assertFalse(params["EnableUserData"])
+                self.assertFalse(params["EnableTotalRecordCount"])
+
+    def test_sync_requests(self):
+        with mock.patch.object(self.client.session, "get",
+                               return_value=FakeResponse({"Items": [], "TotalRecordCount": 0})) as get:
+            self.client.get_library_items(USER_ID, TOKEN, limit=10)
+            self.client.get_artists(USER_ID, TOKEN, limit=10)
+
+            # the syncs page through the items with the total number of items
+            for call in get.call_args_list:
+                self.assertNotIn("EnableTotalRecordCount", call[1]["params"])
+                self.assertFalse(call[1]["params"]["EnableUserData"])
+
+    def test_requested_fields(self):
+        with mock.patch.object(self.client.session, "get", return_value=FakeResponse({"Items": []})) as get:
+            self.client.search_media_items(USER_ID, TOKEN, "song", MediaType.AUDIO, Fields="Genres")
+            self.assertEqual(get.call_args[1]["params"]["Fields"], "Genres")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+import copy
+import json
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from ask_sdk_core.serialize import DefaultSerializer
+from ask_sdk_model import RequestEnvelope
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.alexa.handler import get_skill_builder
+from jellyfin_alexa_skill.alexa.handler.event import PlaybackStoppedEventHandler
+from jellyfin_alexa_skill.alexa.router import AudioPlayerEventRouter, ROUTER_ERRORS
+from jellyfin_alexa_skill.database.db import get_playback
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.database.state import PlaybackStateCache
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient
+
+ALEXA_USER_ID = "amzn1.ask.account.42424242"
+ALEXA_AUTH_TOKEN = "nicetoken4242"
+SKILL_ID = "amzn1.ask.skill.11111111-2222-3333-4444-555555555555"
+
+EVENT_TEMPLATE = {
+    "version": "1.0",
+    "context": {
+        "AudioPlayer": {
+            "token": "abc0",
+            "offsetInMilliseconds": 4200,
+            "playerActivity": "STOPPED"
+        },
+        "System": {
+            "application": {
+                "applicationId": SKILL_ID
+            },
+            "user": {
+                "userId": ALEXA_USER_ID,
+                "accessToken": ALEXA_AUTH_TOKEN
+            },
+            "device": {
+                "deviceId": "amzn1.ask.device.1234567890",
+                "supportedInterfaces": {
+                    "AudioPlayer": {}
+                }
+            },
+            "apiEndpoint": "https://api.eu.amazonalexa.com",
+            "apiAccessToken": "apitoken.4242"
+        }
+    },
+    "request": {
+        "requestId": "amzn1.echo-api.request.99999999-8888-7777-6666-555555555555",
+        "locale": "en-US",
+        "timestamp": "2022-01-01T12:42:42Z",
+        "token": "abc0",
+        "offsetInMilliseconds": 4200
+    }
+}
+
+
+def build_event(request_type: str) -> dict:
+    event = copy.deepcopy(EVENT_TEMPLATE)
+    event["request"]["type"] = request_type
+
+    return event
+
+
+def encode(event: dict) -> bytes:
+    return json.dumps(event).encode("utf-8")
+
+
+class TestAudioPlayerEventRouter(unittest.TestCase):
+    def setUp(self) -> None:
+        db.initialize(SqliteDatabase(":memory:"))
+        db.connect(reuse_if_open=True)
+        db.create_tables([User, Playback, QueueItem], safe=True)
+
+        User.create(alexa_auth_token=ALEXA_AUTH_TOKEN, jellyfin_user_id="a8e5cac72a3a4ad8a3069f95b4a811ee",
+                    jellyfin_token="token")
+        Playback.create(user_id=ALEXA_USER_ID, playing=True, offset=42)
+
+        skill_builder = get_skill_builder(JellyfinClient(server_endpoint="http://localhost:8096"),
+                                          PlaybackStateCache(flush_interval=0))
+        self.skill = skill_builder.create()
+        self.chains = skill_builder.runtime_configuration_builder.request_handler_chains
+        self.router = AudioPlayerEventRouter(self.chains)
+
+    def tearDown(self) -> None:
+        db.close()
+
+    def invoke_skill(self, event: dict) -> dict:
+        serializer = DefaultSerializer()
+        request_envelope = serializer.deserialize(payload=json.dumps(event), obj_type=RequestEnvelope)
+
+        return serializer.serialize(self.skill.invoke(request_envelope=request_envelope, context=None))
+
+    def test_routed_events(self):
+        response = self.router.dispatch({}, encode(build_event("AudioPlayer.PlaybackStopped")))
+        # the response is the same as the response of the skill
+        self.assertEqual(response, self.invoke_skill(build_event("AudioPlayer.PlaybackStopped")))
+
+        playback = get_playback(ALEXA_USER_ID)
+        self.assertFalse(playback.playing)
+        self.assertEqual(playback.offset, 42)
+
+        self.assertIsNotNone(self.router.dispatch({}, encode(build_event("AudioPlayer.PlaybackStarted"))))
+        playback = get_playback(ALEXA_USER_ID)
+        self.assertTrue(playback.playing)
+        self.assertEqual(playback.offset, 0)
+
+        self.assertIsNotNone(self.router.dispatch({}, encode(build_event("AudioPlayer.PlaybackFinished"))))
+        self.assertFalse(get_playback(ALEXA_USER_ID).playing)
+
+    def test_not_routed(self):
+        # events with content in the response and all other requests are dispatched by the skill
+        for request_type in ("AudioPlayer.PlaybackNearlyFinished", "AudioPlayer.PlaybackFailed", "LaunchRequest"):
+            with self.subTest(request_type=request_type):
+                self.assertIsNone(self.router.dispatch({}, encode(build_event(request_type))))
+
+        event = build_event("IntentRequest")
+        event["request"]["intent"] = {"name": "AMAZON.PauseIntent", "confirmationStatus": "NONE"}
+        self.assertIsNone(self.router.dispatch({}, encode(event)))
+
+        self.assertTrue(get_playback(ALEXA_USER_ID).playing)
+
+    def test_not_linked(self):
+        event = build_event("AudioPlayer.PlaybackStopped")
+        event["context"]["System"]["user"]["accessToken"] = "unknowntoken"
+        self.assertIsNone(self.router.dispatch({}, encode(event)))
+
+        del event["context"]["System"]["user"]["accessToken"]
+        self.assertIsNone(self.router.dispatch({}, encode(event)))
+
+        self.assertTrue(get_playback(ALEXA_USER_ID).playing)
+
+    def test_no_audio_player(self):
+        event = build_event("AudioPlayer.PlaybackStopped")
+        event["context"]["System"]["device"]["supportedInterfaces"] = {}
+
+        self.assertIsNone(self.router.dispatch({}, encode(event)))
+
+    def test_other_skill(self):
+        router = AudioPlayerEventRouter(self.chains, skill_id=SKILL_ID)
+        event = build_event("AudioPlayer.PlaybackStopped")
+        event["context"]["System"]["application"]["applicationId"] = "amzn1.ask.skill.other"
+
+        # events of other skills are rejected by the skill
+        self.assertIsNone(router.dispatch({}, encode(event)))
+        self.assertTrue(get_playback(ALEXA_USER_ID).playing)
+
+        self.assertIsNotNone(router.dispatch({}, encode(build_event("AudioPlayer.PlaybackStopped"))))
+        self.assertFalse(get_playback(ALEXA_USER_ID).playing)
+
+    def test_verification(self):
+        verifier = mock.Mock()
+        router = AudioPlayerEventRouter(self.chains, verifiers=[verifier])
+
+        body = encode(build_event("AudioPlayer.PlaybackStopped"))
+        router.dispatch({"Signature": "signature"}, body)
+
+        kwargs = verifier.verify.call_args[1]
+        self.assertEqual(kwargs["headers"], {"Signature": "signature"})
+        self.assertEqual(kwargs["serialized_request_env"], body.decode("utf-8"))
+        self.assertEqual(kwargs["deserialized_request_env"].request.object_type, "AudioPlayer.PlaybackStopped")
+        self.assertIsInstance(kwargs["deserialized_request_env"].request.timestamp, datetime)
+
+        # failed verifications are raised before the event is handled
+        verifier.verify.side_effect = ValueError("invalid signature")
+        with self.assertRaises(ValueError):
+            router.dispatch({}, encode(build_event("AudioPlayer.PlaybackStarted")))
+        self.assertFalse(get_playback(ALEXA_USER_ID).playing)
+
+    def test_failed_event(self):
+        errors = ROUTER_ERRORS.value
+
+        with mock.patch.object(PlaybackStoppedEventHandler, "handle_event", side_effect=ValueError("failed")):
+            response = self.router.dispatch({}, encode(build_event("AudioPlayer.PlaybackStopped")))
+
+        self.assertEqual(response["response"], {})
+        self.assertEqual(ROUTER_ERRORS.value, errors + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
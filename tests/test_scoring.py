@@ -0,0 +1,47 @@
+import unittest
+
+from jellyfin_alexa_skill.library.scoring import trigrams, top_k, score_names
+
+NAMES = ["Monkeys Spinning Monkeys", "Sneaky Snitch", "Monkeys", "Spinning", "Café Monkeys"]
+
+
+class TestScoring(unittest.TestCase):
+    def test_trigrams(self):
+        self.assertEqual(trigrams("Ab"), frozenset(["  a", " ab", "ab "]))
+        # the text is normalized first
+        self.assertEqual(trigrams("AB!"), trigrams("ab"))
+        self.assertEqual(trigrams("!?"), frozenset())
+
+    def test_top_k(self):
+        candidates = [trigrams(name) for name in NAMES]
+
+        scores = top_k(trigrams("monkeys"), candidates, k=2)
+        self.assertEqual([index for index, _ in scores], [2, 4])
+        self.assertEqual(scores[0][1], 1.0)
+
+        scores = top_k(trigrams("monkeys"), candidates)
+        self.assertEqual(len(scores), len(NAMES))
+        self.assertEqual([score for _, score in scores], sorted([score for _, score in scores], reverse=True))
+        # equal scores keep the order of the candidates
+        self.assertEqual(scores[-2:], [(1, 0.0), (3, 0.0)])
+
+    def test_empty_query(self):
+        candidates = [trigrams(name) for name in NAMES]
+
+        self.assertEqual(top_k(frozenset(), candidates, k=2), [(0, 0.0), (1, 0.0)])
+        self.assertEqual(top_k(trigrams("monkeys"), [], k=2), [])
+
+    def test_time_budget(self):
+        candidates = [trigrams(name) for name in NAMES] * 1000
+
+        # the first batch of candidates is always scored
+        scores = top_k(trigrams("monkeys"), candidates, time_budget=0)
+        self.assertLess(len(scores), len(candidates))
+        self.assertGreater(len(scores), 0)
+
+    def test_score_names(self):
+        self.assertEqual(score_names("sneaky snitch", NAMES, k=1), [(1, 1.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
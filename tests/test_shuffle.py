@@ -0,0 +1,34 @@
+import unittest
+
+from jellyfin_alexa_skill.shuffle import Permutation
+
+
+class TestPermutation(unittest.TestCase):
+    def test_permutation(self):
+        for size in [1, 2, 3, 10, 64, 1000, 4097]:
+            for seed in [0, -424242, 42, 424242]:
+                with self.subTest(size=size, seed=seed):
+                    permutation = Permutation(size, seed)
+                    order = permutation.to_list()
+
+                    # every index occurs exactly once
+                    self.assertEqual(sorted(order), list(range(size)))
+                    for position, value in enumerate(order):
+                        self.assertEqual(permutation.index(value), position)
+
+    def test_seed(self):
+        self.assertEqual(Permutation(100, 42).to_list(), Permutation(100, 42).to_list())
+        self.assertNotEqual(Permutation(100, 42).to_list(), Permutation(100, 43).to_list())
+        self.assertNotEqual(Permutation(100, 42).to_list(), list(range(100)))
+
+    def test_out_of_range(self):
+        permutation = Permutation(10, 42)
+
+        with self.assertRaises(IndexError):
+            permutation[10]
+        with self.assertRaises(ValueError):
+            permutation.index(-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 
-from jellyfin_alexa_skill.alexa.util import get_similarity
+from jellyfin_alexa_skill.alexa.util import get_similarity, get_similarities, best_matches_by_idx
+from jellyfin_alexa_skill.config import ARTISTS_PARTIAL_RATIO_THRESHOLD, PHONETIC_MATCH_SIMILARITY
+from jellyfin_alexa_skill.library.normalize import normalize
 
 
 class TestSimilarity(unittest.TestCase):
@@ -67,6 +69,44 @@ class TestSimilarity(unittest.TestCase):
 
             self.assertEqual(similarity, 2 * 35 / (len(s1) + len(s2)))
 
+    def test_similarities(self):
+        names = ["Hello", "abcd", "Hello world", "", "artist art, artist - song name name"]
+        term = "Hello Alexa"
+
+        self.assertEqual(get_similarities(names, term),
+                         [get_similarity(normalize(name), normalize(term)) for name in names])
+        self.assertEqual(get_similarities([], term), [])
+
+    def test_similarities_keys(self):
+        # names with the same normalized key are equal
+        self.assertEqual(get_similarities(["AC/DC", "Sigur Rós"], "ac dc"), [1.0, get_similarity("sigur ros", "ac dc")])
+        self.assertEqual(get_similarities(["Maroon 5"], "maroon five"), [1.0])
+
+        # names which sound like the term are above all thresholds
+        self.assertGreaterEqual(get_similarities(["Beyoncé"], "beyonsay")[0], PHONETIC_MATCH_SIMILARITY)
+        self.assertLess(get_similarity("Beyoncé", "beyonsay"), ARTISTS_PARTIAL_RATIO_THRESHOLD)
+
+    def test_similarities_locales(self):
+        # width and kana variants of japanese names
+        self.assertEqual(get_similarities(["ｶﾀｶﾅ", "カタカナの歌"], "かたかな")[0], 1.0)
+        self.assertGreater(get_similarities(["カタカナの歌"], "かたかな")[0],
+                           get_similarity("カタカナの歌", "かたかな"))
+
+        # vowel marks of arabic names
+        self.assertEqual(get_similarities(["مُحَمَّد"], "محمد"), [1.0])
+
+
+class TestBestMatches(unittest.TestCase):
+    def test_best_matches(self):
+        self.assertEqual(best_matches_by_idx([]), [])
+        self.assertEqual(best_matches_by_idx([0.5]), [0])
+        self.assertEqual(best_matches_by_idx([0.31, 0.4, 0.21, 0.8]), [3, 1, 0])
+        self.assertEqual(best_matches_by_idx([0.31, 0.4, 0.21, 0.8], max_matches=2), [3, 1])
+
+    def test_equal_scores(self):
+        # equal scores keep their order
+        self.assertEqual(best_matches_by_idx([0.5, 0.7, 0.5, 0.5]), [1, 0, 2])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,8 @@
+import copy
 import json
 import time
 import unittest
+import uuid
 from multiprocessing import Process
 from urllib.parse import urlparse, parse_qs
 
@@ -129,6 +131,21 @@ SKILL_WEB_APP_PORT = 1456
 
 jellyfin_endpoint = "http://localhost:8096"
 
+ALBUM_MEDIA_IDS = [
+    # "song title" by "artist"
+    "ccf19d58cf1a38fa18ea0e2dd0da0e5b",
+    # "song title 2" by "artist 2"
+    "52d1ba6abce1e968d3be5da9fcce4acf"
+]
+
+
+def build_request_id() -> str:
+    """
+    Build a new request id, every request of a simulated dialog has its own request id like a real request.
+    """
+
+    return f"amzn1.echo-api.request.{uuid.uuid4()}"
+
 
 class TestSkillResponseControl(unittest.TestCase):
     skill_process = None
@@ -344,6 +361,117 @@ class TestSkillResponseControl(unittest.TestCase):
         self.assertEqual(parsed_url.path, "/Audio/{}/universal".format(media_id))
         self.assertEqual(parse_qs(parsed_url.query)["api_key"][0], JELLYFIN_TOKEN)
 
+    @staticmethod
+    def audio_player_request(request_type: str, token: str) -> dict:
+        requests_data = copy.deepcopy(REQUEST_TEMPLATE)
+
+        requests_data["context"]["AudioPlayer"] = {
+            "token": token,
+            "offsetInMilliseconds": 0,
+            "playerActivity": "PLAYING"
+        }
+        requests_data["request"] = {
+            "type": request_type,
+            "requestId": build_request_id(),
+            "locale": "en-US",
+            "timestamp": "2022-01-01T12:42:42Z",
+            "token": token,
+            "offsetInMilliseconds": 0
+        }
+
+        return requests_data
+
+    def test_album_playback_directives(self):
+        """
+        Play a whole album. Only the first item should replace the queue of the device, all following items should be
+        enqueued after the item before for a gapless playback.
+        """
+
+        playback = get_playback(ALEXA_USER_ID)
+        queue_items = [QueueItem(item_id=media_id, idx=i, media_type=MediaType.AUDIO)
+                       for i, media_id in enumerate(ALBUM_MEDIA_IDS)]
+        playback.set_queue(queue_items)
+
+        requests_data = copy.deepcopy(REQUEST_TEMPLATE)
+        requests_data["request"] = {
+            "type": "LaunchRequest",
+            "requestId": build_request_id(),
+            "locale": "en-US",
+            "timestamp": "2022-01-01T12:42:42Z",
+            "shouldLinkResultBeReturned": "false"
+        }
+
+        res = self.post_request(requests_data)
+
+        directives = res["response"]["directives"]
+        self.assertEqual(len(directives), 1)
+        self.assertEqual(directives[0]["type"], "AudioPlayer.Play")
+        self.assertEqual(directives[0]["playBehavior"], "REPLACE_ALL")
+        self.assertEqual(directives[0]["audioItem"]["stream"]["token"], ALBUM_MEDIA_IDS[0])
+        self.assertNotIn("expectedPreviousToken", directives[0]["audioItem"]["stream"])
+
+        token = directives[0]["audioItem"]["stream"]["token"]
+        for media_id in ALBUM_MEDIA_IDS[1:]:
+            res = self.post_request(self.audio_player_request("AudioPlayer.PlaybackStarted", token))
+            self.assertNotIn("directives", res["response"])
+
+            res = self.post_request(self.audio_player_request("AudioPlayer.PlaybackNearlyFinished", token))
+
+            directives = res["response"]["directives"]
+            self.assertEqual(len(directives), 1)
+            self.assertEqual(directives[0]["type"], "AudioPlayer.Play")
+            self.assertEqual(directives[0]["playBehavior"], "ENQUEUE")
+            self.assertEqual(directives[0]["audioItem"]["stream"]["expectedPreviousToken"], token)
+            self.assertEqual(directives[0]["audioItem"]["stream"]["offsetInMilliseconds"], 0)
+
+            parsed_url = urlparse(directives[0]["audioItem"]["stream"]["url"])
+            self.assertEqual(parsed_url.path, "/Audio/{}/universal".format(media_id))
+
+            next_token = directives[0]["audioItem"]["stream"]["token"]
+            self.assertEqual(next_token, media_id)
+
+            # the device reports the end of the stream which just finished, then starts the enqueued stream
+            res = self.post_request(self.audio_player_request("AudioPlayer.PlaybackFinished", token))
+            self.assertNotIn("directives", res["response"])
+
+            token = next_token
+
+        # the last item of the album is playing, there is nothing to enqueue anymore
+        res = self.post_request(self.audio_player_request("AudioPlayer.PlaybackStarted", token))
+        self.assertNotIn("directives", res["response"])
+
+        res = self.post_request(self.audio_player_request("AudioPlayer.PlaybackNearlyFinished", token))
+        self.assertNotIn("directives", res["response"])
+
+    def test_next_intent_replaces_stream(self):
+        """
+        Skipping to the next item is requested by the user, so the playing stream should be replaced immediately.
+        """
+
+        playback = get_playback(ALEXA_USER_ID)
+        queue_items = [QueueItem(item_id=media_id, idx=i, media_type=MediaType.AUDIO)
+                       for i, media_id in enumerate(ALBUM_MEDIA_IDS)]
+        playback.set_queue(queue_items)
+
+        requests_data = copy.deepcopy(REQUEST_TEMPLATE)
+        requests_data["request"] = {
+            "type": "IntentRequest",
+            "requestId": build_request_id(),
+            "locale": "en-US",
+            "timestamp": "2022-01-01T12:42:42Z",
+            "intent": {
+                "name": "AMAZON.NextIntent",
+                "confirmationStatus": "NONE"
+            }
+        }
+
+        res = self.post_request(requests_data)
+
+        directives = res["response"]["directives"]
+        self.assertEqual(len(directives), 1)
+        self.assertEqual(directives[0]["playBehavior"], "REPLACE_ALL")
+        self.assertEqual(directives[0]["audioItem"]["stream"]["token"], ALBUM_MEDIA_IDS[1])
+
 
 if __name__ == "__main__":
     unittest.main()
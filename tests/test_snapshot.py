@@ -0,0 +1,201 @@
+import os
+import struct
+import tempfile
+import time
+import unittest
+
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.library import sync
+from jellyfin_alexa_skill.library.index import LibraryIndex
+from jellyfin_alexa_skill.library.snapshot import FORMAT_VERSION, Snapshot, SnapshotIndex, read_generation, \
+    write_snapshot
+from jellyfin_alexa_skill.library.sync import LibrarySync
+from tests.test_library import FakeJellyfinClient, ITEMS, OTHER_USER_ID, USER_ID
+
+QUERIES = [
+    ("monkey", ["Audio", "MusicAlbum", "Video"], None, None),
+    ("monkey", ["Audio", "MusicAlbum"], None, True),
+    ("monkey", ["Audio", "MusicAlbum", "Video"], 2, None),
+    ("spin monk", ["Audio"], None, None),
+    ("CAFE", ["Audio"], None, None),
+    ("kevin", ["MusicArtist"], None, None),
+    ("ac dc", ["MusicArtist"], None, None),
+    ("beyonsay", ["MusicArtist"], None, None),
+    ("事変", ["Audio"], None, None),
+    ("spinning cats", ["Audio"], None, None)
+]
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "library_index.snapshot")
+
+        self.library_index = LibraryIndex(max_age=60)
+        self.library_index.update_user(USER_ID, ITEMS)
+        self.library_index.add_items(USER_ID, [{"Id": "artist2", "Name": "AC/DC", "Type": "MusicArtist"},
+                                               {"Id": "artist3", "Name": "Beyoncé", "Type": "MusicArtist"},
+                                               {"Id": "song4", "Name": "東京事変の歌", "Type": "Audio"}])
+        self.library_index.update_user(OTHER_USER_ID, ITEMS[:1])
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_search(self):
+        write_snapshot(self.library_index, self.path)
+        snapshot_index = SnapshotIndex(self.path, max_age=60)
+
+        # the snapshot returns the same results as the index
+        for term, item_types, limit, is_folder in QUERIES:
+            with self.subTest(term=term):
+                self.assertEqual(snapshot_index.search(USER_ID, term, item_types, limit, is_folder),
+                                 self.library_index.search(USER_ID, term, item_types, limit, is_folder))
+
+        self.assertEqual(len(snapshot_index), len(self.library_index))
+        self.assertEqual(snapshot_index.item_count(USER_ID), self.library_index.item_count(USER_ID))
+        self.assertEqual(snapshot_index.synced_at(USER_ID), self.library_index.synced_at(USER_ID))
+
+    def test_visibility(self):
+        write_snapshot(self.library_index, self.path)
+        snapshot_index = SnapshotIndex(self.path, max_age=60)
+
+        self.assertEqual(snapshot_index.search(OTHER_USER_ID, "sneaky", ["Audio"]), [])
+        self.assertEqual(len(snapshot_index.search(OTHER_USER_ID, "monkeys", ["Audio"])), 1)
+        self.assertIsNone(snapshot_index.search("unknown", "monkeys", ["Audio"]))
+
+    def test_new_generation(self):
+        self.assertEqual(write_snapshot(self.library_index, self.path), 1)
+        snapshot_index = SnapshotIndex(self.path, max_age=60)
+        self.assertEqual(len(snapshot_index.search(USER_ID, "sneaky", ["Audio"])), 1)
+
+        with snapshot_index._view() as previous_snapshot:
+            self.library_index.update_user(USER_ID, [{"Id": "song2", "Name": "Loud Snitch", "Type": "Audio"}])
+            self.assertEqual(write_snapshot(self.library_index, self.path), 2)
+
+            # the new generation is mapped without restarting, running searches keep the previous one
+            self.assertEqual(snapshot_index.generation, 2)
+            self.assertEqual(snapshot_index.search(USER_ID, "sneaky", ["Audio"]), [])
+            self.assertEqual(previous_snapshot.generation, 1)
+            self.assertEqual(len(previous_snapshot._prefix_slots("sneaky")), 1)
+
+        self.assertEqual(read_generation(self.path), 2)
+        self.assertEqual(os.listdir(self.directory.name), ["library_index.snapshot"])
+
+    def test_missing_and_invalid_snapshot(self):
+        snapshot_index = SnapshotIndex(self.path, max_age=60)
+        self.assertIsNone(snapshot_index.search(USER_ID, "monkeys", ["Audio"]))
+        self.assertEqual(read_generation(self.path), 0)
+
+        with open(self.path, "wb") as file:
+            file.write(b"no snapshot" * 10)
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
+        self.assertIsNone(snapshot_index.search(USER_ID, "monkeys", ["Audio"]))
+
+        # a valid snapshot replaces the invalid file
+        write_snapshot(self.library_index, self.path)
+        self.assertEqual(len(snapshot_index.search(USER_ID, "sneaky", ["Audio"])), 1)
+
+    def test_stale_snapshot(self):
+        write_snapshot(self.library_index, self.path)
+        snapshot_index = SnapshotIndex(self.path, max_age=0)
+
+        self.assertFalse(snapshot_index.is_fresh(USER_ID))
+        self.assertIsNone(snapshot_index.search(USER_ID, "monkeys", ["Audio"]))
+
+    @unittest.skipIf(sync.fcntl is None, "file locks are not supported")
+    def test_single_writer(self):
+        first_sync = LibrarySync(None, self.library_index, snapshot_path=self.path)
+        second_sync = LibrarySync(None, LibraryIndex(), snapshot_path=self.path)
+
+        self.assertTrue(first_sync._acquire_writer_lock())
+        self.assertFalse(second_sync._acquire_writer_lock())
+
+        # the writer keeps the lock
+        self.assertTrue(first_sync._acquire_writer_lock())
+
+        first_sync._writer_lock_file.close()
+        self.assertTrue(second_sync._acquire_writer_lock())
+        second_sync._writer_lock_file.close()
+
+    def test_trigger_other_process(self):
+        first_sync = LibrarySync(None, self.library_index, interval=60, snapshot_path=self.path)
+        second_sync = LibrarySync(None, LibraryIndex(), snapshot_path=self.path)
+
+        # the process which syncs the index wakes up, if the sync is triggered in another process
+        trigger_time = first_sync._get_trigger_time()
+        second_sync.trigger()
+        start = time.monotonic()
+        first_sync._wait(trigger_time)
+        self.assertLess(time.monotonic() - start, 10)
+
+
+class TestSnapshotRestore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "library_index.snapshot")
+
+        db.initialize(SqliteDatabase(":memory:"))
+        db.connect(reuse_if_open=True)
+        db.create_tables([User], safe=True)
+        User.create(alexa_auth_token="alexa_token", jellyfin_user_id=USER_ID, jellyfin_token="token")
+
+        self.library_index = LibraryIndex(max_age=60)
+        self.client = FakeJellyfinClient(self.library_index)
+        self.library_sync = LibrarySync(self.client, self.library_index, page_size=2, snapshot_path=self.path)
+
+    def tearDown(self) -> None:
+        db.close()
+        self.directory.cleanup()
+
+    def test_contents(self):
+        self.library_index.update_user(USER_ID, ITEMS)
+        self.library_index.update_user(OTHER_USER_ID, ITEMS[:2])
+        write_snapshot(self.library_index, self.path)
+
+        restored_index = LibraryIndex(max_age=60)
+        restored_index.restore(Snapshot(self.path).contents())
+
+        self.assertEqual(len(restored_index), len(self.library_index))
+        for user_id in (USER_ID, OTHER_USER_ID):
+            self.assertEqual(restored_index.item_count(user_id), self.library_index.item_count(user_id))
+            self.assertEqual(restored_index.synced_at(user_id), self.library_index.synced_at(user_id))
+        for term in ("monkey", "kevin", "cafe snacks", "sneeky snitch"):
+            self.assertEqual(restored_index.search(USER_ID, term, ["Audio", "MusicArtist"]),
+                             self.library_index.search(USER_ID, term, ["Audio", "MusicArtist"]))
+
+    def test_restart(self):
+        self.library_sync.sync_all()
+        self.library_sync.publish_snapshot()
+
+        # a new process restores the index and continues with a delta sync
+        restored_index = LibraryIndex(max_age=60)
+        client = FakeJellyfinClient(restored_index)
+        library_sync = LibrarySync(client, restored_index, page_size=2, snapshot_path=self.path)
+
+        self.assertTrue(library_sync.restore_snapshot())
+        self.assertTrue(restored_index.is_fresh(USER_ID))
+        self.assertEqual(restored_index.item_count(USER_ID), len(ITEMS))
+
+        self.assertEqual(library_sync.sync_all(), 1)
+        self.assertTrue(client.requests)
+        self.assertTrue(all("MinDateLastSaved" in request[3] or request[2] == 0 for request in client.requests))
+
+    def test_restore_without_snapshot(self):
+        self.assertFalse(self.library_sync.restore_snapshot())
+
+        # snapshots of other format versions are synced again
+        self.library_sync.sync_all()
+        self.library_sync.publish_snapshot()
+        with open(self.path, "r+b") as file:
+            file.seek(8)
+            file.write(struct.pack("<I", FORMAT_VERSION + 1))
+
+        self.assertFalse(LibrarySync(self.client, LibraryIndex(), snapshot_path=self.path).restore_snapshot())
+
+
+if __name__ == "__main__":
+    unittest.main()
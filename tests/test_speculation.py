@@ -0,0 +1,184 @@
+import json
+import threading
+import unittest
+from typing import List
+
+from ask_sdk_core.serialize import DefaultSerializer
+from ask_sdk_model import RequestEnvelope
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.alexa.handler import get_skill_builder
+from jellyfin_alexa_skill.alexa.handler.yesno import YesNoIntentHandler
+from jellyfin_alexa_skill.alexa.speculation import MatchSpeculator
+from jellyfin_alexa_skill.database.db import get_playback
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+from tests.test_router import ALEXA_AUTH_TOKEN, ALEXA_USER_ID, build_event
+
+TOP_MATCHES = [{"Name": "first album", "Id": "album0", "Artist": ["artist"]},
+               {"Name": "second album", "Id": "album1", "Artist": []}]
+
+
+class FakeJellyfinClient(JellyfinClient):
+    def __init__(self):
+        super().__init__(server_endpoint="http://localhost:8096")
+        self.requests = []
+
+    def get_album_items(self, user_id: str, token: str, album_id: str, **kwargs) -> List[dict]:
+        self.requests.append(("album", album_id))
+        if album_id == "empty":
+            return []
+        return [{"Id": f"{album_id}-track{i}", "Name": f"track {i}", "MediaType": "Audio"} for i in range(2)]
+
+    def get_stream_url(self, user_id: str, token: str, item_id: str, **kwargs):
+        self.requests.append(("stream", item_id))
+        return f"http://localhost:8096/Audio/{item_id}/universal", {"PlaySessionId": "42"}
+
+    def get_item_info(self, user_id: str, token: str, media_id: str, **kwargs) -> dict:
+        self.requests.append(("info", media_id))
+        return {"Id": media_id, "Name": f"name {media_id}", "Artists": ["artist"]}
+
+
+class TestMatchSpeculator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = FakeJellyfinClient()
+        self.speculator = MatchSpeculator(self.client)
+
+    def test_album(self):
+        self.speculator.speculate(ALEXA_USER_ID, MediaType.ALBUM, "album0", "jellyfin_user", "token")
+
+        match = self.speculator.get(ALEXA_USER_ID, MediaType.ALBUM, "album0")
+        self.assertEqual([item["Id"] for item in match.items], ["album0-track0", "album0-track1"])
+        self.assertEqual(match.stream.url, "http://localhost:8096/Audio/album0-track0/universal")
+        self.assertEqual(match.stream.item_info["Name"], "name album0-track0")
+
+        # a speculated match is used only once
+        self.assertIsNone(self.speculator.get(ALEXA_USER_ID, MediaType.ALBUM, "album0"))
+
+    def test_empty_album(self):
+        self.speculator.speculate(ALEXA_USER_ID, MediaType.ALBUM, "empty", "jellyfin_user", "token")
+
+        match = self.speculator.get(ALEXA_USER_ID, MediaType.ALBUM, "empty")
+        self.assertEqual(match.items, [])
+        self.assertIsNone(match.stream)
+
+    def test_single_item(self):
+        self.speculator.speculate(ALEXA_USER_ID, MediaType.AUDIO, "song0", "jellyfin_user", "token")
+
+        match = self.speculator.get(ALEXA_USER_ID, MediaType.AUDIO, "song0")
+        self.assertIsNone(match.items)
+        self.assertEqual(match.stream.url, "http://localhost:8096/Audio/song0/universal")
+
+    def test_other_match(self):
+        self.speculator.speculate(ALEXA_USER_ID, MediaType.ALBUM, "album0", "jellyfin_user", "token")
+
+        self.assertIsNone(self.speculator.get(ALEXA_USER_ID, MediaType.ALBUM, "album1"))
+
+    def test_timeout(self):
+        resolved = threading.Event()
+        get_album_items = self.client.get_album_items
+
+        def hanging_get_album_items(*args, **kwargs):
+            resolved.wait(1)
+            return get_album_items(*args, **kwargs)
+
+        self.client.get_album_items = hanging_get_album_items
+        speculator = MatchSpeculator(self.client, wait=0.01)
+        speculator.speculate(ALEXA_USER_ID, MediaType.ALBUM, "album0", "jellyfin_user", "token")
+
+        # the confirmation resolves the match itself instead of waiting for the hanging server
+        self.assertIsNone(speculator.get(ALEXA_USER_ID, MediaType.ALBUM, "album0"))
+        resolved.set()
+
+
+class TestYesNoSpeculation(unittest.TestCase):
+    def setUp(self) -> None:
+        db.initialize(SqliteDatabase(":memory:"))
+        db.connect(reuse_if_open=True)
+        db.create_tables([User, Playback, QueueItem], safe=True)
+
+        User.create(alexa_auth_token=ALEXA_AUTH_TOKEN, jellyfin_user_id="a8e5cac72a3a4ad8a3069f95b4a811ee",
+                    jellyfin_token="token")
+
+        self.client = FakeJellyfinClient()
+        skill_builder = get_skill_builder(self.client)
+        self.skill = skill_builder.create()
+        self.speculator = next(handler.match_speculator
+                               for chain in skill_builder.runtime_configuration_builder.request_handler_chains
+                               for handler in [chain.request_handler]
+                               if isinstance(handler, YesNoIntentHandler))
+
+    def tearDown(self) -> None:
+        db.close()
+
+    def invoke_skill(self, intent_name: str, top_matches: List[dict], media_type: MediaType = MediaType.ALBUM) -> dict:
+        event = build_event("IntentRequest")
+        event["request"]["intent"] = {"name": intent_name, "confirmationStatus": "NONE"}
+        event["session"] = {
+            "new": False,
+            "sessionId": "amzn1.echo-api.session.1234",
+            "application": event["context"]["System"]["application"],
+            "user": event["context"]["System"]["user"],
+            "attributes": {"TopMatches": top_matches, "TopMatchesType": media_type.value}
+        }
+
+        serializer = DefaultSerializer()
+        request_envelope = serializer.deserialize(payload=json.dumps(event), obj_type=RequestEnvelope)
+
+        return serializer.serialize(self.skill.invoke(request_envelope=request_envelope, context=None))
+
+    def test_yes(self):
+        self.speculator.speculate(ALEXA_USER_ID, MediaType.ALBUM, "album0", "a8e5cac72a3a4ad8a3069f95b4a811ee",
+                                  "token")
+
+        res = self.invoke_skill("AMAZON.YesIntent", TOP_MATCHES)
+
+        # the confirmation is answered from the speculated match without further requests to the server
+        self.assertEqual(self.client.requests, [("album", "album0"), ("stream", "album0-track0"),
+                                                ("info", "album0-track0")])
+        stream = res["response"]["directives"][0]["audioItem"]["stream"]
+        self.assertEqual(stream["url"], "http://localhost:8096/Audio/album0-track0/universal")
+        self.assertEqual([item.item_id for item in get_playback(ALEXA_USER_ID).get_queue()],
+                         ["album0-track0", "album0-track1"])
+
+    def test_yes_without_speculation(self):
+        res = self.invoke_skill("AMAZON.YesIntent", TOP_MATCHES)
+
+        self.assertIn(("album", "album0"), self.client.requests)
+        stream = res["response"]["directives"][0]["audioItem"]["stream"]
+        self.assertEqual(stream["url"], "http://localhost:8096/Audio/album0-track0/universal")
+
+    def test_yes_song(self):
+        self.speculator.speculate(ALEXA_USER_ID, MediaType.AUDIO, "song0", "a8e5cac72a3a4ad8a3069f95b4a811ee",
+                                  "token")
+
+        res = self.invoke_skill("AMAZON.YesIntent", [{"Name": "song", "Id": "song0", "Artist": []}], MediaType.AUDIO)
+
+        self.assertEqual(self.client.requests, [("stream", "song0"), ("info", "song0")])
+        self.assertEqual(res["response"]["directives"][0]["audioItem"]["metadata"]["title"], "name song0")
+        self.assertEqual(get_playback(ALEXA_USER_ID).current_item.media_type, MediaType.AUDIO)
+
+    def test_no(self):
+        self.speculator.speculate(ALEXA_USER_ID, MediaType.ALBUM, "album0", "a8e5cac72a3a4ad8a3069f95b4a811ee",
+                                  "token")
+
+        self.invoke_skill("AMAZON.NoIntent", TOP_MATCHES)
+
+        # the speculation advances to the next match
+        match = self.speculator.get(ALEXA_USER_ID, MediaType.ALBUM, "album1")
+        self.assertEqual(match.stream.url, "http://localhost:8096/Audio/album1-track0/universal")
+
+    def test_no_last_match(self):
+        self.speculator.speculate(ALEXA_USER_ID, MediaType.ALBUM, "album1", "a8e5cac72a3a4ad8a3069f95b4a811ee",
+                                  "token")
+
+        self.invoke_skill("AMAZON.NoIntent", TOP_MATCHES[1:])
+
+        # no speculation is left after the last match
+        self.assertIsNone(self.speculator.get(ALEXA_USER_ID, MediaType.ALBUM, "album1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
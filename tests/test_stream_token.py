@@ -0,0 +1,130 @@
+import json
+import unittest
+from unittest import mock
+
+from ask_sdk_core.serialize import DefaultSerializer
+from ask_sdk_model import RequestEnvelope
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.alexa.handler import get_skill_builder
+from jellyfin_alexa_skill.alexa.handler.base import BaseHandler
+from jellyfin_alexa_skill.alexa.handler.event import STALE_EVENTS
+from jellyfin_alexa_skill.alexa.stream_token import StreamToken, StreamTokenSigner
+from jellyfin_alexa_skill.database.db import get_playback
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.database.state import PlaybackStateCache
+from jellyfin_alexa_skill.jellyfin.api.client import JellyfinClient, MediaType
+from tests.test_router import ALEXA_AUTH_TOKEN, ALEXA_USER_ID, build_event
+
+ITEM_IDS = [f"{i:032x}" for i in range(3)]
+
+
+class TestStreamTokenSigner(unittest.TestCase):
+    def setUp(self) -> None:
+        self.signer = StreamTokenSigner("secret")
+
+    def test_decode(self):
+        token = self.signer.encode(ALEXA_USER_ID, ITEM_IDS[1], 42, 3)
+        self.assertTrue(token.startswith(ITEM_IDS[1]))
+
+        self.assertEqual(self.signer.decode(ALEXA_USER_ID, token), StreamToken(ITEM_IDS[1], 42, 3))
+
+    def test_invalid_tokens(self):
+        token = self.signer.encode(ALEXA_USER_ID, ITEM_IDS[1], 42, 3)
+
+        # tokens of other users and secrets
+        self.assertIsNone(self.signer.decode("amzn1.ask.account.other", token))
+        self.assertIsNone(StreamTokenSigner("other secret").decode(ALEXA_USER_ID, token))
+
+        # changed positions
+        item_id, queue_idx, queue_generation, signature = token.split(":")
+        self.assertIsNone(self.signer.decode(ALEXA_USER_ID, ":".join((item_id, "2b", queue_generation, signature))))
+
+        # bare item ids of unsigned tokens
+        self.assertIsNone(self.signer.decode(ALEXA_USER_ID, ITEM_IDS[1]))
+        self.assertIsNone(self.signer.decode(ALEXA_USER_ID, None))
+
+
+class TestStaleEvents(unittest.TestCase):
+    def setUp(self) -> None:
+        db.initialize(SqliteDatabase(":memory:"))
+        db.connect(reuse_if_open=True)
+        db.create_tables([User, Playback, QueueItem], safe=True)
+
+        User.create(alexa_auth_token=ALEXA_AUTH_TOKEN, jellyfin_user_id="a8e5cac72a3a4ad8a3069f95b4a811ee",
+                    jellyfin_token="token")
+        self.playback = get_playback(ALEXA_USER_ID)
+        self.playback.set_queue([QueueItem(idx=i, media_type=MediaType.AUDIO, item_id=item_id)
+                                 for i, item_id in enumerate(ITEM_IDS)])
+
+        self.signer = StreamTokenSigner("secret")
+        BaseHandler.stream_token_signer = self.signer
+
+        jellyfin_client = JellyfinClient(server_endpoint="http://localhost:8096")
+        jellyfin_client.get_stream_url = mock.Mock(side_effect=lambda item_id, user_id, token: (
+            f"http://localhost:8096/Audio/{item_id}/universal", {"Name": item_id}))
+        jellyfin_client.get_item_info = mock.Mock(side_effect=lambda user_id, token, media_id: {"Name": media_id})
+        self.skill = get_skill_builder(jellyfin_client, PlaybackStateCache(flush_interval=0)).create()
+
+    def tearDown(self) -> None:
+        BaseHandler.stream_token_signer = None
+        db.close()
+
+    def invoke_skill(self, request_type: str, token: str) -> dict:
+        event = build_event(request_type)
+        event["request"]["token"] = token
+        event["context"]["AudioPlayer"]["token"] = token
+
+        serializer = DefaultSerializer()
+        request_envelope = serializer.deserialize(payload=json.dumps(event), obj_type=RequestEnvelope)
+
+        return serializer.serialize(self.skill.invoke(request_envelope=request_envelope, context=None))
+
+    def test_nearly_finished(self):
+        token = self.signer.encode(ALEXA_USER_ID, ITEM_IDS[0], 0, self.playback.queue_generation)
+
+        res = self.invoke_skill("AudioPlayer.PlaybackNearlyFinished", token)
+
+        stream = res["response"]["directives"][0]["audioItem"]["stream"]
+        self.assertEqual(stream["expectedPreviousToken"], token)
+        # the token of the enqueued stream contains the position of the next item
+        self.assertEqual(self.signer.decode(ALEXA_USER_ID, stream["token"]),
+                         StreamToken(ITEM_IDS[1], 1, self.playback.queue_generation))
+        self.assertEqual(get_playback(ALEXA_USER_ID).current_item.idx, 1)
+
+    def test_stale_nearly_finished(self):
+        stale_events = STALE_EVENTS.value
+
+        # the event of the first item arrives after the playback moved on to the second item
+        playback = get_playback(ALEXA_USER_ID)
+        playback.current_item = playback.next()
+        playback.save()
+
+        res = self.invoke_skill("AudioPlayer.PlaybackNearlyFinished",
+                                self.signer.encode(ALEXA_USER_ID, ITEM_IDS[0], 0, self.playback.queue_generation))
+
+        self.assertNotIn("directives", res["response"])
+        self.assertEqual(get_playback(ALEXA_USER_ID).current_item.idx, 1)
+        self.assertEqual(STALE_EVENTS.value, stale_events + 1)
+
+    def test_stale_started(self):
+        # an event of a stream of the replaced queue
+        token = self.signer.encode(ALEXA_USER_ID, ITEM_IDS[0], 0, self.playback.queue_generation - 1)
+        self.invoke_skill("AudioPlayer.PlaybackStarted", token)
+        self.assertFalse(get_playback(ALEXA_USER_ID).playing)
+
+        token = self.signer.encode(ALEXA_USER_ID, ITEM_IDS[0], 0, self.playback.queue_generation)
+        self.invoke_skill("AudioPlayer.PlaybackStarted", token)
+        self.assertTrue(get_playback(ALEXA_USER_ID).playing)
+
+    def test_unsigned_token(self):
+        # streams started before the tokens were signed are handled as before
+        self.invoke_skill("AudioPlayer.PlaybackNearlyFinished", ITEM_IDS[0])
+
+        self.assertEqual(get_playback(ALEXA_USER_ID).current_item.idx, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from peewee import SqliteDatabase
+
+from jellyfin_alexa_skill.database.model.base import db
+from jellyfin_alexa_skill.database.model.playback import Playback, QueueItem
+from jellyfin_alexa_skill.database.model.user import User
+from jellyfin_alexa_skill.database.user_cache import UserCache
+
+ALEXA_AUTH_TOKEN = "a7e1b6e9f0c24d5b8a3f6e2d1c0b9a8f"
+JELLYFIN_USER_ID = "a8e5cac72a3a4ad8a3069f95b4a811ee"
+JELLYFIN_TOKEN = "c98e5a373ff04faebc46daec14572eed"
+
+
+class TestUserCache(unittest.TestCase):
+    def setUp(self) -> None:
+        db.initialize(SqliteDatabase(":memory:"))
+        db.connect(reuse_if_open=True)
+        db.create_tables([User, Playback, QueueItem], safe=True)
+
+        User.create(alexa_auth_token=ALEXA_AUTH_TOKEN, jellyfin_user_id=JELLYFIN_USER_ID, jellyfin_token=JELLYFIN_TOKEN)
+
+    def tearDown(self) -> None:
+        db.close()
+
+    def test_get_user(self):
+        user_cache = UserCache(max_size=16, ttl=60)
+
+        user = user_cache.get_user(ALEXA_AUTH_TOKEN)
+        self.assertEqual(user.jellyfin_user_id, JELLYFIN_USER_ID)
+        self.assertEqual(len(user_cache), 1)
+
+        # the second lookup does not query the database
+        User.delete().execute()
+        user = user_cache.get_user(ALEXA_AUTH_TOKEN)
+        self.assertEqual(user.alexa_auth_token, ALEXA_AUTH_TOKEN)
+        self.assertEqual(user.jellyfin_user_id, JELLYFIN_USER_ID)
+        self.assertEqual(user.jellyfin_token, JELLYFIN_TOKEN)
+
+    def test_unknown_user(self):
+        user_cache = UserCache(max_size=16, ttl=60)
+
+        self.assertIsNone(user_cache.get_user("unknown"))
+        self.assertEqual(len(user_cache), 0)
+
+    def test_invalidate(self):
+        user_cache = UserCache(max_size=16, ttl=60)
+        user_cache.get_user(ALEXA_AUTH_TOKEN)
+
+        # the account is linked again with a new access token
+        User.delete().execute()
+        User.create(alexa_auth_token="new", jellyfin_user_id=JELLYFIN_USER_ID, jellyfin_token="new token")
+
+        self.assertEqual(user_cache.invalidate_jellyfin_user("other"), 0)
+        self.assertEqual(user_cache.invalidate_jellyfin_user(JELLYFIN_USER_ID), 1)
+
+        self.assertIsNone(user_cache.get_user(ALEXA_AUTH_TOKEN))
+        self.assertEqual(user_cache.get_user("new").jellyfin_token, "new token")
+
+    def test_disabled(self):
+        user_cache = UserCache(max_size=0, ttl=60)
+
+        self.assertIsNotNone(user_cache.get_user(ALEXA_AUTH_TOKEN))
+        self.assertEqual(len(user_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()